@@ -0,0 +1,98 @@
+"""
+--sample 抽样估算的加速比与误差基准
+
+用 git fast-import 生成指定数量 commit 的合成仓库（工作日白天为主，夹杂晚间与周末加班），
+按几种抽样比例分别运行 SampledAnalyzer，并与同一仓库的完整统计对比；
+先在没有 commit-graph 时测一遍，写入 commit-graph 后再测一遍：
+
+    python benchmarks/sample_speedup.py
+    python benchmarks/sample_speedup.py --commits 500000 --rates 0.02 0.05 0.1
+
+输出每种抽样比例的样本量、耗时、加速比、996 指数以及置信区间是否覆盖完整统计的结果；
+有置信区间未覆盖完整统计结果时以状态码 1 退出。
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code996_local import SampledAnalyzer  # noqa: E402
+
+TZ = timezone(timedelta(hours=8))
+
+
+def commit_times(count, seed):
+    """按时间排列的合成 commit 时间：工作日 9~19 点为主，约两成在晚间或周末"""
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1, tzinfo=TZ)
+    times = []
+    for _ in range(count):
+        day = start + timedelta(days=rng.randrange(730))
+        if day.weekday() >= 5 and rng.random() < 0.85:
+            day += timedelta(days=7 - day.weekday())  # 周末的大部分挪到下周一
+        hour = rng.choice(range(19, 24)) if rng.random() < 0.15 else rng.choice(range(9, 19))
+        times.append(day + timedelta(hours=hour, minutes=rng.randrange(60)))
+    times.sort()
+    return times
+
+
+def build_repo(path, count, seed):
+    """用 git fast-import 生成 count 个空提交组成的线性历史"""
+    subprocess.run(['git', 'init', '-q', '-b', 'main', path], check=True)
+    lines = []
+    for seq, moment in enumerate(commit_times(count, seed)):
+        signature = f"bench <bench@example.com> {int(moment.timestamp())} +0800"
+        message = f"commit {seq}"
+        lines += ["commit refs/heads/main", f"author {signature}", f"committer {signature}",
+                  f"data {len(message)}", message, '']
+    subprocess.run(['git', '-C', path, 'fast-import', '--quiet'], input='\n'.join(lines).encode(), check=True)
+
+
+def run(repo, rate, tolerance):
+    analyzer = SampledAnalyzer(start_date='2022-01-01', end_date='2025-12-31', repo_path=repo,
+                               rate=rate, tolerance=tolerance)
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        result = analyzer.analyze()
+        comparison = analyzer.compare_exact(result)
+    return result['sample'], result, comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description='--sample 加速比与误差基准')
+    parser.add_argument('--commits', type=int, default=200000, help='合成仓库的 commit 数 (默认: 200000)')
+    parser.add_argument('--rates', type=float, nargs='+', default=[0.05, 0.1, 0.2], help='抽样比例')
+    parser.add_argument('--tolerance', type=float, default=5.0, help='置信区间半宽容差 (默认: 5)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='code996-bench-') as repo:
+        started = time.perf_counter()
+        build_repo(repo, args.commits, args.seed)
+        print(f"合成仓库: {args.commits} 个 commit（生成耗时 {time.perf_counter() - started:.1f}s）")
+        all_covered = True
+        for commit_graph in (False, True):
+            if commit_graph:
+                subprocess.run(['git', '-C', repo, 'commit-graph', 'write', '--reachable'], check=True)
+            print(f"\n{'有' if commit_graph else '无'} commit-graph")
+            print(f"{'比例':>6} {'样本量':>8} {'抽样耗时':>8} {'完整耗时':>8} {'加速比':>7} "
+                  f"{'996指数(抽样/完整)':>14} {'95% 置信区间':>12} {'覆盖':>4}")
+            for rate in args.rates:
+                sample, result, comparison = run(repo, rate, args.tolerance)
+                low, high = sample['index_996_ci']
+                all_covered &= comparison['index_996_covered']
+                print(f"{rate:>8} {sample['sampled']:>10} {sample['elapsed']:>11.2f}s {comparison['elapsed']:>11.2f}s "
+                      f"{comparison['speedup']:>9}x {result['index_996']:>12}/{comparison['index_996']:<8} "
+                      f"{f'[{low}, {high}]':>14} {'✓' if comparison['index_996_covered'] else '✗':>5}")
+    sys.exit(0 if all_covered else 1)
+
+
+if __name__ == '__main__':
+    main()
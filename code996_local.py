@@ -9,14 +9,685 @@ import subprocess
 import sys
 import os
 import json
-from datetime import datetime
-from collections import defaultdict
+from datetime import datetime, date, timedelta
+from collections import defaultdict, Counter
 import argparse
 import math
+import random
 import webbrowser
 import tempfile
 import shutil
 import re
+from html import escape as html_escape
+import threading
+import queue
+import itertools
+import heapq
+import functools
+import struct
+import gzip
+import zlib
+import base64
+import tarfile
+import csv
+import hashlib
+import contextlib
+import time
+import select
+import ctypes
+import ctypes.util
+import sqlite3
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+
+# 目录扫描时默认跳过的目录（依赖、缓存，通常很大且不包含独立仓库）
+DEFAULT_PRUNE_DIRS = frozenset([
+    'node_modules', 'bower_components', 'vendor_modules',
+    '__pycache__', '.venv', 'venv', '.tox', '.nox', '.gradle', '.idea', '.cache',
+])
+# 常见的构建产物目录：跳过，但目录本身是仓库时（如克隆到 build/、target/）仍然报告
+BUILD_OUTPUT_DIRS = frozenset(['build', 'dist', 'out', 'target', 'bin', 'obj'])
+
+
+def _is_repo_dir(path):
+    """目录本身是否为 Git 仓库（含 .git，或为 bare 仓库）"""
+    return os.path.exists(os.path.join(path, '.git')) or (
+        os.path.isfile(os.path.join(path, 'HEAD')) and os.path.isdir(os.path.join(path, 'objects')))
+
+
+def _scan_directory(path, include_submodules, prune_dirs):
+    """
+    扫描单个目录（只读取一层）
+
+    Returns:
+        tuple: (仓库信息或 None, 需要继续扫描的子目录列表)
+    """
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        # 无权限、目录在扫描期间被删除等情况直接跳过
+        return None, []
+
+    names = {entry.name for entry in entries}
+
+    # bare 仓库：目录下直接包含 HEAD / objects / refs
+    if 'HEAD' in names and 'objects' in names and 'refs' in names:
+        return {'path': path, 'type': 'local', 'bare': True}, []
+
+    repo = None
+    if '.git' in names:
+        # 普通仓库（.git 目录）或子模块/worktree（.git 文件）
+        repo = {'path': path, 'type': 'local'}
+        if not include_submodules:
+            return repo, []
+
+    subdirs = []
+    for entry in entries:
+        if entry.name == '.git' or entry.name in prune_dirs:
+            continue
+        try:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+        except OSError:
+            continue
+        if entry.name in BUILD_OUTPUT_DIRS and not _is_repo_dir(entry.path):
+            continue
+        subdirs.append(entry.path)
+
+    return repo, subdirs
+
+
+def discover_git_repos(root, workers=8, include_submodules=False, prune_dirs=DEFAULT_PRUNE_DIRS):
+    """
+    并行递归扫描目录树，逐个产出发现的 Git 仓库
+
+    使用线程池 + os.scandir 遍历目录，发现仓库后立即产出，
+    调用方可以在扫描尚未结束时就开始分析。
+
+    Args:
+        root: 扫描根目录
+        workers: 扫描线程数
+        include_submodules: 是否继续进入工作区查找子模块/嵌套仓库
+        prune_dirs: 无条件跳过的目录名集合（BUILD_OUTPUT_DIRS 只在目录本身不是仓库时跳过）
+
+    Yields:
+        dict: {'path': 'xxx', 'type': 'local'}，bare 仓库额外带 'bare': True
+    """
+    dir_queue = queue.Queue()
+    found_queue = queue.Queue()
+    finished = object()
+    workers = max(1, workers)
+
+    def worker():
+        while True:
+            path = dir_queue.get()
+            if path is None:
+                return
+            try:
+                repo, subdirs = _scan_directory(path, include_submodules, prune_dirs)
+                if repo:
+                    found_queue.put(repo)
+                for subdir in subdirs:
+                    dir_queue.put(subdir)
+            finally:
+                dir_queue.task_done()
+
+    def watcher():
+        # 所有目录都处理完毕后，通知工作线程和消费者结束
+        dir_queue.join()
+        for _ in range(workers):
+            dir_queue.put(None)
+        found_queue.put(finished)
+
+    dir_queue.put(os.path.abspath(root))
+    for _ in range(workers):
+        threading.Thread(target=worker, daemon=True).start()
+    threading.Thread(target=watcher, daemon=True).start()
+
+    while True:
+        repo = found_queue.get()
+        if repo is finished:
+            return
+        yield repo
+
+
+# 24×7 直方图：按 (星期-1) * 24 + 小时 展开为 168 个计数
+HOURS_PER_DAY = 24
+DAYS_PER_WEEK = 7
+HISTOGRAM_SIZE = HOURS_PER_DAY * DAYS_PER_WEEK
+WEEK_LABELS = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+
+def histogram_to_stats(histogram):
+    """
+    将 24×7 直方图转换为 hour_data / week_data（与 git log 统计格式一致）
+
+    Returns:
+        tuple: (hour_data, week_data)，hour_data 只包含有 commit 的小时
+    """
+    hour_counts = [0] * HOURS_PER_DAY
+    week_counts = [0] * DAYS_PER_WEEK
+    for day in range(DAYS_PER_WEEK):
+        row = histogram[day * HOURS_PER_DAY:(day + 1) * HOURS_PER_DAY]
+        week_counts[day] = sum(row)
+        for hour, count in enumerate(row):
+            hour_counts[hour] += count
+
+    hour_data = [
+        {'time': f"{hour:02d}", 'count': count}
+        for hour, count in enumerate(hour_counts) if count
+    ]
+    week_data = [
+        {'time': WEEK_LABELS[day], 'count': week_counts[day]}
+        for day in range(DAYS_PER_WEEK)
+    ]
+    return hour_data, week_data
+
+
+# 分钟级直方图（--minutes）：按 (星期-1) * 1440 + 小时 * 60 + 分钟 展开为 10080 个计数
+MINUTES_PER_DAY = HOURS_PER_DAY * 60
+MINUTE_HISTOGRAM_SIZE = MINUTES_PER_DAY * DAYS_PER_WEEK
+MINUTE_KERNEL_SIGMA = 15  # 高斯核平滑的带宽（分钟）
+MINUTE_PROFILE_STEP = 10  # 报告中平滑曲线的采样间隔（分钟）
+WORK_TIME_THRESHOLD = 0.45  # 工作时间阈值：相对于平方平均数的比例
+OPENING_MINUTES = (8 * 60, 13 * 60)  # 开工时间段（8:00-12:59）
+CLOSING_MINUTES = (17 * 60, MINUTES_PER_DAY)  # 收工时间段（17:00-23:59）
+
+
+def gaussian_kernel(sigma):
+    """截断到 ±3σ、归一化的高斯核"""
+    radius = 3 * sigma
+    weights = [math.exp(-offset * offset / (2 * sigma * sigma)) for offset in range(-radius, radius + 1)]
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+def smooth_minute_profile(profile, sigma=MINUTE_KERNEL_SIGMA):
+    """
+    对一天 1440 分钟的 commit 计数做环形高斯核平滑（23:59 与 0:00 相邻）
+
+    安装了 NumPy 时整段向量化卷积；否则只对有 commit 的分钟逐个散布核权重
+
+    Returns:
+        tuple: (1440 个平滑后的值, 'numpy' / 'python')
+    """
+    kernel = gaussian_kernel(sigma)
+    radius = len(kernel) // 2
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    if np is not None:
+        values = np.asarray(profile, dtype=float)
+        padded = np.concatenate((values[-radius:], values, values[:radius]))
+        return np.convolve(padded, kernel, mode='valid').tolist(), 'numpy'
+
+    size = len(profile)
+    smoothed = [0.0] * size
+    for minute, count in enumerate(profile):
+        if count:
+            for offset, weight in enumerate(kernel, minute - radius):
+                smoothed[offset % size] += count * weight
+    return smoothed, 'python'
+
+
+def detect_work_minutes(minute_histogram, sigma=MINUTE_KERNEL_SIGMA):
+    """
+    由分钟级直方图识别精确到分钟的上下班时间
+
+    与 calculate_work_time_range() 的规则相同，只是把 24 个小时桶换成平滑后的 1440 分钟曲线：
+    平滑值不低于平方平均数 × WORK_TIME_THRESHOLD 的分钟视为工作时间，
+    开工时间为 8:00-12:59 中第一个越过阈值的分钟，收工时间为 17:00-23:59 中最后一个。
+
+    Returns:
+        dict: {'opening', 'closing'（HH:MM，未识别时为 None）, 'opening_minute', 'closing_minute',
+               'bandwidth', 'backend', 'threshold', 'profile'（每 MINUTE_PROFILE_STEP 分钟的平滑值，换算为 commit/小时）}
+    """
+    profile = [0] * MINUTES_PER_DAY
+    for day in range(DAYS_PER_WEEK):
+        offset = day * MINUTES_PER_DAY
+        for minute, count in enumerate(minute_histogram[offset:offset + MINUTES_PER_DAY]):
+            profile[minute] += count
+    smoothed, backend = smooth_minute_profile(profile, sigma)
+
+    active = [value for value in smoothed if value > 0]
+    threshold = math.sqrt(sum(value * value for value in active) / len(active)) * WORK_TIME_THRESHOLD if active else 0
+
+    def crossing(minutes):
+        if not active:
+            return None
+        return next((minute for minute in minutes if smoothed[minute] >= threshold), None)
+
+    opening = crossing(range(*OPENING_MINUTES))
+    closing = crossing(reversed(range(*CLOSING_MINUTES)))
+
+    def clock(minute):
+        return f"{minute // 60:02d}:{minute % 60:02d}" if minute is not None else None
+
+    return {
+        'opening': clock(opening),
+        'closing': clock(closing),
+        'opening_minute': opening,
+        'closing_minute': closing,
+        'bandwidth': sigma,
+        'backend': backend,
+        'threshold': round(threshold * 60, 2),
+        'profile': [
+            round(sum(smoothed[start:start + MINUTE_PROFILE_STEP]) * 60 / MINUTE_PROFILE_STEP, 2)
+            for start in range(0, MINUTES_PER_DAY, MINUTE_PROFILE_STEP)
+        ],
+    }
+
+
+# 工作日历（--calendar）：每天的类型
+DAY_WORKDAY = 0  # 工作日（含调休上班的周末）
+DAY_WEEKEND = 1  # 普通周末
+DAY_HOLIDAY = 2  # 法定节假日（含假期中的周末）
+DAY_TYPE_LABELS = ('工作日', '周末', '节假日')
+
+# 内置日历，格式与自定义日历文件相同：日期为 YYYY-MM-DD，连续多天写作 START:END
+BUILTIN_CALENDARS = {
+    # 中国法定节假日与调休上班日（国务院办公厅每年发布的放假安排）
+    'cn': {
+        'name': 'cn',
+        'holidays': [
+            '2022-01-01:2022-01-03', '2022-01-31:2022-02-06', '2022-04-03:2022-04-05', '2022-04-30:2022-05-04',
+            '2022-06-03:2022-06-05', '2022-09-10:2022-09-12', '2022-10-01:2022-10-07',
+            '2022-12-31:2023-01-02', '2023-01-21:2023-01-27', '2023-04-05', '2023-04-29:2023-05-03',
+            '2023-06-22:2023-06-24', '2023-09-29:2023-10-06',
+            '2023-12-30:2024-01-01', '2024-02-10:2024-02-17', '2024-04-04:2024-04-06', '2024-05-01:2024-05-05',
+            '2024-06-08:2024-06-10', '2024-09-15:2024-09-17', '2024-10-01:2024-10-07',
+            '2025-01-01', '2025-01-28:2025-02-04', '2025-04-04:2025-04-06', '2025-05-01:2025-05-05',
+            '2025-05-31:2025-06-02', '2025-10-01:2025-10-08',
+            '2026-01-01:2026-01-03', '2026-02-15:2026-02-23', '2026-04-04:2026-04-06', '2026-05-01:2026-05-05',
+            '2026-06-19:2026-06-21', '2026-09-25:2026-09-27', '2026-10-01:2026-10-07',
+        ],
+        'workdays': [
+            '2022-01-29', '2022-01-30', '2022-04-02', '2022-04-24', '2022-05-07', '2022-10-08', '2022-10-09',
+            '2023-01-28', '2023-01-29', '2023-04-23', '2023-05-06', '2023-06-25', '2023-10-07', '2023-10-08',
+            '2024-02-04', '2024-02-18', '2024-04-07', '2024-04-28', '2024-05-11', '2024-09-14', '2024-09-29',
+            '2024-10-12',
+            '2025-01-26', '2025-02-08', '2025-04-27', '2025-09-28', '2025-10-11',
+            '2026-01-04', '2026-02-14', '2026-02-28', '2026-05-09', '2026-09-20', '2026-10-10',
+        ],
+    },
+}
+
+
+def parse_calendar_days(items, source):
+    """将日历中的日期列表（YYYY-MM-DD 或 START:END）展开为 ordinal 列表"""
+    ordinals = []
+    for item in items:
+        first, _, last = str(item).partition(':')
+        try:
+            start = date.fromisoformat(first.strip()).toordinal()
+            end = date.fromisoformat(last.strip()).toordinal() if last else start
+        except ValueError:
+            print(f"错误: 日历 {source} 中的日期格式应为 YYYY-MM-DD 或 START:END: {item}", file=sys.stderr)
+            sys.exit(1)
+        ordinals.extend(range(start, end + 1))
+    return ordinals
+
+
+def load_calendar(source):
+    """
+    读取工作日历：内置名称（如 cn）或 JSON 文件
+
+    文件格式: {"name": "...", "holidays": [...], "workdays": [...], "weekend": [6, 7]}，
+    holidays 为放假日，workdays 为调休上班日，weekend 为周末的星期几（1-7，可选，默认周六、周日）
+    """
+    if source.lower() in BUILTIN_CALENDARS:
+        return BUILTIN_CALENDARS[source.lower()]
+    if not os.path.isfile(source):
+        print(f"错误: 找不到日历 {source}（内置日历: {', '.join(BUILTIN_CALENDARS)}）", file=sys.stderr)
+        sys.exit(1)
+    try:
+        with open(source, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"错误: 读取日历文件失败 {source}: {e}", file=sys.stderr)
+        sys.exit(1)
+    weekend = spec.get('weekend', [6, 7]) if isinstance(spec, dict) else None
+    if (not isinstance(spec, dict) or not isinstance(spec.get('holidays', []), list)
+            or not isinstance(spec.get('workdays', []), list)
+            or not isinstance(weekend, list) or not all(day in range(1, 8) for day in weekend)):
+        print(f"错误: 日历文件 {source} 应为包含 holidays / workdays 列表（可选 weekend）的 JSON 对象", file=sys.stderr)
+        sys.exit(1)
+    return dict(spec, name=spec.get('name') or os.path.splitext(os.path.basename(source))[0])
+
+
+class WorkCalendar:
+    """
+    工作日历：把一个或多个日历编译为按天下标的字节数组（每天一个 DAY_* 类型）
+
+    数组覆盖日历中出现过的所有整年，统计时每个 commit 按日期查表；
+    范围之外的日期只按星期几区分工作日与周末。多个日历按顺序叠加，后面的覆盖前面的。
+    """
+
+    def __init__(self, sources):
+        specs = [load_calendar(source) for source in sources]
+        self.name = '+'.join(spec['name'] for spec in specs)
+        self.weekend = frozenset(next((spec['weekend'] for spec in reversed(specs) if 'weekend' in spec), (6, 7)))
+        layers = [(parse_calendar_days(spec.get('holidays', []), spec['name']),
+                   parse_calendar_days(spec.get('workdays', []), spec['name'])) for spec in specs]
+        listed = [ordinal for holidays, workdays in layers for ordinal in holidays + workdays]
+        if not listed:
+            print(f"错误: 日历 {self.name} 中没有任何日期", file=sys.stderr)
+            sys.exit(1)
+        self.first = date(date.fromordinal(min(listed)).year, 1, 1).toordinal()
+        last = date(date.fromordinal(max(listed)).year, 12, 31).toordinal()
+        self.days = bytearray(
+            DAY_WEEKEND if self.isoweekday(ordinal) in self.weekend else DAY_WORKDAY
+            for ordinal in range(self.first, last + 1)
+        )
+        for holidays, workdays in layers:
+            for ordinal in holidays:
+                self.days[ordinal - self.first] = DAY_HOLIDAY
+            for ordinal in workdays:
+                self.days[ordinal - self.first] = DAY_WORKDAY
+        self._types = {}  # YYYY-MM-DD -> 类型，省去重复解析日期
+
+    @staticmethod
+    def isoweekday(ordinal):
+        """ordinal 对应的星期几（1-7，周一=1；ordinal 1 为周一）"""
+        return (ordinal - 1) % 7 + 1
+
+    def classify(self, day):
+        """YYYY-MM-DD -> DAY_WORKDAY / DAY_WEEKEND / DAY_HOLIDAY"""
+        day_type = self._types.get(day)
+        if day_type is None:
+            ordinal = date.fromisoformat(day).toordinal()
+            offset = ordinal - self.first
+            if 0 <= offset < len(self.days):
+                day_type = self.days[offset]
+            else:
+                day_type = DAY_WEEKEND if self.isoweekday(ordinal) in self.weekend else DAY_WORKDAY
+            self._types[day] = day_type
+        return day_type
+
+    def describe(self):
+        """结果中的 calendar 字段"""
+        return {
+            'name': self.name,
+            'start': date.fromordinal(self.first).isoformat(),
+            'end': date.fromordinal(self.first + len(self.days) - 1).isoformat(),
+        }
+
+
+PERIOD_CHOICES = ('day', 'week', 'month')
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# --refs 的预设选择器 -> for-each-ref 模式
+REF_SELECTORS = {
+    'all': ['refs/heads', 'refs/remotes', 'refs/tags'],
+    'branches': ['refs/heads', 'refs/remotes'],
+}
+
+
+@functools.lru_cache(maxsize=None)
+def period_key(day, granularity):
+    """
+    将 YYYY-MM-DD 映射为周期标识
+
+    Returns:
+        str: day -> 2024-03-15, week -> 2024-W11（ISO 周）, month -> 2024-03
+    """
+    if granularity == 'month':
+        return day[:7]
+    if granularity == 'week':
+        year, week, _ = date.fromisoformat(day).isocalendar()
+        return f"{year}-W{week:02d}"
+    return day
+
+
+@functools.lru_cache(maxsize=None)
+def day_to_number(day):
+    """YYYY-MM-DD -> 1970-01-01 起的天数"""
+    return date.fromisoformat(day).toordinal() - EPOCH_ORDINAL
+
+
+@functools.lru_cache(maxsize=None)
+def number_to_day(number):
+    """1970-01-01 起的天数 -> YYYY-MM-DD"""
+    return date.fromordinal(number + EPOCH_ORDINAL).isoformat()
+
+
+def parse_windows(values):
+    """
+    解析 --window 参数：NAME=YYYY-MM-DD:YYYY-MM-DD（两端均包含）
+    
+    Returns:
+        list: [{'name': 'Q1', 'start_date': '2024-01-01', 'end_date': '2024-03-31'}, ...]
+    """
+    windows = []
+    for value in values or []:
+        match = re.match(r'^\s*([^=]+?)\s*=\s*(\d{4}-\d{2}-\d{2})\s*:\s*(\d{4}-\d{2}-\d{2})\s*$', value)
+        if not match:
+            print(f"错误: 时间窗口格式应为 NAME=YYYY-MM-DD:YYYY-MM-DD: {value}", file=sys.stderr)
+            sys.exit(1)
+        name, start, end = match.groups()
+        try:
+            date.fromisoformat(start)
+            date.fromisoformat(end)
+        except ValueError:
+            print(f"错误: 无效的日期: {value}", file=sys.stderr)
+            sys.exit(1)
+        if start > end:
+            print(f"错误: 时间窗口起始日期晚于结束日期: {value}", file=sys.stderr)
+            sys.exit(1)
+        windows.append({'name': name, 'start_date': start, 'end_date': end})
+    return windows
+
+
+def windows_date_range(windows):
+    """所有时间窗口的并集范围，用于只遍历一次 git 历史（--before 为次日，保证包含结束当天）"""
+    start = min(w['start_date'] for w in windows)
+    end = date.fromisoformat(max(w['end_date'] for w in windows)) + timedelta(days=1)
+    return start, end.isoformat()
+
+
+def summarize_window(window, result):
+    """提取时间窗口结果中用于对比展示的字段"""
+    return {
+        'name': window['name'],
+        'start_date': window['start_date'],
+        'end_date': window['end_date'],
+        'total_count': result['total_count'],
+        'hour_data': result['hour_data'],
+        'week_data': result['week_data'],
+        'opening_hour': result['opening_hour'],
+        'closing_hour': result['closing_hour'],
+        'work_days': result['work_days'],
+        'index_996': result['index_996'],
+        'overtime_ratio': result['overtime_ratio'],
+        'is_standard': result['is_standard'],
+        'description': result['description'],
+    }
+
+
+def revs_stdin(revs):
+    """版本范围 -> git --stdin 的输入（旧版 git 不接受 stdin 中的 --not，改写为 ^SHA）"""
+    lines, negate = [], False
+    for rev in revs:
+        if rev == '--not':
+            negate = not negate
+        else:
+            lines.append('^' + rev if negate else rev)
+    return '\n'.join(lines) + '\n'
+
+
+def merge_histogram_stats(target, source):
+    """将 collect_histogram() 的结果累加到 target（直方图、周期、时间窗口）"""
+    for index, count in enumerate(source['histogram']):
+        target['histogram'][index] += count
+    if target['periods'] is not None:
+        for key, bucket in source['periods'].items():
+            merged = target['periods'].setdefault(key, [0] * HISTOGRAM_SIZE)
+            for index, count in enumerate(bucket):
+                merged[index] += count
+    for merged, bucket in zip(target['windows'], source['windows']):
+        for index, count in enumerate(bucket):
+            merged[index] += count
+    if target.get('refs') is not None:
+        target['refs'].update(source['refs'])
+    if target.get('minutes') is not None:
+        for index, count in enumerate(source['minutes']):
+            if count:
+                target['minutes'][index] += count
+    if target.get('day_types') is not None:
+        for merged, counts in zip([target['day_types'], *target['window_day_types']],
+                                  [source['day_types'], *source['window_day_types']]):
+            for day_type, count in enumerate(counts):
+                merged[day_type] += count
+
+
+def sha_to_digest(sha):
+    """将 commit SHA（十六进制）转换为 20 字节摘要"""
+    return bytes.fromhex(sha[:40])
+
+
+class SortedDigestSet:
+    """
+    精确去重集合：有序拼接的 20 字节摘要 + 少量待合并摘要
+
+    主体存储为一段连续的 bytes（每个摘要 20 字节，二分查找），
+    新摘要先进入小集合，积累到主体的一定比例后再归并，
+    内存接近 20 字节/commit，远小于十六进制字符串组成的 set。
+    """
+
+    DIGEST_SIZE = 20
+    MIN_PENDING = 65536
+
+    def __init__(self):
+        self._sorted = b''
+        self._count = 0
+        self._pending = set()
+
+    def __len__(self):
+        return self._count + len(self._pending)
+
+    def __contains__(self, digest):
+        return digest in self._pending or self._search(digest)
+
+    @property
+    def nbytes(self):
+        return len(self._sorted) + len(self._pending) * self.DIGEST_SIZE
+
+    def _search(self, digest):
+        buf, size = self._sorted, self.DIGEST_SIZE
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = buf[mid * size:(mid + 1) * size]
+            if probe < digest:
+                lo = mid + 1
+            elif probe > digest:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def add(self, digest):
+        """加入摘要，返回是否为首次出现"""
+        if digest in self:
+            return False
+        self._pending.add(digest)
+        if len(self._pending) >= max(self.MIN_PENDING, self._count // 8):
+            self._flush()
+        return True
+
+    def _flush(self):
+        """将待合并摘要归并进有序主体"""
+        if not self._pending:
+            return
+        buf, size = self._sorted, self.DIGEST_SIZE
+        existing = (buf[i:i + size] for i in range(0, len(buf), size))
+        self._sorted = b''.join(heapq.merge(existing, sorted(self._pending)))
+        self._count += len(self._pending)
+        self._pending = set()
+
+    def clear(self):
+        self._sorted = b''
+        self._count = 0
+        self._pending = set()
+
+
+class BloomDigestSet:
+    """
+    近似去重集合：Bloom filter，内存固定，存在可配置的误判率
+
+    误判时会把一个新 commit 当作重复 commit 丢弃，适合超大规模仓库集合。
+    """
+
+    def __init__(self, capacity=1000000, false_positive_rate=0.001):
+        capacity = max(1, int(capacity))
+        false_positive_rate = min(max(false_positive_rate, 1e-9), 0.5)
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+        self._warned = False
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+    def _positions(self, digest):
+        # SHA 本身已均匀分布，直接切片作为两个基础哈希（双重哈希）
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, digest):
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+    def add(self, digest):
+        """加入摘要，返回是否为首次出现（可能误判为已存在）"""
+        bits = self._bits
+        is_new = False
+        for pos in self._positions(digest):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                is_new = True
+        if is_new:
+            self._count += 1
+            if self._count > self.capacity and not self._warned:
+                self._warned = True
+                print(f"⚠️  提示: 去重 commit 数已超过 Bloom filter 容量 {self.capacity}，误判率将上升", file=sys.stderr)
+        return is_new
+
+    def clear(self):
+        self._bits = bytearray(len(self._bits))
+        self._count = 0
+
+
+def create_digest_set(mode, capacity=1000000, false_positive_rate=0.001):
+    """根据 --dedupe 模式创建去重集合"""
+    if mode == 'bloom':
+        return BloomDigestSet(capacity, false_positive_rate)
+    return SortedDigestSet()
+
+
+def classify_repo(spec):
+    """根据路径/URL 判断仓库类型，返回 {'path': ..., 'type': 'local'/'remote'/'archive'}"""
+    if spec.startswith('http://') or spec.startswith('https://') or spec.startswith('git@'):
+        return {'path': spec, 'type': 'remote'}
+    return local_repo_spec(spec)
+
+
+def local_repo_spec(path):
+    """本地路径：bundle / tar 归档文件为 'archive'，其余为 'local'"""
+    if is_repo_archive(path):
+        return {'path': path, 'type': 'archive'}
+    return {'path': path, 'type': 'local'}
 
 
 def parse_repo_list(args):
@@ -27,7 +698,8 @@ def parse_repo_list(args):
         args: argparse解析后的参数对象
     
     Returns:
-        list: [{'path': 'xxx', 'type': 'local'/'remote'}, ...]
+        list: [{'path': 'xxx', 'type': 'local'/'remote'/'archive'}, ...]
+              使用 --scan 时返回惰性迭代器（扫描与分析同时进行）
     """
     repos = []
     
@@ -36,7 +708,7 @@ def parse_repo_list(args):
         for path in args.repos.split(','):
             path = path.strip()
             if path:
-                repos.append({'path': path, 'type': 'local'})
+                repos.append(local_repo_spec(path))
     
     # 处理 --urls（逗号分隔）
     if args.urls:
@@ -49,7 +721,7 @@ def parse_repo_list(args):
     if args.repo and isinstance(args.repo, list):
         for path in args.repo:
             if path:
-                repos.append({'path': path, 'type': 'local'})
+                repos.append(local_repo_spec(path))
     
     # 处理 --url 多次传入（action='append'）
     if args.url and isinstance(args.url, list):
@@ -79,10 +751,18 @@ def parse_repo_list(args):
                     continue
                 
                 # 判断是本地路径还是 URL
-                if line.startswith('http://') or line.startswith('https://') or line.startswith('git@'):
-                    repos.append({'path': line, 'type': 'remote'})
-                else:
-                    repos.append({'path': line, 'type': 'local'})
+                repos.append(classify_repo(line))
+    
+    # 处理 --scan（目录扫描，边扫描边产出）
+    if getattr(args, 'scan', None):
+        prune_dirs = DEFAULT_PRUNE_DIRS | frozenset(args.scan_exclude or [])
+        scanners = [
+            discover_git_repos(root, workers=args.scan_workers,
+                               include_submodules=args.scan_submodules,
+                               prune_dirs=prune_dirs)
+            for root in args.scan
+        ]
+        return itertools.chain(repos, *scanners)
     
     # 如果没有提供任何仓库参数，默认当前目录（单仓库模式）
     if not repos:
@@ -102,7 +782,7 @@ def validate_repo_params(args):
         SystemExit: 参数配置错误时退出
     """
     # 检测是否使用了多仓库参数
-    multi_repo_params = bool(args.repos or args.urls or args.input_file)
+    multi_repo_params = bool(args.repos or args.urls or args.input_file or args.scan)
     
     # 检测是否使用了传统单仓库参数（但不是默认值）
     # 注意：--repo 和 --url 现在支持多次传入，所以允许它们出现
@@ -115,15 +795,418 @@ def validate_repo_params(args):
     return True
 
 
+def parse_size(value):
+    """解析字节数：支持 K/M/G/T 后缀（1024 进制），如 500M、20G"""
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$', str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"无效的大小: {value}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** ' KMGT'.index(unit.upper() or ' '))
+
+
+def format_size(num_bytes):
+    """字节数 -> 便于阅读的字符串"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+def directory_size(path):
+    """目录下所有文件的总字节数"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def lock_file(f, shared=False, blocking=True):
+    """
+    对已打开的文件加锁，非阻塞模式下拿不到锁返回 False
+    
+    POSIX 使用 flock（支持共享锁）；Windows 使用 msvcrt.locking，只有独占锁
+    """
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            if blocking:
+                raise
+            return False
+        return True
+    
+    flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if not blocking:
+        flags |= fcntl.LOCK_NB
+    try:
+        fcntl.flock(f.fileno(), flags)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def unlock_file(f):
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        return
+    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class CloneCache:
+    """
+    远程仓库的 bare clone 缓存（默认 online_project/）
+    
+    每个 URL 对应一个固定目录，命中时复用并 fetch 更新，未命中时克隆。
+    .cache-index.json 记录每个条目的 URL、大小、最后使用时间以及累计命中/未命中/淘汰次数，
+    超出容量或超过最长闲置时间的条目按最后使用时间（LRU）淘汰。
+    
+    并发安全：索引的读写持有 .cache.lock 独占锁；每个条目有自己的锁文件，
+    clone/fetch 期间独占，分析期间共享，淘汰时只删除能拿到独占锁（无人使用）的条目。
+    
+    共享对象库模式（families 不为 None）下，同一“家族”的 URL（默认按仓库名归类，
+    如各个 fork）共用 .stores/<家族>.git：成员先 fetch 到对象库的 refs/remotes/<条目>/ 下，
+    再以 --reference 克隆（alternates），共同的历史只下载和存储一次。
+    """
+    
+    INDEX_FILE = '.cache-index.json'
+    LOCK_FILE = '.cache.lock'
+    STORE_DIR = '.stores'
+    CLONE_DEPTH = 1000
+    
+    def __init__(self, root='online_project', max_bytes=None, max_age_days=None, families=None):
+        """
+        Args:
+            families: None 表示不共享对象；否则为 [(家族名, URL 正则)]，
+                      未匹配任何规则的 URL 以仓库名作为家族名
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.families = families
+        self._held = {}  # 条目目录 -> 已打开的条目锁文件
+        self.run_stats = {'hits': 0, 'misses': 0, 'bytes': 0}  # 本进程内的命中/未命中次数与新下载的字节数（--metrics）
+    
+    def family_of(self, url):
+        """URL 所属的对象库家族，未开启共享对象库时返回 None"""
+        if self.families is None:
+            return None
+        for name, pattern in self.families:
+            if re.search(pattern, url):
+                return name
+        basename = re.sub(r'\.git$', '', url.rstrip('/')).replace(':', '/').rsplit('/', 1)[-1]
+        return re.sub(r'[<>:"/\\|?*\s]', '-', basename) or 'default'
+    
+    def store_path(self, family):
+        return os.path.join(self.root, self.STORE_DIR, f"{family}.git")
+    
+    @contextlib.contextmanager
+    def _store_lock(self, family):
+        os.makedirs(os.path.join(self.root, self.STORE_DIR), exist_ok=True)
+        with open(os.path.join(self.root, self.STORE_DIR, f"{family}.lock"), 'a+') as lock:
+            lock_file(lock)
+            try:
+                yield
+            finally:
+                unlock_file(lock)
+    
+    def _sync_store(self, family, name, url):
+        """
+        将成员仓库的分支 fetch 到家族对象库（完整历史，--reference 不支持浅克隆的对象库）
+        
+        Returns:
+            str: 对象库的绝对路径
+        """
+        store = os.path.abspath(self.store_path(family))
+        with self._store_lock(family):
+            if not os.path.isfile(os.path.join(store, 'HEAD')):
+                subprocess.run(["git", "init", "--bare", "-q", store], capture_output=True, text=True, check=True)
+            subprocess.run(["git", "-C", store, "fetch", "--no-tags", "--prune", url,
+                            f"+refs/heads/*:refs/remotes/{name}/*"], capture_output=True, text=True, check=True)
+        return store
+    
+    def _drop_store_refs(self, family, name):
+        """删除已淘汰成员在对象库中的分支（其独有对象随对象库 gc 回收）"""
+        store = self.store_path(family)
+        if not os.path.isdir(store):
+            return
+        with self._store_lock(family):
+            refs = subprocess.run(["git", "-C", store, "for-each-ref", "--format=delete %(refname)",
+                                   f"refs/remotes/{name}/"], capture_output=True, text=True, check=False).stdout
+            if refs:
+                subprocess.run(["git", "-C", store, "update-ref", "--stdin"], input=refs,
+                               capture_output=True, text=True, check=False)
+    
+    def entry_name(self, url):
+        """URL -> 缓存目录名：项目名 + URL 哈希（不同来源的同名项目互不冲突）"""
+        url = url.rstrip('/')
+        match = re.search(r'[:/]([^/]+/[^/]+?)(?:\.git)?$', url)
+        project = match.group(1).replace('/', '-') if match else 'unknown-project'
+        project = re.sub(r'[<>:"/\\|?*\s]', '-', project)
+        return f"{project}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}"
+    
+    def _adopt_legacy(self, index):
+        """
+        将旧版本留下的克隆（online_project/<项目名>[_时间戳]，不在索引中）纳入索引，每个缓存目录只扫描一次
+        
+        按 remote.origin.url 识别 URL：对应的缓存目录还不存在时改名过去，之后直接复用；
+        同一 URL 的其余旧克隆保留原目录名登记，计入容量并按目录修改时间参与 LRU 淘汰。
+        """
+        if index.get('legacy_scanned'):
+            return
+        adopted = 0
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if (name.startswith('.') or name in index['entries'] or '.tmp-' in name
+                    or not os.path.isfile(os.path.join(path, 'HEAD')) or not os.path.isdir(os.path.join(path, 'objects'))):
+                continue
+            url = subprocess.run(["git", "-C", path, "config", "--get", "remote.origin.url"],
+                                 capture_output=True, text=True, check=False).stdout.strip()
+            if not url:
+                continue
+            target = self.entry_name(url)
+            if target not in index['entries'] and not os.path.exists(os.path.join(self.root, target)):
+                with self._open_entry_lock(target) as lock:
+                    if lock_file(lock, blocking=False):
+                        try:
+                            os.replace(path, os.path.join(self.root, target))
+                            name, path = target, os.path.join(self.root, target)
+                        finally:
+                            unlock_file(lock)
+            index['entries'][name] = {'url': url, 'created_at': os.path.getmtime(path),
+                                      'size': directory_size(path), 'last_used': os.path.getmtime(path)}
+            adopted += 1
+        index['legacy_scanned'] = True
+        if adopted:
+            print(f"📦 已将 {adopted} 个旧版本的克隆纳入缓存索引: {os.path.abspath(self.root)}")
+    
+    @contextlib.contextmanager
+    def _index(self):
+        """持有全局锁读写索引"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, self.LOCK_FILE), 'a+') as lock:
+            lock_file(lock)
+            try:
+                index_path = os.path.join(self.root, self.INDEX_FILE)
+                index = {'entries': {}, 'stores': {}, 'hits': 0, 'misses': 0, 'evictions': 0, 'evicted_bytes': 0}
+                if os.path.exists(index_path):
+                    with open(index_path, 'r', encoding='utf-8') as f:
+                        index.update(json.load(f))
+                yield index
+                tmp_path = f"{index_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(index, f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, index_path)
+            finally:
+                unlock_file(lock)
+    
+    def _open_entry_lock(self, name):
+        os.makedirs(self.root, exist_ok=True)
+        return open(os.path.join(self.root, f"{name}.lock"), 'a+')
+    
+    def checkout(self, url):
+        """
+        获取 URL 对应的本地 bare 仓库：命中时 fetch 更新，未命中时克隆
+        
+        返回后条目保持共享锁，直到调用 release()，期间不会被其他进程淘汰
+        
+        Returns:
+            tuple: (仓库目录, 是否命中)
+        
+        Raises:
+            subprocess.CalledProcessError: 克隆失败
+        """
+        with self._index() as index:
+            self._adopt_legacy(index)
+        name = self.entry_name(url)
+        path = os.path.join(self.root, name)
+        family = self.family_of(url)
+        lock = self._open_entry_lock(name)
+        lock_file(lock)
+        try:
+            hit = os.path.isfile(os.path.join(path, 'HEAD'))
+            size_before = directory_size(path) if hit else 0
+            store_before = directory_size(self.store_path(family)) if family else 0
+            store = None
+            if family:
+                try:
+                    store = self._sync_store(family, name, url)
+                except subprocess.CalledProcessError as e:
+                    if not hit:
+                        raise
+                    print(f"⚠️  更新共享对象库失败: {e.stderr.strip()}", file=sys.stderr)
+            # 共享对象库中是完整历史，成员仓库也不再浅克隆；
+            # 浅克隆默认只取默认分支，--no-single-branch 与之后的 fetch 一致，取所有分支（--refs 需要）
+            depth = [] if family else [f"--depth={self.CLONE_DEPTH}"]
+            if hit:
+                fetch_cmd = ["git", "-C", path, "fetch", "--prune", *depth, "origin", "+refs/heads/*:refs/heads/*"]
+                fetched = subprocess.run(fetch_cmd, capture_output=True, text=True, check=False)
+                if fetched.returncode != 0:
+                    print(f"⚠️  更新缓存失败，使用已缓存的数据: {fetched.stderr.strip()}", file=sys.stderr)
+            else:
+                # 先克隆到临时目录再改名，中断时不会留下半个仓库
+                tmp_path = f"{path}.tmp-{os.getpid()}"
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                shutil.rmtree(path, ignore_errors=True)
+                reference = ["--reference", store] if store else []
+                try:
+                    subprocess.run(["git", "clone", "--bare", *depth, *(["--no-single-branch"] if depth else []),
+                                    *reference, url, tmp_path],
+                                   capture_output=True, text=True, check=True)
+                except subprocess.CalledProcessError:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                    raise
+                os.replace(tmp_path, path)
+            size = directory_size(path)
+            store_size = directory_size(store) if store else 0
+        except BaseException:
+            unlock_file(lock)
+            lock.close()
+            raise
+        
+        # clone/fetch 完成后降级为共享锁（Windows 下保持独占）
+        lock_file(lock, shared=True)
+        self._held[path] = lock
+        
+        with self._index() as index:
+            entry = index['entries'].setdefault(name, {'url': url, 'created_at': time.time()})
+            entry.update(url=url, size=size, last_used=time.time())
+            if store:
+                entry['family'] = family
+                index['stores'][family] = {'size': store_size, 'last_used': time.time()}
+            index['hits' if hit else 'misses'] += 1
+            self.run_stats['hits' if hit else 'misses'] += 1
+            self.run_stats['bytes'] += max(0, size - size_before) + max(0, store_size - store_before)
+            self._evict(index, protect={name})
+        return path, hit
+    
+    def release(self, path):
+        """释放条目的共享锁"""
+        lock = self._held.pop(path, None)
+        if lock is not None:
+            unlock_file(lock)
+            lock.close()
+    
+    def _evict(self, index, protect=()):
+        """淘汰超过最长闲置时间的条目，再按 LRU 淘汰直到不超出容量"""
+        entries = index['entries']
+        now = time.time()
+        # 索引中有记录但目录已被手动删除的条目直接移除
+        for name in [name for name in entries if not os.path.isdir(os.path.join(self.root, name))]:
+            del entries[name]
+        
+        candidates = sorted((name for name in entries if name not in protect),
+                            key=lambda name: entries[name].get('last_used', 0))
+        stores = index['stores']
+        total = sum(entry.get('size', 0) for entry in entries.values()) + sum(
+            store.get('size', 0) for store in stores.values())
+        for name in candidates:
+            entry = entries[name]
+            expired = self.max_age_days is not None and now - entry.get('last_used', 0) > self.max_age_days * 86400
+            over_budget = self.max_bytes is not None and total > self.max_bytes
+            if not expired and not over_budget:
+                continue
+            with self._open_entry_lock(name) as lock:
+                if not lock_file(lock, blocking=False):
+                    continue  # 其他进程正在使用
+                try:
+                    shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                finally:
+                    unlock_file(lock)
+            total -= entry.get('size', 0)
+            index['evictions'] += 1
+            index['evicted_bytes'] += entry.get('size', 0)
+            del entries[name]
+            print(f"🧹 缓存淘汰: {entry['url']} ({format_size(entry.get('size', 0))}，"
+                  f"{'超过最长闲置时间' if expired else '超出容量'})")
+            
+            family = entry.get('family')
+            if family:
+                if any(other.get('family') == family for other in entries.values()):
+                    self._drop_store_refs(family, name)
+                else:
+                    # 家族最后一个成员被淘汰，对象库一并删除
+                    with self._store_lock(family):
+                        shutil.rmtree(self.store_path(family), ignore_errors=True)
+                    store_size = stores.pop(family, {}).get('size', 0)
+                    total -= store_size
+                    index['evicted_bytes'] += store_size
+        
+        if self.max_bytes is not None and total > self.max_bytes:
+            print(f"⚠️  缓存占用 {format_size(total)} 仍超出容量 {format_size(self.max_bytes)}（其余条目正在使用）",
+                  file=sys.stderr)
+    
+    def gc(self):
+        """按当前容量与闲置时间设置执行一次淘汰"""
+        with self._index() as index:
+            self._adopt_legacy(index)
+            self._evict(index)
+    
+    def print_stats(self):
+        """打印缓存占用与命中统计"""
+        with self._index() as index:
+            entries = index['entries']
+            stores = index['stores']
+            total = sum(entry.get('size', 0) for entry in entries.values()) + sum(
+                store.get('size', 0) for store in stores.values())
+            lookups = index['hits'] + index['misses']
+            print(f"\n📦 克隆缓存: {os.path.abspath(self.root)}")
+            budget = f" / 容量 {format_size(self.max_bytes)}" if self.max_bytes is not None else ""
+            print(f"条目: {len(entries)} 个，占用 {format_size(total)}{budget}")
+            print(f"命中: {index['hits']}，未命中: {index['misses']}"
+                  + (f"，命中率 {index['hits'] / lookups:.0%}" if lookups else "")
+                  + f"，已淘汰 {index['evictions']} 个 ({format_size(index['evicted_bytes'])})")
+            for name, entry in sorted(entries.items(), key=lambda item: -item[1].get('last_used', 0)):
+                last_used = datetime.fromtimestamp(entry.get('last_used', 0)).strftime('%Y-%m-%d %H:%M')
+                family = f"  [对象库: {entry['family']}]" if entry.get('family') else ""
+                print(f"  {last_used}  {format_size(entry.get('size', 0)):>10}  {entry['url']}{family}")
+            if stores:
+                print(f"共享对象库: {len(stores)} 个，占用 {format_size(sum(s.get('size', 0) for s in stores.values()))}")
+                for family, store in sorted(stores.items()):
+                    members = sum(1 for entry in entries.values() if entry.get('family') == family)
+                    print(f"  {format_size(store.get('size', 0)):>10}  {family} ({members} 个成员)")
+
+
 class Code996Analyzer:
-    def __init__(self, start_date=None, end_date=None, author=None, repo_path=".", remote_url=None):
+    clone_cache = None  # 远程仓库克隆缓存（CloneCache），为空时使用默认设置的 online_project/
+    
+    def __init__(self, start_date=None, end_date=None, author=None, repo_path=".", remote_url=None,
+                 period=None, commit_sink=None, windows=None, refs=None, notes=None, minutes=False, calendar=None):
         self.start_date = start_date or "2022-01-01"
         self.end_date = end_date or datetime.now().strftime("%Y-%m-%d")
+        self.open_end = end_date is None  # 未指定结束日期时统计到最新 commit
         self.author = author or ""
         self.repo_path = repo_path
         self.remote_url = remote_url
         self.temp_dir = None  # 用于存储临时克隆的目录
         self.project_name = None  # 项目名称
+        self.period = period  # 按周期分桶的粒度（day/week/month），None 表示不分桶
+        self.commit_sink = commit_sink  # 每个 commit 的回调 (sha, day, index)，用于多仓库汇总
+        self.windows = windows or []  # 命名时间窗口 [{'name', 'start_date', 'end_date'}, ...]
+        self.head = None  # 本次统计对应的 HEAD commit（--refs 模式为 {tip SHA: 引用名}，--watch 模式据此增量更新）
+        self.revs = []  # 传给 git log 的版本范围，为空时即 HEAD
+        self.refs = refs  # --refs 选择器（all/branches/模式），None 表示只遍历 HEAD
+        self.ref_counts = None  # --refs 模式下每个引用贡献的 commit 数
+        self.ref_total = 0  # --refs 选中的引用数
+        self.stats = None  # collect_histogram() 的累计结果
+        self.shards = 1  # 分片并行格式化的 git 进程数（执行计划选择 sharded 时大于 1）
+        self.notes = notes  # git notes 复用模式：None / 'read'（复用已发布的逐日直方图）/ 'publish'（复用并发布）
+        self.notes_info = None  # 本次复用 git notes 的情况 {'base', 'scanned', 'published'}
+        self.minutes = minutes  # 是否同时统计分钟级直方图（--minutes）
+        self.minute_histogram = None  # --minutes 模式下的 7×1440 分钟级直方图（array('i')）
+        self.calendar = calendar  # WorkCalendar，设置后按日历区分工作日/周末/节假日
         
     def get_project_name(self):
         """获取项目名称"""
@@ -157,13 +1240,10 @@ class Code996Analyzer:
         return self.project_name
     
     def clone_remote_repo(self):
-        """克隆远程仓库（仅克隆 .git 目录）"""
+        """获取远程仓库（仅 Git 历史数据）：克隆缓存命中时复用并 fetch 更新"""
         if not self.remote_url:
             return
         
-        print(f"正在克隆远程仓库: {self.remote_url}")
-        print("正在下载 Git 历史数据（不下载工作文件）...")
-        
         # 从 URL 中提取项目名
         url = re.sub(r'\.git$', '', self.remote_url)
         match = re.search(r'[:/]([^/]+/[^/]+)/?$', url)
@@ -172,46 +1252,31 @@ class Code996Analyzer:
         else:
             self.project_name = "unknown-project"
         
-        # 创建 online_project 目录
-        online_dir = "online_project"
-        if not os.path.exists(online_dir):
-            os.makedirs(online_dir)
-        
-        # 为每个项目创建独立目录
-        self.temp_dir = os.path.join(online_dir, self.project_name)
-        
-        # 如果目录已存在，添加时间戳避免冲突
-        if os.path.exists(self.temp_dir):
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            self.temp_dir = os.path.join(online_dir, f"{self.project_name}_{timestamp}")
+        if Code996Analyzer.clone_cache is None:
+            Code996Analyzer.clone_cache = CloneCache()
         
+        print(f"正在获取远程仓库: {self.remote_url}")
         try:
             # 使用 --bare 克隆，只下载 Git 对象，不下载工作文件
-            # 这样可以大幅减少下载量和时间
-            cmd = ["git", "clone", "--bare", "--depth", "1000", self.remote_url, self.temp_dir]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            
-            # 更新 repo_path 为 bare 仓库路径
-            self.repo_path = self.temp_dir
-            print(f"✓ 仓库克隆完成（仅 Git 历史数据）")
-            print(f"📁 保存位置: {self.temp_dir}")
-            
+            self.temp_dir, hit = self.clone_cache.checkout(self.remote_url)
         except subprocess.CalledProcessError as e:
             print(f"克隆失败: {e.stderr}", file=sys.stderr)
-            if self.temp_dir and os.path.exists(self.temp_dir):
-                shutil.rmtree(self.temp_dir)
             sys.exit(1)
+        
+        # 更新 repo_path 为 bare 仓库路径
+        self.repo_path = self.temp_dir
+        if hit:
+            print(f"✓ 克隆缓存命中，已更新到最新（仅 Git 历史数据）")
+        else:
+            print(f"✓ 仓库克隆完成（仅 Git 历史数据）")
+        print(f"📁 保存位置: {self.temp_dir}")
     
     def cleanup(self):
-        """清理临时目录（可选）"""
-        # 注意：对于远程仓库，我们保留在 online_project 目录中以便复用
-        # 如果需要清理，可以手动删除 online_project 目录
-        # 这里不自动清理，让用户可以复用已下载的仓库
+        """释放克隆缓存条目（远程仓库保留在缓存中以便复用）"""
         if self.temp_dir and self.remote_url:
-            # 远程仓库保留不删除
-            print(f"\n💡 提示: 远程仓库已保存在 {self.temp_dir}")
-            print(f"   如需再次分析同一项目，可直接使用: --repo {self.temp_dir}")
-            print(f"   如需清理，请手动删除 online_project 目录")
+            if self.temp_dir in self.clone_cache._held:
+                self.clone_cache.release(self.temp_dir)
+                print(f"\n💡 提示: 远程仓库已缓存在 {self.temp_dir}，再次分析同一 URL 时只需 fetch 增量")
         elif self.temp_dir and os.path.exists(self.temp_dir) and not self.remote_url:
             # 只清理非远程的临时目录
             try:
@@ -219,69 +1284,221 @@ class Code996Analyzer:
             except Exception as e:
                 print(f"警告: 清理临时文件失败: {e}", file=sys.stderr)
     
-    def run_git_command(self, date_format):
-        """运行git log命令获取统计数据"""
+    def run_git_log(self, log_format, date_format, extra_args=()):
+        """
+        流式运行 git log，逐行产出输出（不把整段历史读入内存）
+        
+        Args:
+            log_format: --format 参数
+            date_format: --date=format: 参数
+            extra_args: 额外的 git log 参数（如 --name-only）
+        """
         cmd = [
             "git", "-C", self.repo_path, "log",
-            f"--author={self.author}",
+            f"--format={log_format}",
             f"--date=format:{date_format}",
+            *extra_args,
             f"--after={self.start_date}",
-            f"--before={self.end_date}"
+            f"--before={self.end_date}",
+            *self.revs
         ]
-        
+        if self.author:
+            # 空的 --author= 同样会对每个 commit 做一次正则匹配，不过滤时不传
+            cmd.insert(4, f"--author={self.author}")
+        if self.open_end and '--not' in self.revs:
+            # 增量读取新 commit 时不限制结束时间（--before=当天 会漏掉当天稍后的提交）
+            cmd.remove(f"--before={self.end_date}")
+        revs_input = None
+        if self.refs:
+            # 选中的引用可能有成百上千个，经 stdin 传入；--source 标记每个 commit 最先经由哪个 tip 到达
+            cmd = cmd[:len(cmd) - len(self.revs)] + ['--source', '--stdin']
+            revs_input = revs_stdin(self.revs)
+        
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE if revs_input else None,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, encoding='utf-8', errors='replace')
+        if revs_input:
+            # git log --stdin 先读完全部输入再开始输出
+            process.stdin.write(revs_input)
+            process.stdin.close()
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            return result.stdout
-        except subprocess.CalledProcessError as e:
-            print(f"Git命令执行失败: {e}", file=sys.stderr)
+            for line in process.stdout:
+                yield line
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            returncode = process.wait()
+        
+        if returncode != 0:
+            print(f"Git命令执行失败: {stderr.strip()}", file=sys.stderr)
             self.cleanup()
             sys.exit(1)
     
-    def parse_date_output(self, output):
-        """解析git log输出，统计每个时间点的commit数"""
-        counts = defaultdict(int)
-        for line in output.split('\n'):
-            if line.startswith('Date:'):
-                # 提取日期部分
-                date_value = line.split()[1].strip()
-                counts[date_value] += 1
-        return counts
-    
-    def get_hour_stats(self):
-        """获取按小时统计的commit数据"""
-        output = self.run_git_command("%H")
-        hour_counts = self.parse_date_output(output)
-        
-        # 转换为列表格式，确保所有小时都有数据
-        hour_data = []
-        for hour in sorted(hour_counts.keys()):
-            hour_data.append({
-                "time": hour,
-                "count": hour_counts[hour]
-            })
-        
-        return hour_data
-    
-    def get_week_stats(self):
-        """获取按星期统计的commit数据"""
-        output = self.run_git_command("%u")
-        week_counts = self.parse_date_output(output)
+    def list_commits(self):
+        """时间范围内的 commit SHA，按 git log 的顺序紧凑存放（每条 41 字节）"""
+        cmd = [
+            "git", "-C", self.repo_path, "rev-list",
+            f"--after={self.start_date}",
+            f"--before={self.end_date}",
+            "--stdin"
+        ]
+        if self.author:
+            # 只在需要时传 --author：它要求解析每个 commit，无法只用 commit-graph 遍历
+            cmd.insert(4, f"--author={self.author}")
+        result = subprocess.run(cmd, input=revs_stdin(self.revs or ['HEAD']).encode('utf-8'),
+                                capture_output=True, check=False)
+        if result.returncode != 0:
+            print(f"Git命令执行失败: {result.stderr.decode('utf-8', errors='replace').strip()}", file=sys.stderr)
+            self.cleanup()
+            sys.exit(1)
+        return result.stdout
+    
+    def run_git_log_sharded(self, log_format, date_format):
+        """
+        分片并行运行 git log（执行计划为 sharded 时），逐行产出输出
         
-        # 星期标签（1=Monday, 7=Sunday）
-        week_labels = {
-            '1': '周一', '2': '周二', '3': '周三', '4': '周四',
-            '5': '周五', '6': '周六', '7': '周日'
-        }
+        先用 rev-list 列出范围内的 commit（有 commit-graph 时只读图文件、不解析 commit），
+        按顺序切成 self.shards 段，每段交给一个 git log --no-walk --stdin 进程并行格式化。
+        输出顺序与单进程不同，commit 集合完全相同。
+        """
+        shas = self.list_commits()
+        count = len(shas) // 41
+        per_shard = -(-count // self.shards) * 41
+        chunks = [shas[i:i + per_shard] for i in range(0, len(shas), per_shard)]
+        batches = queue.Queue(maxsize=SHARD_QUEUE_BATCHES)
+        errors = []
+        
+        def run_shard(chunk):
+            cmd = ["git", "-C", self.repo_path, "log", "--no-walk=unsorted", "--stdin",
+                   f"--format={log_format}", f"--date=format:{date_format}"]
+            try:
+                process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                           stderr=subprocess.PIPE)
+                # git log --stdin 先读完全部输入再开始输出，这里不会互相阻塞
+                process.stdin.write(chunk)
+                process.stdin.close()
+                batch = []
+                for line in process.stdout:
+                    batch.append(line.decode('utf-8', errors='replace'))
+                    if len(batch) >= SHARD_BATCH_LINES:
+                        batches.put(batch)
+                        batch = []
+                batches.put(batch)
+                stderr = process.stderr.read().decode('utf-8', errors='replace')
+                if process.wait() != 0:
+                    errors.append(stderr.strip())
+            except OSError as e:
+                errors.append(str(e))
+            finally:
+                batches.put(None)
+        
+        threads = [threading.Thread(target=run_shard, args=(chunk,), daemon=True) for chunk in chunks]
+        for thread in threads:
+            thread.start()
+        running = len(threads)
+        while running:
+            batch = batches.get()
+            if batch is None:
+                running -= 1
+                continue
+            yield from batch
         
-        # 确保所有天都有数据
-        week_data = []
-        for day in ['1', '2', '3', '4', '5', '6', '7']:
-            week_data.append({
-                "time": week_labels[day],
-                "count": week_counts.get(day, 0)
-            })
+        if errors:
+            print(f"Git命令执行失败: {errors[0]}", file=sys.stderr)
+            self.cleanup()
+            sys.exit(1)
+    
+    def iter_commits(self):
+        """
+        单次遍历 git 历史，逐个产出 commit
         
-        return week_data
+        Yields:
+            tuple: (sha, day, hour, weekday)，day 为 YYYY-MM-DD，
+                   hour 为 0-23，weekday 为 1-7（周一=1）
+        """
+        ref_counts = self.ref_counts
+        minute_histogram = self.minute_histogram
+        # --minutes 时日期格式多输出分钟，同时累计到分钟级直方图
+        date_format = "%Y-%m-%d %H %u %M" if minute_histogram is not None else "%Y-%m-%d %H %u"
+        width = 5 if minute_histogram is not None else 4
+        if ref_counts is not None:
+            # --refs：一次遍历所有选中引用，%S 为最先到达该 commit 的 tip
+            lines = self.run_git_log("%H %S %ad", date_format)
+        elif self.shards > 1 and '--not' not in self.revs:
+            lines = self.run_git_log_sharded("%H %ad", date_format)
+        else:
+            lines = self.run_git_log("%H %ad", date_format)
+        for line in lines:
+            parts = line.split()
+            if ref_counts is not None and len(parts) == width + 1:
+                source = parts.pop(1)
+                ref_counts[self.head.get(source, source)] += 1
+            if len(parts) != width:
+                continue
+            hour, weekday = int(parts[2]), int(parts[3])
+            if minute_histogram is not None:
+                minute_histogram[(weekday - 1) * MINUTES_PER_DAY + hour * 60 + int(parts[4])] += 1
+            yield parts[0], parts[1], hour, weekday
+    
+    def collect_histogram(self):
+        """
+        单次遍历统计 24×7 commit 直方图
+        
+        设置了 period 时同时统计每个周期的直方图，设置了 windows 时
+        同时统计每个时间窗口的直方图（窗口可以重叠，commit 计入所有包含它的窗口）
+        
+        Returns:
+            dict: {
+                'histogram': 168 个计数，下标为 (weekday - 1) * 24 + hour,
+                'periods': {周期: histogram}，未设置 period 时为 None,
+                'windows': [histogram, ...]，与 self.windows 一一对应,
+                'refs': {引用名: 贡献的 commit 数}，未使用 --refs 时为 None,
+                'minutes': 7×1440 分钟级直方图（array('i')），未使用 --minutes 时为 None,
+                'day_types': [工作日, 周末, 节假日] 的 commit 数，未设置日历时为 None,
+                'window_day_types': 每个时间窗口的 day_types
+            }
+        """
+        self.ref_counts = Counter() if self.refs else None
+        self.minute_histogram = array('i', [0]) * MINUTE_HISTOGRAM_SIZE if self.minutes else None
+        calendar = self.calendar
+        histogram = [0] * HISTOGRAM_SIZE
+        day_types = [0] * len(DAY_TYPE_LABELS) if calendar else None
+        periods = {} if self.period else None
+        windows = [(w['start_date'], w['end_date'], [0] * HISTOGRAM_SIZE,
+                    [0] * len(DAY_TYPE_LABELS) if calendar else None) for w in self.windows]
+        commit_sink = self.commit_sink
+        day_type = None
+        
+        for sha, day, hour, weekday in self.iter_commits():
+            index = (weekday - 1) * HOURS_PER_DAY + hour
+            histogram[index] += 1
+            if day_types is not None:
+                day_type = calendar.classify(day)
+                day_types[day_type] += 1
+            if periods is not None:
+                key = period_key(day, self.period)
+                bucket = periods.get(key)
+                if bucket is None:
+                    bucket = periods[key] = [0] * HISTOGRAM_SIZE
+                bucket[index] += 1
+            for window_start, window_end, bucket, window_types in windows:
+                if window_start <= day <= window_end:
+                    bucket[index] += 1
+                    if window_types is not None:
+                        window_types[day_type] += 1
+            if commit_sink is not None:
+                commit_sink(sha, day, index)
+        
+        return {
+            'histogram': histogram,
+            'periods': periods,
+            'windows': [bucket for _, _, bucket, _ in windows],
+            'refs': self.ref_counts,
+            'minutes': self.minute_histogram,
+            'day_types': day_types,
+            'window_day_types': [window_types for _, _, _, window_types in windows],
+        }
     
     def calculate_work_time_range(self, hour_data):
         """计算工作时间范围（上班时间和下班时间）"""
@@ -297,7 +1514,7 @@ class Code996Analyzer:
         standard_value = math.sqrt(quadratic_value)
         
         # 筛选工作时间（score >= 0.45）
-        work_hours = [item for item in hour_data if item['count'] / standard_value >= 0.45]
+        work_hours = [item for item in hour_data if item['count'] / standard_value >= WORK_TIME_THRESHOLD]
         
         # 开工时间段（8-12点）
         opening_data = [item for item in work_hours if 8 <= int(item['time']) <= 12]
@@ -343,16 +1560,21 @@ class Code996Analyzer:
         
         return work_hour_pl, working_time_count, working_else_time_count
     
-    def calculate_week_type(self, week_data):
-        """计算每周工作天数类型"""
+    def calculate_week_type(self, week_data, day_types=None):
+        """计算每周工作天数类型（day_types 为按工作日历统计的 [工作日, 周末, 节假日] commit 数）"""
         total_count = sum(item['count'] for item in week_data)
         if total_count == 0:
             return 5, []
         
-        # 工作日（周一到周五）
-        workday_count = sum(week_data[i]['count'] for i in range(5))
-        # 周末（周六和周日）
-        weekend_count = sum(week_data[i]['count'] for i in range(5, 7))
+        holiday_count = None
+        if day_types is not None:
+            # 按日历：调休上班的周末计为工作日，法定节假日单独统计
+            workday_count, weekend_count, holiday_count = day_types
+        else:
+            # 工作日（周一到周五）
+            workday_count = sum(week_data[i]['count'] for i in range(5))
+            # 周末（周六和周日）
+            weekend_count = sum(week_data[i]['count'] for i in range(5, 7))
         
         workday_ratio = (workday_count / total_count) * 100
         
@@ -372,6 +1594,8 @@ class Code996Analyzer:
             {"time": "工作日", "count": workday_count},
             {"time": "周末", "count": weekend_count}
         ]
+        if holiday_count is not None:
+            work_week_pl.append({"time": "节假日", "count": holiday_count})
         
         return work_days, work_week_pl
     
@@ -384,7 +1608,7 @@ class Code996Analyzer:
         y = work_hour_pl[0]['count']  # 正常工作时间commit数
         x = work_hour_pl[1]['count']  # 加班时间commit数
         m = work_week_pl[0]['count']  # 工作日commit数
-        n = work_week_pl[1]['count']  # 周末commit数
+        n = sum(item['count'] for item in work_week_pl[1:])  # 周末（及节假日）commit数
         
         total_count = y + x
         if total_count == 0:
@@ -434,206 +1658,317 @@ class Code996Analyzer:
     
     def analyze(self):
         """执行完整的分析流程"""
-        # 如果是远程仓库，先克隆
-        if self.remote_url:
+        # 如果是远程仓库，先克隆（执行计划可能已经提前克隆）
+        if self.remote_url and not self.temp_dir:
             self.clone_remote_repo()
         
         print(f"正在分析 Git 项目...")
         print(f"统计时间范围：{self.start_date} 至 {self.end_date}")
         
-        # 获取统计数据
-        hour_data = self.get_hour_stats()
-        week_data = self.get_week_stats()
+        # 固定本次统计的 HEAD（或 --refs 选中的所有 tip），之后可以只读取新增的 commit
+        self.head = self.resolve_head()
+        self.revs = self.head_revs(self.head)
+        if self.refs and not self.head:
+            print(f"错误：没有匹配 --refs {self.refs} 的引用")
+            sys.exit(1)
         
-        total_count = sum(item['count'] for item in hour_data)
+        # 获取统计数据（单次遍历 git 历史；--notes 时只遍历已发布统计之后新增的 commit）
+        if self.notes and self.head:
+            self.stats = self.collect_with_notes()
+        else:
+            self.stats = self.collect_histogram()
         
-        if total_count == 0:
+        if sum(self.stats['histogram']) == 0:
             print("错误：未找到任何commit记录")
             sys.exit(1)
         
-        print(f"总 commit 数: {total_count}")
+        print(f"总 commit 数: {sum(self.stats['histogram'])}")
         
-        # 计算工作时间范围
-        opening_time, closing_time = self.calculate_work_time_range(hour_data)
-        
-        # 计算工作/加班时间
-        work_hour_pl, _, _ = self.calculate_working_time(hour_data, opening_time)
-        
-        # 计算每周工作天数
-        work_days, work_week_pl = self.calculate_week_type(week_data)
+        return self.build_full_result()
+    
+    def build_full_result(self):
+        """根据累计的统计数据构建完整结果（含周期与时间窗口）"""
+        stats = self.stats
+        result = self.build_result(stats['histogram'], day_types=stats.get('day_types'))
+        
+        if stats['periods'] is not None:
+            result['period'] = self.period
+            result['periods'] = dict(sorted(stats['periods'].items()))
+        
+        if self.windows:
+            window_day_types = stats.get('window_day_types') or [None] * len(self.windows)
+            result['windows'] = [
+                summarize_window(window, self.build_result(bucket, window['start_date'], window['end_date'],
+                                                           day_types=day_types))
+                for window, bucket, day_types in zip(self.windows, stats['windows'], window_day_types)
+            ]
         
-        # 计算996指数
-        index_996, overtime_ratio, is_standard = self.calculate_996_index(
-            work_hour_pl, work_week_pl, hour_data
-        )
+        if self.notes_info:
+            result['notes'] = self.notes_info
         
-        # 构建结果对象
-        opening_hour = int(opening_time['time']) if opening_time else None
-        closing_hour = int(closing_time['time']) if closing_time else None
+        if stats.get('minutes') is not None:
+            result['work_time_minutes'] = detect_work_minutes(stats['minutes'])
         
-        result = {
-            'start_date': self.start_date,
-            'end_date': self.end_date,
-            'total_count': total_count,
-            'hour_data': hour_data,
-            'week_data': week_data,
-            'work_hour_pl': work_hour_pl,
-            'work_week_pl': work_week_pl,
-            'opening_hour': opening_hour,
-            'closing_hour': closing_hour % 12 if closing_hour else None,
-            'work_days': work_days,
-            'index_996': index_996,
-            'overtime_ratio': overtime_ratio,
-            'is_standard': is_standard,
-            'description': self.get_index_description(index_996)
-        }
+        if stats.get('refs') is not None:
+            result['refs'] = {
+                'selector': self.refs,
+                'ref_count': self.ref_total,
+                'contributions': [{'ref': ref, 'count': count} for ref, count in stats['refs'].most_common()],
+            }
         
         return result
-
-
-class MultiRepoAnalyzer:
-    """
-    多仓库批量分析器
-    循环分析多个仓库，合并统计数据，计算汇总指标
-    """
     
-    def __init__(self, repo_list, start_date=None, end_date=None, author=None, project_name=None):
+    def find_published_notes(self):
         """
-        Args:
-            repo_list: [{'path': '...', 'type': 'local'/'remote'}, ...]
-            start_date: 起始日期
-            end_date: 结束日期
-            author: 作者过滤
-            project_name: 汇总项目名称
+        HEAD 最近的、在 NOTES_REF 中发布过逐日直方图的祖先
+        
+        按 rev-list 的顺序遍历 HEAD 的历史，遇到第一个带有效 note 的 commit 即停止，
+        通常只需读取上次发布之后新增的那部分历史。
+        
+        Returns:
+            tuple: (commit SHA, {天数: {下标: commit 数}})；没有时为 None
         """
-        self.repo_list = repo_list
-        self.start_date = start_date
-        self.end_date = end_date
-        self.author = author
-        self.project_name = project_name or self.generate_default_name()
-        self.analyzers = []  # 保存每个仓库的分析器实例
-    
-    def generate_default_name(self):
-        """生成默认的项目名称"""
-        if len(self.repo_list) == 1:
-            # 单仓库，使用仓库名
-            path = self.repo_list[0]['path']
-            if self.repo_list[0]['type'] == 'remote':
-                # 从URL提取名称
-                match = re.search(r'[:/]([^/]+/[^/]+?)(?:\.git)?/?$', path)
-                if match:
-                    return match.group(1).replace('/', '-')
-            return os.path.basename(os.path.abspath(path))
-        else:
-            # 多仓库，使用 multi-project 前缀
-            return f"multi-project-{len(self.repo_list)}-repos"
+        if self.remote_url:
+            # 克隆缓存只同步分支，notes 单独获取；不强制更新，本地已在其上发布过时保留本地的（远程没有发布过时忽略）
+            subprocess.run(["git", "-C", self.repo_path, "fetch", "-q", "origin", f"{NOTES_REF}:{NOTES_REF}"],
+                           capture_output=True, check=False)
+        output = subprocess.run(["git", "-C", self.repo_path, "notes", f"--ref={NOTES_REF}", "list"],
+                                capture_output=True, text=True, check=False).stdout
+        annotated = {}
+        for line in output.splitlines():
+            parts = line.split()
+            if len(parts) == 2:
+                annotated[parts[1]] = parts[0]
+        if not annotated:
+            return None
+        
+        process = subprocess.Popen(["git", "-C", self.repo_path, "rev-list", self.head],
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            for line in process.stdout:
+                sha = line.strip()
+                if sha not in annotated:
+                    continue
+                blob = subprocess.run(["git", "-C", self.repo_path, "cat-file", "blob", annotated[sha]],
+                                      capture_output=True, text=True, check=False).stdout
+                decoded = decode_day_histograms(blob)
+                if decoded and decoded[0].get('tip') == sha:
+                    return sha, decoded[1]
+        finally:
+            process.kill()
+            process.stdout.close()
+            process.wait()
+        return None
     
-    def analyze(self):
+    def collect_with_notes(self):
         """
-        循环分析每个仓库，合并结果
+        --notes：从最近一次发布的逐日直方图开始，只遍历之后新增的 commit
+        
+        新增的 commit 不限时间读取并并入逐日直方图（--publish-notes 时发布到 HEAD），
+        再按作者本地日期筛选统计时间范围（与 --db 查询相同，与 git log 按提交时间筛选
+        相比，边界附近的个别 commit 可能不同）。没有可复用的发布且不发布时按常规统计。
         
         Returns:
-            dict: 汇总结果字典（结构与单仓库兼容，但新增汇总相关字段）
+            dict: 与 collect_histogram() 相同的结构
         """
-        print(f"\n{'='*60}")
-        print(f"多仓库汇总分析: {self.project_name}")
-        print(f"共 {len(self.repo_list)} 个仓库")
-        print(f"{'='*60}\n")
+        published = self.find_published_notes()
+        if not published and self.notes != 'publish':
+            print(f"未找到已发布的统计（{NOTES_REF}），按常规方式统计")
+            return self.collect_histogram()
         
-        # 1. 初始化汇总容器
-        merged_hour_data = defaultdict(int)  # {hour: count}
-        merged_week_data = defaultdict(int)  # {weekday: count}
-        repo_results = []  # 每个仓库的详细结果
-        failed_repos = []  # 失败的仓库
+        base, days = published or (None, {})
+        scanned = 0
+        try:
+            for _, epoch, tz_offset, _ in iter_commit_events(self.repo_path, [self.head, '--not', base] if base else [self.head]):
+                day, index = event_bucket(epoch, tz_offset)
+                bucket = days.setdefault(day, {})
+                bucket[index] = bucket.get(index, 0) + 1
+                scanned += 1
+        except RuntimeError as e:
+            print(str(e), file=sys.stderr)
+            self.cleanup()
+            sys.exit(1)
+        if base:
+            print(f"✓ 复用 {NOTES_REF} 中 {base[:8]} 发布的统计，只读取之后新增的 {scanned} 个 commit")
         
-        # 2. 循环分析每个仓库
-        for idx, repo_info in enumerate(self.repo_list, 1):
-            repo_path = repo_info['path']
-            repo_type = repo_info['type']
-            
-            print(f"[{idx}/{len(self.repo_list)}] 分析仓库: {repo_path}")
-            
-            try:
-                # 创建单仓库分析器
-                if repo_type == 'remote':
-                    analyzer = Code996Analyzer(
-                        start_date=self.start_date,
-                        end_date=self.end_date,
-                        author=self.author,
-                        repo_path='.',
-                        remote_url=repo_path
-                    )
-                else:
-                    analyzer = Code996Analyzer(
-                        start_date=self.start_date,
-                        end_date=self.end_date,
-                        author=self.author,
-                        repo_path=repo_path,
-                        remote_url=None
-                    )
-                
-                # 保存分析器实例（用于后续清理）
-                self.analyzers.append(analyzer)
-                
-                # 执行单仓库分析
-                result = analyzer.analyze()
-                
-                # 获取仓库名称
-                repo_name = analyzer.get_project_name()
-                
-                # 收集元信息
-                repo_results.append({
-                    'name': repo_name,
-                    'path': repo_path,
-                    'type': repo_type,
-                    'result': result
-                })
-                
-                # 合并小时统计数据
-                for item in result['hour_data']:
-                    merged_hour_data[item['time']] += item['count']
-                
-                # 合并星期统计数据
-                for item in result['week_data']:
-                    merged_week_data[item['time']] += item['count']
-                
-                print(f"    ✓ 完成 (commit数: {result['total_count']})")
-                
-            except Exception as e:
-                print(f"    ✗ 失败: {e}", file=sys.stderr)
-                failed_repos.append({
-                    'path': repo_path,
-                    'error': str(e)
-                })
+        self.notes_info = {'base': base, 'scanned': scanned, 'published': False}
+        if self.notes == 'publish' and base != self.head:
+            self.notes_info['published'] = self.publish_notes(days)
+        return self.stats_from_days(days)
+    
+    def publish_notes(self, days):
+        """将 HEAD 可达的全部 commit 的逐日直方图发布为 HEAD 上的 note，返回是否成功"""
+        cmd = ["git", "-C", self.repo_path, *NOTES_IDENTITY, "notes", f"--ref={NOTES_REF}",
+               "add", "-f", "-F", "-", self.head]
+        result = subprocess.run(cmd, input=encode_day_histograms(self.head, days),
+                                capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            print(f"警告: 发布统计到 {NOTES_REF} 失败: {result.stderr.strip()}", file=sys.stderr)
+            return False
+        print(f"✓ 已将逐日直方图发布到 {NOTES_REF}（{self.head[:8]}），共享给其他克隆: git -C {self.repo_path} push origin {NOTES_REF}")
+        return True
+    
+    def stats_from_days(self, days):
+        """按作者本地日期从逐日直方图中筛选统计时间范围，构建与 collect_histogram() 相同结构的结果"""
+        first, last = day_to_number(self.start_date), day_to_number(self.end_date)
+        calendar = self.calendar
+        histogram = [0] * HISTOGRAM_SIZE
+        day_types = [0] * len(DAY_TYPE_LABELS) if calendar else None
+        periods = {} if self.period else None
+        windows = [(w['start_date'], w['end_date'], [0] * HISTOGRAM_SIZE,
+                    [0] * len(DAY_TYPE_LABELS) if calendar else None) for w in self.windows]
+        for day_number, buckets in days.items():
+            if not first <= day_number <= last:
                 continue
+            day = number_to_day(day_number)
+            # 逐日直方图按天分类一次即可，当天的 commit 数整体计入
+            day_type = calendar.classify(day) if calendar else None
+            day_total = sum(buckets.values())
+            if day_types is not None:
+                day_types[day_type] += day_total
+            period_bucket = None
+            if periods is not None:
+                period_bucket = periods.setdefault(period_key(day, self.period), [0] * HISTOGRAM_SIZE)
+            for window_start, window_end, _, window_types in windows:
+                if window_types is not None and window_start <= day <= window_end:
+                    window_types[day_type] += day_total
+            for index, count in buckets.items():
+                histogram[index] += count
+                if period_bucket is not None:
+                    period_bucket[index] += count
+                for window_start, window_end, bucket, _ in windows:
+                    if window_start <= day <= window_end:
+                        bucket[index] += count
+        return {
+            'histogram': histogram,
+            'periods': periods,
+            'windows': [bucket for _, _, bucket, _ in windows],
+            'refs': None,
+            'minutes': None,  # 逐日直方图只有小时粒度，--minutes 不能与 --notes 同时使用
+            'day_types': day_types,
+            'window_day_types': [window_types for _, _, _, window_types in windows],
+        }
+    
+    def resolve_head(self):
+        """当前 HEAD 的 commit SHA，空仓库返回 None；--refs 模式返回 resolve_ref_tips()"""
+        if self.refs:
+            return self.resolve_ref_tips()
+        cmd = ["git", "-C", self.repo_path, "rev-parse", "--verify", "-q", "HEAD"]
+        result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        return result.stdout.strip() or None
+    
+    def resolve_ref_tips(self):
+        """
+        --refs 选中的引用的 tip
         
-        # 检查是否所有仓库都失败了
-        if not repo_results:
-            print("\n错误: 所有仓库分析都失败了", file=sys.stderr)
-            sys.exit(1)
+        Returns:
+            dict: {tip commit SHA: 引用短名}，多个引用指向同一 commit 时取排序在前的；没有匹配时为 None
+        """
+        tips = {}
+        for sha, name in self.select_refs():
+            tips.setdefault(sha, name)
+        return tips or None
+    
+    def select_refs(self):
+        """
+        --refs 选中的引用
         
-        # 如果有失败的仓库，显示警告
-        if failed_repos:
-            print(f"\n⚠️  警告: {len(failed_repos)} 个仓库分析失败:")
-            for failed in failed_repos:
-                print(f"   - {failed['path']}: {failed['error']}")
+        all 为全部分支、远程跟踪分支、标签以及 HEAD（不含 refs/notes、refs/stash 等非代码引用），
+        branches 为本地与远程跟踪分支，其余按逗号分隔的模式匹配（如 release/*、refs/heads/main）。
+        符号引用（如 origin/HEAD）跳过，附注标签解引用到 commit。
         
-        # 3. 将合并数据转换为标准格式
-        # 小时数据：确保按小时排序
-        hour_data = [
-            {'time': hour, 'count': merged_hour_data[hour]}
-            for hour in sorted(merged_hour_data.keys())
-        ]
+        Returns:
+            list: [(tip commit SHA, 引用短名), ...]，按引用名排序
+        """
+        if self.refs in REF_SELECTORS:
+            patterns = REF_SELECTORS[self.refs]
+        else:
+            patterns = []
+            for pattern in self.refs.split(','):
+                pattern = pattern.strip()
+                if pattern.startswith('refs/'):
+                    patterns.append(pattern)
+                elif pattern:
+                    patterns += [f"refs/heads/{pattern}", f"refs/remotes/*/{pattern}", f"refs/tags/{pattern}"]
+        
+        cmd = ["git", "-C", self.repo_path, "for-each-ref",
+               "--format=%(objectname) %(objecttype) %(*objectname) %(*objecttype) %(refname:short) %(symref)",
+               *patterns]
+        output = subprocess.run(cmd, capture_output=True, text=True, check=False).stdout
+        refs = []
+        for line in output.splitlines():
+            parts = line.split(' ')
+            if len(parts) != 6 or parts[5]:
+                continue
+            sha = parts[2] if parts[1] == 'tag' else parts[0]
+            if (parts[3] if parts[1] == 'tag' else parts[1]) != 'commit':
+                continue
+            refs.append((sha, parts[4]))
+        if self.refs == 'all':
+            head = subprocess.run(["git", "-C", self.repo_path, "rev-parse", "--verify", "-q", "HEAD"],
+                                  capture_output=True, text=True, check=False).stdout.strip()
+            if head and all(sha != head for sha, _ in refs):
+                refs.append((head, 'HEAD'))
+        self.ref_total = len(refs)
+        return refs
+    
+    def head_revs(self, head):
+        """统计的遍历起点：HEAD 模式为 [head]，--refs 模式为所有 tip"""
+        if not head:
+            return []
+        return list(head) if self.refs else [head]
+    
+    def is_fast_forward(self, previous, head):
+        """previous 中的 commit 是否都仍可从 head 到达（没有改写历史、也没有删除未合并的引用）"""
+        if not self.refs:
+            cmd = ["git", "-C", self.repo_path, "merge-base", "--is-ancestor", previous, head]
+            return subprocess.run(cmd, capture_output=True, check=False).returncode == 0
+        cmd = ["git", "-C", self.repo_path, "rev-list", "--count", "--stdin"]
+        result = subprocess.run(cmd, input=revs_stdin([*previous, '--not', *head]),
+                                capture_output=True, text=True, check=False)
+        return result.returncode == 0 and result.stdout.strip() == '0'
+    
+    def refresh_head(self):
+        """
+        HEAD 移动后只读取新增的 commit 并累加到 self.stats（--watch 模式）
         
-        # 星期数据：保持固定顺序
-        week_labels = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
-        week_data = [
-            {'time': label, 'count': merged_week_data.get(label, 0)}
-            for label in week_labels
-        ]
+        新增 commit 同样会交给 commit_sink，多仓库汇总随之更新
         
-        # 4. 对合并数据计算汇总指标（复用现有函数）
-        total_count = sum(merged_hour_data.values())
+        Returns:
+            int: 新增的 commit 数，HEAD 未变化时为 0；
+            None: 历史被改写（非快进），需要调用 recollect() 重新统计
+        """
+        head = self.resolve_head()
+        if head is None or head == self.head:
+            return 0
+        
+        previous, self.head = self.head, head
+        if self.open_end:
+            self.end_date = datetime.now().strftime("%Y-%m-%d")
+        if previous is None or not self.is_fast_forward(previous, head):
+            self.revs = self.head_revs(head)
+            return None
+        
+        self.revs = [*self.head_revs(head), '--not', *self.head_revs(previous)]
+        try:
+            stats = self.collect_histogram()
+        finally:
+            self.revs = self.head_revs(head)
+        merge_histogram_stats(self.stats, stats)
+        return sum(stats['histogram'])
+    
+    def recollect(self):
+        """按当前 HEAD 重新完整统计"""
+        self.stats = self.collect_histogram()
+    
+    def build_result(self, histogram, start_date=None, end_date=None, day_types=None):
+        """
+        根据 24×7 直方图计算各项指标，构建结果对象
+        
+        day_types 为按工作日历统计的 [工作日, 周末, 节假日] commit 数，为空时按星期几区分工作日与周末
+        """
+        hour_data, week_data = histogram_to_stats(histogram)
+        total_count = sum(histogram)
         
         # 计算工作时间范围
         opening_time, closing_time = self.calculate_work_time_range(hour_data)
@@ -642,96 +1977,1641 @@ class MultiRepoAnalyzer:
         work_hour_pl, _, _ = self.calculate_working_time(hour_data, opening_time)
         
         # 计算每周工作天数
-        work_days, work_week_pl = self.calculate_week_type(week_data)
+        work_days, work_week_pl = self.calculate_week_type(week_data, day_types)
         
         # 计算996指数
         index_996, overtime_ratio, is_standard = self.calculate_996_index(
             work_hour_pl, work_week_pl, hour_data
         )
         
-        # 获取描述
-        description = self.get_index_description(index_996)
-        
-        # 5. 构建汇总结果
+        # 构建结果对象
         opening_hour = int(opening_time['time']) if opening_time else None
         closing_hour = int(closing_time['time']) if closing_time else None
         
-        aggregate_result = {
-            # 基本信息
-            'start_date': self.start_date or "2022-01-01",
-            'end_date': self.end_date or datetime.now().strftime("%Y-%m-%d"),
+        result = {
+            'start_date': start_date or self.start_date,
+            'end_date': end_date or self.end_date,
             'total_count': total_count,
-            
-            # 统计数据（与单仓库格式一致）
+            'histogram': histogram,
             'hour_data': hour_data,
             'week_data': week_data,
             'work_hour_pl': work_hour_pl,
             'work_week_pl': work_week_pl,
-            
-            # 工作时间特征
             'opening_hour': opening_hour,
             'closing_hour': closing_hour % 12 if closing_hour else None,
             'work_days': work_days,
-            
-            # 996指标
             'index_996': index_996,
             'overtime_ratio': overtime_ratio,
             'is_standard': is_standard,
-            'description': description,
-            
-            # 多仓库特有字段 ⭐
-            'is_aggregate': True,  # 标记为汇总模式
-            'project_name': self.project_name,
-            'repo_count': len(repo_results),
-            'repo_results': repo_results,
-            'failed_count': len(failed_repos)
+            'description': self.get_index_description(index_996)
         }
         
-        return aggregate_result
-    
-    def calculate_work_time_range(self, hour_data):
-        """计算工作时间范围（复用Code996Analyzer的算法）"""
-        if not hour_data:
-            return None, None
-        
-        total_count = sum(item['count'] for item in hour_data)
-        if total_count == 0:
-            return None, None
-        
-        quadratic_value = sum(item['count'] ** 2 for item in hour_data) / len(hour_data)
-        standard_value = math.sqrt(quadratic_value)
-        
-        work_hours = [item for item in hour_data if item['count'] / standard_value >= 0.45]
-        
-        opening_data = [item for item in work_hours if 8 <= int(item['time']) <= 12]
-        closing_data = [item for item in work_hours if 17 <= int(item['time']) <= 23]
-        
-        opening_time = min(opening_data, key=lambda x: int(x['time'])) if opening_data else None
-        closing_time = max(closing_data, key=lambda x: int(x['time'])) if closing_data else None
+        if day_types is not None:
+            result['day_types'] = list(day_types)
+            result['calendar'] = self.calendar.describe()
         
-        return opening_time, closing_time
+        return result
+
+
+# 归档输入：git bundle 与 .git 目录的 tar 包，直接从数据流中读取 commit，不解压到磁盘
+BUNDLE_SIGNATURES = (b'# v2 git bundle\n', b'# v3 git bundle\n')
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+ARCHIVE_SUFFIXES = ('.bundle',) + TAR_SUFFIXES
+PACK_OBJ_COMMIT = 1
+PACK_OBJ_OFS_DELTA = 6
+PACK_OBJ_REF_DELTA = 7
+PACK_MAX_PENDING_DELTA = 1 << 20  # 基对象尚未出现的 REF_DELTA，只暂存目标不超过 1MB 的（commit 都很小）
+TAR_LOOSE_OBJECT = re.compile(r'^(.*?)objects/([0-9a-f]{2})/([0-9a-f]{38})$')
+TAR_PACK_FILE = re.compile(r'^(.*?)objects/pack/pack-[0-9a-f]+\.pack$')
+TAR_REF_FILE = re.compile(r'^(.*?)(HEAD|packed-refs|refs/.+)$')
+
+
+def is_repo_archive(path):
+    """是否为 bundle 或 tar 归档文件（而不是仓库目录）"""
+    if not os.path.isfile(path):
+        return False
+    if path.lower().endswith(ARCHIVE_SUFFIXES):
+        return True
+    with open(path, 'rb') as f:
+        return f.read(16) in BUNDLE_SIGNATURES
+
+
+def archive_project_name(path):
+    """归档文件名去掉扩展名作为项目名"""
+    name = os.path.basename(path)
+    for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if name.lower().endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return re.sub(r'\.git$', '', name) or name
+
+
+def apply_git_delta(base, delta):
+    """按 git delta 格式（copy/insert 指令）由基对象还原目标对象"""
+    pos = 0
+    for _ in range(2):  # 基对象大小、目标对象大小（varint）
+        while delta[pos] & 0x80:
+            pos += 1
+        pos += 1
+    out = bytearray()
+    length = len(delta)
+    while pos < length:
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset:offset + (size or 0x10000)]
+        elif op:
+            out += delta[pos:pos + op]
+            pos += op
+        else:
+            raise ValueError("无效的 delta 指令")
+    return bytes(out)
+
+
+def delta_target_size(delta):
+    """delta 头部记录的目标对象大小"""
+    pos = 0
+    while delta[pos] & 0x80:
+        pos += 1
+    pos += 1
+    size = shift = 0
+    while True:
+        byte = delta[pos]
+        size |= (byte & 0x7f) << shift
+        shift += 7
+        pos += 1
+        if not byte & 0x80:
+            return size
+
+
+class PackReader:
+    """
+    流式解析 pack 数据（git pack 格式 v2/v3），产出其中所有 commit
     
-    def calculate_working_time(self, hour_data, opening_time):
-        """计算工作时间和加班时间（复用Code996Analyzer的算法）"""
-        if not opening_time or not hour_data:
-            total_count = sum(item['count'] for item in hour_data)
-            working_time = [item for item in hour_data if 9 <= int(item['time']) <= 18]
-            working_else_time = [item for item in hour_data if item not in working_time]
-            
-            working_time_count = sum(item['count'] for item in working_time)
-            working_else_time_count = sum(item['count'] for item in working_else_time)
+    只向前读取，不需要 .idx 索引、不写磁盘。非 commit 对象解压后直接丢弃；
+    commit 对象按偏移/SHA 保留原文，用于还原以 commit 为基的 OFS_DELTA / REF_DELTA。
+    """
+    
+    CHUNK_SIZE = 1 << 16
+    MAX_INFLATE_CHUNK = 1 << 20
+    
+    def __init__(self, stream):
+        self._stream = stream
+        self._buf = b''
+        self._pos = 0
+        self._base = 0  # _buf[0] 在 pack 中的偏移
+    
+    def _fill(self):
+        chunk = self._stream.read(self.CHUNK_SIZE)
+        if not chunk:
+            raise ValueError("pack 数据不完整")
+        self._base += self._pos
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+    
+    def _read(self, size):
+        while len(self._buf) - self._pos < size:
+            self._fill()
+        data = self._buf[self._pos:self._pos + size]
+        self._pos += size
+        return data
+    
+    def _byte(self):
+        if self._pos >= len(self._buf):
+            self._fill()
+        byte = self._buf[self._pos]
+        self._pos += 1
+        return byte
+    
+    def _inflate(self, keep):
+        """解压从当前位置开始的 zlib 数据流，恰好消费其压缩字节；keep 为 False 时丢弃输出"""
+        decompressor = zlib.decompressobj()
+        parts = []
+        while True:
+            if self._pos >= len(self._buf):
+                self._fill()
+            data = self._buf[self._pos:]
+            self._pos = len(self._buf)
+            out = decompressor.decompress(data, self.MAX_INFLATE_CHUNK)
+            while True:
+                if keep:
+                    parts.append(out)
+                if decompressor.eof or not decompressor.unconsumed_tail:
+                    break
+                out = decompressor.decompress(decompressor.unconsumed_tail, self.MAX_INFLATE_CHUNK)
+            if decompressor.eof:
+                self._pos -= len(decompressor.unused_data)
+                return b''.join(parts) if keep else None
+    
+    def iter_commits(self):
+        """
+        Yields:
+            tuple: (sha, commit 原文)
+        """
+        header = self._read(12)
+        if header[:4] != b'PACK':
+            raise ValueError("不是有效的 pack 数据")
+        version, count = struct.unpack('>II', header[4:])
+        if version not in (2, 3):
+            raise ValueError(f"不支持的 pack 版本: {version}")
+        
+        by_offset = {}  # 偏移 -> commit 原文
+        by_sha = {}  # 20 字节 SHA -> commit 原文
+        pending = []  # 基对象尚未出现的 REF_DELTA: (偏移, 基 SHA, delta)
+        
+        def emit(offset, body):
+            digest = hashlib.sha1(b'commit %d\0' % len(body) + body).digest()
+            by_offset[offset] = by_sha[digest] = body
+            return digest.hex(), body
+        
+        for _ in range(count):
+            offset = self._base + self._pos
+            byte = self._byte()
+            obj_type = (byte >> 4) & 7
+            while byte & 0x80:
+                byte = self._byte()
             
-            work_hour_pl = [
-                {"time": "工作", "count": working_time_count},
-                {"time": "加班", "count": working_else_time_count}
-            ]
-            return work_hour_pl, working_time_count, working_else_time_count
-        
-        opening_hour = int(opening_time['time'])
-        
-        working_time = [item for item in hour_data if opening_hour <= int(item['time']) <= opening_hour + 9]
-        working_else_time = [item for item in hour_data if item not in working_time]
-        
+            if obj_type == PACK_OBJ_COMMIT:
+                yield emit(offset, self._inflate(True))
+            elif obj_type == PACK_OBJ_OFS_DELTA:
+                byte = self._byte()
+                distance = byte & 0x7f
+                while byte & 0x80:
+                    byte = self._byte()
+                    distance = ((distance + 1) << 7) | (byte & 0x7f)
+                base = by_offset.get(offset - distance)
+                delta = self._inflate(base is not None)
+                if base is not None:
+                    yield emit(offset, apply_git_delta(base, delta))
+            elif obj_type == PACK_OBJ_REF_DELTA:
+                base_sha = self._read(20)
+                base = by_sha.get(base_sha)
+                delta = self._inflate(True)
+                if base is not None:
+                    yield emit(offset, apply_git_delta(base, delta))
+                elif delta_target_size(delta) <= PACK_MAX_PENDING_DELTA:
+                    pending.append((offset, base_sha, delta))
+            else:
+                self._inflate(False)
+        
+        # 基对象在 pack 中出现得更晚的 REF_DELTA：反复尝试直到没有进展
+        while pending:
+            remaining = []
+            for offset, base_sha, delta in pending:
+                base = by_sha.get(base_sha)
+                if base is None:
+                    remaining.append((offset, base_sha, delta))
+                else:
+                    yield emit(offset, apply_git_delta(base, delta))
+            if len(remaining) == len(pending):
+                break
+            pending = remaining
+
+
+def parse_commit_object(body):
+    """
+    解析 commit 原文头部
+    
+    Returns:
+        tuple: (父 commit 列表, 作者 "Name <email>", 作者时间戳, 作者时区（分钟）, 提交时间戳)
+    """
+    parents = []
+    ident, author_epoch, author_tz, committer_epoch = '', 0, 0, 0
+    for line in body.split(b'\n'):
+        if not line:
+            break
+        if line.startswith(b'parent '):
+            parents.append(line[7:47].decode('ascii'))
+        elif line.startswith(b'author '):
+            ident, epoch, tz = line[7:].decode('utf-8', errors='replace').rsplit(' ', 2)
+            author_epoch, author_tz = int(epoch), parse_tz_offset(tz)
+        elif line.startswith(b'committer '):
+            committer_epoch = int(line.rsplit(b' ', 2)[1])
+    return parents, ident, author_epoch, author_tz, committer_epoch
+
+
+def read_bundle_header(f):
+    """
+    读取 bundle 头部，之后 f 位于 pack 数据开头
+    
+    Returns:
+        dict: {引用名: sha}
+    """
+    signature = f.readline()
+    if signature not in BUNDLE_SIGNATURES:
+        raise ValueError("不是 git bundle 文件")
+    refs = {}
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError("bundle 头部不完整")
+        line = line.rstrip(b'\n')
+        if not line:
+            return refs
+        if line.startswith((b'-', b'@')):
+            continue  # 前置 commit（增量 bundle）/ v3 能力声明
+        sha, _, name = line.decode('utf-8', errors='replace').partition(' ')
+        refs[name] = sha
+
+
+def resolve_archive_tips(refs, head):
+    """
+    与 git log 默认行为一致：从 HEAD 开始遍历；
+    没有 HEAD 时依次退回到 main/master 分支、全部分支、全部引用
+    """
+    if head:
+        if head.startswith('ref: '):
+            target = refs.get(head[5:].strip())
+            if target:
+                return [target]
+        elif re.fullmatch(r'[0-9a-f]{40}', head):
+            return [head]
+    for name in ('refs/heads/main', 'refs/heads/master'):
+        if name in refs:
+            return [refs[name]]
+    branches = [sha for name, sha in refs.items() if name.startswith('refs/heads/')]
+    return branches or list(refs.values())
+
+
+class ArchiveAnalyzer(Code996Analyzer):
+    """
+    归档仓库分析器：从 git bundle 或 .git 目录的 tar 包中直接流式读取 commit
+    
+    bundle 读取头部引用后解析其中的 pack；tar 包按顺序读取其中的 pack 文件与松散对象
+    （支持 gzip/bz2/xz 压缩），引用来自 HEAD、packed-refs 与 refs/。
+    全程只在内存中解析，不向磁盘写任何文件，也不调用 git。
+    
+    时间范围按提交时间过滤（与 git log --since-as-filter / --until 一致），
+    直方图按作者时间（作者时区）统计。
+    """
+    
+    def __init__(self, archive_path, start_date=None, end_date=None, author=None,
+                 period=None, commit_sink=None, windows=None, calendar=None):
+        super().__init__(start_date=start_date, end_date=end_date, author=author, repo_path=archive_path,
+                         period=period, commit_sink=commit_sink, windows=windows, calendar=calendar)
+        self.archive_path = archive_path
+    
+    def get_project_name(self):
+        if not self.project_name:
+            self.project_name = archive_project_name(self.archive_path)
+        return self.project_name
+    
+    def resolve_head(self):
+        return None  # 归档内容不会变化，不参与 --watch
+    
+    def _read_bundle(self):
+        commits = {}
+        with open(self.archive_path, 'rb') as f:
+            refs = read_bundle_header(f)
+            for sha, body in PackReader(f).iter_commits():
+                commits[sha] = parse_commit_object(body)
+        return commits, refs, refs.get('HEAD')
+    
+    def _read_tar(self):
+        commits = {}
+        ref_files = defaultdict(dict)  # git 目录前缀 -> {相对路径: 内容}
+        object_prefixes = defaultdict(int)
+        with tarfile.open(self.archive_path, 'r|*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                name = member.name[2:] if member.name.startswith('./') else member.name
+                pack_match = TAR_PACK_FILE.match(name)
+                loose_match = TAR_LOOSE_OBJECT.match(name) if not pack_match else None
+                ref_match = TAR_REF_FILE.match(name) if not (pack_match or loose_match) else None
+                if pack_match:
+                    object_prefixes[pack_match.group(1)] += 1
+                    for sha, body in PackReader(archive.extractfile(member)).iter_commits():
+                        commits[sha] = parse_commit_object(body)
+                elif loose_match:
+                    object_prefixes[loose_match.group(1)] += 1
+                    data = zlib.decompress(archive.extractfile(member).read())
+                    if data.startswith(b'commit '):
+                        body = data[data.index(b'\0') + 1:]
+                        commits[loose_match.group(2) + loose_match.group(3)] = parse_commit_object(body)
+                elif ref_match and member.size < (1 << 20):
+                    content = archive.extractfile(member).read().decode('utf-8', errors='replace')
+                    ref_files[ref_match.group(1)][ref_match.group(2)] = content
+        
+        if not object_prefixes:
+            raise ValueError(f"归档中没有找到 Git 对象: {self.archive_path}")
+        prefix = max(object_prefixes, key=object_prefixes.get)
+        files = ref_files.get(prefix, {})
+        refs = {}
+        for line in files.get('packed-refs', '').splitlines():
+            parts = line.split(' ', 1)
+            if len(parts) == 2 and not line.startswith(('#', '^')):
+                refs[parts[1].strip()] = parts[0]
+        for ref_name, content in files.items():
+            if ref_name.startswith('refs/'):
+                refs[ref_name] = content.strip()
+        return commits, refs, files.get('HEAD', '').strip()
+    
+    def iter_commits(self):
+        """
+        遍历 HEAD 可达的 commit，按作者、提交时间过滤
+        
+        Yields:
+            tuple: (sha, day, hour, weekday)，与 Code996Analyzer.iter_commits 相同
+        """
+        try:
+            if self.archive_path.lower().endswith(TAR_SUFFIXES):
+                commits, refs, head = self._read_tar()
+            else:
+                commits, refs, head = self._read_bundle()
+        except (OSError, ValueError, zlib.error, tarfile.TarError) as e:
+            print(f"读取归档失败: {e}", file=sys.stderr)
+            sys.exit(1)
+        
+        # --after / --before 的日期不带时间，git 会补上当前时刻
+        now = datetime.now().time()
+        after = datetime.combine(date.fromisoformat(self.start_date), now).timestamp()
+        before = datetime.combine(date.fromisoformat(self.end_date), now).timestamp()
+        author_pattern = re.compile(self.author) if self.author else None
+        
+        stack = [sha for sha in resolve_archive_tips(refs, head) if sha in commits]
+        seen = set(stack)
+        while stack:
+            sha = stack.pop()
+            parents, ident, author_epoch, author_tz, committer_epoch = commits[sha]
+            for parent in parents:
+                if parent not in seen and parent in commits:  # 增量 bundle 的前置 commit 不在归档中
+                    seen.add(parent)
+                    stack.append(parent)
+            if not after <= committer_epoch <= before:
+                continue
+            if author_pattern and not author_pattern.search(ident):
+                continue
+            day, bucket = event_bucket(author_epoch, author_tz)
+            yield sha, number_to_day(day), bucket % HOURS_PER_DAY, bucket // HOURS_PER_DAY + 1
+
+
+class BranchAnalyzer(Code996Analyzer):
+    """
+    分支对比分析器（--per-branch）：一次遍历所有选中分支的并集，同时统计每个分支的 24×7 直方图
+    
+    每个分支占位集中的一位。git log --topo-order 保证子 commit 先于父 commit 输出，
+    处理一个 commit 时把它的位集并到各个父 commit 上，因此每个 commit 的位集就是能到达它的分支集合；
+    只有尚未输出的父 commit 需要暂存位集（遍历前沿），内存与历史长度无关。
+    计数按 (位集, 直方图下标) 累加，遍历结束后再按位集展开到各分支，
+    展开开销只与位集种类数和分支数有关，与 commit 数无关。
+    """
+    
+    def __init__(self, start_date=None, end_date=None, author=None, repo_path=".", remote_url=None,
+                 period=None, windows=None, refs='branches'):
+        super().__init__(start_date=start_date, end_date=end_date, author=author, repo_path=repo_path,
+                         remote_url=remote_url, period=period, windows=windows, refs=refs)
+        self.branches = []  # 选中的分支名，下标即位集中的位
+        self.tip_masks = {}  # {tip commit SHA: 指向它的分支位集}
+        self.mask_counts = None  # {位集 * HISTOGRAM_SIZE + 直方图下标: commit 数}
+    
+    def resolve_ref_tips(self):
+        """选中的分支，同时为每个分支分配一位"""
+        self.branches = []
+        self.tip_masks = {}
+        for sha, name in self.select_refs():
+            self.tip_masks[sha] = self.tip_masks.get(sha, 0) | (1 << len(self.branches))
+            self.branches.append(name)
+        return {sha: self.branches[(mask & -mask).bit_length() - 1] for sha, mask in self.tip_masks.items()} or None
+    
+    def iter_commits(self):
+        """
+        按拓扑顺序遍历所有分支的并集，逐个产出 commit，并按位集累计 self.mask_counts
+        
+        Yields:
+            tuple: (sha, day, hour, weekday)，与 Code996Analyzer.iter_commits 相同
+        """
+        # 不传 --before / --author：被过滤掉的 commit 也要把位集传给父 commit，这两项在下面逐个判断
+        cmd = [
+            "git", "-C", self.repo_path, "log", "--topo-order", "--stdin",
+            "--format=%H%x00%P%x00%ct%x00%ad%x00%an <%ae>",
+            "--date=format:%Y-%m-%d %H %u",
+            f"--after={self.start_date}",
+        ]
+        # --before 的日期不带时间，git 会补上当前时刻
+        before = datetime.combine(date.fromisoformat(self.end_date), datetime.now().time()).timestamp()
+        author_pattern = re.compile(self.author) if self.author else None
+        masks = dict(self.tip_masks)
+        self.mask_counts = mask_counts = Counter()
+        
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, encoding='utf-8', errors='replace')
+        process.stdin.write(revs_stdin(self.revs))
+        process.stdin.close()
+        try:
+            for line in process.stdout:
+                parts = line.rstrip('\n').split('\0')
+                if len(parts) != 5:
+                    continue
+                sha, parents, committer_epoch, author_date, ident = parts
+                mask = masks.pop(sha, 0)
+                for parent in parents.split():
+                    masks[parent] = masks.get(parent, 0) | mask
+                if int(committer_epoch) > before:
+                    continue
+                if author_pattern and not author_pattern.search(ident):
+                    continue
+                day, hour, weekday = author_date.split()
+                hour, weekday = int(hour), int(weekday)
+                mask_counts[mask * HISTOGRAM_SIZE + (weekday - 1) * HOURS_PER_DAY + hour] += 1
+                yield sha, day, hour, weekday
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            returncode = process.wait()
+        
+        if returncode != 0:
+            print(f"Git命令执行失败: {stderr.strip()}", file=sys.stderr)
+            self.cleanup()
+            sys.exit(1)
+    
+    def collect_histogram(self):
+        """在 Code996Analyzer.collect_histogram() 的基础上增加每个分支的直方图"""
+        stats = super().collect_histogram()
+        stats['refs'] = None  # 各分支的完整统计取代按首个到达引用的归属
+        
+        # 只展开非零的 (位集, 下标)，每种位集的位只分解一次
+        histograms = [[0] * HISTOGRAM_SIZE for _ in self.branches]
+        exclusive = [0] * len(self.branches)
+        mask_bits = {}
+        for key, count in self.mask_counts.items():
+            mask, index = divmod(key, HISTOGRAM_SIZE)
+            bits = mask_bits.get(mask)
+            if bits is None:
+                bits, rest = [], mask
+                while rest:
+                    bits.append((rest & -rest).bit_length() - 1)
+                    rest &= rest - 1
+                mask_bits[mask] = bits
+            if len(bits) == 1:
+                exclusive[bits[0]] += count
+            for bit in bits:
+                histograms[bit][index] += count
+        stats['branches'] = list(zip(self.branches, histograms, exclusive))
+        return stats
+    
+    def build_full_result(self):
+        """完整结果另加 'branches' 字段：每个分支的指标，按 commit 数从多到少排列"""
+        result = super().build_full_result()
+        branches = []
+        for name, histogram, exclusive in self.stats['branches']:
+            branch = self.build_result(histogram)
+            branches.append({
+                'name': name,
+                'total_count': branch['total_count'],
+                'exclusive_count': exclusive,
+                'opening_hour': branch['opening_hour'],
+                'closing_hour': branch['closing_hour'],
+                'work_days': branch['work_days'],
+                'index_996': branch['index_996'],
+                'overtime_ratio': branch['overtime_ratio'],
+                'is_standard': branch['is_standard'],
+                'histogram': histogram,
+            })
+        branches.sort(key=lambda branch: -branch['total_count'])
+        result['branches'] = branches
+        return result
+
+
+PATH_DEFAULT_LIMIT = 50  # --by-path 默认最多单独统计的目录数
+PATH_ROOT = '/'  # 仓库根目录下的文件
+PATH_OTHER = '(其他)'  # 超出上限、被合并的目录
+
+
+def parse_by_path(value):
+    """
+    解析 --by-path 参数：depth=N[,max=M]，也可以只写 N
+    
+    Returns:
+        tuple: (目录深度, 最多单独统计的目录数)
+    """
+    options = {'depth': None, 'max': PATH_DEFAULT_LIMIT}
+    for i, item in enumerate(value.split(',')):
+        key, sep, number = item.strip().partition('=')
+        if not sep and i == 0:
+            key, number = 'depth', key
+        if key not in options or not number.strip().isdigit() or int(number) < 1:
+            print(f"错误: --by-path 格式应为 depth=N[,max=M]（N、M 为正整数）: {value}", file=sys.stderr)
+            sys.exit(1)
+        options[key] = int(number)
+    if options['depth'] is None:
+        print(f"错误: --by-path 需要指定 depth=N: {value}", file=sys.stderr)
+        sys.exit(1)
+    return options['depth'], options['max']
+
+
+def unquote_git_path(path):
+    """还原 git 加了引号的路径：C 风格转义，非 ASCII 字符为逐字节的八进制转义（如中文目录名）"""
+    body = path[1:-1] if path.endswith('"') and len(path) > 1 else path[1:]
+    raw = body.encode('latin-1', 'backslashreplace').decode('unicode_escape').encode('latin-1')
+    return raw.decode('utf-8', errors='replace')
+
+
+class PathAnalyzer(Code996Analyzer):
+    """
+    按目录拆分的分析器（--by-path depth=N）：一次 git log --name-only 同时统计整体与每个目录前缀的 24×7 直方图
+    
+    每个 commit 按其修改的文件取前 N 级目录（根目录下的文件记为 /），触及的每个前缀各计一次。
+    目录数有上限：表中超过 4 倍上限时，按 commit 数只保留前 2 倍，其余并入 (其他)；
+    结束时再只保留前 limit 个。没有文件列表的 merge commit 只计入整体。
+    """
+    
+    def __init__(self, start_date=None, end_date=None, author=None, repo_path=".", remote_url=None,
+                 period=None, windows=None, depth=1, limit=PATH_DEFAULT_LIMIT, calendar=None):
+        super().__init__(start_date=start_date, end_date=end_date, author=author, repo_path=repo_path,
+                         remote_url=remote_url, period=period, windows=windows, calendar=calendar)
+        self.depth = depth  # 目录前缀的级数
+        self.limit = limit  # 最多单独统计的目录数
+        self.prefixes = None  # {目录前缀: [commit 数, 直方图]}
+        self.other = None  # 被合并的目录的直方图
+        self.merge_count = 0  # 没有文件列表的 commit 数（merge）
+    
+    def prefix_of(self, path):
+        """文件路径 -> 前 depth 级目录（不足时取到文件所在目录）"""
+        if path.startswith('"'):
+            path = unquote_git_path(path)
+        end = -1
+        for _ in range(self.depth):
+            slash = path.find('/', end + 1)
+            if slash < 0:
+                break
+            end = slash
+        return path[:end] if end > 0 else PATH_ROOT
+    
+    def fold(self, keep):
+        """只保留 commit 数最多的 keep 个目录，其余并入 self.other"""
+        ranked = sorted(self.prefixes.items(), key=lambda item: -item[1][0])
+        for _, (_, histogram) in ranked[keep:]:
+            for index, count in enumerate(histogram):
+                self.other[index] += count
+        self.prefixes = dict(ranked[:keep])
+    
+    def iter_commits(self):
+        """
+        流式解析 git log --name-only，逐个产出 commit，同时累计每个目录前缀的直方图
+        
+        Yields:
+            tuple: (sha, day, hour, weekday)，与 Code996Analyzer.iter_commits 相同
+        """
+        self.prefixes = prefixes = {}
+        self.other = [0] * HISTOGRAM_SIZE
+        self.merge_count = 0
+        capacity = self.limit * 4
+        prefix_of = self.prefix_of
+        current = None
+        touched = set()
+        
+        # 每个 commit 先输出以 NUL 开头的头部行，再输出它修改的文件（每行一个，中间有空行）
+        lines = self.run_git_log("%x00%H %ad", "%Y-%m-%d %H %u", ["--name-only", "--no-renames"])
+        for line in itertools.chain(lines, ['\0']):
+            if line.startswith('\0'):
+                if current is not None:
+                    sha, day, hour, weekday = current
+                    if touched:
+                        index = (weekday - 1) * HOURS_PER_DAY + hour
+                        for prefix in touched:
+                            entry = prefixes.get(prefix)
+                            if entry is None:
+                                entry = prefixes[prefix] = [0, [0] * HISTOGRAM_SIZE]
+                            entry[0] += 1
+                            entry[1][index] += 1
+                        touched.clear()
+                        if len(prefixes) > capacity:
+                            self.fold(self.limit * 2)
+                            prefixes = self.prefixes
+                    else:
+                        self.merge_count += 1
+                    yield current
+                parts = line[1:].split()
+                current = (parts[0], parts[1], int(parts[2]), int(parts[3])) if len(parts) == 4 else None
+            elif len(line) > 1:
+                touched.add(prefix_of(line.rstrip('\n')))
+        
+        self.fold(self.limit)
+    
+    def collect_histogram(self):
+        """在 Code996Analyzer.collect_histogram() 的基础上增加每个目录前缀的直方图"""
+        stats = super().collect_histogram()
+        stats['paths'] = [(prefix, histogram) for prefix, (_, histogram) in self.prefixes.items()]
+        stats['paths_other'] = self.other
+        return stats
+    
+    def build_full_result(self):
+        """完整结果另加 'paths' 字段：每个目录前缀的指标，按 commit 数从多到少排列"""
+        result = super().build_full_result()
+        
+        def summarize(name, histogram):
+            item = self.build_result(histogram)
+            return {
+                'path': name,
+                'total_count': item['total_count'],
+                'opening_hour': item['opening_hour'],
+                'closing_hour': item['closing_hour'],
+                'work_days': item['work_days'],
+                'index_996': item['index_996'],
+                'overtime_ratio': item['overtime_ratio'],
+                'is_standard': item['is_standard'],
+                'histogram': histogram,
+            }
+        
+        prefixes = sorted((summarize(name, histogram) for name, histogram in self.stats['paths']),
+                          key=lambda item: -item['total_count'])
+        other = self.stats['paths_other']
+        result['paths'] = {
+            'depth': self.depth,
+            'limit': self.limit,
+            'prefixes': prefixes,
+            'other': summarize(PATH_OTHER, other) if any(other) else None,
+            'merge_count': self.merge_count,
+        }
+        return result
+
+
+SAMPLE_BATCH_SIZE = 512  # 每轮抽样的最少 commit 数
+SAMPLE_MIN_SIZE = 1000  # 样本量达到后才开始判断是否提前结束
+SAMPLE_BOOTSTRAP_ROUNDS = 200
+SAMPLE_CONFIDENCE = 0.95
+
+
+def poisson_draw(rng, lam):
+    """Poisson(lam) 随机数：小均值用 Knuth 算法，大均值用正态近似"""
+    if lam <= 0:
+        return 0
+    if lam >= 30:
+        return max(0, round(rng.gauss(lam, math.sqrt(lam))))
+    limit, k, p = math.exp(-lam), 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+def scale_histogram(histogram, total):
+    """把样本直方图按比例放大到 total 个 commit（最大余数法取整，总数恰好为 total）"""
+    sampled = sum(histogram)
+    exact = [count * total / sampled for count in histogram]
+    scaled = [int(value) for value in exact]
+    order = sorted(range(len(exact)), key=lambda i: exact[i] - scaled[i], reverse=True)
+    for i in order[:total - sum(scaled)]:
+        scaled[i] += 1
+    return scaled
+
+
+def bit_reverse(value, bits):
+    """value 的低 bits 位逆序，用于把分层抽样的各轮偏移均匀铺开"""
+    return int(format(value, f'0{bits}b')[::-1], 2) if bits else 0
+
+
+class SampledAnalyzer(Code996Analyzer):
+    """
+    抽样估算分析器（--sample）：只读取部分 commit 估算 24×7 直方图
+    
+    先用 git rev-list 列出时间范围内的 commit（只输出 SHA，不格式化日期），
+    再按步长分层抽样：每轮从按时间排列的 commit 中等间隔取一批，各轮偏移按位逆序
+    交错，任意时刻已抽到的样本都均匀覆盖整个时间范围。抽到的 commit 通过常驻的
+    git cat-file --batch 读取。每轮之后用 Poisson bootstrap 估计 996 指数与加班占比的
+    置信区间，区间半宽小于容差或达到最大抽样比例时停止。
+    """
+    
+    def __init__(self, start_date=None, end_date=None, author=None, repo_path=".", remote_url=None,
+                 rate=0.1, tolerance=5.0, seed=0):
+        super().__init__(start_date=start_date, end_date=end_date, author=author,
+                         repo_path=repo_path, remote_url=remote_url)
+        self.rate = rate  # 最大抽样比例
+        self.tolerance = tolerance  # 996 指数置信区间半宽的容差
+        self.seed = seed
+        self.elapsed = None  # 抽样分析耗时（秒，不含克隆）
+    
+    @staticmethod
+    def feed_batch(stdin, batch):
+        """在后台线程中把一轮抽样的 SHA 写入 cat-file --batch"""
+        try:
+            stdin.write(b''.join(batch))
+            stdin.flush()
+        except OSError:
+            pass  # cat-file 已退出，读取端会遇到 EOF
+    
+    def bootstrap(self, histogram, rng):
+        """996 指数与加班占比的 bootstrap 置信区间: ((下限, 上限), (下限, 上限))"""
+        indexes, ratios = [], []
+        for _ in range(SAMPLE_BOOTSTRAP_ROUNDS):
+            resampled = [poisson_draw(rng, count) for count in histogram]
+            if not sum(resampled):
+                continue
+            result = self.build_result(resampled)
+            indexes.append(result['index_996'])
+            ratios.append(result['overtime_ratio'])
+        tail = (1 - SAMPLE_CONFIDENCE) / 2
+        
+        def interval(values):
+            values.sort()
+            return values[int(tail * len(values))], values[max(0, math.ceil((1 - tail) * len(values)) - 1)]
+        
+        return interval(indexes), interval(ratios)
+    
+    def analyze(self):
+        """抽样估算，结果结构与 Code996Analyzer.analyze() 相同，另加 'sample' 字段"""
+        if self.remote_url and not self.temp_dir:
+            self.clone_remote_repo()
+        
+        print(f"正在抽样分析 Git 项目...")
+        print(f"统计时间范围：{self.start_date} 至 {self.end_date}")
+        started = time.perf_counter()
+        
+        self.head = self.resolve_head()
+        self.revs = [self.head] if self.head else []
+        shas = self.list_commits()
+        population = len(shas) // 41
+        if population == 0:
+            print("错误：未找到任何commit记录")
+            sys.exit(1)
+        
+        # 步长 stride = 2^bits，每轮取 population / stride 个（不少于 SAMPLE_BATCH_SIZE）
+        bits = max(0, int(math.log2(population / SAMPLE_BATCH_SIZE))) if population > SAMPLE_BATCH_SIZE else 0
+        stride = 1 << bits
+        max_rounds = min(stride, max(1, math.ceil(self.rate * stride)))
+        if stride == 1:
+            print(f"⚠️  提示: 时间范围内只有 {population} 个 commit，少于分层抽样所需的 {2 * SAMPLE_BATCH_SIZE} 个，"
+                  f"--sample 退化为完整统计（不会更快，建议去掉 --sample）", file=sys.stderr)
+        else:
+            if self.rate * stride < 1:
+                print(f"⚠️  提示: 每轮至少抽取 {SAMPLE_BATCH_SIZE} 个 commit，实际抽样比例为 {1 / stride:.0%}"
+                      f"（--sample {self.rate}）", file=sys.stderr)
+            dirs = resolve_git_dirs(self.repo_path)
+            if dirs and not has_commit_graph(dirs[1]):
+                # 没有 commit-graph 时 rev-list 按日期过滤要逐个解析 commit，耗时与完整统计相当
+                print("⚠️  提示: 仓库没有 commit-graph，列出 commit 就要解析全部历史，抽样几乎不会更快"
+                      "（可先运行 git commit-graph write --reachable）", file=sys.stderr)
+        rng = random.Random(self.seed)
+        histogram = [0] * HISTOGRAM_SIZE
+        sampled = checked = 0
+        index_ci = ratio_ci = None
+        early_stop = False
+        
+        process = subprocess.Popen(["git", "-C", self.repo_path, "cat-file", "--batch"],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        try:
+            for round_no in range(max_rounds):
+                offset = bit_reverse(round_no, bits)
+                batch = [shas[i * 41:i * 41 + 41] for i in range(offset, population, stride)]
+                # 边写边读：整批 SHA 可能超出管道缓冲区（Windows 匿名管道默认 4 KB），
+                # 主线程先写完再读会与等待输出被读走的 cat-file 互相阻塞
+                writer = threading.Thread(target=self.feed_batch, args=(process.stdin, batch), daemon=True)
+                writer.start()
+                for _ in batch:
+                    header = process.stdout.readline().split()
+                    body = process.stdout.read(int(header[2]) + 1)
+                    _, _, author_epoch, author_tz, _ = parse_commit_object(body)
+                    _, bucket = event_bucket(author_epoch, author_tz)
+                    histogram[bucket] += 1
+                writer.join()
+                sampled += len(batch)
+                
+                # 样本量每增长 1/4 检查一次置信区间
+                if sampled < population and sampled >= SAMPLE_MIN_SIZE and sampled >= checked * 1.25:
+                    checked = sampled
+                    index_ci, ratio_ci = self.bootstrap(histogram, rng)
+                    if (index_ci[1] - index_ci[0]) / 2 <= self.tolerance:
+                        early_stop = round_no + 1 < max_rounds
+                        break
+        finally:
+            process.stdin.close()
+            process.stdout.close()
+            process.wait()
+        
+        self.stats = {'histogram': scale_histogram(histogram, population), 'periods': None, 'windows': []}
+        result = self.build_full_result()
+        if sampled == population:
+            index_ci = (result['index_996'], result['index_996'])
+            ratio_ci = (result['overtime_ratio'], result['overtime_ratio'])
+        elif sampled != checked:
+            index_ci, ratio_ci = self.bootstrap(histogram, rng)
+        self.elapsed = time.perf_counter() - started
+        
+        result['sample'] = {
+            'population': population,
+            'sampled': sampled,
+            'rate': round(sampled / population, 4),
+            'confidence': SAMPLE_CONFIDENCE,
+            'tolerance': self.tolerance,
+            'index_996_ci': list(index_ci),
+            'overtime_ratio_ci': list(ratio_ci),
+            'early_stop': early_stop,
+            'exhaustive': stride == 1,
+            'elapsed': round(self.elapsed, 3),
+        }
+        print(f"总 commit 数: {population}（抽样 {sampled} 个，{sampled / population:.1%}"
+              f"{'，已达到容差提前结束' if early_stop else ''}）")
+        print(f"996 指数 {SAMPLE_CONFIDENCE:.0%} 置信区间: [{index_ci[0]}, {index_ci[1]}]")
+        return result
+    
+    def compare_exact(self, result):
+        """
+        在同一仓库上做一次完整统计，报告抽样的加速比与误差（--sample-compare）
+        
+        Returns:
+            dict: 写入 result['sample']['exact']
+        """
+        exact_analyzer = Code996Analyzer(start_date=self.start_date, end_date=self.end_date,
+                                         author=self.author, repo_path=self.repo_path)
+        exact_analyzer.open_end = self.open_end
+        started = time.perf_counter()
+        exact_analyzer.head = self.head
+        exact_analyzer.revs = list(self.revs)
+        exact_analyzer.stats = exact_analyzer.collect_histogram()
+        exact = exact_analyzer.build_full_result()
+        elapsed = time.perf_counter() - started
+        
+        total = exact['total_count']
+        sample = result['sample']
+        comparison = {
+            'elapsed': round(elapsed, 3),
+            'speedup': round(elapsed / self.elapsed, 2) if self.elapsed else None,
+            'index_996': exact['index_996'],
+            'overtime_ratio': exact['overtime_ratio'],
+            'index_996_error': result['index_996'] - exact['index_996'],
+            'overtime_ratio_error': result['overtime_ratio'] - exact['overtime_ratio'],
+            'index_996_covered': sample['index_996_ci'][0] <= exact['index_996'] <= sample['index_996_ci'][1],
+            # 直方图分布的总变差距离（0 表示完全一致）
+            'histogram_distance': round(sum(abs(a - b) for a, b in zip(result['histogram'], exact['histogram']))
+                                        / (2 * total), 4) if total else 0,
+        }
+        sample['exact'] = comparison
+        return comparison
+
+
+# 执行计划：先做廉价探测，再为每个仓库选择执行策略
+PLAN_SHARD_MIN_COMMITS = 100000  # 窗口内 commit 数达到后考虑分片并行
+PLAN_SHARD_MIN_SIZE = 25000  # 每个分片至少的 commit 数
+PLAN_BYTES_PER_COMMIT = 2048  # 没有 commit 数时按 pack 大小粗略估计规模
+SHARD_BATCH_LINES = 1024
+SHARD_QUEUE_BATCHES = 64
+PLAN_STRATEGY_LABELS = {
+    'empty': '跳过（窗口内无 commit）',
+    'stream': '单进程流式遍历',
+    'sharded': '分片并行格式化',
+    'sample': '抽样估算',
+    'archive': '归档流式解析',
+}
+
+
+def has_commit_graph(common_dir):
+    """公共 git 目录下是否有 commit-graph（单个文件或分层链）"""
+    objects_dir = os.path.join(common_dir, 'objects')
+    return (os.path.isfile(os.path.join(objects_dir, 'info', 'commit-graph')) or
+            os.path.isfile(os.path.join(objects_dir, 'info', 'commit-graphs', 'commit-graph-chain')))
+
+
+def probe_repo(repo_info, start_date=None, end_date=None, cache=None):
+    """
+    对仓库做廉价探测（不遍历历史）
+    
+    - pack 大小：git count-objects -v
+    - 是否有 commit-graph：有时 rev-list 只读图文件即可按日期遍历
+    - 窗口内 commit 数：仅在有 commit-graph 时用 rev-list --count 统计（不按作者过滤，是上界）
+    - 远程仓库的克隆缓存是否命中：未命中时要克隆后才能探测
+    
+    Returns:
+        dict: {'repo', 'commits', 'pack_bytes', 'commit_graph', 'cache', 'cost'}，未知项为 None
+    """
+    probe = {'repo': repo_info, 'commits': None, 'pack_bytes': None, 'commit_graph': False, 'cache': None}
+    repo_path = repo_info['path']
+    if repo_info['type'] == 'archive':
+        probe['pack_bytes'] = os.path.getsize(repo_path)
+    elif repo_info['type'] == 'remote':
+        cache = cache or Code996Analyzer.clone_cache or CloneCache()
+        repo_path = os.path.join(cache.root, cache.entry_name(repo_path))
+        probe['cache'] = 'warm' if os.path.isfile(os.path.join(repo_path, 'HEAD')) else 'cold'
+    
+    dirs = resolve_git_dirs(repo_path) if probe['cache'] != 'cold' and repo_info['type'] != 'archive' else None
+    if dirs:
+        probe['commit_graph'] = has_commit_graph(dirs[1])
+        output = subprocess.run(["git", "-C", repo_path, "count-objects", "-v"],
+                                capture_output=True, text=True, check=False).stdout
+        sizes = dict(line.split(': ', 1) for line in output.splitlines() if ': ' in line)
+        probe['pack_bytes'] = (int(sizes.get('size-pack', 0)) + int(sizes.get('size', 0))) * 1024
+        if probe['commit_graph']:
+            cmd = ["git", "-C", repo_path, "rev-list", "--count",
+                   f"--after={start_date or '2022-01-01'}",
+                   f"--before={end_date or datetime.now().strftime('%Y-%m-%d')}", "HEAD"]
+            result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+            if result.returncode == 0:
+                probe['commits'] = int(result.stdout.strip() or 0)
+    
+    # 调度用的规模估计：未缓存的远程仓库规模未知且要先克隆，排在最前
+    if probe['cache'] == 'cold':
+        probe['cost'] = float('inf')
+    elif probe['commits'] is not None:
+        probe['cost'] = probe['commits']
+    else:
+        probe['cost'] = (probe['pack_bytes'] or 0) // PLAN_BYTES_PER_COMMIT
+    return probe
+
+
+def plan_repo(probe, jobs=1, sample=False, refs=None):
+    """
+    根据探测结果选择执行策略，写入 probe 的 'strategy'、'shards'、'reason' 并返回
+    
+    - empty: 窗口内没有 commit，不启动 git log
+    - sample: 指定了 --sample
+    - sharded: commit 数足够多、有 commit-graph 且允许并行时，按 SHA 分片并行格式化
+               （--refs 需要 git log --source 标记引用，不分片）
+    - stream: 其余情况，单进程流式遍历（与不做计划时相同）
+    """
+    commits = probe['commits']
+    probe['shards'] = 1
+    if probe['repo']['type'] == 'archive':
+        probe['strategy'], probe['reason'] = 'archive', '归档文件只能顺序读取'
+    elif commits == 0:
+        probe['strategy'], probe['reason'] = 'empty', '窗口内没有 commit'
+    elif sample:
+        probe['strategy'], probe['reason'] = 'sample', '指定了 --sample'
+    elif probe['cache'] == 'cold':
+        probe['strategy'], probe['reason'] = 'stream', '远程仓库未缓存，克隆后重新规划'
+    elif probe['cost'] < PLAN_SHARD_MIN_COMMITS:
+        probe['strategy'], probe['reason'] = 'stream', '规模较小'
+    elif commits is None:
+        probe['strategy'] = 'stream'
+        probe['reason'] = '没有 commit-graph，分片需要额外遍历一次历史（可运行 git commit-graph write --reachable）'
+    elif jobs < 2:
+        probe['strategy'], probe['reason'] = 'stream', '--jobs 为 1，不并行'
+    elif refs:
+        probe['strategy'], probe['reason'] = 'stream', '--refs 需要一次遍历标记各引用的贡献，不分片'
+    else:
+        probe['strategy'] = 'sharded'
+        probe['shards'] = max(2, min(jobs, commits // PLAN_SHARD_MIN_SIZE))
+        probe['reason'] = f"{commits} 个 commit，commit-graph 可快速列出后分 {probe['shards']} 段并行格式化"
+    return probe
+
+
+def plan_repos(repo_list, start_date=None, end_date=None, jobs=1, sample=False, refs=None):
+    """探测并规划所有仓库，按规模从大到小排序（大仓库先开始，避免成为长尾）"""
+    plans = [plan_repo(probe_repo(repo_info, start_date, end_date), jobs, sample, refs) for repo_info in repo_list]
+    return sorted(plans, key=lambda plan: plan['cost'], reverse=True)
+
+
+def print_plan(plans, jobs):
+    """--explain：打印执行计划"""
+    print(f"\n执行计划（--jobs {jobs}，按规模从大到小调度）:")
+    print(f"  {'#':>3}  策略          {'窗口 commit':>10}  {'pack':>10}  graph 缓存  仓库")
+    for i, plan in enumerate(plans, 1):
+        strategy = plan['strategy'] + (f"×{plan['shards']}" if plan['shards'] > 1 else '')
+        commits = f"{plan['commits']:,}" if plan['commits'] is not None else '?'
+        pack = format_size(plan['pack_bytes']) if plan['pack_bytes'] is not None else '?'
+        print(f"  {i:>3}  {strategy:<14}{commits:>12}  {pack:>10}  {'有' if plan['commit_graph'] else '无':<5}"
+              f"{plan['cache'] or '-':<6}{plan['repo']['path']}")
+        print(f"       {PLAN_STRATEGY_LABELS[plan['strategy']]}: {plan['reason']}")
+
+
+def compact_histogram(histogram):
+    """按最大计数选择最窄的整数数组（B / H / i）保存直方图"""
+    peak = max(histogram, default=0)
+    return array('B' if peak < 1 << 8 else 'H' if peak < 1 << 16 else 'i', histogram)
+
+
+# 可以由直方图重新计算、RepoRecord 不保存的结果字段
+RECORD_DERIVED_FIELDS = ('hour_data', 'week_data', 'work_hour_pl', 'work_week_pl', 'description')
+
+
+class RepoRecord:
+    """
+    多仓库汇总中单个仓库的紧凑记录（repo_results 的条目）
+
+    只保存数字：各项指标为属性，24×7 直方图与按周期的直方图为紧凑数组；
+    hour_data / week_data 等列表与 dict 由直方图重新计算，只在序列化（to_dict）
+    或渲染单仓库报告（result）时生成。时间窗口、引用贡献等不常用的字段放在 extra 中。
+    """
+
+    __slots__ = ('name', 'path', 'type', 'duplicate_count', 'report', 'partial',
+                 'start_date', 'end_date', 'total_count', 'index_996', 'overtime_ratio',
+                 'opening_hour', 'closing_hour', 'work_days', 'is_standard', 'histogram', 'extra')
+
+    def __init__(self, name, path, repo_type, result, duplicate_count=0, partial=None):
+        """
+        Args:
+            name: 仓库名称
+            path: 仓库路径 / URL
+            repo_type: local / remote / archive
+            result: 单仓库的完整结果（Code996Analyzer.build_full_result()）
+            duplicate_count: 去重跳过的 commit 数，None 表示不记录（reduce 模式）
+            partial: 来自哪个中间结果文件（reduce 模式）
+        """
+        self.name = name
+        self.path = path
+        self.type = repo_type
+        self.duplicate_count = duplicate_count
+        self.report = None  # 单仓库报告的相对链接
+        self.partial = partial
+        self.update(result)
+
+    def update(self, result):
+        """用新的完整结果替换记录中的指标（--watch 模式下仓库有新 commit 时）"""
+        self.start_date = result['start_date']
+        self.end_date = result['end_date']
+        self.total_count = result['total_count']
+        self.index_996 = result['index_996']
+        self.overtime_ratio = result['overtime_ratio']
+        self.opening_hour = result['opening_hour']
+        self.closing_hour = result['closing_hour']
+        self.work_days = result['work_days']
+        self.is_standard = result['is_standard']
+        self.histogram = compact_histogram(result['histogram'])
+        extra = {key: value for key, value in result.items()
+                 if key not in RECORD_DERIVED_FIELDS and key not in self.__slots__}
+        if extra.get('periods'):
+            extra['periods'] = {key: compact_histogram(bucket) for key, bucket in extra['periods'].items()}
+        self.extra = extra or None
+
+    def get(self, key, default=None):
+        """extra 中的字段（periods 为紧凑数组）"""
+        return self.extra.get(key, default) if self.extra else default
+
+    def with_report(self, report):
+        """共享数据、只有报告链接不同的副本（静态站点中不同目录下的页面链接）"""
+        copy = object.__new__(RepoRecord)
+        for slot in self.__slots__:
+            setattr(copy, slot, getattr(self, slot))
+        copy.report = report
+        return copy
+
+    def result(self):
+        """生成与 Code996Analyzer.build_full_result() 结构相同的完整结果 dict"""
+        histogram = list(self.histogram)
+        calculator = Code996Analyzer()
+        hour_data, week_data = histogram_to_stats(histogram)
+        opening_time, _ = calculator.calculate_work_time_range(hour_data)
+        work_hour_pl, _, _ = calculator.calculate_working_time(hour_data, opening_time)
+        _, work_week_pl = calculator.calculate_week_type(week_data, self.get('day_types'))
+        result = {
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'total_count': self.total_count,
+            'histogram': histogram,
+            'hour_data': hour_data,
+            'week_data': week_data,
+            'work_hour_pl': work_hour_pl,
+            'work_week_pl': work_week_pl,
+            'opening_hour': self.opening_hour,
+            'closing_hour': self.closing_hour,
+            'work_days': self.work_days,
+            'index_996': self.index_996,
+            'overtime_ratio': self.overtime_ratio,
+            'is_standard': self.is_standard,
+            'description': calculator.get_index_description(self.index_996),
+        }
+        if self.extra:
+            result.update(self.extra)
+            if self.extra.get('periods'):
+                result['periods'] = {key: list(bucket) for key, bucket in self.extra['periods'].items()}
+        return result
+
+    def to_dict(self):
+        """序列化为 repo_results 条目的 dict（JSON 输出）"""
+        entry = {'name': self.name, 'path': self.path, 'type': self.type, 'result': self.result()}
+        if self.duplicate_count is not None:
+            entry['duplicate_count'] = self.duplicate_count
+        if self.partial is not None:
+            entry['partial'] = self.partial
+        if self.report is not None:
+            entry['report'] = self.report
+        return entry
+
+
+class MultiRepoAnalyzer:
+    """
+    多仓库批量分析器
+    循环分析多个仓库，合并统计数据，计算汇总指标
+    """
+    
+    def __init__(self, repo_list, start_date=None, end_date=None, author=None, project_name=None,
+                 dedupe_set=None, period=None, partial_writer=None, windows=None, jobs=1, refs=None, calendar=None,
+                 watch=False):
+        """
+        Args:
+            repo_list: [{'path': '...', 'type': 'local'/'remote'}, ...]
+                       也可以是惰性迭代器（如 --scan 扫描结果），此时仓库总数未知
+            start_date: 起始日期
+            end_date: 结束日期
+            author: 作者过滤
+            project_name: 汇总项目名称
+            dedupe_set: commit 去重集合（SortedDigestSet / BloomDigestSet），
+                        设置后跨仓库重复的 commit（fork、镜像）只计一次
+            period: 按周期分桶的粒度（day/week/month）
+            partial_writer: PartialWriter 实例，map 模式下记录每个计入汇总的 commit
+            windows: 命名时间窗口列表，每个窗口单独汇总（只遍历一次历史）
+            jobs: 并行度，大于 1 时按执行计划从大到小并发分析仓库（大仓库可再分片）
+            refs: --refs 选择器，每个仓库遍历所有选中的引用（归档仓库仍只统计 HEAD）
+            calendar: WorkCalendar，设置后按日历区分工作日/周末/节假日（汇总与每个仓库）
+            watch: --watch 模式保留每个仓库的分析器以便增量刷新；
+                   否则分析完只保留紧凑的 RepoRecord（远程仓库的分析器留到 cleanup）
+        """
+        self.repo_list = repo_list
+        self.repo_total = len(repo_list) if hasattr(repo_list, '__len__') else None
+        self.start_date = start_date
+        self.end_date = end_date
+        self.author = author
+        self.dedupe_set = dedupe_set
+        self.period = period
+        self.partial_writer = partial_writer
+        self.windows = windows or []
+        self.jobs = jobs
+        self.refs = refs
+        self.calendar = calendar
+        self.watch = watch
+        self.project_name = project_name or self.generate_default_name()
+        self.analyzers = []  # 需要清理临时文件（或 --watch 模式下需要刷新）的分析器实例
+        
+        # 汇总容器（由 consume_commit 逐个 commit 累加）
+        self.merged_histogram = [0] * HISTOGRAM_SIZE
+        self.merged_periods = {}
+        self.merged_windows = [[0] * HISTOGRAM_SIZE for _ in self.windows]
+        self.merged_day_types = [0] * len(DAY_TYPE_LABELS)
+        self.merged_window_day_types = [[0] * len(DAY_TYPE_LABELS) for _ in self.windows]
+        self.duplicate_count = 0
+        self._repo_duplicates = 0
+        self.repo_entries = []  # [(RepoRecord, 分析器)]，--watch 模式据此刷新结果（其余模式分析器为 None）
+        self.failed_repos = []
+        self._sink_lock = threading.Lock()  # 并行分析时串行化 consume_commit
+    
+    def generate_default_name(self):
+        """生成默认的项目名称"""
+        if self.repo_total is None:
+            # 扫描模式，仓库数量在分析前未知
+            return "multi-project-scan"
+        if self.repo_total == 1:
+            # 单仓库，使用仓库名
+            path = self.repo_list[0]['path']
+            if self.repo_list[0]['type'] == 'remote':
+                # 从URL提取名称
+                match = re.search(r'[:/]([^/]+/[^/]+?)(?:\.git)?/?$', path)
+                if match:
+                    return match.group(1).replace('/', '-')
+            if self.repo_list[0]['type'] == 'archive':
+                return archive_project_name(path)
+            return os.path.basename(os.path.abspath(path))
+        else:
+            # 多仓库，使用 multi-project 前缀
+            return f"multi-project-{self.repo_total}-repos"
+    
+    def analyze(self):
+        """
+        循环分析每个仓库，合并结果
+        
+        Returns:
+            dict: 汇总结果字典（结构与单仓库兼容，但新增汇总相关字段）
+        """
+        print(f"\n{'='*60}")
+        print(f"多仓库汇总分析: {self.project_name}")
+        if self.repo_total is None:
+            print("仓库列表来自目录扫描，边扫描边分析")
+        else:
+            print(f"共 {self.repo_total} 个仓库")
+        print(f"{'='*60}\n")
+        
+        # 1. 初始化汇总容器
+        repo_results = []  # 每个仓库的详细结果
+        failed_repos = self.failed_repos  # 失败的仓库
+        
+        # 2. 循环分析每个仓库（--jobs 大于 1 时按执行计划并发）
+        if self.jobs > 1:
+            self._analyze_parallel()
+            repo_results = [record for record, _ in self.repo_entries]
+        else:
+            for idx, repo_info in enumerate(self.repo_list, 1):
+                repo_path = repo_info['path']
+                repo_type = repo_info['type']
+                
+                print(f"[{idx}/{self.repo_total or '?'}] 分析仓库: {repo_path}")
+                self._repo_duplicates = 0
+                
+                try:
+                    # 创建单仓库分析器（commit 逐个交给 consume_commit 合并）
+                    analyzer = self._create_analyzer(repo_info, self.consume_commit)
+                    
+                    # 执行单仓库分析（分析器按需保留，用于后续清理或 --watch 刷新）
+                    try:
+                        result = analyzer.analyze()
+                    finally:
+                        self.keep_analyzer(analyzer)
+                    
+                    # 获取仓库名称
+                    repo_name = analyzer.get_project_name()
+                    
+                    # 收集元信息（只保留紧凑记录，完整结果在序列化时重新生成）
+                    record = RepoRecord(repo_name, repo_path, repo_type, result, self._repo_duplicates)
+                    repo_results.append(record)
+                    self.repo_entries.append((record, analyzer if self.watch else None))
+                    
+                    if self._repo_duplicates:
+                        print(f"    ✓ 完成 (commit数: {result['total_count']}，其中 {self._repo_duplicates} 个已在其他仓库出现)")
+                    else:
+                        print(f"    ✓ 完成 (commit数: {result['total_count']})")
+                    
+                except SystemExit:
+                    # 单仓库分析在无 commit 或 git 失败时会直接退出，
+                    # 多仓库模式下只记录为失败，不中断其余仓库
+                    print(f"    ✗ 失败: 无 commit 记录或 Git 命令执行失败", file=sys.stderr)
+                    failed_repos.append({
+                        'path': repo_path,
+                        'error': '无 commit 记录或 Git 命令执行失败'
+                    })
+                    continue
+                except Exception as e:
+                    print(f"    ✗ 失败: {e}", file=sys.stderr)
+                    failed_repos.append({
+                        'path': repo_path,
+                        'error': str(e)
+                    })
+                    continue
+        
+        # 检查是否所有仓库都失败了
+        if not repo_results:
+            if not failed_repos and self.repo_total is None:
+                # --scan 没有产出任何仓库，与「分析失败」区分开
+                print("\n错误: 未发现任何 Git 仓库", file=sys.stderr)
+            else:
+                print("\n错误: 所有仓库分析都失败了", file=sys.stderr)
+            sys.exit(1)
+        
+        # 如果有失败的仓库，显示警告
+        if failed_repos:
+            print(f"\n⚠️  警告: {len(failed_repos)} 个仓库分析失败:")
+            for failed in failed_repos:
+                print(f"   - {failed['path']}: {failed['error']}")
+        
+        return self.build_current_result()
+    
+    def _create_analyzer(self, repo_info, commit_sink):
+        """按仓库类型创建单仓库分析器"""
+        repo_path = repo_info['path']
+        if repo_info['type'] == 'remote':
+            return Code996Analyzer(
+                start_date=self.start_date,
+                end_date=self.end_date,
+                author=self.author,
+                repo_path='.',
+                remote_url=repo_path,
+                period=self.period,
+                commit_sink=commit_sink,
+                windows=self.windows,
+                refs=self.refs,
+                calendar=self.calendar
+            )
+        if repo_info['type'] == 'archive':
+            return ArchiveAnalyzer(
+                repo_path,
+                start_date=self.start_date,
+                end_date=self.end_date,
+                author=self.author,
+                period=self.period,
+                commit_sink=commit_sink,
+                windows=self.windows,
+                calendar=self.calendar
+            )
+        return Code996Analyzer(
+            start_date=self.start_date,
+            end_date=self.end_date,
+            author=self.author,
+            repo_path=repo_path,
+            remote_url=None,
+            period=self.period,
+            commit_sink=commit_sink,
+            windows=self.windows,
+            refs=self.refs,
+            calendar=self.calendar
+        )
+    
+    def _analyze_planned(self, plan, duplicates):
+        """按执行计划分析单个仓库（在线程池中运行）"""
+        analyzer = self._create_analyzer(plan['repo'], functools.partial(self.consume_locked, duplicates))
+        if plan['strategy'] == 'empty':
+            raise ValueError('时间范围内没有 commit（执行计划已跳过）')
+        try:
+            if analyzer.remote_url and plan['cache'] == 'cold':
+                # 克隆后按本地仓库重新探测，大仓库同样可以分片
+                analyzer.clone_remote_repo()
+                plan = plan_repo(probe_repo({'path': analyzer.repo_path, 'type': 'local'},
+                                            self.start_date, self.end_date), self.jobs, refs=self.refs)
+            analyzer.shards = plan['shards']
+            return analyzer, analyzer.analyze()
+        finally:
+            with self._sink_lock:
+                self.keep_analyzer(analyzer)
+    
+    def keep_analyzer(self, analyzer):
+        """保留需要清理临时克隆或 --watch 刷新的分析器，其余分析完即释放"""
+        if self.watch or analyzer.temp_dir:
+            self.analyzers.append(analyzer)
+    
+    def _analyze_parallel(self):
+        """
+        按执行计划并发分析：先探测所有仓库，规模大的先开始，避免大仓库最后才开始成为长尾
+        
+        git 进程在各自的线程中运行，commit 经 consume_locked 串行合并；
+        repo_results 最终按输入顺序排列。--scan 的仓库列表边扫描边提交，按发现顺序调度。
+        """
+        if self.repo_total is None:
+            plans = (plan_repo(probe_repo(repo_info, self.start_date, self.end_date), self.jobs, refs=self.refs)
+                     for repo_info in self.repo_list)
+        else:
+            plans = plan_repos(self.repo_list, self.start_date, self.end_date, self.jobs, refs=self.refs)
+            print(f"执行计划: 并行 {self.jobs}，最大的仓库: {plans[0]['repo']['path']} "
+                  f"({PLAN_STRATEGY_LABELS[plans[0]['strategy']]})\n")
+        order = {}
+        for idx, repo_info in enumerate(self.repo_list if self.repo_total is not None else (), 1):
+            order.setdefault(id(repo_info), idx)
+        
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            futures = {}
+            for seq, plan in enumerate(plans, 1):
+                duplicates = [0]
+                future = pool.submit(self._analyze_planned, plan, duplicates)
+                futures[future] = (order.get(id(plan['repo']), seq), plan, duplicates)
+            
+            done = 0
+            for future in as_completed(futures):
+                idx, plan, duplicates = futures[future]
+                repo_path = plan['repo']['path']
+                done += 1
+                try:
+                    analyzer, result = future.result()
+                except SystemExit:
+                    print(f"[{done}/{len(futures)}] ✗ 失败: {repo_path}: 无 commit 记录或 Git 命令执行失败", file=sys.stderr)
+                    self.failed_repos.append({'path': repo_path, 'error': '无 commit 记录或 Git 命令执行失败'})
+                    continue
+                except Exception as e:
+                    print(f"[{done}/{len(futures)}] ✗ 失败: {repo_path}: {e}", file=sys.stderr)
+                    self.failed_repos.append({'path': repo_path, 'error': str(e)})
+                    continue
+                
+                record = RepoRecord(analyzer.get_project_name(), repo_path, plan['repo']['type'],
+                                    result, duplicates[0])
+                self.repo_entries.append((idx, record, analyzer if self.watch else None))
+                print(f"[{done}/{len(futures)}] ✓ 完成: {repo_path} (commit数: {result['total_count']}"
+                      f"{f'，其中 {duplicates[0]} 个已在其他仓库出现' if duplicates[0] else ''})")
+        
+        self.repo_entries = [(record, analyzer) for _, record, analyzer in sorted(self.repo_entries, key=lambda item: item[0])]
+    
+    def build_current_result(self, changed=()):
+        """
+        根据当前累计的汇总数据构建结果（--watch 模式下每次更新后调用）
+        
+        Args:
+            changed: 统计数据有变化、需要重新计算单仓库结果的分析器
+        """
+        repo_results = []
+        for record, analyzer in self.repo_entries:
+            if analyzer is not None and analyzer in changed:
+                record.update(analyzer.build_full_result())
+            repo_results.append(record)
+        
+        aggregate_result = self.build_aggregate_result(
+            self.merged_histogram, repo_results, len(self.failed_repos),
+            periods=self.merged_periods if self.period else None,
+            day_types=self.merged_day_types if self.calendar else None
+        )
+        
+        if self.windows:
+            aggregate_result['windows'] = [
+                summarize_window(window, self.build_aggregate_result(
+                    bucket, [], 0, start_date=window['start_date'], end_date=window['end_date'],
+                    day_types=day_types if self.calendar else None))
+                for window, bucket, day_types in zip(self.windows, self.merged_windows, self.merged_window_day_types)
+            ]
+        
+        return aggregate_result
+    
+    def recollect(self):
+        """历史被改写时按各仓库当前 HEAD 重新汇总（去重集合一并重建）"""
+        self.merged_histogram = [0] * HISTOGRAM_SIZE
+        self.merged_periods = {}
+        self.merged_windows = [[0] * HISTOGRAM_SIZE for _ in self.windows]
+        self.merged_day_types = [0] * len(DAY_TYPE_LABELS)
+        self.merged_window_day_types = [[0] * len(DAY_TYPE_LABELS) for _ in self.windows]
+        self.duplicate_count = 0
+        if self.dedupe_set is not None:
+            self.dedupe_set.clear()
+        for record, analyzer in self.repo_entries:
+            self._repo_duplicates = 0
+            analyzer.recollect()
+            record.duplicate_count = self._repo_duplicates
+    
+    def consume_locked(self, duplicates, sha, day, index):
+        """并行分析时的 commit_sink：加锁合并，跳过的重复 commit 计入该仓库的 duplicates[0]"""
+        with self._sink_lock:
+            before = self.duplicate_count
+            self.consume_commit(sha, day, index)
+            duplicates[0] += self.duplicate_count - before
+    
+    def consume_commit(self, sha, day, index):
+        """
+        合并单个 commit 到汇总直方图（Code996Analyzer 的 commit_sink 回调）
+        
+        去重模式下已在其他仓库出现过的 commit 直接跳过
+        """
+        digest = None
+        if self.dedupe_set is not None:
+            digest = sha_to_digest(sha)
+            if not self.dedupe_set.add(digest):
+                self.duplicate_count += 1
+                self._repo_duplicates += 1
+                return
+        
+        self.merged_histogram[index] += 1
+        
+        day_type = None
+        if self.calendar is not None:
+            day_type = self.calendar.classify(day)
+            self.merged_day_types[day_type] += 1
+        
+        if self.period:
+            key = period_key(day, self.period)
+            bucket = self.merged_periods.get(key)
+            if bucket is None:
+                bucket = self.merged_periods[key] = [0] * HISTOGRAM_SIZE
+            bucket[index] += 1
+        
+        for window, bucket, day_types in zip(self.windows, self.merged_windows, self.merged_window_day_types):
+            if window['start_date'] <= day <= window['end_date']:
+                bucket[index] += 1
+                if day_type is not None:
+                    day_types[day_type] += 1
+        
+        if self.partial_writer is not None:
+            self.partial_writer.add(digest or sha_to_digest(sha), day, index)
+    
+    def build_aggregate_result(self, merged_histogram, repo_results, failed_count,
+                               periods=None, start_date=None, end_date=None, day_types=None):
+        """
+        根据合并后的 24×7 直方图计算汇总指标（day_types 见 Code996Analyzer.build_result）
+        
+        Returns:
+            dict: 汇总结果字典（结构与单仓库兼容，但新增汇总相关字段）
+        """
+        # 3. 将合并数据转换为标准格式（小时按顺序，星期固定顺序）
+        hour_data, week_data = histogram_to_stats(merged_histogram)
+        
+        # 4. 对合并数据计算汇总指标（复用现有函数）
+        total_count = sum(merged_histogram)
+        
+        # 计算工作时间范围
+        opening_time, closing_time = self.calculate_work_time_range(hour_data)
+        
+        # 计算工作/加班时间
+        work_hour_pl, _, _ = self.calculate_working_time(hour_data, opening_time)
+        
+        # 计算每周工作天数
+        work_days, work_week_pl = self.calculate_week_type(week_data, day_types)
+        
+        # 计算996指数
+        index_996, overtime_ratio, is_standard = self.calculate_996_index(
+            work_hour_pl, work_week_pl, hour_data
+        )
+        
+        # 获取描述
+        description = self.get_index_description(index_996)
+        
+        # 5. 构建汇总结果
+        opening_hour = int(opening_time['time']) if opening_time else None
+        closing_hour = int(closing_time['time']) if closing_time else None
+        
+        aggregate_result = {
+            # 基本信息
+            'start_date': start_date or self.start_date or "2022-01-01",
+            'end_date': end_date or self.end_date or datetime.now().strftime("%Y-%m-%d"),
+            'total_count': total_count,
+            
+            # 统计数据（与单仓库格式一致）
+            'histogram': merged_histogram,
+            'hour_data': hour_data,
+            'week_data': week_data,
+            'work_hour_pl': work_hour_pl,
+            'work_week_pl': work_week_pl,
+            
+            # 工作时间特征
+            'opening_hour': opening_hour,
+            'closing_hour': closing_hour % 12 if closing_hour else None,
+            'work_days': work_days,
+            
+            # 996指标
+            'index_996': index_996,
+            'overtime_ratio': overtime_ratio,
+            'is_standard': is_standard,
+            'description': description,
+            
+            # 多仓库特有字段 ⭐
+            'is_aggregate': True,  # 标记为汇总模式
+            'project_name': self.project_name,
+            'repo_count': len(repo_results),
+            'repo_results': repo_results,
+            'failed_count': failed_count,
+            'dedupe': self.dedupe_set is not None,
+            'duplicate_count': self.duplicate_count
+        }
+        
+        if periods is not None:
+            aggregate_result['period'] = self.period
+            aggregate_result['periods'] = dict(sorted(periods.items()))
+        
+        if day_types is not None:
+            aggregate_result['day_types'] = list(day_types)
+            aggregate_result['calendar'] = self.calendar.describe()
+        
+        return aggregate_result
+    
+    def calculate_work_time_range(self, hour_data):
+        """计算工作时间范围（复用Code996Analyzer的算法）"""
+        if not hour_data:
+            return None, None
+        
+        total_count = sum(item['count'] for item in hour_data)
+        if total_count == 0:
+            return None, None
+        
+        quadratic_value = sum(item['count'] ** 2 for item in hour_data) / len(hour_data)
+        standard_value = math.sqrt(quadratic_value)
+        
+        work_hours = [item for item in hour_data if item['count'] / standard_value >= WORK_TIME_THRESHOLD]
+        
+        opening_data = [item for item in work_hours if 8 <= int(item['time']) <= 12]
+        closing_data = [item for item in work_hours if 17 <= int(item['time']) <= 23]
+        
+        opening_time = min(opening_data, key=lambda x: int(x['time'])) if opening_data else None
+        closing_time = max(closing_data, key=lambda x: int(x['time'])) if closing_data else None
+        
+        return opening_time, closing_time
+    
+    def calculate_working_time(self, hour_data, opening_time):
+        """计算工作时间和加班时间（复用Code996Analyzer的算法）"""
+        if not opening_time or not hour_data:
+            total_count = sum(item['count'] for item in hour_data)
+            working_time = [item for item in hour_data if 9 <= int(item['time']) <= 18]
+            working_else_time = [item for item in hour_data if item not in working_time]
+            
+            working_time_count = sum(item['count'] for item in working_time)
+            working_else_time_count = sum(item['count'] for item in working_else_time)
+            
+            work_hour_pl = [
+                {"time": "工作", "count": working_time_count},
+                {"time": "加班", "count": working_else_time_count}
+            ]
+            return work_hour_pl, working_time_count, working_else_time_count
+        
+        opening_hour = int(opening_time['time'])
+        
+        working_time = [item for item in hour_data if opening_hour <= int(item['time']) <= opening_hour + 9]
+        working_else_time = [item for item in hour_data if item not in working_time]
+        
         working_time_count = sum(item['count'] for item in working_time)
         working_else_time_count = sum(item['count'] for item in working_else_time)
         
@@ -742,14 +3622,18 @@ class MultiRepoAnalyzer:
         
         return work_hour_pl, working_time_count, working_else_time_count
     
-    def calculate_week_type(self, week_data):
+    def calculate_week_type(self, week_data, day_types=None):
         """计算每周工作天数（复用Code996Analyzer的算法）"""
         total_count = sum(item['count'] for item in week_data)
         if total_count == 0:
             return 5, []
         
-        workday_count = sum(week_data[i]['count'] for i in range(5))
-        weekend_count = sum(week_data[i]['count'] for i in range(5, 7))
+        holiday_count = None
+        if day_types is not None:
+            workday_count, weekend_count, holiday_count = day_types
+        else:
+            workday_count = sum(week_data[i]['count'] for i in range(5))
+            weekend_count = sum(week_data[i]['count'] for i in range(5, 7))
         
         workday_ratio = (workday_count / total_count) * 100
         
@@ -762,119 +3646,1526 @@ class MultiRepoAnalyzer:
         elif workday_ratio >= 72:
             work_days = 7
         else:
-            work_days = 7
-        
-        work_week_pl = [
-            {"time": "工作日", "count": workday_count},
-            {"time": "周末", "count": weekend_count}
-        ]
-        
-        return work_days, work_week_pl
+            work_days = 7
+        
+        work_week_pl = [
+            {"time": "工作日", "count": workday_count},
+            {"time": "周末", "count": weekend_count}
+        ]
+        if holiday_count is not None:
+            work_week_pl.append({"time": "节假日", "count": holiday_count})
+        
+        return work_days, work_week_pl
+    
+    def calculate_996_index(self, work_hour_pl, work_week_pl, hour_data):
+        """计算996指数（复用Code996Analyzer的算法）"""
+        if not work_hour_pl or len(work_hour_pl) < 2 or not work_week_pl or len(work_week_pl) < 2:
+            return 0, 0, False
+        
+        y = work_hour_pl[0]['count']
+        x = work_hour_pl[1]['count']
+        m = work_week_pl[0]['count']
+        n = sum(item['count'] for item in work_week_pl[1:])
+        
+        total_count = y + x
+        if total_count == 0:
+            return 0, 0, False
+        
+        overtime_amend_count = round(x + (y * n) / (m + n) if (m + n) > 0 else x)
+        overtime_ratio = math.ceil((overtime_amend_count / total_count) * 100)
+        
+        if overtime_ratio == 0 and len(hour_data) < 9:
+            average_commit = total_count / len(hour_data) if len(hour_data) > 0 else 0
+            mock_total_count = average_commit * 9
+            if mock_total_count > 0:
+                overtime_ratio = math.ceil((total_count / mock_total_count) * 100) - 100
+        
+        index_996 = overtime_ratio * 3
+        
+        # 多仓库汇总通常commit数量较多，is_standard判断更宽松
+        is_standard = index_996 < 200 and total_count > 30
+        
+        return index_996, overtime_ratio, is_standard
+    
+    def get_index_description(self, index_996):
+        """根据996指数返回描述（复用Code996Analyzer的逻辑）"""
+        if index_996 <= 10:
+            return '令人羡慕的工作'
+        elif 10 < index_996 <= 50:
+            return '你还有剩余价值'
+        elif 50 < index_996 <= 90:
+            return '加油，老板的法拉利靠你了'
+        elif 90 < index_996 <= 110:
+            return '你的福报已经修满了'
+        else:
+            return '你们想必就是卷王中的卷王吧'
+    
+    def cleanup(self):
+        """清理所有分析器的临时文件"""
+        for analyzer in self.analyzers:
+            try:
+                analyzer.cleanup()
+            except Exception as e:
+                print(f"警告: 清理临时文件失败: {e}", file=sys.stderr)
+
+
+# map/reduce 中间结果文件格式
+# gzip 压缩：第一行为 JSON 头（汇总直方图、周期直方图、仓库元信息），
+# 其后是定长二进制记录：20 字节 commit 摘要 + 1 字节 24×7 下标 + 4 字节有符号日期（1970 起天数，之前为负数）
+PARTIAL_FORMAT = 'code996-partial'
+PARTIAL_VERSION = 1
+PARTIAL_RECORD = struct.Struct('<20sBi')
+PARTIAL_SUFFIX = '.c996'
+
+
+class PartialWriter:
+    """
+    map 模式的中间结果写入器
+    
+    commit 记录先写入临时文件，分析结束后与 JSON 头一起压缩写出，
+    写出过程先写临时文件再原子替换，避免留下半个文件。
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.record_count = 0
+        self._spool = tempfile.TemporaryFile()
+    
+    def add(self, digest, day, index):
+        """记录一个计入汇总的 commit"""
+        self._spool.write(PARTIAL_RECORD.pack(digest[:20], index, day_to_number(day)))
+        self.record_count += 1
+    
+    def close(self, result, author=None):
+        """写出中间结果文件"""
+        header = {
+            'format': PARTIAL_FORMAT,
+            'version': PARTIAL_VERSION,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'project_name': result['project_name'],
+            'start_date': result['start_date'],
+            'end_date': result['end_date'],
+            'author': author or '',
+            'dedupe': result.get('dedupe', False),
+            'duplicate_count': result.get('duplicate_count', 0),
+            'failed_count': result.get('failed_count', 0),
+            'total_count': result['total_count'],
+            'histogram': result['histogram'],
+            'period': result.get('period'),
+            'periods': result.get('periods'),
+            'repos': [
+                {
+                    'name': repo.name,
+                    'path': repo.path,
+                    'type': repo.type,
+                    'total_count': repo.total_count,
+                    'index_996': repo.index_996,
+                    'overtime_ratio': repo.overtime_ratio,
+                    'histogram': list(repo.histogram),
+                }
+                for repo in result['repo_results']
+            ],
+            'record_count': self.record_count,
+        }
+        
+        output_dir = os.path.dirname(self.path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            f.write(b'\n')
+            self._spool.seek(0)
+            shutil.copyfileobj(self._spool, f)
+        os.replace(tmp_path, self.path)
+        self._spool.close()
+        return self.path
+
+
+def expand_partial_paths(paths):
+    """展开 --reduce 参数：目录下所有 .c996 文件 + 直接指定的文件"""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(PARTIAL_SUFFIX):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def read_partial_header(f, path):
+    """读取并校验中间结果文件的 JSON 头"""
+    try:
+        header = json.loads(f.readline().decode('utf-8'))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"无法解析中间结果文件 {path}: {e}")
+    if header.get('format') != PARTIAL_FORMAT:
+        raise ValueError(f"不是 code996 中间结果文件: {path}")
+    if header.get('version', 0) > PARTIAL_VERSION:
+        raise ValueError(f"中间结果文件版本过新 (v{header['version']}): {path}")
+    return header
+
+
+def reduce_partials(paths, project_name=None, dedupe_set=None):
+    """
+    流式合并多个 map 中间结果文件
+    
+    每次只打开一个文件；不去重时只读取 JSON 头，
+    去重时顺序读取二进制记录并通过去重集合重新累加。
+    
+    Returns:
+        dict: 与 MultiRepoAnalyzer.analyze() 相同结构的汇总结果
+    """
+    merged_histogram = [0] * HISTOGRAM_SIZE
+    merged_periods = {}
+    repo_results = []
+    calculator = Code996Analyzer()  # 由仓库直方图重新计算完整指标
+    failed_count = 0
+    duplicate_count = 0
+    partial_count = 0
+    period = None
+    start_dates, end_dates, authors = set(), set(), set()
+    chunk_size = PARTIAL_RECORD.size * 65536
+    
+    for path in expand_partial_paths(paths):
+        with gzip.open(path, 'rb') as f:
+            header = read_partial_header(f, path)
+            partial_count += 1
+            print(f"[{partial_count}] 合并中间结果: {path} ({header['total_count']} commits)")
+            
+            if partial_count == 1:
+                period = header.get('period')
+            elif header.get('period') != period:
+                raise ValueError(f"中间结果的周期粒度不一致: {path} ({header.get('period')} != {period})")
+            
+            start_dates.add(header['start_date'])
+            end_dates.add(header['end_date'])
+            authors.add(header.get('author', ''))
+            failed_count += header.get('failed_count', 0)
+            duplicate_count += header.get('duplicate_count', 0)
+            
+            if dedupe_set is None:
+                for index, count in enumerate(header['histogram']):
+                    merged_histogram[index] += count
+                for key, bucket in (header.get('periods') or {}).items():
+                    merged = merged_periods.setdefault(key, [0] * HISTOGRAM_SIZE)
+                    for index, count in enumerate(bucket):
+                        merged[index] += count
+            else:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    for digest, index, day_number in PARTIAL_RECORD.iter_unpack(chunk):
+                        if not dedupe_set.add(digest):
+                            duplicate_count += 1
+                            continue
+                        merged_histogram[index] += 1
+                        if period:
+                            key = period_key(number_to_day(day_number), period)
+                            merged = merged_periods.setdefault(key, [0] * HISTOGRAM_SIZE)
+                            merged[index] += 1
+            
+            for repo in header['repos']:
+                repo_result = calculator.build_result(repo['histogram'], header['start_date'], header['end_date'])
+                repo_results.append(RepoRecord(repo['name'], repo['path'], repo['type'], repo_result,
+                                               duplicate_count=None, partial=path))
+    
+    if partial_count == 0:
+        print("错误: 没有找到任何中间结果文件", file=sys.stderr)
+        sys.exit(1)
+    
+    if len(authors) > 1:
+        print(f"⚠️  警告: 中间结果的作者过滤条件不一致: {sorted(authors)}", file=sys.stderr)
+    
+    reducer = MultiRepoAnalyzer(
+        repo_list=[],
+        project_name=project_name or f"reduce-{partial_count}-partials",
+        dedupe_set=dedupe_set,
+        period=period
+    )
+    reducer.duplicate_count = duplicate_count
+    result = reducer.build_aggregate_result(
+        merged_histogram, repo_results, failed_count,
+        periods=merged_periods if period else None,
+        start_date=min(start_dates),
+        end_date=max(end_dates)
+    )
+    result['partial_count'] = partial_count
+    return result
+
+
+# 本地 commit 事件库（SQLite）：一次导入，之后的切片查询只执行聚合 SQL，不再访问 git
+EVENT_STORE_VERSION = 1
+EVENT_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS repos (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    head TEXT,
+    ingested_at TEXT
+);
+CREATE TABLE IF NOT EXISTS authors (
+    id INTEGER PRIMARY KEY,
+    ident TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS commits (
+    repo_id INTEGER NOT NULL,
+    sha BLOB NOT NULL,
+    author_id INTEGER NOT NULL,
+    epoch INTEGER NOT NULL,
+    tz_offset INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    PRIMARY KEY (repo_id, sha)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS commits_day ON commits (day, bucket);
+CREATE INDEX IF NOT EXISTS commits_author ON commits (author_id, day, bucket);
+CREATE TABLE IF NOT EXISTS bucket_counts (
+    repo_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (repo_id, author_id, day, bucket)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bucket_counts_day ON bucket_counts (day, bucket, n);
+CREATE INDEX IF NOT EXISTS bucket_counts_author ON bucket_counts (author_id, day, bucket, n);
+CREATE TABLE IF NOT EXISTS repo_months (
+    repo_id INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    histogram BLOB NOT NULL,
+    PRIMARY KEY (repo_id, month)
+) WITHOUT ROWID;
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def day_to_month(number):
+    """天数 -> 月序号（year * 12 + month - 1）"""
+    day = date.fromordinal(number + EPOCH_ORDINAL)
+    return day.year * 12 + day.month - 1
+
+
+def month_first_day(month):
+    """月序号 -> 该月第一天的天数"""
+    return date(month // 12, month % 12 + 1, 1).toordinal() - EPOCH_ORDINAL
+
+
+def parse_tz_offset(value):
+    """+0800 -> 480（分钟）"""
+    minutes = int(value[1:3]) * 60 + int(value[3:5])
+    return -minutes if value[0] == '-' else minutes
+
+
+def iter_commit_events(repo_path, revs):
+    """
+    流式读取 commit 事件（不做时间/作者过滤）
+    
+    Yields:
+        tuple: (sha, epoch, tz_offset 分钟, 作者 "Name <email>")
+    """
+    # --date=raw 输出 "时间戳 时区"：按作者本地时间早于 1970 的 commit，git 拒绝按 format: 格式化
+    cmd = ["git", "-C", repo_path, "log", "--format=%H %ad %aN <%aE>", "--date=raw", *revs]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, encoding='utf-8', errors='replace')
+    try:
+        for line in process.stdout:
+            parts = line.rstrip('\n').split(' ', 3)
+            if len(parts) != 4:
+                continue
+            yield parts[0], int(parts[1]), parse_tz_offset(parts[2]), parts[3]
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        returncode = process.wait()
+    
+    if returncode != 0:
+        raise RuntimeError(f"Git命令执行失败: {stderr.strip()}")
+
+
+def event_bucket(epoch, tz_offset):
+    """
+    按作者本地时间计算 (天数, 直方图下标)，与 git log --date=format: 的结果一致
+    
+    1970-01-01 是周四，(day + 3) % 7 即为周一起算的星期下标
+    """
+    local = epoch + tz_offset * 60
+    day = local // 86400
+    return day, ((day + 3) % DAYS_PER_WEEK) * HOURS_PER_DAY + (local % 86400) // 3600
+
+
+# 发布到 git notes 的逐日直方图
+# note 挂在统计时的 HEAD 上，覆盖范围为该 commit 可达的全部 commit（不限时间、不按作者过滤）。
+# 第一行为 JSON 头，第二行为 base64(定长记录)：4 字节有符号日期（1970 起天数，作者本地时间，
+# 1970 年以前为负数）+ 1 字节 24×7 下标 + 4 字节 commit 数，按 (日期, 下标) 排序，只记录非零的桶。
+# 不再额外压缩：git 对象本身是 zlib 压缩的，相邻两次发布的内容前缀相同，打包时可以互为 delta
+NOTES_REF = 'refs/notes/code996'
+NOTES_FORMAT = 'code996-notes'
+NOTES_VERSION = 1
+NOTES_RECORD = struct.Struct('<iBI')
+NOTES_IDENTITY = ["-c", "user.name=code996", "-c", "user.email=code996@localhost"]
+
+
+def encode_day_histograms(tip, days):
+    """逐日直方图 {天数: {下标: commit 数}} -> git notes 文本"""
+    records = bytearray()
+    total = 0
+    for day in sorted(days):
+        for index, count in sorted(days[day].items()):
+            records += NOTES_RECORD.pack(day, index, count)
+            total += count
+    header = {
+        'format': NOTES_FORMAT,
+        'version': NOTES_VERSION,
+        'tip': tip,
+        'commit_count': total,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    payload = base64.b64encode(bytes(records)).decode('ascii')
+    return json.dumps(header, separators=(',', ':')) + '\n' + payload + '\n'
+
+
+def decode_day_histograms(text):
+    """
+    解析 git notes 文本
+    
+    Returns:
+        tuple: (JSON 头, {天数: {下标: commit 数}})；格式不符或版本过新时为 None
+    """
+    lines = text.split('\n')
+    try:
+        header = json.loads(lines[0])
+        records = base64.b64decode(lines[1], validate=True)
+    except (IndexError, ValueError):
+        return None
+    if (not isinstance(header, dict) or header.get('format') != NOTES_FORMAT
+            or header.get('version', 0) > NOTES_VERSION or len(records) % NOTES_RECORD.size):
+        return None
+    days = {}
+    for day, index, count in NOTES_RECORD.iter_unpack(records):
+        if index < HISTOGRAM_SIZE:
+            days.setdefault(day, {})[index] = count
+    return header, days
+
+
+class CommitEventStore:
+    """
+    本地 SQLite commit 事件库
+    
+    commits 表保存每个 commit 事件 (repo, sha, author, epoch, tz)，
+    bucket_counts 表按 (仓库, 作者, 天, 直方图下标) 预聚合，
+    repo_months 表保存每个仓库逐月累计的直方图：不按作者过滤时，
+    整月部分只需每个仓库两行累计值相减，首尾不足一月的部分再查 bucket_counts，
+    因此查询开销与 commit 总数无关；去重查询走 commits 表的覆盖索引。
+    导入按仓库 HEAD 增量进行：HEAD 未变化时不运行 git log，
+    快进时只读取 `git log 新HEAD --not 旧HEAD`，历史被改写时整库重新导入。
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        db_dir = os.path.dirname(path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > EVENT_STORE_VERSION:
+            raise ValueError(f"事件库版本过新 (v{version}): {path}")
+        self.conn.executescript(EVENT_STORE_SCHEMA)
+        self.conn.execute(f"PRAGMA user_version={EVENT_STORE_VERSION}")
+        self._author_ids = None
+    
+    def close(self):
+        self.conn.execute("PRAGMA optimize")
+        self.conn.close()
+    
+    def author_id(self, ident):
+        """作者标识 -> id（不存在时插入）"""
+        if self._author_ids is None:
+            self._author_ids = dict(self.conn.execute("SELECT ident, id FROM authors"))
+        author_id = self._author_ids.get(ident)
+        if author_id is None:
+            author_id = self.conn.execute("INSERT INTO authors (ident) VALUES (?)", (ident,)).lastrowid
+            self._author_ids[ident] = author_id
+        return author_id
+    
+    def ingest_repo(self, key, repo_path, name, repo_type):
+        """
+        增量导入单个仓库
+        
+        Args:
+            key: 仓库在库中的标识（本地仓库为绝对路径，远程仓库为 URL）
+            repo_path: 实际运行 git 的路径
+        
+        Returns:
+            tuple: (新增 commit 数, 导入方式 'unchanged'/'incremental'/'full')
+        """
+        head_cmd = ["git", "-C", repo_path, "rev-parse", "--verify", "-q", "HEAD"]
+        head = subprocess.run(head_cmd, capture_output=True, text=True, check=False).stdout.strip()
+        if not head:
+            raise RuntimeError("仓库没有任何 commit")
+        
+        row = self.conn.execute("SELECT id, head FROM repos WHERE path = ?", (key,)).fetchone()
+        if row and row[1] == head:
+            self.conn.execute("UPDATE repos SET name = ? WHERE id = ?", (name, row[0]))
+            self.conn.commit()
+            return 0, 'unchanged'
+        
+        mode = 'full'
+        revs = [head]
+        if row and row[1]:
+            ancestor_cmd = ["git", "-C", repo_path, "merge-base", "--is-ancestor", row[1], head]
+            if subprocess.run(ancestor_cmd, capture_output=True, check=False).returncode == 0:
+                mode = 'incremental'
+                revs = [head, '--not', row[1]]
+        
+        with self.conn:
+            if row is None:
+                repo_id = self.conn.execute(
+                    "INSERT INTO repos (path, name, type) VALUES (?, ?, ?)", (key, name, repo_type)).lastrowid
+            else:
+                repo_id = row[0]
+                if mode == 'full':
+                    # 历史被改写（或上次导入不完整）：清空后重新导入
+                    self.conn.execute("DELETE FROM commits WHERE repo_id = ?", (repo_id,))
+                    self.conn.execute("DELETE FROM bucket_counts WHERE repo_id = ?", (repo_id,))
+            
+            batch = []
+            added = 0
+            for sha, epoch, tz_offset, ident in iter_commit_events(repo_path, revs):
+                author_id = self.author_id(ident)
+                day, bucket = event_bucket(epoch, tz_offset)
+                batch.append((repo_id, sha_to_digest(sha), author_id, epoch, tz_offset, day, bucket))
+                if len(batch) >= 10000:
+                    added += self._insert_commits(batch)
+                    batch.clear()
+            added += self._insert_commits(batch)
+            self._rebuild_repo_months(repo_id)
+            self.conn.execute(
+                "UPDATE repos SET name = ?, type = ?, head = ?, ingested_at = ? WHERE id = ?",
+                (name, repo_type, head, datetime.now().isoformat(timespec='seconds'), repo_id)
+            )
+        return added, mode
+    
+    def _insert_commits(self, batch):
+        """
+        写入一批 commit 事件，只把实际新增的 commit 计入 bucket_counts
+        
+        先写入临时表并去掉 commits 中已有的行，预聚合与 commits 表始终一致
+        
+        Returns:
+            int: 实际新增的 commit 数
+        """
+        if not batch:
+            return 0
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS ingest_batch ("
+                          "repo_id INTEGER, sha BLOB, author_id INTEGER, epoch INTEGER, tz_offset INTEGER, "
+                          "day INTEGER, bucket INTEGER, PRIMARY KEY (repo_id, sha)) WITHOUT ROWID")
+        self.conn.execute("DELETE FROM ingest_batch")
+        self.conn.executemany("INSERT OR IGNORE INTO ingest_batch VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+        self.conn.execute("DELETE FROM ingest_batch WHERE EXISTS (SELECT 1 FROM commits "
+                          "WHERE commits.repo_id = ingest_batch.repo_id AND commits.sha = ingest_batch.sha)")
+        changes = self.conn.total_changes
+        self.conn.execute("INSERT INTO commits SELECT * FROM ingest_batch")
+        added = self.conn.total_changes - changes
+        self.conn.execute(
+            "INSERT INTO bucket_counts SELECT repo_id, author_id, day, bucket, COUNT(*) FROM ingest_batch WHERE 1 "
+            "GROUP BY repo_id, author_id, day, bucket "
+            "ON CONFLICT (repo_id, author_id, day, bucket) DO UPDATE SET n = n + excluded.n"
+        )
+        return added
+    
+    def _rebuild_repo_months(self, repo_id):
+        """重建仓库的逐月累计直方图"""
+        months = {}
+        for day, bucket, count in self.conn.execute(
+                "SELECT day, bucket, SUM(n) FROM bucket_counts WHERE repo_id = ? GROUP BY day, bucket", (repo_id,)):
+            month = day_to_month(day)
+            histogram = months.get(month)
+            if histogram is None:
+                histogram = months[month] = [0] * HISTOGRAM_SIZE
+            histogram[bucket] += count
+        
+        cumulative = [0] * HISTOGRAM_SIZE
+        rows = []
+        for month in sorted(months):
+            cumulative = [total + count for total, count in zip(cumulative, months[month])]
+            rows.append((repo_id, month, array('q', cumulative).tobytes()))
+        self.conn.execute("DELETE FROM repo_months WHERE repo_id = ?", (repo_id,))
+        self.conn.executemany("INSERT INTO repo_months VALUES (?, ?, ?)", rows)
+    
+    def ingest(self, repo_list):
+        """
+        导入仓库列表（远程仓库先克隆到 online_project）
+        
+        Returns:
+            tuple: (成功仓库数, 新增 commit 数, 失败仓库数)
+        """
+        ingested = total_added = failed = 0
+        for idx, repo_info in enumerate(repo_list, 1):
+            repo_path = repo_info['path']
+            print(f"[{idx}] 导入仓库: {repo_path}")
+            analyzer = None
+            if repo_info['type'] == 'archive':
+                print("    ✗ 跳过: 事件库不支持归档仓库，请直接用 --repo 分析", file=sys.stderr)
+                failed += 1
+                continue
+            try:
+                if repo_info['type'] == 'remote':
+                    analyzer = Code996Analyzer(repo_path='.', remote_url=repo_path)
+                    analyzer.clone_remote_repo()
+                    key = repo_path
+                else:
+                    analyzer = Code996Analyzer(repo_path=repo_path)
+                    key = os.path.abspath(repo_path)
+                added, mode = self.ingest_repo(key, analyzer.repo_path, analyzer.get_project_name(), repo_info['type'])
+            except SystemExit:
+                print("    ✗ 失败: 克隆失败", file=sys.stderr)
+                failed += 1
+                continue
+            except Exception as e:
+                print(f"    ✗ 失败: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            finally:
+                if analyzer:
+                    analyzer.cleanup()
+            ingested += 1
+            total_added += added
+            if mode == 'unchanged':
+                print("    ✓ 无变化")
+            else:
+                print(f"    ✓ {'增量' if mode == 'incremental' else '全量'}导入 {added} 个 commit")
+        return ingested, total_added, failed
+    
+    def _prepare_filters(self, repo_specs, author):
+        """
+        将仓库/作者过滤条件写入临时表，返回 (SQL 条件, 参数, {repo_id: 请求的仓库标识})
+        """
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS query_repos (id INTEGER PRIMARY KEY)")
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS query_authors (id INTEGER PRIMARY KEY)")
+        self.conn.execute("DELETE FROM query_repos")
+        self.conn.execute("DELETE FROM query_authors")
+        
+        repo_rows = self.conn.execute("SELECT id, path, name, type FROM repos").fetchall()
+        if repo_specs is None:
+            requested = {repo_id: path for repo_id, path, _, _ in repo_rows}
+        else:
+            by_path = {path: repo_id for repo_id, path, _, _ in repo_rows}
+            by_name = defaultdict(list)
+            for repo_id, _, name, _ in repo_rows:
+                by_name[name].append(repo_id)
+            requested = {}
+            for repo_info in repo_specs:
+                spec = repo_info['path']
+                key = spec if repo_info['type'] == 'remote' else os.path.abspath(spec)
+                matched = [by_path[key]] if key in by_path else by_name.get(spec, [])
+                if not matched:
+                    print(f"⚠️  警告: 事件库中没有该仓库，请先使用 --ingest 导入: {spec}", file=sys.stderr)
+                for repo_id in matched:
+                    requested.setdefault(repo_id, spec)
+        self.conn.executemany("INSERT INTO query_repos VALUES (?)", [(repo_id,) for repo_id in requested])
+        
+        # 查询全部仓库时不加仓库条件，避免查询计划按主键逐仓库扫描全部天数
+        conditions = ["repo_id IN (SELECT id FROM query_repos)"] if repo_specs is not None else ["1"]
+        if author:
+            # 与 git log --author 一致：正则匹配 "Name <email>"
+            pattern = re.compile(author)
+            author_ids = [(author_id,) for ident, author_id in self.conn.execute("SELECT ident, id FROM authors")
+                          if pattern.search(ident)]
+            self.conn.executemany("INSERT INTO query_authors VALUES (?)", author_ids)
+            conditions.append("author_id IN (SELECT id FROM query_authors)")
+        
+        names = {repo_id: (name, repo_type) for repo_id, _, name, repo_type in repo_rows}
+        return ' AND '.join(conditions), requested, names
     
-    def calculate_996_index(self, work_hour_pl, work_week_pl, hour_data):
-        """计算996指数（复用Code996Analyzer的算法）"""
-        if not work_hour_pl or len(work_hour_pl) < 2 or not work_week_pl or len(work_week_pl) < 2:
-            return 0, 0, False
+    def _cumulative_histograms(self, month):
+        """每个待查询仓库截至 month（含）的累计直方图"""
+        return {
+            repo_id: array('q', blob)
+            for repo_id, blob in self.conn.execute(
+                "SELECT repo_id, histogram FROM repo_months WHERE (repo_id, month) IN ("
+                "SELECT repo_id, MAX(month) FROM repo_months "
+                "WHERE month <= ? AND repo_id IN (SELECT id FROM query_repos) GROUP BY repo_id)", (month,))
+        }
+    
+    def _range_histograms(self, first_day, last_day, condition, use_months):
+        """
+        日期范围内每个仓库的直方图
         
-        y = work_hour_pl[0]['count']
-        x = work_hour_pl[1]['count']
-        m = work_week_pl[0]['count']
-        n = work_week_pl[1]['count']
+        use_months 为 True（无作者过滤）时，整月部分用 repo_months 的累计值相减，
+        只有首尾不足一月的天数查询 bucket_counts
+        """
+        histograms = {}
+        edges = [(first_day, last_day)]
+        if use_months:
+            first_month = day_to_month(first_day)
+            if month_first_day(first_month) != first_day:
+                first_month += 1
+            last_month = day_to_month(last_day + 1) - 1
+            if first_month <= last_month:
+                edges = [(first_day, month_first_day(first_month) - 1), (month_first_day(last_month + 1), last_day)]
+                before = self._cumulative_histograms(first_month - 1)
+                for repo_id, upper in self._cumulative_histograms(last_month).items():
+                    lower = before.get(repo_id)
+                    histogram = list(upper) if lower is None else [a - b for a, b in zip(upper, lower)]
+                    if any(histogram):
+                        histograms[repo_id] = histogram
+        
+        for edge_start, edge_end in edges:
+            if edge_start > edge_end:
+                continue
+            for repo_id, bucket, count in self.conn.execute(
+                    f"SELECT repo_id, bucket, SUM(n) FROM bucket_counts "
+                    f"WHERE day BETWEEN ? AND ? AND {condition} GROUP BY repo_id, bucket", (edge_start, edge_end)):
+                histogram = histograms.get(repo_id)
+                if histogram is None:
+                    histogram = histograms[repo_id] = [0] * HISTOGRAM_SIZE
+                histogram[bucket] += count
+        return histograms
+    
+    def _period_histograms(self, first_day, last_day, condition, period, use_months):
+        """
+        日期范围内每个仓库按周期的直方图 {repo_id: {周期: histogram}}
         
-        total_count = y + x
-        if total_count == 0:
-            return 0, 0, False
+        按月统计且无作者过滤时，整月部分由相邻月份的累计值相减得到，
+        其余情况（以及首尾不足一月的天数）逐天查询 bucket_counts
+        """
+        periods = defaultdict(dict)
+        edges = [(first_day, last_day)]
+        if period == 'month' and use_months:
+            first_month = day_to_month(first_day)
+            if month_first_day(first_month) != first_day:
+                first_month += 1
+            last_month = day_to_month(last_day + 1) - 1
+            if first_month <= last_month:
+                edges = [(first_day, month_first_day(first_month) - 1), (month_first_day(last_month + 1), last_day)]
+                previous = self._cumulative_histograms(first_month - 1)
+                for repo_id, month, blob in self.conn.execute(
+                        "SELECT repo_id, month, histogram FROM repo_months "
+                        "WHERE month BETWEEN ? AND ? AND repo_id IN (SELECT id FROM query_repos) "
+                        "ORDER BY repo_id, month", (first_month, last_month)):
+                    cumulative = array('q', blob)
+                    lower = previous.get(repo_id)
+                    periods[repo_id][f"{month // 12:04d}-{month % 12 + 1:02d}"] = (
+                        list(cumulative) if lower is None else [a - b for a, b in zip(cumulative, lower)])
+                    previous[repo_id] = cumulative
+        
+        for edge_start, edge_end in edges:
+            if edge_start > edge_end:
+                continue
+            for repo_id, day, bucket, count in self.conn.execute(
+                    f"SELECT repo_id, day, bucket, SUM(n) FROM bucket_counts "
+                    f"WHERE day BETWEEN ? AND ? AND {condition} GROUP BY repo_id, day, bucket", (edge_start, edge_end)):
+                buckets = periods[repo_id]
+                key = period_key(number_to_day(day), period)
+                histogram = buckets.get(key)
+                if histogram is None:
+                    histogram = buckets[key] = [0] * HISTOGRAM_SIZE
+                histogram[bucket] += count
+        return periods
+    
+    def _distinct_histogram(self, first_day, last_day, condition):
+        """日期范围内按 SHA 去重的汇总直方图（同一 commit 在各仓库中的下标相同）"""
+        histogram = [0] * HISTOGRAM_SIZE
+        for bucket, count in self.conn.execute(
+                f"SELECT bucket, COUNT(DISTINCT sha) FROM commits "
+                f"WHERE day BETWEEN ? AND ? AND {condition} GROUP BY bucket", (first_day, last_day)):
+            histogram[bucket] = count
+        return histogram
+    
+    def query(self, start_date=None, end_date=None, author=None, repo_specs=None, project_name=None,
+              dedupe=False, period=None, windows=None):
+        """
+        用聚合 SQL 回答与 MultiRepoAnalyzer.analyze() 等价的查询（不访问 git）
         
-        overtime_amend_count = round(x + (y * n) / (m + n) if (m + n) > 0 else x)
-        overtime_ratio = math.ceil((overtime_amend_count / total_count) * 100)
+        日期按作者本地时间的日期过滤（与报告中的小时/星期统计口径一致），起止日期均包含在内。
         
-        if overtime_ratio == 0 and len(hour_data) < 9:
-            average_commit = total_count / len(hour_data) if len(hour_data) > 0 else 0
-            mock_total_count = average_commit * 9
-            if mock_total_count > 0:
-                overtime_ratio = math.ceil((total_count / mock_total_count) * 100) - 100
+        Args:
+            repo_specs: 仓库列表（按绝对路径/URL 或仓库名匹配），None 表示库中全部仓库
+            dedupe: 跨仓库按 SHA 去重
         
-        index_996 = overtime_ratio * 3
+        Returns:
+            tuple: (与 MultiRepoAnalyzer.analyze() 相同结构的汇总结果, 计算指标用的 MultiRepoAnalyzer)
+        """
+        start_date = start_date or "2022-01-01"
+        end_date = end_date or datetime.now().strftime("%Y-%m-%d")
+        windows = windows or []
+        condition, requested, names = self._prepare_filters(repo_specs, author)
+        first_day, last_day = day_to_number(start_date), day_to_number(end_date)
+        
+        repo_histograms = self._range_histograms(first_day, last_day, condition, not author)
+        if dedupe:
+            merged_histogram = self._distinct_histogram(first_day, last_day, condition)
+        else:
+            merged_histogram = [0] * HISTOGRAM_SIZE
+            for histogram in repo_histograms.values():
+                for index, count in enumerate(histogram):
+                    merged_histogram[index] += count
+        duplicate_count = sum(sum(h) for h in repo_histograms.values()) - sum(merged_histogram)
+        
+        # 按周期统计
+        repo_periods = self._period_histograms(first_day, last_day, condition, period, not author) if period else {}
+        merged_periods = {}
+        if period and dedupe:
+            for day, bucket, count in self.conn.execute(
+                    f"SELECT day, bucket, COUNT(DISTINCT sha) FROM commits "
+                    f"WHERE day BETWEEN ? AND ? AND {condition} GROUP BY day, bucket", (first_day, last_day)):
+                merged = merged_periods.setdefault(period_key(number_to_day(day), period), [0] * HISTOGRAM_SIZE)
+                merged[bucket] += count
+        elif period:
+            for buckets in repo_periods.values():
+                for key, histogram in buckets.items():
+                    merged = merged_periods.setdefault(key, [0] * HISTOGRAM_SIZE)
+                    for index, count in enumerate(histogram):
+                        merged[index] += count
+        
+        window_histograms = []
+        for window in windows:
+            window_first, window_last = day_to_number(window['start_date']), day_to_number(window['end_date'])
+            if dedupe:
+                window_histograms.append(self._distinct_histogram(window_first, window_last, condition))
+                continue
+            merged = [0] * HISTOGRAM_SIZE
+            for histogram in self._range_histograms(window_first, window_last, condition, not author).values():
+                for index, count in enumerate(histogram):
+                    merged[index] += count
+            window_histograms.append(merged)
+        
+        calculator = Code996Analyzer(start_date=start_date, end_date=end_date)
+        repo_results = []
+        for repo_id, spec in requested.items():
+            histogram = repo_histograms.get(repo_id)
+            if histogram is None:
+                continue
+            result = calculator.build_result(histogram)
+            if period:
+                result['period'] = period
+                result['periods'] = dict(sorted(repo_periods.get(repo_id, {}).items()))
+            name, repo_type = names[repo_id]
+            repo_results.append(RepoRecord(name, spec, repo_type, result))
         
-        # 多仓库汇总通常commit数量较多，is_standard判断更宽松
-        is_standard = index_996 < 200 and total_count > 30
+        if not repo_results:
+            print("错误: 事件库中没有符合条件的 commit 记录", file=sys.stderr)
+            sys.exit(1)
         
-        return index_996, overtime_ratio, is_standard
+        aggregator = MultiRepoAnalyzer(
+            repo_list=[{'path': spec, 'type': names[repo_id][1]} for repo_id, spec in requested.items()],
+            start_date=start_date, end_date=end_date, author=author, project_name=project_name,
+            dedupe_set=set() if dedupe else None, period=period, windows=windows
+        )
+        aggregator.duplicate_count = duplicate_count
+        result = aggregator.build_aggregate_result(
+            merged_histogram, repo_results, 0, periods=merged_periods if period else None
+        )
+        if windows:
+            result['windows'] = [
+                summarize_window(window, aggregator.build_aggregate_result(
+                    bucket, [], 0, start_date=window['start_date'], end_date=window['end_date']))
+                for window, bucket in zip(windows, window_histograms)
+            ]
+        return result, aggregator
+
+
+def _new_hierarchy_node(name):
+    return {'name': name, 'children': [], 'repos': []}
+
+
+def _build_hierarchy_node(name, data):
+    """将 JSON/YAML 结构转换为层级节点：dict 为下级分组，list 为仓库（可混合分组）"""
+    node = _new_hierarchy_node(name)
+    if isinstance(data, dict):
+        for child_name, child_data in data.items():
+            node['children'].append(_build_hierarchy_node(str(child_name), child_data))
+    elif isinstance(data, list):
+        for item in data:
+            if isinstance(item, dict):
+                for child_name, child_data in item.items():
+                    node['children'].append(_build_hierarchy_node(str(child_name), child_data))
+            elif item:
+                node['repos'].append(str(item).strip())
+    elif data:
+        node['repos'].append(str(data).strip())
+    return node
+
+
+def _load_hierarchy_csv(f):
+    """
+    CSV 层级：每行 仓库,一级分组,二级分组,...（如 repo,org,department,team）
+    第一行的第一列为 repo 时视为表头
+    """
+    root = _new_hierarchy_node(None)
+    for row_num, row in enumerate(csv.reader(f)):
+        row = [cell.strip() for cell in row]
+        if not row or not row[0] or row[0].startswith('#'):
+            continue
+        if row_num == 0 and row[0].lower() == 'repo':
+            continue
+        node = root
+        for group in row[1:]:
+            if not group:
+                continue
+            child = next((c for c in node['children'] if c['name'] == group), None)
+            if child is None:
+                child = _new_hierarchy_node(group)
+                node['children'].append(child)
+            node = child
+        node['repos'].append(row[0])
+    return root
+
+
+def load_hierarchy(path):
+    """
+    读取层级文件（JSON / YAML / CSV），返回根节点
     
-    def get_index_description(self, index_996):
-        """根据996指数返回描述（复用Code996Analyzer的逻辑）"""
-        if index_996 <= 10:
-            return '令人羡慕的工作'
-        elif 10 < index_996 <= 50:
-            return '你还有剩余价值'
-        elif 50 < index_996 <= 90:
-            return '加油，老板的法拉利靠你了'
-        elif 90 < index_996 <= 110:
-            return '你的福报已经修满了'
+    JSON/YAML 示例：{"Org": {"Backend": {"Team A": ["/path/repo1", "https://..."]}}}
+    只有一个顶层分组时它就是根节点，否则以文件名作为根节点
+    """
+    if not os.path.exists(path):
+        print(f"错误: 文件不存在: {path}", file=sys.stderr)
+        sys.exit(1)
+    
+    ext = os.path.splitext(path)[1].lower()
+    default_name = os.path.splitext(os.path.basename(path))[0]
+    
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if ext == '.csv':
+            root = _load_hierarchy_csv(f)
         else:
-            return '你们想必就是卷王中的卷王吧'
+            if ext in ('.yaml', '.yml'):
+                try:
+                    import yaml
+                except ImportError:
+                    print("错误: 读取 YAML 层级文件需要安装 PyYAML (pip install pyyaml)，或改用 JSON/CSV 格式", file=sys.stderr)
+                    sys.exit(1)
+                data = yaml.safe_load(f)
+            else:
+                data = json.load(f)
+            root = _build_hierarchy_node(None, data)
     
-    def cleanup(self):
-        """清理所有分析器的临时文件"""
-        for analyzer in self.analyzers:
-            try:
-                analyzer.cleanup()
-            except Exception as e:
-                print(f"警告: 清理临时文件失败: {e}", file=sys.stderr)
+    if root['name'] is None:
+        if len(root['children']) == 1 and not root['repos']:
+            root = root['children'][0]
+        else:
+            root['name'] = default_name
+    return root
+
+
+def hierarchy_repo_list(root):
+    """收集层级中的所有仓库（去重，同一仓库只扫描一次）"""
+    repo_list = []
+    seen = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for spec in node['repos']:
+            if spec not in seen:
+                seen.add(spec)
+                repo_list.append(classify_repo(spec))
+        stack.extend(reversed(node['children']))
+    return repo_list
+
+
+def rollup_hierarchy(node, repo_index, aggregator, parent_path=''):
+    """
+    自底向上汇总层级：每个节点的直方图为其子树内所有（不重复）仓库直方图之和
+    
+    Args:
+        node: 层级节点
+        repo_index: {仓库路径: RepoRecord}
+        aggregator: MultiRepoAnalyzer 实例（复用汇总指标计算）
+    
+    Returns:
+        tuple: (节点汇总信息 dict, 子树内的仓库路径集合)
+    """
+    node_path = f"{parent_path}/{node['name']}" if parent_path else node['name']
+    children = []
+    subtree_repos = set(spec for spec in node['repos'] if spec in repo_index)
+    for child in node['children']:
+        child_summary, child_repos = rollup_hierarchy(child, repo_index, aggregator, node_path)
+        children.append(child_summary)
+        subtree_repos |= child_repos
+    
+    histogram = [0] * HISTOGRAM_SIZE
+    day_types = [0] * len(DAY_TYPE_LABELS) if aggregator.calendar else None
+    for spec in subtree_repos:
+        for index, count in enumerate(repo_index[spec].histogram):
+            histogram[index] += count
+        if day_types is not None:
+            for day_type, count in enumerate(repo_index[spec].get('day_types', ())):
+                day_types[day_type] += count
+    
+    result = aggregator.build_aggregate_result(histogram, [], 0, day_types=day_types)
+    summary = {
+        'name': node['name'],
+        'path': node_path,
+        'repo_count': len(subtree_repos),
+        'total_count': result['total_count'],
+        'index_996': result['index_996'],
+        'overtime_ratio': result['overtime_ratio'],
+        'is_standard': result['is_standard'],
+        'work_type': f"{result['opening_hour'] or '?'}{result['closing_hour'] or '?'}{result['work_days'] or '?'}",
+        'histogram': histogram,
+        'children': children,
+        'repos': [
+            {
+                'name': repo_index[spec].name,
+                'path': spec,
+                'total_count': repo_index[spec].total_count,
+                'index_996': repo_index[spec].index_996,
+            }
+            for spec in node['repos'] if spec in repo_index
+        ],
+    }
+    if day_types is not None:
+        summary['day_types'] = day_types
+    return summary, subtree_repos
+
+
+def print_hierarchy(summary, depth=0):
+    """在终端按层级打印每个节点的指标"""
+    indent = '  ' * depth
+    print(f"{indent}- {summary['name']}: 996指数 {summary['index_996']}，"
+          f"加班占比 {summary['overtime_ratio']}%，{summary['total_count']} commits，{summary['repo_count']} 个仓库")
+    for child in summary['children']:
+        print_hierarchy(child, depth + 1)
+
+
+def print_ref_contributions(refs, limit=10):
+    """在终端打印 --refs 各引用贡献的 commit 数"""
+    print(f"引用: {refs['ref_count']} 个（--refs {refs['selector']}），各引用贡献的 commit 数:")
+    for item in refs['contributions'][:limit]:
+        print(f"  {item['count']:>8}  {item['ref']}")
+    rest = refs['contributions'][limit:]
+    if rest:
+        print(f"  {sum(item['count'] for item in rest):>8}  （其余 {len(rest)} 个引用）")
+
+
+def print_branch_breakdown(branches, limit=20):
+    """在终端打印 --per-branch 各分支的指标（commit 数最多的 limit 个）"""
+    print(f"分支对比: {len(branches)} 个分支（一次遍历）")
+    print(f"  {'commits':>8}    独有  996指数  加班占比  分支")
+    for branch in branches[:limit]:
+        index_996 = branch['index_996'] if branch['is_standard'] else f"{branch['index_996']}*"
+        print(f"  {branch['total_count']:>8}  {branch['exclusive_count']:>6}  {index_996:>7}  "
+              f"{branch['overtime_ratio']:>7}%  {branch['name']}")
+    if len(branches) > limit:
+        print(f"  （其余 {len(branches) - limit} 个分支见 HTML/JSON 结果）")
+
+
+def print_path_breakdown(paths, limit=20):
+    """在终端打印 --by-path 各目录的指标（commit 数最多的 limit 个）"""
+    print(f"目录拆分: 前 {paths['depth']} 级目录，{len(paths['prefixes'])} 个（一次遍历）")
+    print(f"  {'commits':>8}  996指数  加班占比  目录")
+    rows = paths['prefixes'][:limit] + ([paths['other']] if paths['other'] else [])
+    for item in rows:
+        index_996 = item['index_996'] if item['is_standard'] else f"{item['index_996']}*"
+        print(f"  {item['total_count']:>8}  {index_996:>7}  {item['overtime_ratio']:>7}%  {item['path']}")
+    if len(paths['prefixes']) > limit:
+        print(f"  （其余 {len(paths['prefixes']) - limit} 个目录见 HTML/JSON 结果）")
+
+
+def generate_hierarchy_html(summary):
+    """
+    生成层级下钻视图（可逐级展开的 details 树）
+    
+    Args:
+        summary: rollup_hierarchy 返回的根节点汇总信息
+    
+    Returns:
+        str: HTML 代码
+    """
+    def render(node, depth):
+        parts = [
+            f"<details class='tree-node'{' open' if depth < 2 else ''}>",
+            f"<summary><span class='tree-name'>{html_escape(node['name'])}</span>"
+            f"<span class='tree-stat'>996 指数 <b>{node['index_996']}</b></span>"
+            f"<span class='tree-stat'>加班 {node['overtime_ratio']}%</span>"
+            f"<span class='tree-stat'>{node['work_type']}</span>"
+            f"<span class='tree-stat'>{node['total_count']} commits</span>"
+            f"<span class='tree-stat'>{node['repo_count']} 个仓库</span></summary>",
+        ]
+        for child in node['children']:
+            parts.append(render(child, depth + 1))
+        for repo in node['repos']:
+            parts.append(
+                f"<div class='tree-repo'>📁 {html_escape(repo['name'])}"
+                f"<span class='tree-stat'>996 指数 {repo['index_996']}</span>"
+                f"<span class='tree-stat'>{repo['total_count']} commits</span></div>"
+            )
+        parts.append("</details>")
+        return ''.join(parts)
+    
+    return f"""
+    <h2 class="title">🏢 组织层级</h2>
+    <div class="tree">{render(summary, 0)}</div>
+    <p style='margin: 10px 0 40px; color: #999; font-size: 14px;'>* 每个分组的指标由其下所有仓库的 commit 合并计算（仓库只扫描一次）</p>
+    """
+
+
+def generate_refs_notice(refs, limit=10):
+    """--refs 的说明：选中的引用数与各引用贡献的 commit 数（前 limit 个）"""
+    items = [f"{html_escape(item['ref'])} <strong>{item['count']}</strong>" for item in refs['contributions'][:limit]]
+    rest = len(refs['contributions']) - limit
+    if rest > 0:
+        items.append(f"其余 {rest} 个引用 <strong>{sum(item['count'] for item in refs['contributions'][limit:])}</strong>")
+    return (f"<p>🌿 统计了 {refs['ref_count']} 个引用（--refs {html_escape(refs['selector'])}），共享的 commit 只计一次，"
+            f"按最先到达的引用归属：{'，'.join(items)}</p>")
+
+
+def generate_branches_html(branches):
+    """
+    生成 --per-branch 各分支指标对比表
+    
+    Args:
+        branches: 结果中的 branches 列表
+    
+    Returns:
+        str: HTML 代码
+    """
+    rows = ''.join(
+        f"<tr><td style='text-align: left;'>{html_escape(branch['name'])}</td>"
+        f"<td>{branch['total_count']}</td><td>{branch['exclusive_count']}</td>"
+        f"<td>{branch['index_996'] if branch['is_standard'] else str(branch['index_996']) + '*'}</td>"
+        f"<td>{branch['overtime_ratio']}%</td>"
+        f"<td>{branch['opening_hour'] or '?'}{branch['closing_hour'] or '?'}{branch['work_days'] or '?'}</td></tr>"
+        for branch in branches
+    )
+    return f"""
+    <h2 class="title">🌿 分支对比</h2>
+    <div class="table-wrapper">
+        <table>
+            <thead><tr><th>分支</th><th>commit 数</th><th>独有 commit</th><th>996 指数</th><th>加班时间占比</th><th>工作时间类型</th></tr></thead>
+            <tbody>{rows}</tbody>
+        </table>
+        <p style='margin-top: 10px; color: #999; font-size: 14px;'>* 每个分支统计其可到达的全部 commit（共享历史计入每个分支），独有 commit 只能从该分支到达；所有分支来自同一次 git 历史遍历；带 * 的指数 commit 数不足，仅供参考</p>
+    </div>
+    """
+
+
+def generate_paths_html(paths):
+    """
+    生成 --by-path 各目录指标对比表
+    
+    Args:
+        paths: 结果中的 paths 字段
+    
+    Returns:
+        str: HTML 代码
+    """
+    rows = ''.join(
+        f"<tr><td style='text-align: left;'>{html_escape(item['path'])}</td><td>{item['total_count']}</td>"
+        f"<td>{item['index_996'] if item['is_standard'] else str(item['index_996']) + '*'}</td>"
+        f"<td>{item['overtime_ratio']}%</td>"
+        f"<td>{item['opening_hour'] or '?'}{item['closing_hour'] or '?'}{item['work_days'] or '?'}</td></tr>"
+        for item in paths['prefixes'] + ([paths['other']] if paths['other'] else [])
+    )
+    return f"""
+    <h2 class="title">📂 目录拆分（前 {paths['depth']} 级）</h2>
+    <div class="table-wrapper">
+        <table>
+            <thead><tr><th>目录</th><th>commit 数</th><th>996 指数</th><th>加班时间占比</th><th>工作时间类型</th></tr></thead>
+            <tbody>{rows}</tbody>
+        </table>
+        <p style='margin-top: 10px; color: #999; font-size: 14px;'>* 同时修改多个目录的 commit 计入每个目录；最多单独列出 {paths['limit']} 个目录，其余合并为 {PATH_OTHER}；{paths['merge_count']} 个 merge commit 只计入整体；带 * 的指数 commit 数不足，仅供参考</p>
+    </div>
+    """
+
+
+def generate_minutes_html(minutes, width=720, height=200):
+    """
+    生成 --minutes 的分钟级上下班时间与平滑后的一天 commit 曲线（内联 SVG）
+
+    Args:
+        minutes: 结果中的 work_time_minutes 字段
+
+    Returns:
+        str: HTML 代码
+    """
+    profile = minutes['profile']
+    peak = max(max(profile), minutes['threshold']) or 1
+
+    def x(minute):
+        return round(minute / MINUTES_PER_DAY * width, 1)
+
+    def y(value):
+        return round(height - 20 - value / peak * (height - 30), 1)
+
+    points = ' '.join(f"{x(i * MINUTE_PROFILE_STEP + MINUTE_PROFILE_STEP / 2)},{y(value)}"
+                      for i, value in enumerate(profile))
+    ticks = ''.join(
+        f"<text x='{x(hour * 60)}' y='{height - 4}' fill='#999' font-size='11' text-anchor='middle'>{hour}</text>"
+        for hour in range(0, HOURS_PER_DAY + 1, 3)
+    )
+    markers = ''.join(
+        f"<line x1='{x(minute)}' y1='0' x2='{x(minute)}' y2='{height - 20}' stroke='#fff' stroke-width='1'/>"
+        f"<text x='{x(minute) + 4}' y='14' fill='#fff' font-size='12'>{label}</text>"
+        for minute, label in ((minutes['opening_minute'], minutes['opening']),
+                              (minutes['closing_minute'], minutes['closing']))
+        if minute is not None
+    )
+    return f"""
+    <h2 class="title">⏱️ 分钟级上下班时间</h2>
+    <div class="table-wrapper">
+        <p>上班：<span class="p1">{minutes['opening'] or '?'}</span>　下班：<span class="p1">{minutes['closing'] or '?'}</span></p>
+        <svg viewBox='0 0 {width} {height}' style='width: 100%; max-width: {width}px; background-color: #2a2a2a;'>
+            <line x1='0' y1='{y(minutes['threshold'])}' x2='{width}' y2='{y(minutes['threshold'])}' stroke='#999' stroke-dasharray='4 4'/>
+            <polyline points='{points}' fill='none' stroke='#de335e' stroke-width='2'/>
+            {markers}{ticks}
+        </svg>
+        <p style='margin-top: 10px; color: #999; font-size: 14px;'>* 按分钟统计 commit，经 σ={minutes['bandwidth']} 分钟的高斯核平滑后，取 8-13 点第一个、17-24 点最后一个越过虚线阈值（平方平均数 × {WORK_TIME_THRESHOLD}）的时刻；上方的工作时间类型仍按小时统计</p>
+    </div>
+    """
+
+
+def generate_calendar_notice(calendar, day_types):
+    """工作日历（--calendar）的说明：各类日期的 commit 数"""
+    workday_count, weekend_count, holiday_count = day_types
+    return (f"<p>📅 按工作日历 {html_escape(calendar['name'])}（{calendar['start']} ∼ {calendar['end']}）区分日期："
+            f"工作日 {workday_count} 个、周末 {weekend_count} 个、<strong>节假日 {holiday_count}</strong> 个 commit。"
+            f"调休上班的周末计为工作日，节假日与周末一起计入加班；日历范围之外按星期几区分</p>")
+
+
+def print_day_types(calendar, day_types):
+    """在终端打印按工作日历分类的 commit 数"""
+    print(f"工作日历 {calendar['name']}: " + "，".join(
+        f"{label} {count}" for label, count in zip(DAY_TYPE_LABELS, day_types)) + " 个 commit")
+
+
+def generate_sample_notice(sample):
+    """抽样估算（--sample）的说明：样本量与置信区间"""
+    if sample.get('exhaustive'):
+        return (f"<p>🎯 时间范围内只有 {sample['population']} 个 commit，少于抽样所需的数量，"
+                f"已读取全部 commit，结果即完整统计</p>")
+    index_low, index_high = sample['index_996_ci']
+    ratio_low, ratio_high = sample['overtime_ratio_ci']
+    return (f"<p>🎯 本报告为抽样估算：从 {sample['population']} 个 commit 中抽取 <strong>{sample['sampled']}</strong> 个"
+            f"（{sample['rate']:.1%}），图表按比例放大。996 指数的 {sample['confidence']:.0%} 置信区间为 "
+            f"<strong>[{index_low}, {index_high}]</strong>，加班占比为 [{ratio_low}%, {ratio_high}%]</p>")
+
+
+def generate_windows_html(windows):
+    """
+    生成多个时间窗口并排对比的 HTML（指标表格 + 每个窗口的小时分布图）
+    
+    Args:
+        windows: 结果中的 windows 列表
+    
+    Returns:
+        str: HTML 代码
+    """
+    def row(label, values):
+        return f"<tr><td style='text-align: left;'>{label}</td>{''.join(f'<td>{v}</td>' for v in values)}</tr>"
+    
+    header = ''.join(
+        f"<th>{html_escape(w['name'])}<br><span class='p2'>{w['start_date']} ∼ {w['end_date']}</span></th>"
+        for w in windows
+    )
+    rows = [
+        row('总 commit 数', [w['total_count'] for w in windows]),
+        row('996 指数', [w['index_996'] if w['is_standard'] else f"{w['index_996']}*" for w in windows]),
+        row('加班时间占比', [f"{w['overtime_ratio']}%" for w in windows]),
+        row('工作时间类型', [f"{w['opening_hour'] or '?'}{w['closing_hour'] or '?'}{w['work_days'] or '?'}" for w in windows]),
+        row('评价', [w['description'] for w in windows]),
+    ]
+    charts = ''.join(
+        f"<div class='item'><h2>{html_escape(w['name'])}：按小时 commit 分布</h2>"
+        f"<div class='chart-container'><svg id='windowChart{i}'></svg></div></div>"
+        for i, w in enumerate(windows)
+    )
+    
+    return f"""
+    <h2 class="title">🗓️ 时间窗口对比</h2>
+    <div class="table-wrapper">
+        <table>
+            <thead><tr><th>指标</th>{header}</tr></thead>
+            <tbody>{''.join(rows)}</tbody>
+        </table>
+        <p style='margin-top: 10px; color: #999; font-size: 14px;'>* 所有窗口来自同一次 git 历史遍历，窗口可重叠；带 * 的指数 commit 数不足，仅供参考</p>
+    </div>
+    <div class="section">{charts}</div>
+    """
+
+
+def chart_data(chart_type, items):
+    """图表数据集：{'type': Bar/Pie, 'labels', 'data'}（items 为 [{'time', 'count'}, ...]）"""
+    return {'type': chart_type, 'labels': [item['time'] for item in items], 'data': [item['count'] for item in items]}
+
+
+def windows_chart_data(windows):
+    """时间窗口小时分布图的数据集（按 svg 元素 id）"""
+    return {f'windowChart{i}': chart_data('Bar', w['hour_data']) for i, w in enumerate(windows)}
+
+
+def json_default(value):
+    """JSON 序列化：RepoRecord 在写出时才展开为完整的仓库条目，紧凑数组转为列表"""
+    if isinstance(value, RepoRecord):
+        return value.to_dict()
+    if isinstance(value, array):
+        return value.tolist()
+    raise TypeError(f"无法序列化为 JSON: {type(value).__name__}")
+
+
+def write_json_result(result, output_file):
+    """将分析结果写出为 JSON 文件"""
+    output_dir = os.path.dirname(output_file)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2, default=json_default)
+    return output_file
+
+
+METRICS_OTHER = '__other__'  # 超出 --metrics-max-series 的仓库合并到这一条序列
+
+
+def openmetrics_escape(value):
+    """OpenMetrics 标签值转义"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def write_openmetrics(path, result, project_name, run_stats, max_series=100):
+    """
+    将分析结果与本次运行的性能指标写成 OpenMetrics 文本（兼容 node_exporter textfile collector）
+    
+    序列标签为 scope（total/group/repo）与 name。为限制序列数，仓库按 commit 数只保留前 max_series 个，
+    其余合并为 name="__other__"（指标由合并后的直方图重新计算）；分组按层级广度优先保留前 max_series 个。
+    先写临时文件再原子替换，采集方不会读到半个文件。
+    
+    Args:
+        result: analyze() 的结果（单仓库或多仓库汇总）
+        run_stats: {'scan_seconds', 'scanned_commits', 'failed_repos', 'cache': CloneCache.run_stats 或 None}
+    """
+    calculator = Code996Analyzer()
+    series = [('total', project_name or 'project', result)]
+    folded = {'group': 0, 'repo': 0}
+    
+    if result.get('hierarchy'):
+        nodes = [result['hierarchy']]
+        for node in nodes:
+            nodes.extend(node['children'])
+        folded['group'] = max(0, len(nodes) - max_series)
+        series += [('group', node['path'], node) for node in nodes[:max_series]]
+    
+    repos = sorted(result.get('repo_results') or [], key=lambda repo: -repo.total_count)
+    names = set()
+    for repo in repos[:max_series]:
+        name = repo.name if repo.name not in names else f"{repo.name} ({repo.path})"
+        names.add(name)
+        series.append(('repo', name, repo.result()))
+    if len(repos) > max_series:
+        folded['repo'] = len(repos) - max_series
+        histogram = [0] * HISTOGRAM_SIZE
+        for repo in repos[max_series:]:
+            for index, count in enumerate(repo.histogram):
+                histogram[index] += count
+        series.append(('repo', METRICS_OTHER, calculator.build_result(histogram)))
+    
+    lines = []
+    
+    def family(name, help_text, samples, unit=None):
+        lines.append(f"# TYPE {name} gauge")
+        if unit:
+            lines.append(f"# UNIT {name} {unit}")
+        lines.append(f"# HELP {name} {help_text}")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{openmetrics_escape(val)}"' for key, val in labels)
+            value = round(value, 6) if isinstance(value, float) else value
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    
+    labels = [(('scope', scope), ('name', name)) for scope, name, _ in series]
+    family('code996_index', '996 指数（0 为不加班，996 工作制为 100）',
+           [(label, item['index_996']) for label, (_, _, item) in zip(labels, series)])
+    family('code996_overtime_ratio', '加班 commit 占比（0~1）',
+           [(label, item['overtime_ratio'] / 100) for label, (_, _, item) in zip(labels, series)])
+    family('code996_commits', '统计时间范围内的 commit 数',
+           [(label, item['total_count']) for label, (_, _, item) in zip(labels, series)])
+    if result.get('repo_count') is not None:
+        family('code996_repos', '参与统计的仓库数',
+               [((('scope', 'total'), ('name', series[0][1])), result['repo_count'])] +
+               [(label, item['repo_count']) for label, (scope, _, item) in zip(labels, series) if scope == 'group'])
+    family('code996_folded_series', '因序列数上限被合并（仓库）或省略（分组）的数量',
+           [((('scope', scope),), count) for scope, count in folded.items()])
+    family('code996_window_start_timestamp_seconds', '统计时间范围的起始日期',
+           [((), datetime.fromisoformat(result['start_date']).timestamp())], unit='seconds')
+    family('code996_window_end_timestamp_seconds', '统计时间范围的结束日期',
+           [((), datetime.fromisoformat(result['end_date']).timestamp())], unit='seconds')
+    
+    scan_seconds = run_stats['scan_seconds']
+    family('code996_scan_duration_seconds', '本次分析耗时', [((), scan_seconds)], unit='seconds')
+    family('code996_scanned_commits', '本次分析读取的 commit 数（含去重跳过的）', [((), run_stats['scanned_commits'])])
+    family('code996_scan_commits_per_second', '每秒读取的 commit 数',
+           [((), run_stats['scanned_commits'] / scan_seconds if scan_seconds > 0 else 0.0)])
+    family('code996_failed_repos', '分析失败的仓库数', [((), run_stats.get('failed_repos', 0))])
+    cache = run_stats.get('cache')
+    if cache is not None:
+        lookups = cache['hits'] + cache['misses']
+        family('code996_clone_cache_lookups', '克隆缓存查找次数',
+               [((('result', 'hit'),), cache['hits']), ((('result', 'miss'),), cache['misses'])])
+        if lookups:
+            family('code996_clone_cache_hit_ratio', '克隆缓存命中率（0~1）', [((), cache['hits'] / lookups)])
+        family('code996_clone_bytes', '克隆/fetch 新增的磁盘字节数', [((), cache['bytes'])], unit='bytes')
+    family('code996_last_run_timestamp_seconds', '最近一次写出指标的时间', [((), time.time())], unit='seconds')
+    lines.append('# EOF')
+    
+    output_dir = os.path.dirname(path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
+    return path
+
+
+def json_for_script(data):
+    """序列化为可安全嵌入 <script> 标签的紧凑 JSON"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+
+# 仓库列表的虚拟表格：renderRepoTable(data) 由报告数据加载后调用（data 见 repo_table_data）
+REPO_TABLE_SCRIPT = """
+<script>
+function renderRepoTable(data) {
+    var rows = data.rows, total = data.total;
+    var ROW_HEIGHT = 36, OVERSCAN = 8;
+    var viewport = document.getElementById('repo-viewport');
+    var spacer = document.getElementById('repo-spacer');
+    var body = document.getElementById('repo-body');
+    var filterInput = document.getElementById('repo-filter');
+    var counter = document.getElementById('repo-counter');
+    var view = rows, sortKey = 2, sortDir = -1, scheduled = false;
+
+    function escapeHtml(text) {
+        return String(text).replace(/[&<>"']/g, function(c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    }
+
+    function cell(row, key) {
+        if (key === 3) return total > 0 ? Math.round(row[2] / total * 1000) / 10 : 0;
+        if (key === 4) return row[3];
+        return row[key];
+    }
+
+    function renderRow(row) {
+        var name = escapeHtml(row[0]);
+        if (row[4]) name = '<a href="' + escapeHtml(row[4]) + '">' + name + '</a>';
+        return '<div class="vrow">' +
+            '<div class="vcell vname" title="' + escapeHtml(row[0]) + '">' + name + '</div>' +
+            '<div class="vcell">' + (row[1] === 'r' ? '🌐 远程' : row[1] === 'a' ? '📦 归档' : '📁 本地') + '</div>' +
+            '<div class="vcell">' + row[2] + '</div>' +
+            '<div class="vcell">' + cell(row, 3) + '%</div>' +
+            '<div class="vcell">' + row[3] + '</div></div>';
+    }
+
+    function render() {
+        scheduled = false;
+        var first = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+        var count = Math.ceil(viewport.clientHeight / ROW_HEIGHT) + OVERSCAN * 2;
+        var html = [];
+        for (var i = first; i < Math.min(view.length, first + count); i++) html.push(renderRow(view[i]));
+        body.style.transform = 'translateY(' + first * ROW_HEIGHT + 'px)';
+        body.innerHTML = html.join('');
+    }
+
+    function schedule() {
+        if (!scheduled) { scheduled = true; requestAnimationFrame(render); }
+    }
+
+    function refresh() {
+        var keyword = filterInput.value.trim().toLowerCase();
+        view = keyword ? rows.filter(function(row) { return row[0].toLowerCase().indexOf(keyword) !== -1; }) : rows.slice();
+        view.sort(function(a, b) {
+            var x = cell(a, sortKey), y = cell(b, sortKey);
+            return (x < y ? -1 : x > y ? 1 : 0) * sortDir;
+        });
+        spacer.style.height = view.length * ROW_HEIGHT + 'px';
+        viewport.style.height = Math.min(Math.max(view.length, 1) * ROW_HEIGHT, 480) + 'px';
+        counter.textContent = view.length + ' / ' + rows.length;
+        viewport.scrollTop = 0;
+        render();
+    }
+
+    document.querySelectorAll('#repo-header .vcell').forEach(function(header) {
+        header.addEventListener('click', function() {
+            var key = Number(header.getAttribute('data-key'));
+            sortDir = key === sortKey ? -sortDir : (key === 0 || key === 1 ? 1 : -1);
+            sortKey = key;
+            refresh();
+        });
+    });
+    filterInput.addEventListener('input', refresh);
+    viewport.addEventListener('scroll', schedule);
+    refresh();
+}
+</script>
+"""
 
 
-def generate_repo_list_html(repo_results, total_count):
+def repo_table_data(repo_results, total_count, links=None):
     """
-    生成参与仓库列表的 HTML 表格
+    参与仓库列表的数据：每个仓库一行紧凑数组，随报告数据嵌入页面，由浏览器只渲染可见的行
     
     Args:
-        repo_results: 仓库结果列表
+        repo_results: 仓库结果列表（RepoRecord）
         total_count: 总 commit 数
+        links: 可选，与 repo_results 对应的单仓库报告链接列表
+    
+    Returns:
+        dict: {'total': 总 commit 数, 'rows': [[名称, 类型, commit 数, 996 指数, 报告链接?], ...]}
+    """
+    rows = []
+    for i, repo in enumerate(repo_results):
+        row = [
+            repo.name,
+            {'remote': 'r', 'archive': 'a'}.get(repo.type, 'l'),
+            repo.total_count,
+            repo.index_996,
+        ]
+        if links and links[i]:
+            row.append(links[i])
+        rows.append(row)
+    return {'total': total_count, 'rows': rows}
+
+
+def generate_repo_list_html():
+    """
+    生成参与仓库列表（虚拟滚动、可排序、可筛选的表格）的骨架
+    
+    表格行来自报告数据（repo_table_data），上万个仓库时页面体积和渲染时间也基本不变。
     
     Returns:
         str: HTML 表格代码
     """
-    html = """
+    return """
     <h2 class="title">📦 参与仓库列表</h2>
     <div class="table-wrapper">
-        <table>
-            <thead>
-                <tr>
-                    <th>仓库名称</th>
-                    <th>来源类型</th>
-                    <th>Commit 数</th>
-                    <th>占比</th>
-                    <th>996 指数</th>
-                </tr>
-            </thead>
-            <tbody>
-    """
-    
-    for repo in repo_results:
-        name = repo['name']
-        repo_type = '🌐 远程' if repo['type'] == 'remote' else '📁 本地'
-        count = repo['result']['total_count']
-        ratio = round(count / total_count * 100, 1) if total_count > 0 else 0
-        index = repo['result']['index_996']
-        
-        html += f"""
-                <tr>
-                    <td style="text-align: left;">{name}</td>
-                    <td>{repo_type}</td>
-                    <td>{count}</td>
-                    <td>{ratio}%</td>
-                    <td>{index}</td>
-                </tr>
-        """
-    
-    html += """
-            </tbody>
-        </table>
-        <p style='margin-top: 10px; color: #999; font-size: 14px;'>* 汇总数据为所有仓库合并后计算得出</p>
+        <div class="vtable-toolbar">
+            <input id="repo-filter" type="search" placeholder="筛选仓库名称...">
+            <span id="repo-counter"></span>
+        </div>
+        <div class="vtable">
+            <div class="vrow vhead" id="repo-header">
+                <div class="vcell vname" data-key="0">仓库名称</div>
+                <div class="vcell" data-key="1">来源类型</div>
+                <div class="vcell" data-key="2">Commit 数</div>
+                <div class="vcell" data-key="3">占比</div>
+                <div class="vcell" data-key="4">996 指数</div>
+            </div>
+            <div class="vviewport" id="repo-viewport">
+                <div id="repo-spacer"></div>
+                <div class="vbody" id="repo-body"></div>
+            </div>
+        </div>
+        <p style='margin-top: 10px; color: #999; font-size: 14px;'>* 汇总数据为所有仓库合并后计算得出，点击表头排序</p>
     </div>
     """
-    
-    return html
 
 
 def get_default_output_filename(project_name, is_aggregate=False):
@@ -902,181 +5193,86 @@ def get_default_output_filename(project_name, is_aggregate=False):
     return os.path.join(report_dir, filename)
 
 
-def generate_html(result, output_file=None, project_name=None):
-    """生成HTML报告"""
-    
-    # 检测是否为汇总模式
-    is_aggregate = result.get('is_aggregate', False)
-    
-    # 如果未指定输出文件，使用默认格式
-    if not output_file:
-        if not project_name:
-            project_name = result.get('project_name', 'unknown-project')
-        output_file = get_default_output_filename(project_name, is_aggregate)
-    
-    # 读取chart.xkcd库
-    chart_xkcd_cdn = "https://cdn.jsdelivr.net/npm/chart.xkcd@1.1.13/dist/chart.xkcd.min.js"
-    
-    # 准备小时分布数据
-    hour_labels = [item['time'] for item in result['hour_data']]
-    hour_counts = [item['count'] for item in result['hour_data']]
-    
-    # 准备周分布数据
-    week_labels = [item['time'] for item in result['week_data']]
-    week_counts = [item['count'] for item in result['week_data']]
-    
-    # 工作/加班数据
-    work_hour_labels = [item['time'] for item in result['work_hour_pl']]
-    work_hour_counts = [item['count'] for item in result['work_hour_pl']]
-    
-    work_week_labels = [item['time'] for item in result['work_week_pl']]
-    work_week_counts = [item['count'] for item in result['work_week_pl']]
-    
-    # 计算比例数据
-    total_work_hour = sum(work_hour_counts)
-    work_hour_percentages = [round(c / total_work_hour * 100, 1) if total_work_hour > 0 else 0 for c in work_hour_counts]
-    
-    total_work_week = sum(work_week_counts)
-    work_week_percentages = [round(c / total_work_week * 100, 1) if total_work_week > 0 else 0 for c in work_week_counts]
-    
-    # 对比表格数据
-    table_data = [
-        {'type': '955', 'daily': '6.5', 'weekly': '32.5', 'overtime': '-5', 'ratio': '-11', 'index': '-33'},
-        {'type': '965', 'daily': '7.5', 'weekly': '37.5', 'overtime': '0', 'ratio': '0', 'index': '0'},
-        {'type': '966', 'daily': '7.5', 'weekly': '45', 'overtime': '7.5', 'ratio': '16', 'index': '48'},
-        {'type': '995', 'daily': '9.5', 'weekly': '47.5', 'overtime': '10', 'ratio': '21', 'index': '63'},
-        {'type': '996', 'daily': '9.5', 'weekly': '57', 'overtime': '19.5', 'ratio': '34', 'index': '100'},
-        {'type': '997', 'daily': '9.5', 'weekly': '66.5', 'overtime': '29', 'ratio': '44', 'index': '130'},
-        {'type': '9126', 'daily': '12.5', 'weekly': '75', 'overtime': '37.5', 'ratio': '50', 'index': '150'},
-    ]
-    
-    working_type = f"{result['opening_hour'] or '?'}{result['closing_hour'] or '?'}{result['work_days'] or '?'}"
-    
-    # 计算当前项目的数据
-    opening_hour = result['opening_hour'] if result['opening_hour'] else 9
-    closing_hour = result['closing_hour'] if result['closing_hour'] else 18
-    work_days = result['work_days'] if result['work_days'] else 5
-    
-    # 日均打卡时长
-    attendance = closing_hour - opening_hour if closing_hour > opening_hour else 12 - opening_hour + closing_hour
-    
-    # 日均有效工作时间（减去休息时间）
-    if closing_hour <= 19 or (closing_hour <= 7 and attendance <= 10):
-        daily_work = attendance - 1.5  # 只休息中午
-    else:
-        daily_work = attendance - 2.5  # 加上晚餐休息
-    
-    # 确保合理值
-    if daily_work < 0:
-        daily_work = 0
-    
-    weekly_work = round(daily_work * work_days, 1)
-    overtime = round((result['overtime_ratio'] * 0.01 * weekly_work), 1)
-    
-    # 添加当前项目到表格
-    current_project = {
-        'type': working_type,
-        'daily': str(round(daily_work, 1)),
-        'weekly': str(weekly_work),
-        'overtime': str(overtime),
-        'ratio': str(result['overtime_ratio']),
-        'index': str(result['index_996'])
-    }
-    
-    # 将当前项目插入到表格中，按996指数排序
-    table_data.append(current_project)
-    table_data = sorted(table_data, key=lambda x: float(x['index']))
-    
-    # 生成标题文本
-    if is_aggregate:
-        page_title = f"聚合项目：{result.get('project_name', 'Multi-Project')}（共 {result.get('repo_count', 0)} 个仓库）"
-    else:
-        page_title = "#CODE996 Result"
-    
-    html_content = f"""<!DOCTYPE html>
+# 报告页面模板：{{name}} 为占位符，在导入时编译一次（见 ReportTemplate）
+REPORT_TEMPLATE_SOURCE = """<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Code996 分析报告 - {project_name or 'Project'}</title>
-    <script src="{chart_xkcd_cdn}"></script>
+    <title>Code996 分析报告 - {{project_title}}</title>
+    {{chart_xkcd_tag}}
     <style>
         /* 字体定义 */
-        @font-face {{
+        @font-face {
             font-family: 'vcr-osd';
-            src: url('https://fastly.jsdelivr.net/gh/hellodigua/cdn/fonts/vcr-osd.ttf');
-            font-display: swap;
-        }}
-        
-        @font-face {{
-            font-family: 'Pixel';
-            src: url('https://fastly.jsdelivr.net/gh/hellodigua/cdn/fonts/zpix.woff2') format('woff2');
+            src: url('{{font_vcr_src}}');
             font-display: swap;
-        }}
+        }
         
-        @font-face {{
+        /* 正文与 chart.xkcd 图表共用同一字体，只声明一次（inline 模式下不会重复内联） */
+        @font-face {
             font-family: 'xkcd';
-            src: url('https://fastly.jsdelivr.net/gh/hellodigua/cdn/fonts/zpix.woff2') format('woff2');
+            src: url('{{font_zpix_src}}') format('woff2');
             font-display: swap;
-        }}
+        }
         
-        * {{
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
         
-        body {{
+        body {
             background-color: #212121;
             color: #ccc;
-            font-family: 'Pixel', Helvetica Neue, Helvetica, PingFang SC, Hiragino Sans GB, Microsoft YaHei, Arial, sans-serif;
+            font-family: 'xkcd', Helvetica Neue, Helvetica, PingFang SC, Hiragino Sans GB, Microsoft YaHei, Arial, sans-serif;
             font-size: 16px;
             line-height: 1.75;
-        }}
+        }
         
-        .container {{
+        .container {
             max-width: 1200px;
             margin: 0 auto;
             padding: 20px;
-        }}
+        }
         
-        .top-bar {{
+        .top-bar {
             padding: 40px 0;
             background: #2a2a2a;
             margin-bottom: 40px;
-        }}
+        }
         
-        .top-bar h1 {{
+        .top-bar h1 {
             font-family: 'vcr-osd', monospace;
             color: #999;
             font-size: 2em;
             font-weight: normal;
             text-shadow: 6px 6px 0px rgba(0, 0, 0, 0.2);
-        }}
+        }
         
-        .top-result {{
+        .top-result {
             margin-bottom: 60px;
-        }}
+        }
         
-        .top-result h1 {{
+        .top-result h1 {
             font-size: 2em;
             color: #de335e;
             text-shadow: 6px 6px 0px rgba(0, 0, 0, 0.2);
             margin-bottom: 40px;
-        }}
+        }
         
-        .result-line {{
+        .result-line {
             display: flex;
             align-items: flex-start;
             flex-wrap: wrap;
-        }}
+        }
         
-        .score-box {{
+        .score-box {
             margin-right: 60px;
             margin-bottom: 20px;
-        }}
+        }
         
-        .score-number {{
+        .score-number {
             background-color: #de335e;
             color: #fff;
             font-size: 6em;
@@ -1086,166 +5282,286 @@ def generate_html(result, output_file=None, project_name=None):
             line-height: 1;
             padding: 30px;
             display: inline-block;
-        }}
+        }
         
-        .content {{
+        .content {
             flex: 1;
             min-width: 300px;
-        }}
+        }
         
-        .content p {{
+        .content p {
             margin-bottom: 15px;
             font-size: 1.1em;
-        }}
+        }
         
-        .p1 {{
+        .p1 {
             color: #de335e;
             font-size: 1.5em;
             font-weight: bold;
-        }}
+        }
         
-        .p2 {{
+        .p2 {
             color: #999;
             font-size: 0.9em;
             margin-left: 8px;
-        }}
+        }
         
-        .exp {{
+        .exp {
             margin-top: 40px;
             font-size: 0.85em;
             opacity: 0.6;
-        }}
+        }
         
-        .section {{
+        .section {
             display: flex;
             justify-content: space-between;
             margin-bottom: 40px;
             flex-wrap: wrap;
-        }}
+        }
         
-        .item {{
+        .item {
             width: 48%;
             min-width: 300px;
             background-color: #2a2a2a;
             padding: 20px;
             margin-bottom: 20px;
             box-shadow: 10px 10px 0px rgba(0, 0, 0, 0.1);
-        }}
+        }
         
-        .item svg {{
+        .item svg {
             background-color: #2a2a2a;
-        }}
+        }
         
-        .item h2 {{
+        .item h2 {
             font-size: 1.2em;
             margin-bottom: 20px;
             font-weight: normal;
             color: #fff;
-        }}
+        }
         
-        .chart-container {{
+        .chart-container {
             width: 100%;
             height: 300px;
             position: relative;
-        }}
+        }
         
-        .chart-container svg {{
+        .chart-container svg {
             width: 100%;
             height: 100%;
-        }}
+        }
         
-        h2.title {{
+        h2.title {
             font-size: 1.5em;
             margin: 40px 0 20px 0;
             color: #fff;
-        }}
+        }
         
-        .table-wrapper {{
+        .table-wrapper {
             overflow-x: auto;
             margin-bottom: 40px;
-        }}
+        }
         
-        table {{
+        table {
             width: 100%;
             border-collapse: collapse;
             background-color: #2a2a2a;
-        }}
+        }
         
-        th, td {{
+        th, td {
             padding: 15px;
             text-align: center;
             border-bottom: 1px solid #555;
-        }}
+        }
+        
+        th {
+            border-bottom: 2px solid #999;
+            font-weight: bold;
+        }
+        
+        .tree details {
+            background-color: #2a2a2a;
+            margin: 4px 0 4px 20px;
+            padding: 6px 12px;
+        }
+        
+        .tree > details {
+            margin-left: 0;
+        }
+        
+        .tree summary {
+            cursor: pointer;
+        }
+        
+        .tree-name {
+            color: #fff;
+            margin-right: 20px;
+        }
+        
+        .tree-stat {
+            color: #999;
+            margin-right: 16px;
+            font-size: 0.9em;
+        }
+        
+        .tree-stat b {
+            color: #de335e;
+        }
+        
+        .tree-repo {
+            margin-left: 20px;
+            padding: 2px 0;
+        }
+        
+        .vtable {
+            background-color: #2a2a2a;
+        }
+        
+        .vtable-toolbar {
+            display: flex;
+            align-items: center;
+            margin-bottom: 10px;
+        }
+        
+        .vtable-toolbar input {
+            background: #2a2a2a;
+            color: #ccc;
+            border: 1px solid #555;
+            padding: 6px 10px;
+            font-family: inherit;
+            margin-right: 16px;
+        }
+        
+        .vtable-toolbar span {
+            color: #999;
+            font-size: 14px;
+        }
+        
+        .vrow {
+            display: flex;
+            height: 36px;
+            line-height: 36px;
+            border-bottom: 1px solid #555;
+        }
         
-        th {{
+        .vhead {
             border-bottom: 2px solid #999;
             font-weight: bold;
-        }}
+            cursor: pointer;
+            user-select: none;
+        }
+        
+        .vcell {
+            flex: 1;
+            text-align: center;
+            overflow: hidden;
+            white-space: nowrap;
+            text-overflow: ellipsis;
+            padding: 0 10px;
+        }
+        
+        .vcell.vname {
+            flex: 3;
+            text-align: left;
+        }
+        
+        .vcell a {
+            color: #de335e;
+        }
+        
+        .vviewport {
+            position: relative;
+            overflow-y: auto;
+        }
+        
+        .vbody {
+            position: absolute;
+            top: 0;
+            left: 0;
+            right: 0;
+        }
+        
+        .lazy-section {
+            min-height: 240px;
+        }
         
-        .active {{
+        .lazy-section.rendered {
+            min-height: 0;
+        }
+        
+        .active {
             color: #de335e;
             font-weight: bold;
-        }}
+        }
         
-        .notice {{
+        .notice {
             background-color: #2a2a2a;
             padding: 20px;
             margin: 40px 0;
-        }}
+        }
         
-        .notice h2 {{
+        .notice h2 {
             margin-bottom: 15px;
-        }}
+        }
         
-        .notice p {{
+        .notice p {
             margin-bottom: 10px;
             opacity: 0.8;
-        }}
+        }
         
-        @media screen and (max-width: 768px) {{
-            .result-line {{
+        @media screen and (max-width: 768px) {
+            .result-line {
                 flex-direction: column;
-            }}
+            }
             
-            .score-box {{
+            .score-box {
                 margin-right: 0;
                 margin-bottom: 30px;
-            }}
+            }
             
-            .section {{
+            .section {
                 flex-direction: column;
-            }}
+            }
             
-            .item {{
+            .item {
                 width: 100%;
-            }}
-        }}
+            }
+        }
     </style>
 </head>
 <body>
     <div class="top-bar">
         <div class="container">
-            <h1>{page_title}</h1>
+            <h1>{{page_title}}</h1>
         </div>
     </div>
     
     <div class="container">
         <div class="top-result">
-            {"<h1>该项目的 996 指数是：</h1>" if result['is_standard'] else ""}
+            {{score_heading}}
             <div class="result-line">
-                {"<div class='score-box'><div class='score-number'>" + str(result['index_996']) + "</div></div>" if result['is_standard'] else ""}
+                {{score_box}}
                 <div class="content">
-                    {"<p>推测你们的工作时间类型为：<span class='p1'>" + working_type + "</span> <span class='p2'>(早 " + str(result['opening_hour'] or '?') + " 晚 " + str(result['closing_hour'] or '?') + " 一周 " + str(result['work_days']) + " 天)</span></p>" if result['is_standard'] else ""}
-                    {"<p>推测你们的加班时间占比为：<span class='p1'>" + str(result['overtime_ratio']) + "%</span>" + (" <span class='p2'>(工作不饱和)</span>" if result['index_996'] < 0 else "") + "</p>" if result['is_standard'] else ""}
-                    {"<p><span class='p1'>" + ("该项目的 commit 数量过少，只显示基本信息" if result['total_count'] <= 50 else "该项目为开源项目，只显示基本信息") + "</span></p>" if not result['is_standard'] else ""}
-                    <p>总 commit 数：<span class="p1">{result['total_count']}</span></p>
-                    <p>分析时间段：<span class="p1">{result['start_date']} ∼ {result['end_date']}</span></p>
+                    {{work_type_line}}
+                    {{overtime_line}}
+                    {{basic_info_line}}
+                    <p>总 commit 数：<span class="p1">{{total_count}}</span></p>
+                    <p>分析时间段：<span class="p1">{{start_date}} ∼ {{end_date}}</span></p>
                 </div>
             </div>
-            {"<p class='exp'>996 指数：为 0 则不加班，值越大代表加班越严重，996 工作制对应的值为 100，负值说明工作非常轻松。<a href='#compare-table' style='color: #de335e;'>具体可参考下方表格</a></p>" if result['is_standard'] else ""}
+            {{index_explanation}}
         </div>
         
-        {generate_repo_list_html(result['repo_results'], result['total_count']) if is_aggregate else ""}
+        {{minutes_html}}
+        
+        {{windows_html}}
+        
+        {{branches_html}}
+        
+        {{paths_html}}
+        
+        {{hierarchy_html}}
+        
+        {{repo_list_html}}
         
         <div class="charts">
             <div class="section">
@@ -1283,7 +5599,7 @@ def generate_html(result, output_file=None, project_name=None):
                     </tr>
                 </thead>
                 <tbody>
-                    {''.join([f"<tr class='{'active' if item['type'] == working_type else ''}'><td>{item['type']}</td><td>{item['daily']}h</td><td>{item['weekly']}h</td><td>{item['overtime']}h</td><td>{item['ratio']}%</td><td>{item['index']}</td></tr>" for item in table_data])}
+                    {{compare_rows}}
                 </tbody>
             </table>
             <p style='margin-top: 10px; color: #999; font-size: 14px;'>* 高亮行为该项目的估算指标</p>
@@ -1291,101 +5607,415 @@ def generate_html(result, output_file=None, project_name=None):
         
         <div class="notice">
             <h2 class="title">⚠️ 注意事项：</h2>
-            {f"<p>📊 本报告为 <strong>{result.get('repo_count', 0)} 个仓库</strong>的汇总分析，数据已合并计算</p>" if is_aggregate else ""}
-            {f"<p>🌍 多仓库数据可能来自不同时区、不同团队，存在一定误差</p>" if is_aggregate else ""}
+            {{aggregate_notice}}
+            {{timezone_notice}}
+            {{dedupe_notice}}
+            {{sample_notice}}
+            {{refs_notice}}
+            {{notes_notice}}
+            {{calendar_notice}}
             <p>1. 分析结果仅供参考，不代表任何建议</p>
             <p>2. 原始分析数据基于 Git commit 时间，可能与实际工作时间有偏差</p>
             <p>3. 请勿用于正式场合</p>
         </div>
     </div>
     
-    <script>
-        // 等待DOM和chart.xkcd库加载完成
-        window.addEventListener('load', function() {{
-            try {{
-                // 确保chartXkcd已加载
-                if (typeof chartXkcd === 'undefined') {{
-                    console.error('chart.xkcd库未加载');
-                    return;
-                }}
-                
-                // 小时分布图
-                const hourChartEl = document.getElementById('hourChart');
-                if (hourChartEl) {{
-                    new chartXkcd.Bar(hourChartEl, {{
-                        data: {{
-                            labels: {json.dumps(hour_labels)},
-                            datasets: [{{
-                                data: {json.dumps(hour_counts)}
-                            }}]
-                        }},
-                        options: {{
-                            backgroundColor: '#2a2a2a',
-                            strokeColor: '#fff',
-                            unxkcdify: false
-                        }}
-                    }});
-                }}
-                
-                // 周分布图
-                const weekChartEl = document.getElementById('weekChart');
-                if (weekChartEl) {{
-                    new chartXkcd.Bar(weekChartEl, {{
-                        data: {{
-                            labels: {json.dumps(week_labels)},
-                            datasets: [{{
-                                data: {json.dumps(week_counts)}
-                            }}]
-                        }},
-                        options: {{
-                            backgroundColor: '#2a2a2a',
-                            strokeColor: '#fff',
-                            unxkcdify: false
-                        }}
-                    }});
-                }}
-                
-                // 工作/加班占比饼图（按小时）
-                const hourPieChartEl = document.getElementById('hourPieChart');
-                if (hourPieChartEl) {{
-                    new chartXkcd.Pie(hourPieChartEl, {{
-                        data: {{
-                            labels: {json.dumps(work_hour_labels)},
-                            datasets: [{{
-                                data: {json.dumps(work_hour_counts)}
-                            }}]
-                        }},
-                        options: {{
-                            backgroundColor: '#2a2a2a',
-                            strokeColor: '#fff'
-                        }}
-                    }});
-                }}
-                
-                // 工作/加班占比饼图（按天）
-                const weekPieChartEl = document.getElementById('weekPieChart');
-                if (weekPieChartEl) {{
-                    new chartXkcd.Pie(weekPieChartEl, {{
-                        data: {{
-                            labels: {json.dumps(work_week_labels)},
-                            datasets: [{{
-                                data: {json.dumps(work_week_counts)}
-                            }}]
-                        }},
-                        options: {{
-                            backgroundColor: '#2a2a2a',
-                            strokeColor: '#fff'
-                        }}
-                    }});
-                }}
-            }} catch (error) {{
-                console.error('图表初始化错误:', error);
-            }}
-        }});
-    </script>
-</body>
-</html>
-"""
+    {{repo_table_js}}
+    <script type="{{report_data_type}}" id="report-data"{{report_data_attrs}}>{{report_data}}</script>
+    <script>
+        const CHART_OPTIONS = {
+            Bar: { backgroundColor: '#2a2a2a', strokeColor: '#fff', unxkcdify: false },
+            Pie: { backgroundColor: '#2a2a2a', strokeColor: '#fff' }
+        };
+        
+        // 绘制 root 内尚未绘制的图表（charts: {svg 元素 id: {type, labels, data}}）
+        function drawCharts(charts, root) {
+            Object.keys(charts).forEach(function(id) {
+                const el = root.querySelector('#' + id);
+                if (!el || el.dataset.drawn) {
+                    return;
+                }
+                el.dataset.drawn = '1';
+                const chart = charts[id];
+                new chartXkcd[chart.type](el, {
+                    data: { labels: chart.labels, datasets: [{ data: chart.data }] },
+                    options: CHART_OPTIONS[chart.type]
+                });
+            });
+        }
+        
+        // 读取报告数据：gzip 模式下为 gzip + base64，由浏览器的 DecompressionStream 解压
+        async function loadReportData() {
+            const el = document.getElementById('report-data');
+            if (el.dataset.encoding !== 'gzip') {
+                return JSON.parse(el.textContent);
+            }
+            const bytes = Uint8Array.from(atob(el.textContent.trim()), function(c) { return c.charCodeAt(0); });
+            const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+            return JSON.parse(await new Response(stream).text());
+        }
+        
+        // 渲染延迟区块：插入区块 HTML 后绘制其中的图表、初始化仓库列表
+        function renderSection(el, data) {
+            el.innerHTML = data.sections[el.dataset.section];
+            el.classList.add('rendered');
+            drawCharts(data.charts, el);
+            if (data.repos && el.querySelector('#repo-viewport')) {
+                renderRepoTable(data.repos);
+            }
+        }
+        
+        // 等待DOM和chart.xkcd库加载完成
+        window.addEventListener('load', function() {
+            loadReportData().then(function(data) {
+                // 确保chartXkcd已加载
+                if (typeof chartXkcd === 'undefined') {
+                    console.error('chart.xkcd库未加载');
+                    data.charts = {};
+                }
+                drawCharts(data.charts, document);
+                if (!data.sections) {
+                    if (data.repos) {
+                        renderRepoTable(data.repos);
+                    }
+                    return;
+                }
+                // 各区块滚动到附近时才渲染
+                const sections = document.querySelectorAll('.lazy-section');
+                if (!('IntersectionObserver' in window)) {
+                    sections.forEach(function(el) { renderSection(el, data); });
+                    return;
+                }
+                const observer = new IntersectionObserver(function(entries) {
+                    entries.forEach(function(entry) {
+                        if (entry.isIntersecting) {
+                            observer.unobserve(entry.target);
+                            renderSection(entry.target, data);
+                        }
+                    });
+                }, { rootMargin: '400px' });
+                sections.forEach(function(el) { observer.observe(el); });
+            }).catch(function(error) {
+                console.error('报告数据加载失败:', error);
+                document.querySelectorAll('.lazy-section').forEach(function(el) {
+                    el.textContent = '⚠️ 报告数据解压失败，请使用支持 DecompressionStream 的浏览器（Chrome 80+、Firefox 113+、Safari 16.4+）打开';
+                });
+            });
+        });
+    </script>
+</body>
+</html>
+"""
+
+
+class ReportTemplate:
+    """
+    预编译的报告模板
+    
+    模板源码只在创建时解析一次，拆分为「文本片段 + 占位符」序列，
+    渲染时按顺序拼接，避免每次生成报告都重建整段 f-string。
+    """
+    
+    PLACEHOLDER = re.compile(r'\{\{(\w+)\}\}')
+    
+    def __init__(self, source):
+        parts = self.PLACEHOLDER.split(source)
+        self.literals = parts[0::2]
+        self.keys = parts[1::2]
+    
+    def render(self, values):
+        """按占位符顺序填充 values（dict），返回完整文本"""
+        chunks = [self.literals[0]]
+        for key, literal in zip(self.keys, self.literals[1:]):
+            chunks.append(str(values[key]))
+            chunks.append(literal)
+        return ''.join(chunks)
+
+
+REPORT_TEMPLATE = ReportTemplate(REPORT_TEMPLATE_SOURCE)
+
+# 报告依赖的静态资源：仓库内 public/ 下有一份离线副本
+# (模板占位符, 仓库内相对路径, CDN 地址)
+REPORT_ASSETS = {
+    'chart_xkcd': ('public/js/chart.xkcd.min.js',
+                   "https://cdn.jsdelivr.net/npm/chart.xkcd@1.1.13/dist/chart.xkcd.min.js"),
+    'font_vcr': ('public/fonts/vcr-osd.ttf',
+                 "https://fastly.jsdelivr.net/gh/hellodigua/cdn/fonts/vcr-osd.ttf"),
+    'font_zpix': ('public/fonts/zpix.woff2',
+                  "https://fastly.jsdelivr.net/gh/hellodigua/cdn/fonts/zpix.woff2"),
+}
+ASSET_MODES = ('cdn', 'inline', 'shared')
+# inline 模式下以 data URI 内联的字体
+INLINE_FONT_TYPES = {'font_vcr': 'font/ttf', 'font_zpix': 'font/woff2'}
+
+
+def vendored_asset_path(name):
+    """静态资源在仓库中的离线副本路径（不存在时返回 None）"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), REPORT_ASSETS[name][0])
+    return path if os.path.exists(path) else None
+
+
+@functools.lru_cache(maxsize=None)
+def read_vendored_asset(name):
+    """读取离线资源（每个进程只读一次）"""
+    path = vendored_asset_path(name)
+    if not path:
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def vendored_asset_data_uri(name):
+    """离线字体的 data URI（每个进程只编码一次）"""
+    path = vendored_asset_path(name)
+    if not path:
+        return None
+    with open(path, 'rb') as f:
+        return f"data:{INLINE_FONT_TYPES[name]};base64,{base64.b64encode(f.read()).decode('ascii')}"
+
+
+def ensure_shared_assets(assets_dir):
+    """
+    将离线资源复制到共享目录（已存在且大小一致时跳过）
+    
+    Returns:
+        set: 成功放入共享目录的资源名
+    """
+    available = set()
+    for name, (relative_path, _) in REPORT_ASSETS.items():
+        source = vendored_asset_path(name)
+        if not source:
+            continue
+        target = os.path.join(assets_dir, os.path.basename(relative_path))
+        if not os.path.exists(target) or os.path.getsize(target) != os.path.getsize(source):
+            if not os.path.exists(assets_dir):
+                os.makedirs(assets_dir)
+            shutil.copyfile(source, target)
+        available.add(name)
+    return available
+
+
+def resolve_report_assets(mode, output_file, assets_dir=None):
+    """
+    根据资源模式生成模板中的资源引用
+    
+    Args:
+        mode: cdn（在线加载）/ inline（图表库和字体内联进页面）/ shared（多个报告共用一份本地资源）
+        output_file: 报告路径，shared 模式下用于计算相对路径
+        assets_dir: shared 模式的资源目录，默认为报告所在目录下的 assets/
+    
+    Returns:
+        dict: chart_xkcd_tag / font_vcr_src / font_zpix_src
+    """
+    sources = {name: cdn for name, (_, cdn) in REPORT_ASSETS.items()}
+    chart_xkcd_tag = None
+    
+    if mode == 'inline':
+        code = read_vendored_asset('chart_xkcd')
+        if code is None:
+            print("⚠️  提示: 未找到 public/js/chart.xkcd.min.js，图表库改为从 CDN 加载", file=sys.stderr)
+        else:
+            chart_xkcd_tag = f"<script>{code}</script>"
+        for name in INLINE_FONT_TYPES:
+            data_uri = vendored_asset_data_uri(name)
+            if data_uri is None:
+                print(f"⚠️  提示: 未找到 {REPORT_ASSETS[name][0]}，字体改为从 CDN 加载", file=sys.stderr)
+            else:
+                sources[name] = data_uri
+    elif mode == 'shared':
+        if not assets_dir:
+            assets_dir = os.path.join(os.path.dirname(output_file) or '.', 'assets')
+        base_dir = os.path.dirname(os.path.abspath(output_file))
+        for name in ensure_shared_assets(assets_dir):
+            target = os.path.join(os.path.abspath(assets_dir), os.path.basename(REPORT_ASSETS[name][0]))
+            sources[name] = os.path.relpath(target, base_dir).replace(os.sep, '/')
+    
+    if chart_xkcd_tag is None:
+        # defer：不阻塞页面首次绘制，load 事件会等待它执行完成
+        chart_xkcd_tag = f'<script src="{html_escape(sources["chart_xkcd"])}" defer></script>'
+    
+    return {
+        'chart_xkcd_tag': chart_xkcd_tag,
+        'font_vcr_src': sources['font_vcr'],
+        'font_zpix_src': sources['font_zpix'],
+    }
+
+
+def render_report(result, project_name=None, assets=None, data_mode='inline'):
+    """
+    渲染报告页面，返回 HTML 文本
+    
+    Args:
+        result: 单仓库或汇总分析结果
+        project_name: 页面标题中的项目名称
+        assets: resolve_report_assets() 的返回值，默认从 CDN 加载
+        data_mode: 报告数据的嵌入方式（见 embed_report_data）
+    """
+    if assets is None:
+        assets = resolve_report_assets('cdn', None)
+    
+    # 检测是否为汇总模式
+    is_aggregate = result.get('is_aggregate', False)
+    
+    # 对比表格数据
+    table_data = [
+        {'type': '955', 'daily': '6.5', 'weekly': '32.5', 'overtime': '-5', 'ratio': '-11', 'index': '-33'},
+        {'type': '965', 'daily': '7.5', 'weekly': '37.5', 'overtime': '0', 'ratio': '0', 'index': '0'},
+        {'type': '966', 'daily': '7.5', 'weekly': '45', 'overtime': '7.5', 'ratio': '16', 'index': '48'},
+        {'type': '995', 'daily': '9.5', 'weekly': '47.5', 'overtime': '10', 'ratio': '21', 'index': '63'},
+        {'type': '996', 'daily': '9.5', 'weekly': '57', 'overtime': '19.5', 'ratio': '34', 'index': '100'},
+        {'type': '997', 'daily': '9.5', 'weekly': '66.5', 'overtime': '29', 'ratio': '44', 'index': '130'},
+        {'type': '9126', 'daily': '12.5', 'weekly': '75', 'overtime': '37.5', 'ratio': '50', 'index': '150'},
+    ]
+    
+    working_type = f"{result['opening_hour'] or '?'}{result['closing_hour'] or '?'}{result['work_days'] or '?'}"
+    
+    # 计算当前项目的数据
+    opening_hour = result['opening_hour'] if result['opening_hour'] else 9
+    closing_hour = result['closing_hour'] if result['closing_hour'] else 18
+    work_days = result['work_days'] if result['work_days'] else 5
+    
+    # 日均打卡时长
+    attendance = closing_hour - opening_hour if closing_hour > opening_hour else 12 - opening_hour + closing_hour
+    
+    # 日均有效工作时间（减去休息时间）
+    if closing_hour <= 19 or (closing_hour <= 7 and attendance <= 10):
+        daily_work = attendance - 1.5  # 只休息中午
+    else:
+        daily_work = attendance - 2.5  # 加上晚餐休息
+    
+    # 确保合理值
+    if daily_work < 0:
+        daily_work = 0
+    
+    weekly_work = round(daily_work * work_days, 1)
+    overtime = round((result['overtime_ratio'] * 0.01 * weekly_work), 1)
+    
+    # 添加当前项目到表格
+    current_project = {
+        'type': working_type,
+        'daily': str(round(daily_work, 1)),
+        'weekly': str(weekly_work),
+        'overtime': str(overtime),
+        'ratio': str(result['overtime_ratio']),
+        'index': str(result['index_996'])
+    }
+    
+    # 将当前项目插入到表格中，按996指数排序
+    table_data.append(current_project)
+    table_data = sorted(table_data, key=lambda x: float(x['index']))
+    
+    # 生成标题文本
+    if is_aggregate:
+        page_title = f"聚合项目：{result.get('project_name', 'Multi-Project')}（共 {result.get('repo_count', 0)} 个仓库）"
+    else:
+        page_title = "#CODE996 Result"
+    
+    values = {
+        'project_title': html_escape(project_name or 'Project'),
+        'chart_xkcd_tag': assets['chart_xkcd_tag'],
+        'font_vcr_src': assets['font_vcr_src'],
+        'font_zpix_src': assets['font_zpix_src'],
+        'page_title': html_escape(page_title),
+        'score_heading': "<h1>该项目的 996 指数是：</h1>" if result['is_standard'] else "",
+        'score_box': "<div class='score-box'><div class='score-number'>" + str(result['index_996']) + "</div></div>" if result['is_standard'] else "",
+        'work_type_line': "<p>推测你们的工作时间类型为：<span class='p1'>" + working_type + "</span> <span class='p2'>(早 " + str(result['opening_hour'] or '?') + " 晚 " + str(result['closing_hour'] or '?') + " 一周 " + str(result['work_days']) + " 天)</span></p>" if result['is_standard'] else "",
+        'overtime_line': "<p>推测你们的加班时间占比为：<span class='p1'>" + str(result['overtime_ratio']) + "%</span>" + (" <span class='p2'>(工作不饱和)</span>" if result['index_996'] < 0 else "") + "</p>" if result['is_standard'] else "",
+        'basic_info_line': "<p><span class='p1'>" + ("该项目的 commit 数量过少，只显示基本信息" if result['total_count'] <= 50 else "该项目为开源项目，只显示基本信息") + "</span></p>" if not result['is_standard'] else "",
+        'total_count': result['total_count'],
+        'start_date': result['start_date'],
+        'end_date': result['end_date'],
+        'index_explanation': "<p class='exp'>996 指数：为 0 则不加班，值越大代表加班越严重，996 工作制对应的值为 100，负值说明工作非常轻松。<a href='#compare-table' style='color: #de335e;'>具体可参考下方表格</a></p>" if result['is_standard'] else "",
+        'minutes_html': generate_minutes_html(result['work_time_minutes']) if result.get('work_time_minutes') else "",
+        'windows_html': generate_windows_html(result['windows']) if result.get('windows') else "",
+        'branches_html': generate_branches_html(result['branches']) if result.get('branches') else "",
+        'paths_html': generate_paths_html(result['paths']) if result.get('paths') else "",
+        'hierarchy_html': generate_hierarchy_html(result['hierarchy']) if result.get('hierarchy') else "",
+        'repo_list_html': generate_repo_list_html() if is_aggregate else "",
+        'repo_table_js': REPO_TABLE_SCRIPT if is_aggregate else "",
+        'compare_rows': ''.join([f"<tr class='{'active' if item['type'] == working_type else ''}'><td>{item['type']}</td><td>{item['daily']}h</td><td>{item['weekly']}h</td><td>{item['overtime']}h</td><td>{item['ratio']}%</td><td>{item['index']}</td></tr>" for item in table_data]),
+        'aggregate_notice': f"<p>📊 本报告为 <strong>{result.get('repo_count', 0)} 个仓库</strong>的汇总分析，数据已合并计算</p>" if is_aggregate else "",
+        'timezone_notice': "<p>🌍 多仓库数据可能来自不同时区、不同团队，存在一定误差</p>" if is_aggregate else "",
+        'dedupe_notice': f"<p>🔁 已按 commit SHA 跨仓库去重，共跳过 <strong>{result.get('duplicate_count', 0)}</strong> 个重复 commit（fork/镜像的共享历史只计一次）</p>" if result.get('dedupe') else "",
+        'sample_notice': generate_sample_notice(result['sample']) if result.get('sample') else "",
+        'refs_notice': generate_refs_notice(result['refs']) if result.get('refs') else "",
+        'notes_notice': f"<p>📝 复用了 {NOTES_REF} 中已发布的统计，只读取了之后新增的 <strong>{result['notes']['scanned']}</strong> 个 commit，时间范围按作者本地日期筛选</p>" if result.get('notes', {}).get('base') else "",
+        'calendar_notice': generate_calendar_notice(result['calendar'], result['day_types']) if result.get('calendar') else "",
+    }
+    
+    # 页面数据：图表数据集与仓库列表行，由页面脚本读取后渲染
+    data = {
+        'charts': {
+            'hourChart': chart_data('Bar', result['hour_data']),
+            'weekChart': chart_data('Bar', result['week_data']),
+            'hourPieChart': chart_data('Pie', result['work_hour_pl']),
+            'weekPieChart': chart_data('Pie', result['work_week_pl']),
+        },
+    }
+    if result.get('windows'):
+        data['charts'].update(windows_chart_data(result['windows']))
+    if is_aggregate:
+        data['repos'] = repo_table_data(result['repo_results'], result['total_count'],
+                                        links=[repo.report for repo in result['repo_results']])
+    values.update(embed_report_data(data, values, data_mode))
+    
+    return REPORT_TEMPLATE.render(values)
+
+
+# gzip 数据模式下随数据压缩、在页面中延迟渲染的区块（体积随仓库、分组、分支、目录数增长）
+LAZY_SECTIONS = ('minutes_html', 'windows_html', 'branches_html', 'paths_html', 'hierarchy_html', 'repo_list_html')
+DATA_MODES = ('inline', 'gzip')
+
+
+def embed_report_data(data, values, mode='inline'):
+    """
+    生成报告数据块的模板值
+    
+    inline 模式下数据为明文 JSON；gzip 模式下 LAZY_SECTIONS 的 HTML 也并入数据，
+    整体 gzip 压缩后 base64 编码为一个数据块，页面用浏览器的 DecompressionStream 解压，
+    各区块滚动到附近时才插入页面，大型汇总报告的体积和首次绘制时间都随之减少。
+    
+    Args:
+        data: 页面数据（charts / repos）
+        values: 模板值，gzip 模式下其中的延迟区块会被替换为占位元素
+        mode: inline / gzip
+    
+    Returns:
+        dict: 需要更新到模板值中的项
+    """
+    if mode != 'gzip':
+        return {'report_data_type': 'application/json', 'report_data_attrs': '', 'report_data': json_for_script(data)}
+    
+    updates = {}
+    sections = {}
+    for key in LAZY_SECTIONS:
+        if values[key]:
+            name = key[:-len('_html')]
+            sections[name] = values[key]
+            updates[key] = f"<div class='lazy-section' data-section='{name}'></div>"
+    data = dict(data, sections=sections)
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    updates.update({
+        'report_data_type': 'application/octet-stream',
+        'report_data_attrs': ' data-encoding="gzip"',
+        'report_data': base64.b64encode(gzip.compress(payload, mtime=0)).decode('ascii'),
+    })
+    return updates
+
+
+def generate_html(result, output_file=None, project_name=None, asset_mode='cdn', assets_dir=None,
+                  data_mode='inline'):
+    """生成HTML报告（asset_mode 见 resolve_report_assets，data_mode 见 embed_report_data）"""
+    
+    # 如果未指定输出文件，使用默认格式
+    if not output_file:
+        if not project_name:
+            project_name = result.get('project_name', 'unknown-project')
+        output_file = get_default_output_filename(project_name, result.get('is_aggregate', False))
+    
+    assets = resolve_report_assets(asset_mode, output_file, assets_dir)
+    html_content = render_report(result, project_name, assets, data_mode)
     
     # 确保输出目录存在
     output_dir = os.path.dirname(output_file)
@@ -1398,6 +6028,546 @@ def generate_html(result, output_file=None, project_name=None):
     return output_file
 
 
+def _render_report_task(task):
+    """进程池任务：渲染单个报告页面（RepoRecord 在工作进程中才展开为完整结果）"""
+    result, project_name, output_file, asset_mode, assets_dir, data_mode = task
+    if isinstance(result, RepoRecord):
+        result = result.result()
+    return generate_html(result, output_file, project_name, asset_mode, assets_dir, data_mode)
+
+
+def generate_per_repo_reports(result, aggregate_output_file, report_dir=None, workers=None,
+                              asset_mode='cdn', data_mode='inline'):
+    """
+    为汇总结果中的每个仓库生成独立报告（进程池并行渲染），
+    并在 repo_results 的每条 RepoRecord 中记录相对于汇总报告的链接（report 属性）
+    
+    Args:
+        result: 汇总分析结果
+        aggregate_output_file: 汇总报告路径（链接以它所在目录为基准）
+        report_dir: 单仓库报告目录，默认为「汇总报告名-repos」
+        workers: 渲染进程数，默认 CPU 核数
+        asset_mode: 资源模式，shared 模式下与汇总报告共用同一个 assets 目录
+        data_mode: 报告数据的嵌入方式（inline / gzip）
+    
+    Returns:
+        str: 单仓库报告目录
+    """
+    if not report_dir:
+        report_dir = os.path.splitext(aggregate_output_file)[0] + '-repos'
+    if not os.path.exists(report_dir):
+        os.makedirs(report_dir)
+    
+    base_dir = os.path.dirname(os.path.abspath(aggregate_output_file))
+    assets_dir = os.path.join(base_dir, 'assets')
+    if asset_mode == 'shared':
+        ensure_shared_assets(assets_dir)
+    tasks = []
+    used_names = set()
+    for repo in result['repo_results']:
+        clean_name = re.sub(r'[<>:"/\\|?*]', '-', repo.name)
+        filename = f"{clean_name}.html"
+        suffix = 2
+        while filename in used_names:
+            filename = f"{clean_name}-{suffix}.html"
+            suffix += 1
+        used_names.add(filename)
+        
+        output_file = os.path.join(report_dir, filename)
+        repo.report = os.path.relpath(os.path.abspath(output_file), base_dir).replace(os.sep, '/')
+        tasks.append((repo, repo.name, output_file, asset_mode, assets_dir, data_mode))
+    
+    render_reports_parallel(tasks, workers)
+    return report_dir
+
+
+def render_reports_parallel(tasks, workers=None):
+    """
+    并行渲染多个报告页面
+    
+    Args:
+        tasks: [(result 或 RepoRecord, project_name, output_file, asset_mode, assets_dir, data_mode), ...]
+        workers: 进程数，默认 CPU 核数；为 1 或任务很少时直接在当前进程渲染
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            _render_report_task(task)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(_render_report_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))):
+                pass
+
+
+# 静态站点：manifest 记录每个页面的输入指纹，未变化的页面不重新渲染
+SITE_MANIFEST = 'manifest.json'
+SITE_MANIFEST_VERSION = 1
+REPORT_TEMPLATE_FINGERPRINT = hashlib.sha256(REPORT_TEMPLATE_SOURCE.encode('utf-8')).hexdigest()
+
+SITE_INDEX_TEMPLATE = ReportTemplate("""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Code996 报告索引 - {{title}}</title>
+    <style>
+        body { background-color: #212121; color: #ccc; font-family: Helvetica Neue, Helvetica, PingFang SC, Microsoft YaHei, Arial, sans-serif; line-height: 1.75; margin: 0; }
+        .container { max-width: 1200px; margin: 0 auto; padding: 20px; }
+        h1 { color: #de335e; font-weight: normal; }
+        h2 { color: #fff; font-weight: normal; margin-top: 40px; }
+        table { width: 100%; border-collapse: collapse; background-color: #2a2a2a; }
+        th, td { padding: 8px 15px; text-align: center; border-bottom: 1px solid #555; }
+        th { border-bottom: 2px solid #999; }
+        td.name { text-align: left; }
+        a { color: #de335e; }
+        .meta { color: #999; font-size: 14px; }
+        svg.spark polyline { fill: none; stroke: #de335e; stroke-width: 1.5; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>#CODE996 {{title}}</h1>
+        <p class="meta">{{meta}}</p>
+        {{sections}}
+    </div>
+</body>
+</html>
+""")
+
+
+def page_fingerprint(payload, asset_mode, data_mode='inline'):
+    """页面输入指纹：模板版本 + 资源模式 + 数据嵌入方式 + 页面数据"""
+    digest = hashlib.sha256()
+    digest.update(REPORT_TEMPLATE_FINGERPRINT.encode('ascii'))
+    digest.update(asset_mode.encode('ascii'))
+    digest.update(data_mode.encode('ascii'))
+    digest.update(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+
+def monthly_totals(periods):
+    """将按周期的直方图压缩为 {周期: commit 数}"""
+    return {key: sum(bucket) for key, bucket in (periods or {}).items()}
+
+
+def sparkline_svg(series, keys, width=120, height=24):
+    """生成趋势迷你折线图（内联 SVG）"""
+    values = [series.get(key, 0) for key in keys]
+    if len(values) < 2:
+        return ''
+    peak = max(values) or 1
+    step = width / (len(values) - 1)
+    points = ' '.join(
+        f"{round(i * step, 1)},{round(height - 2 - value / peak * (height - 4), 1)}"
+        for i, value in enumerate(values)
+    )
+    title = html_escape(f"{keys[0]} ∼ {keys[-1]}，峰值 {peak} commits")
+    return (f"<svg class='spark' width='{width}' height='{height}' viewBox='0 0 {width} {height}'>"
+            f"<title>{title}</title><polyline points='{points}'/></svg>")
+
+
+def site_page_name(name, path, duplicate):
+    """站点内页面文件名：同名仓库追加路径哈希，保证多次运行文件名稳定"""
+    clean_name = re.sub(r'[<>:"/\\|?*\s]', '-', name)
+    if duplicate:
+        clean_name += '-' + hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]
+    return f"{clean_name}.html"
+
+
+def _hierarchy_nodes(summary):
+    """前序遍历层级汇总节点"""
+    yield summary
+    for child in summary['children']:
+        yield from _hierarchy_nodes(child)
+
+
+def _subtree_repo_paths(summary):
+    paths = set()
+    for node in _hierarchy_nodes(summary):
+        paths.update(repo['path'] for repo in node['repos'])
+    return paths
+
+
+def build_static_site(result, site_dir, aggregator, asset_mode='shared', workers=None, data_mode='inline'):
+    """
+    增量维护静态报告站点
+    
+    站点结构：index.html（索引 + 趋势图）、all.html（汇总）、
+    groups/（层级分组）、repos/（单仓库）、assets/、manifest.json。
+    每个页面的输入（直方图、仓库列表、模板版本）计算指纹并记录在 manifest 中，
+    再次生成时只渲染指纹变化的页面，并删除已不存在的页面。
+    
+    Args:
+        result: 汇总分析结果（需包含 periods 才能绘制趋势）
+        site_dir: 站点目录
+        aggregator: MultiRepoAnalyzer 实例（用于计算分组页面的指标）
+        asset_mode: 资源模式，默认共用 assets/
+        workers: 渲染进程数
+        data_mode: 报告数据的嵌入方式（inline / gzip）
+    
+    Returns:
+        tuple: (索引页路径, 重新渲染的页面数, 页面总数)
+    """
+    manifest_path = os.path.join(site_dir, SITE_MANIFEST)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == SITE_MANIFEST_VERSION:
+            previous = manifest.get('pages', {})
+    
+    assets_dir = os.path.join(site_dir, 'assets')
+    if asset_mode == 'shared':
+        ensure_shared_assets(assets_dir)
+    
+    # 1. 单仓库页面（文件名稳定，便于增量比较）；页面结果为 RepoRecord，只有需要重新渲染时才展开
+    name_counts = defaultdict(int)
+    for repo in result['repo_results']:
+        name_counts[repo.name] += 1
+    repo_pages = {}
+    for repo in result['repo_results']:
+        repo_pages[repo.path] = 'repos/' + site_page_name(repo.name, repo.path, name_counts[repo.name] > 1)
+    
+    pages = []  # (相对路径, 标题, 类型, 结果, 指纹载荷, 趋势)
+    for repo in result['repo_results']:
+        pages.append((
+            repo_pages[repo.path], repo.name, 'repo', repo,
+            {'name': repo.name, 'start_date': repo.start_date,
+             'histogram': list(repo.histogram), 'windows': repo.get('windows'),
+             'calendar': repo.get('calendar'), 'day_types': repo.get('day_types')},
+            monthly_totals(repo.get('periods')),
+        ))
+    
+    def linked_repos(repos, prefix):
+        return [repo.with_report(prefix + repo_pages[repo.path]) for repo in repos]
+    
+    def table_payload(repos):
+        return [(repo.name, repo.total_count, repo.index_996, repo.report) for repo in repos]
+    
+    def page_summary(page_result):
+        if isinstance(page_result, RepoRecord):
+            return page_result.total_count, page_result.index_996, page_result.overtime_ratio
+        return page_result['total_count'], page_result['index_996'], page_result['overtime_ratio']
+    
+    # 2. 层级分组页面
+    if result.get('hierarchy'):
+        repo_by_path = {repo.path: repo for repo in result['repo_results']}
+        for node in _hierarchy_nodes(result['hierarchy']):
+            node_repos = linked_repos(
+                [repo_by_path[path] for path in sorted(_subtree_repo_paths(node)) if path in repo_by_path], '../')
+            node_result = aggregator.build_aggregate_result(
+                node['histogram'], node_repos, 0, start_date=result['start_date'], end_date=result['end_date'],
+                day_types=node.get('day_types'))
+            node_result['project_name'] = node['path']
+            series = defaultdict(int)
+            for repo in node_repos:
+                for key, count in monthly_totals(repo.get('periods')).items():
+                    series[key] += count
+            pages.append((
+                'groups/' + site_page_name(node['path'], node['path'], False), node['path'], 'group', node_result,
+                {'name': node['path'], 'histogram': node['histogram'], 'repos': table_payload(node_repos),
+                 'calendar': node_result.get('calendar'), 'day_types': node.get('day_types')},
+                dict(series),
+            ))
+    
+    # 3. 汇总页面
+    aggregate_result = dict(result, repo_results=linked_repos(result['repo_results'], ''))
+    pages.append((
+        'all.html', result['project_name'], 'aggregate', aggregate_result,
+        {'name': result['project_name'], 'start_date': result['start_date'], 'histogram': result['histogram'],
+         'windows': result.get('windows'), 'hierarchy': result.get('hierarchy'),
+         'calendar': result.get('calendar'), 'day_types': result.get('day_types'),
+         'repos': table_payload(aggregate_result['repo_results'])},
+        monthly_totals(result.get('periods')),
+    ))
+    
+    # 4. 只渲染指纹变化（或文件缺失）的页面
+    current = {}
+    tasks = []
+    for relative_path, title, kind, page_result, payload, _ in pages:
+        fingerprint = page_fingerprint(payload, asset_mode, data_mode)
+        current[relative_path] = {'hash': fingerprint, 'title': title, 'kind': kind}
+        output_file = os.path.join(site_dir, relative_path)
+        if previous.get(relative_path, {}).get('hash') != fingerprint or not os.path.exists(output_file):
+            tasks.append((page_result, title, output_file, asset_mode, assets_dir, data_mode))
+    render_reports_parallel(tasks, workers)
+    
+    # 删除本次已不存在的页面
+    for relative_path in set(previous) - set(current):
+        stale_file = os.path.join(site_dir, relative_path)
+        if os.path.exists(stale_file):
+            os.remove(stale_file)
+    
+    # 5. 索引页（每次重写，体积很小）
+    all_keys = sorted(set(key for page in pages for key in page[5]))
+    sections = []
+    for kind, heading in (('aggregate', '汇总'), ('group', '分组'), ('repo', '仓库')):
+        rows = [
+            f"<tr><td class='name'><a href='{html_escape(relative_path)}'>{html_escape(title)}</a></td>"
+            "<td>{}</td><td>{}</td><td>{}%</td>".format(*page_summary(page_result)) +
+            f"<td>{sparkline_svg(series, all_keys)}</td></tr>"
+            for relative_path, title, page_kind, page_result, _, series in pages if page_kind == kind
+        ]
+        if rows:
+            sections.append(
+                f"<h2>{heading}</h2><table><thead><tr><th>名称</th><th>Commit 数</th><th>996 指数</th>"
+                f"<th>加班占比</th><th>趋势（每{ {'day': '天', 'week': '周', 'month': '月'}.get(result.get('period'), '月') } commit 数）</th></tr></thead>"
+                f"<tbody>{''.join(rows)}</tbody></table>"
+            )
+    index_html = SITE_INDEX_TEMPLATE.render({
+        'title': html_escape(result['project_name']),
+        'meta': html_escape(f"统计时间段：{result['start_date']} ∼ {result['end_date']} · "
+                            f"更新于 {datetime.now().strftime('%Y-%m-%d %H:%M')} · "
+                            f"本次重新生成 {len(tasks)}/{len(pages)} 个页面"),
+        'sections': ''.join(sections),
+    })
+    index_path = os.path.join(site_dir, 'index.html')
+    with open(index_path, 'w', encoding='utf-8') as f:
+        f.write(index_html)
+    
+    tmp_manifest = f"{manifest_path}.tmp"
+    with open(tmp_manifest, 'w', encoding='utf-8') as f:
+        json.dump({'version': SITE_MANIFEST_VERSION, 'updated_at': datetime.now().isoformat(timespec='seconds'),
+                   'pages': current}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_manifest, manifest_path)
+    
+    return index_path, len(tasks), len(pages)
+
+
+# --watch：监听 refs 变化（inotify 事件常量见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+INOTIFY_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+INOTIFY_EVENT = struct.Struct('iIII')
+WATCHED_GIT_FILES = frozenset(['HEAD', 'packed-refs'])
+
+
+def resolve_git_dirs(repo_path):
+    """
+    仓库的 (git 目录, 公共 git 目录)，失败时返回 None
+    
+    worktree 的 HEAD 在自己的 git 目录中，refs 与 packed-refs 在公共目录中
+    """
+    cmd = ["git", "-C", repo_path, "rev-parse", "--absolute-git-dir", "--git-common-dir"]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+    lines = result.stdout.splitlines()
+    if result.returncode != 0 or len(lines) < 2:
+        return None
+    common_dir = lines[1] if os.path.isabs(lines[1]) else os.path.join(repo_path, lines[1])
+    return lines[0], os.path.abspath(common_dir)
+
+
+class RefWatcher:
+    """
+    监听多个仓库的 HEAD、packed-refs 与 refs/ 目录
+    
+    Linux 下通过 ctypes 调用 inotify，阻塞等待事件，两次推送之间不占用 CPU；
+    inotify 不可用（非 Linux、监听数超出 max_user_watches 等）时退化为按间隔轮询 mtime。
+    """
+    
+    def __init__(self, repos, interval=2.0):
+        """
+        Args:
+            repos: {key: (git 目录, 公共 git 目录)}
+            interval: 轮询间隔（秒），同时也是 inotify 事件的最长合并等待时间
+        """
+        self.repos = repos
+        self.interval = interval
+        self._fd = None
+        self._watches = {}  # wd -> (仓库 key 集合, 目录, 是否为 git 目录本身)
+        self._snapshot = None
+        try:
+            self._init_inotify()
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify 不可用，改为每 {interval} 秒轮询: {e}", file=sys.stderr)
+            self.close()
+            self._snapshot = self._poll_snapshot()
+    
+    @property
+    def mode(self):
+        return 'inotify' if self._fd is not None else 'poll'
+    
+    def _init_inotify(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify 仅在 Linux 上可用")
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._fd = fd
+        for key, (git_dir, common_dir) in self.repos.items():
+            for top_dir in {git_dir, common_dir}:
+                self._add_watch(key, top_dir, True)
+            self._add_tree(key, os.path.join(common_dir, 'refs'))
+    
+    def _add_watch(self, key, path, top):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), INOTIFY_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"{os.strerror(errno)}: {path}")
+        keys = self._watches[wd][0] if wd in self._watches else set()
+        keys.add(key)
+        self._watches[wd] = (keys, path, top)
+    
+    def _add_tree(self, key, root):
+        for path, _, _ in os.walk(root):
+            self._add_watch(key, path, False)
+    
+    def _read_events(self):
+        """读取已到达的事件，返回 refs 有变化的仓库 key 集合"""
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b'\0')
+                name = os.fsdecode(name)
+                offset += INOTIFY_EVENT.size + length
+                
+                if mask & IN_Q_OVERFLOW:
+                    # 事件队列溢出：无法确定哪些仓库变化，全部检查一遍
+                    changed.update(self.repos)
+                    continue
+                watch = self._watches.get(wd)
+                if watch is None:
+                    continue
+                keys, path, top = watch
+                if top:
+                    if name not in WATCHED_GIT_FILES:
+                        continue
+                else:
+                    if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                        # 新建的 refs 子目录（如 refs/heads/feature/）也需要监听
+                        for key in keys:
+                            self._add_tree(key, os.path.join(path, name))
+                    if name.endswith('.lock'):
+                        continue
+                changed.update(keys)
+    
+    def _poll_snapshot(self):
+        """每个仓库 HEAD / packed-refs / refs 文件的 (路径, mtime, 大小) 签名"""
+        snapshot = {}
+        for key, (git_dir, common_dir) in self.repos.items():
+            signature = []
+            paths = [os.path.join(git_dir, 'HEAD'), os.path.join(common_dir, 'packed-refs')]
+            for root, _, files in os.walk(os.path.join(common_dir, 'refs')):
+                paths.extend(os.path.join(root, name) for name in files if not name.endswith('.lock'))
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            snapshot[key] = hash(tuple(signature))
+        return snapshot
+    
+    def wait(self):
+        """阻塞直到有仓库的 refs 变化，返回这些仓库的 key 集合"""
+        if self._fd is None:
+            while True:
+                time.sleep(self.interval)
+                snapshot = self._poll_snapshot()
+                changed = set(key for key in snapshot if snapshot[key] != self._snapshot.get(key))
+                self._snapshot = snapshot
+                if changed:
+                    return changed
+        
+        changed = set()
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            ready, _, _ = select.select([self._fd], [], [], timeout)
+            if ready:
+                changed |= self._read_events()
+                if changed and deadline is None:
+                    # 一次推送会连续更新多个文件，稍等片刻合并为一次更新
+                    deadline = time.monotonic() + min(0.3, self.interval)
+            elif changed:
+                return changed
+    
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def watch_repositories(analyzers, on_update, interval=2.0, aggregator=None):
+    """
+    --watch 模式主循环：refs 变化时只读取新增 commit，更新内存中的直方图后调用 on_update
+    
+    Args:
+        analyzers: 已完成首次统计的 Code996Analyzer 列表（远程仓库不监听）
+        on_update: 回调 on_update(changed_analyzers)，返回更新后的结果
+        interval: 轮询间隔（秒）
+        aggregator: 多仓库模式下的 MultiRepoAnalyzer，历史被改写时整体重新汇总
+    """
+    repos = {}
+    by_key = defaultdict(list)
+    for analyzer in analyzers:
+        if analyzer.remote_url or isinstance(analyzer, ArchiveAnalyzer):
+            continue
+        dirs = resolve_git_dirs(analyzer.repo_path)
+        if dirs is None:
+            continue
+        repos[dirs[0]] = dirs
+        by_key[dirs[0]].append(analyzer)
+    
+    if not repos:
+        print("⚠️  没有可监听的本地仓库（远程仓库不支持 --watch）", file=sys.stderr)
+        return
+    
+    watcher = RefWatcher(repos, interval)
+    print(f"\n👀 正在监听 {len(repos)} 个仓库的 refs 变化（{watcher.mode}），按 Ctrl+C 退出")
+    try:
+        while True:
+            changed, rewritten = [], []
+            new_count = 0
+            for key in watcher.wait():
+                for analyzer in by_key[key]:
+                    try:
+                        added = analyzer.refresh_head()
+                    except SystemExit:
+                        continue
+                    if added is None:
+                        rewritten.append(analyzer)
+                    elif added:
+                        new_count += added
+                        changed.append(analyzer)
+            if not changed and not rewritten:
+                continue
+            
+            if rewritten:
+                # 历史被改写（rebase、force push）：无法增量扣除，重新统计
+                if aggregator is not None:
+                    aggregator.recollect()
+                    changed = [analyzer for _, analyzer in aggregator.repo_entries]
+                else:
+                    for analyzer in rewritten:
+                        analyzer.recollect()
+                    changed += rewritten
+            
+            result = on_update(changed)
+            summary = f"+{new_count} commits" if not rewritten else f"{len(rewritten)} 个仓库历史被改写，已重新统计"
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {summary} → 总 commit 数 {result['total_count']}，"
+                  f"996指数 {result['index_996']}，加班占比 {result['overtime_ratio']}%")
+    except KeyboardInterrupt:
+        print("\n已停止监听")
+    finally:
+        watcher.close()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Code996 本地版 - 统计 Git 项目的 commit 时间分布',
@@ -1417,6 +6587,61 @@ def main():
   python code996_local.py --repos /path/repo1,/path/repo2,/path/repo3 --project-name "Team Backend"
   python code996_local.py --urls https://github.com/org/repo1,https://github.com/org/repo2
   python code996_local.py --input-file repos.txt --project-name "Q4 Projects"
+  python code996_local.py --scan ~/workspace --project-name "Workspace"
+  python code996_local.py --repo legacy.bundle --repo old-project.tar.gz
+  
+  # 统计所有分支/标签，或指定的分支模式（一次遍历）
+  python code996_local.py --refs all
+  python code996_local.py --refs "main,release/*"
+  
+  # 通过 git notes 发布/复用统计结果（其他克隆只读取新增 commit）
+  python code996_local.py --publish-notes && git push origin refs/notes/code996
+  python code996_local.py --notes
+  
+  # 各分支分别统计、并排对比（一次遍历）
+  python code996_local.py --per-branch --refs "main,release/*"
+  
+  # monorepo 按前两级目录拆分统计（一次遍历）
+  python code996_local.py --by-path depth=2,max=100
+  
+  # 精确到分钟的上下班时间（如 9:30 上班、18:30 下班）
+  python code996_local.py --minutes
+  
+  # 按中国法定节假日与调休上班日区分工作日/周末/节假日
+  python code996_local.py --calendar cn
+  
+  # 大型汇总报告：数据压缩为一个 gzip 数据块，浏览器解压后按区块延迟渲染
+  python code996_local.py --scan ~/workspace --data-payload gzip
+  
+  # 并行分析（大仓库先开始），先查看执行计划
+  python code996_local.py --input-file repos.txt --jobs 8 --explain
+  python code996_local.py --input-file repos.txt --jobs 8
+  
+  # 超大仓库抽样估算（带置信区间，--sample-compare 对比完整统计）
+  python code996_local.py --repo ~/monorepo --sample --sample-compare
+  
+  # 输出 Prometheus textfile collector 可采集的 OpenMetrics 指标
+  python code996_local.py --input-file repos.txt --no-browser --metrics /var/lib/node_exporter/textfile/code996.prom
+  
+  # 多个时间窗口对比（只遍历一次历史）
+  python code996_local.py --window Q1=2024-01-01:2024-03-31 --window Q2=2024-04-01:2024-06-30
+  
+  # 按组织层级汇总（每个仓库只扫描一次）
+  python code996_local.py --hierarchy org.json
+  
+  # 增量静态站点（只重新生成数据变化的页面）
+  python code996_local.py --scan ~/workspace --site public_site
+  
+  # 监听仓库，有新 commit 时自动更新报告（适合看板）
+  python code996_local.py --scan ~/workspace --watch --no-browser --output dashboard.html
+  
+  # commit 事件库：增量导入后按任意作者/时间段/仓库切片查询（不再访问 git）
+  python code996_local.py --scan ~/workspace --db code996.db --ingest
+  python code996_local.py --db code996.db --author alice --start 2024-01-01
+  
+  # 分布式 map/reduce
+  python code996_local.py --repos /path/repo1,/path/repo2 --map-output agent1.c996
+  python code996_local.py --reduce agent1.c996 agent2.c996 --dedupe
         """
     )
     
@@ -1429,7 +6654,7 @@ def main():
     
     # 单仓库参数（支持多次传入）
     parser.add_argument('--repo', '-r', action='append', default=None,
-                        help='Git 仓库路径 (可多次使用)')
+                        help='Git 仓库路径，或 git bundle / .git 目录的 tar 包 (可多次使用)')
     parser.add_argument('--url', '-u', action='append', default=None,
                         help='远程 Git 仓库 URL (可多次使用)')
     
@@ -1442,45 +6667,311 @@ def main():
                         help='从文件读取仓库列表 (每行一个，支持 # 注释)')
     parser.add_argument('--project-name', default=None,
                         help='多仓库汇总项目的显示名称')
+    parser.add_argument('--dedupe', nargs='?', const='exact', default=None, choices=['exact', 'bloom'],
+                        help='多仓库模式下按 commit SHA 去重 (exact: 精确有序摘要; bloom: 固定内存的 Bloom filter)')
+    parser.add_argument('--dedupe-capacity', type=int, default=1000000,
+                        help='bloom 去重模式的预计 commit 数 (默认: 1000000)')
+    parser.add_argument('--dedupe-fpr', type=float, default=0.001,
+                        help='bloom 去重模式的误判率 (默认: 0.001)')
+    parser.add_argument('--window', action='append', default=None, metavar='NAME=START:END',
+                        help='命名时间窗口，如 Q1=2024-01-01:2024-03-31 (可多次使用，只遍历一次历史)')
+    parser.add_argument('--hierarchy', default=None, metavar='FILE',
+                        help='层级文件 (JSON/YAML/CSV)，按 组织/部门/团队 汇总，每个仓库只扫描一次')
+    parser.add_argument('--period', default=None, choices=PERIOD_CHOICES,
+                        help='额外按周期 (day/week/month) 统计直方图')
+    parser.add_argument('--map-output', default=None, metavar='FILE',
+                        help='map 模式：只输出可合并的中间结果文件 (.c996)，不生成 HTML')
+    parser.add_argument('--reduce', nargs='+', default=None, metavar='FILE',
+                        help='reduce 模式：合并多个中间结果文件（或包含 .c996 文件的目录）并生成汇总报告')
+    parser.add_argument('--db', default=None, metavar='FILE',
+                        help='本地 SQLite commit 事件库：不加 --ingest 时直接从库中查询（不访问 git）')
+    parser.add_argument('--ingest', action='store_true',
+                        help='将仓库增量导入 --db 事件库（只读取新增 commit），导入后生成报告')
+    parser.add_argument('--scan', action='append', default=None, metavar='DIR',
+                        help='递归扫描目录下的所有 Git 仓库并汇总分析 (可多次使用)')
+    parser.add_argument('--scan-workers', type=int, default=8,
+                        help='目录扫描线程数 (默认: 8)')
+    parser.add_argument('--scan-submodules', action='store_true',
+                        help='扫描时包含子模块和嵌套仓库')
+    parser.add_argument('--scan-exclude', action='append', default=None, metavar='NAME',
+                        help='扫描时额外跳过的目录名 (可多次使用，默认已跳过 node_modules/.venv 等；build/target 等目录本身是仓库时仍会报告)')
     
     parser.add_argument('--output', '-o', default=None,
                         help='输出HTML文件名 (默认: report/项目名·时间戳-result.html)')
+    parser.add_argument('--per-repo-reports', nargs='?', const='', default=None, metavar='DIR',
+                        help='多仓库模式下为每个仓库生成独立报告并在汇总页链接 (默认目录: 汇总报告名-repos)')
+    parser.add_argument('--report-workers', type=int, default=None,
+                        help='渲染单仓库报告的进程数 (默认: CPU 核数)')
+    parser.add_argument('--assets', default=None, choices=ASSET_MODES,
+                        help='报告资源加载方式: cdn (在线), inline (图表库和字体内联，可离线查看), '
+                             'shared (报告目录下共用一份 assets/ 本地资源) (默认: cdn，--site 模式为 shared)')
+    parser.add_argument('--data-payload', default='inline', choices=DATA_MODES,
+                        help='报告数据的嵌入方式: inline (明文 JSON), gzip (所有数据集与仓库列表、层级等区块压缩为一个 '
+                             'gzip+base64 数据块，浏览器解压后按区块延迟渲染，适合大型汇总报告) (默认: inline)')
+    parser.add_argument('--site', default=None, metavar='DIR',
+                        help='增量维护静态报告站点（索引页 + 每个仓库/分组一页，只重新生成数据变化的页面）')
+    parser.add_argument('--cache-dir', default='online_project', metavar='DIR',
+                        help='远程仓库克隆缓存目录 (默认: online_project)')
+    parser.add_argument('--cache-max-size', default=None, metavar='SIZE',
+                        help='克隆缓存容量上限，超出时按最后使用时间淘汰 (如 50G)')
+    parser.add_argument('--cache-max-age', type=float, default=None, metavar='DAYS',
+                        help='克隆缓存条目最长闲置天数，超过后淘汰')
+    parser.add_argument('--shared-store', action='store_true',
+                        help='同一家族（默认按仓库名归类，如各个 fork）的远程仓库共用一个对象库，共同历史只下载一次')
+    parser.add_argument('--family', action='append', default=None, metavar='NAME=REGEX',
+                        help='按 URL 正则指定对象库家族 (可多次使用，隐含 --shared-store)')
+    parser.add_argument('--cache-stats', action='store_true',
+                        help='显示克隆缓存占用与命中统计（按容量/闲置时间设置执行淘汰）后退出')
+    parser.add_argument('--watch', action='store_true',
+                        help='生成报告后持续监听本地仓库的 refs，有新 commit 时增量更新并重写 HTML/JSON')
+    parser.add_argument('--watch-interval', type=float, default=2.0,
+                        help='--watch 在 inotify 不可用时的轮询间隔秒数 (默认: 2)')
+    parser.add_argument('--refs', default=None, metavar='all|branches|PATTERN',
+                        help='一次遍历多个引用而不只是 HEAD：all（分支+远程分支+标签）、branches，'
+                             '或逗号分隔的模式如 "main,release/*"；报告各引用贡献的 commit 数')
+    parser.add_argument('--notes', action='store_true',
+                        help=f'复用 {NOTES_REF} 中已发布的逐日直方图，只读取发布之后新增的 commit')
+    parser.add_argument('--publish-notes', action='store_true',
+                        help=f'分析后把 HEAD 可达的全部 commit 的逐日直方图发布到 {NOTES_REF}（隐含 --notes）')
+    parser.add_argument('--per-branch', action='store_true',
+                        help='一次遍历所有分支（或 --refs 选中的引用），分别统计每个分支的 996 指数并对比')
+    parser.add_argument('--by-path', default=None, metavar='depth=N[,max=M]',
+                        help=f'按修改的前 N 级目录分别统计（一次遍历），最多单独列出 M 个目录 (默认 M: {PATH_DEFAULT_LIMIT})')
+    parser.add_argument('--minutes', action='store_true',
+                        help='同时按分钟统计 commit 时间，平滑后识别精确到分钟的上下班时间（有 NumPy 时向量化计算）')
+    parser.add_argument('--calendar', action='append', default=None, metavar='NAME|FILE',
+                        help=f'按工作日历区分工作日/周末/节假日（调休上班日计为工作日），可多次指定、后者覆盖前者；'
+                             f'内置: {", ".join(BUILTIN_CALENDARS)}，或 JSON 日历文件')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='并行度：多仓库时同时分析的仓库数（大仓库先开始），大仓库按 SHA 分片的进程数 (默认: 1)')
+    parser.add_argument('--explain', action='store_true',
+                        help='只探测仓库规模并打印执行计划（每个仓库的策略与调度顺序），不执行分析')
+    parser.add_argument('--sample', nargs='?', type=float, const=0.1, default=None, metavar='RATE',
+                        help='抽样估算模式：最多读取 RATE 比例的 commit，给出置信区间 (默认 RATE: 0.1)')
+    parser.add_argument('--sample-tolerance', type=float, default=5.0,
+                        help='--sample 的 996 指数置信区间半宽容差，达到后提前结束 (默认: 5)')
+    parser.add_argument('--sample-compare', action='store_true',
+                        help='--sample 完成后再做一次完整统计，报告加速比与误差')
+    parser.add_argument('--json', default=None, metavar='FILE',
+                        help='同时将分析结果输出为 JSON 文件')
+    parser.add_argument('--metrics', default=None, metavar='FILE',
+                        help='同时输出 OpenMetrics 文本（Prometheus textfile collector），含各仓库/分组指标与本次运行的性能指标')
+    parser.add_argument('--metrics-max-series', type=int, default=100, metavar='N',
+                        help='--metrics 中最多单独输出的仓库数与分组数，其余仓库合并为 __other__ (默认: 100)')
     parser.add_argument('--no-browser', action='store_true',
                         help='不自动打开浏览器')
     
     args = parser.parse_args()
     
+    # 远程仓库克隆缓存
+    try:
+        cache_max_bytes = parse_size(args.cache_max_size) if args.cache_max_size else None
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    families = None
+    if args.shared_store or args.family:
+        families = []
+        for value in args.family or []:
+            name, sep, pattern = value.partition('=')
+            if not sep or not name.strip() or not pattern:
+                print(f"错误: --family 格式应为 NAME=REGEX: {value}", file=sys.stderr)
+                sys.exit(1)
+            families.append((name.strip(), pattern))
+    Code996Analyzer.clone_cache = CloneCache(args.cache_dir, cache_max_bytes, args.cache_max_age, families)
+    if args.cache_stats:
+        Code996Analyzer.clone_cache.gc()
+        Code996Analyzer.clone_cache.print_stats()
+        return
+    
+    # 静态站点需要按月统计以绘制趋势图
+    if args.site and not args.period:
+        args.period = 'month'
+    if not args.assets:
+        args.assets = 'shared' if args.site else 'cdn'
+    
+    # 多个时间窗口：在并集范围内只遍历一次历史
+    windows = parse_windows(args.window)
+    if windows:
+        if args.start or args.end:
+            print("⚠️  提示: 使用 --window 时将以所有窗口的并集作为统计范围，忽略 --start/--end", file=sys.stderr)
+        args.start, args.end = windows_date_range(windows)
+    
     # 验证参数
     validate_repo_params(args)
     
-    # 解析仓库列表
-    repo_list = parse_repo_list(args)
+    # 解析仓库列表（层级模式下仓库来自层级文件）
+    hierarchy = load_hierarchy(args.hierarchy) if args.hierarchy else None
+    repo_list = hierarchy_repo_list(hierarchy) if hierarchy else parse_repo_list(args)
+    
+    if args.ingest and not args.db:
+        print("错误: --ingest 需要同时指定 --db", file=sys.stderr)
+        sys.exit(1)
+    if args.watch and (args.reduce or args.db or args.map_output):
+        print("错误: --watch 不能与 --reduce / --db / --map-output 同时使用", file=sys.stderr)
+        sys.exit(1)
     
     # 判断模式：单仓库 or 多仓库
-    is_multi_repo = len(repo_list) > 1 or args.project_name or args.repos or args.urls or args.input_file
+    is_multi_repo = args.reduce or args.db or args.site or args.hierarchy or args.scan or args.map_output or len(repo_list) > 1 or args.project_name or args.repos or args.urls or args.input_file
+    
+    if args.notes or args.publish_notes:
+        if (is_multi_repo or args.author or args.refs or args.per_branch or args.sample is not None
+                or repo_list[0]['type'] == 'archive'):
+            print("错误: --notes / --publish-notes 只支持单个 Git 仓库，且不能与 --author / --refs / --per-branch / --sample 同时使用"
+                  "（发布的是全部作者的统计）", file=sys.stderr)
+            sys.exit(1)
+    
+    if hierarchy and args.dedupe:
+        # 层级节点的直方图由各仓库（未去重的）直方图相加得到，与去重后的汇总口径不一致
+        print("错误: --hierarchy 不能与 --dedupe 同时使用（层级汇总按仓库直方图相加，无法去重）", file=sys.stderr)
+        sys.exit(1)
+    
+    by_path = parse_by_path(args.by_path) if args.by_path else None
+    if by_path:
+        if (is_multi_repo or args.watch or args.sample is not None or args.refs or args.per_branch
+                or args.notes or args.publish_notes or repo_list[0]['type'] == 'archive'):
+            print("错误: --by-path 只支持单个 Git 仓库，不能与 --watch / --sample / --refs / --per-branch / --notes 同时使用",
+                  file=sys.stderr)
+            sys.exit(1)
+    
+    if args.minutes:
+        if (is_multi_repo or args.sample is not None or args.per_branch or by_path
+                or args.notes or args.publish_notes or repo_list[0]['type'] == 'archive'):
+            print("错误: --minutes 只支持单个 Git 仓库，不能与 --sample / --per-branch / --by-path / --notes 同时使用",
+                  file=sys.stderr)
+            sys.exit(1)
+    
+    calendar = WorkCalendar(args.calendar) if args.calendar else None
+    if calendar:
+        if args.reduce or args.db or args.map_output or args.sample is not None or args.per_branch:
+            print("错误: --calendar 不能与 --reduce / --db / --map-output / --sample / --per-branch 同时使用",
+                  file=sys.stderr)
+            sys.exit(1)
+    
+    if args.per_branch:
+        if is_multi_repo or args.watch or args.sample is not None or repo_list[0]['type'] == 'archive':
+            print("错误: --per-branch 只支持单个 Git 仓库，不能与 --watch / --sample 同时使用", file=sys.stderr)
+            sys.exit(1)
+    
+    if args.sample is not None:
+        if is_multi_repo or args.period or windows or args.watch or args.refs or repo_list[0]['type'] == 'archive':
+            print("错误: --sample 只支持单个 Git 仓库，不能与 --period / --window / --watch / --refs 同时使用", file=sys.stderr)
+            sys.exit(1)
+        if not 0 < args.sample <= 1:
+            print("错误: --sample 的抽样比例应在 (0, 1] 之间", file=sys.stderr)
+            sys.exit(1)
+    elif args.sample_compare:
+        print("错误: --sample-compare 需要同时指定 --sample", file=sys.stderr)
+        sys.exit(1)
+    if args.jobs < 1:
+        print("错误: --jobs 至少为 1", file=sys.stderr)
+        sys.exit(1)
+    if args.metrics_max_series < 0:
+        print("错误: --metrics-max-series 不能为负数", file=sys.stderr)
+        sys.exit(1)
+    
+    # 执行计划：只探测、不分析
+    if args.explain:
+        if args.reduce or args.db:
+            print("错误: --explain 不能与 --reduce / --db 同时使用", file=sys.stderr)
+            sys.exit(1)
+        print_plan(plan_repos(list(repo_list), args.start, args.end, args.jobs, args.sample is not None, args.refs),
+                   args.jobs)
+        return
     
     analyzer_instance = None
     multi_analyzer_instance = None
+    event_store = None
+    partial_writer = PartialWriter(args.map_output) if args.map_output else None
+    dedupe_set = create_digest_set(args.dedupe, args.dedupe_capacity, args.dedupe_fpr) if args.dedupe else None
+    run_started = time.perf_counter()
+    scan_seconds = None
     
     try:
         if is_multi_repo:
-            # ========== 多仓库模式 ==========
-            print("\n🚀 启动多仓库汇总分析模式")
-            
-            multi_analyzer_instance = MultiRepoAnalyzer(
-                repo_list=repo_list,
-                start_date=args.start,
-                end_date=args.end,
-                author=args.author,
-                project_name=args.project_name
-            )
-            
-            # 执行分析
-            result = multi_analyzer_instance.analyze()
+            if args.reduce:
+                # ========== reduce 模式：合并中间结果 ==========
+                print("\n🚀 启动 reduce 模式，合并中间结果")
+                result = reduce_partials(args.reduce, args.project_name, dedupe_set)
+            elif args.db:
+                # ========== 事件库模式：聚合 SQL 查询 ==========
+                event_store = CommitEventStore(args.db)
+                has_repo_args = any([args.repo, args.url, args.repos, args.urls, args.input_file, args.scan, hierarchy])
+                if args.ingest:
+                    repo_list = list(repo_list)
+                    print(f"\n📥 增量导入 commit 事件库: {args.db}")
+                    ingested, added, failed = event_store.ingest(repo_list)
+                    print(f"✓ 导入完成: {ingested} 个仓库，新增 {added} 个 commit" +
+                          (f"，{failed} 个失败" if failed else ""))
+                print(f"\n🔎 从事件库查询: {args.db}")
+                result, multi_analyzer_instance = event_store.query(
+                    start_date=args.start,
+                    end_date=args.end,
+                    author=args.author,
+                    repo_specs=repo_list if has_repo_args or args.ingest else None,
+                    project_name=args.project_name or (hierarchy['name'] if hierarchy else None),
+                    dedupe=bool(args.dedupe),
+                    period=args.period,
+                    windows=windows
+                )
+                if hierarchy:
+                    repo_index = {repo.path: repo for repo in result['repo_results']}
+                    result['hierarchy'], _ = rollup_hierarchy(hierarchy, repo_index, multi_analyzer_instance)
+            else:
+                # ========== 多仓库模式 ==========
+                print("\n🚀 启动多仓库汇总分析模式")
+                
+                multi_analyzer_instance = MultiRepoAnalyzer(
+                    repo_list=repo_list,
+                    start_date=args.start,
+                    end_date=args.end,
+                    author=args.author,
+                    project_name=args.project_name or (hierarchy['name'] if hierarchy else None),
+                    dedupe_set=dedupe_set,
+                    period=args.period,
+                    partial_writer=partial_writer,
+                    windows=windows,
+                    jobs=args.jobs,
+                    refs=args.refs,
+                    calendar=calendar,
+                    watch=args.watch
+                )
+                
+                # 执行分析
+                result = multi_analyzer_instance.analyze()
+                
+                # 层级汇总：复用已扫描的仓库结果逐级合并
+                if hierarchy:
+                    repo_index = {repo.path: repo for repo in result['repo_results']}
+                    result['hierarchy'], _ = rollup_hierarchy(hierarchy, repo_index, multi_analyzer_instance)
             project_name = result['project_name']
+            scan_seconds = time.perf_counter() - run_started
             
-            # 生成HTML报告
-            output_file = generate_html(result, args.output, project_name)
+            if partial_writer:
+                # map 模式只输出中间结果文件
+                output_file = partial_writer.close(result, args.author)
+            elif args.site:
+                # 静态站点模式：增量更新站点，打开索引页
+                output_file, rendered, total_pages = build_static_site(
+                    result, args.site,
+                    multi_analyzer_instance or MultiRepoAnalyzer([], project_name=project_name),
+                    args.assets, args.report_workers, args.data_payload
+                )
+                print(f"🌐 站点已更新: 重新生成 {rendered}/{total_pages} 个页面")
+            else:
+                output_file = args.output or get_default_output_filename(project_name, True)
+                
+                # 先并行生成单仓库报告，汇总页的仓库列表会链接到它们
+                if args.per_repo_reports is not None:
+                    report_dir = generate_per_repo_reports(
+                        result, output_file, args.per_repo_reports or None, args.report_workers, args.assets,
+                        args.data_payload
+                    )
+                    print(f"📁 单仓库报告: {os.path.abspath(report_dir)} ({result['repo_count']} 个)")
+                
+                # 生成HTML报告
+                output_file = generate_html(result, output_file, project_name, args.assets,
+                                            data_mode=args.data_payload)
             
             # 打印结果摘要
             print("\n" + "="*60)
@@ -1501,31 +6992,116 @@ def main():
                 else:
                     print("显示基本信息")
             
+            if result.get('dedupe'):
+                print(f"去重跳过: {result['duplicate_count']} 个重复 commit")
+            
+            if result.get('calendar'):
+                print_day_types(result['calendar'], result['day_types'])
+            
             if result.get('failed_count', 0) > 0:
                 print(f"⚠️  失败仓库: {result['failed_count']} 个")
             
+            if result.get('hierarchy'):
+                print("-"*60)
+                print_hierarchy(result['hierarchy'])
+            
             print("="*60)
             
         else:
             # ========== 单仓库模式（向后兼容）==========
             repo_info = repo_list[0]
             
-            analyzer_instance = Code996Analyzer(
-                start_date=args.start,
-                end_date=args.end,
-                author=args.author,
-                repo_path=repo_info['path'] if repo_info['type'] == 'local' else '.',
-                remote_url=repo_info['path'] if repo_info['type'] == 'remote' else None
-            )
+            if args.sample is not None:
+                analyzer_instance = SampledAnalyzer(
+                    start_date=args.start,
+                    end_date=args.end,
+                    author=args.author,
+                    repo_path=repo_info['path'] if repo_info['type'] == 'local' else '.',
+                    remote_url=repo_info['path'] if repo_info['type'] == 'remote' else None,
+                    rate=args.sample,
+                    tolerance=args.sample_tolerance
+                )
+            elif args.per_branch:
+                analyzer_instance = BranchAnalyzer(
+                    start_date=args.start,
+                    end_date=args.end,
+                    author=args.author,
+                    repo_path=repo_info['path'] if repo_info['type'] == 'local' else '.',
+                    remote_url=repo_info['path'] if repo_info['type'] == 'remote' else None,
+                    period=args.period,
+                    windows=windows,
+                    refs=args.refs or 'branches'
+                )
+            elif by_path:
+                analyzer_instance = PathAnalyzer(
+                    start_date=args.start,
+                    end_date=args.end,
+                    author=args.author,
+                    repo_path=repo_info['path'] if repo_info['type'] == 'local' else '.',
+                    remote_url=repo_info['path'] if repo_info['type'] == 'remote' else None,
+                    period=args.period,
+                    windows=windows,
+                    depth=by_path[0],
+                    limit=by_path[1],
+                    calendar=calendar
+                )
+            elif repo_info['type'] == 'archive':
+                analyzer_instance = ArchiveAnalyzer(
+                    repo_info['path'],
+                    start_date=args.start,
+                    end_date=args.end,
+                    author=args.author,
+                    period=args.period,
+                    windows=windows,
+                    calendar=calendar
+                )
+            else:
+                analyzer_instance = Code996Analyzer(
+                    start_date=args.start,
+                    end_date=args.end,
+                    author=args.author,
+                    repo_path=repo_info['path'] if repo_info['type'] == 'local' else '.',
+                    remote_url=repo_info['path'] if repo_info['type'] == 'remote' else None,
+                    period=args.period,
+                    windows=windows,
+                    refs=args.refs,
+                    notes='publish' if args.publish_notes else 'read' if args.notes else None,
+                    minutes=args.minutes,
+                    calendar=calendar
+                )
+            
+            # 大仓库按执行计划分片并行
+            if (args.jobs > 1 and args.sample is None and not args.per_branch and not by_path
+                    and repo_info['type'] != 'archive'):
+                plan = plan_repo(probe_repo(repo_info, args.start, args.end), args.jobs, refs=args.refs)
+                if plan['cache'] == 'cold':
+                    analyzer_instance.clone_remote_repo()
+                    plan = plan_repo(probe_repo({'path': analyzer_instance.repo_path, 'type': 'local'},
+                                                args.start, args.end), args.jobs, refs=args.refs)
+                analyzer_instance.shards = plan['shards']
+                print(f"执行计划: {PLAN_STRATEGY_LABELS[plan['strategy']]}" +
+                      (f" ×{plan['shards']}" if plan['shards'] > 1 else '') + f"（{plan['reason']}）")
             
             # 执行分析
             result = analyzer_instance.analyze()
+            scan_seconds = time.perf_counter() - run_started
+            if args.sample_compare:
+                print("\n正在完整统计以对比抽样误差...")
+                comparison = analyzer_instance.compare_exact(result)
+                print(f"完整统计耗时 {comparison['elapsed']}s，抽样耗时 {result['sample']['elapsed']}s，"
+                      f"加速比 {comparison['speedup']}x"
+                      f"{'（commit 数过少，抽样即完整统计，加速比没有参考意义）' if result['sample']['exhaustive'] else ''}")
+                print(f"996 指数误差 {comparison['index_996_error']:+d}（完整统计 {comparison['index_996']}，"
+                      f"{'在' if comparison['index_996_covered'] else '不在'}置信区间内），"
+                      f"加班占比误差 {comparison['overtime_ratio_error']:+d}%，"
+                      f"直方图分布偏差 {comparison['histogram_distance']:.2%}")
             
             # 获取项目名称
             project_name = analyzer_instance.get_project_name()
             
             # 生成HTML报告
-            output_file = generate_html(result, args.output, project_name)
+            output_file = generate_html(result, args.output, project_name, args.assets,
+                                        data_mode=args.data_payload)
             
             # 打印结果摘要
             print("\n" + "="*50)
@@ -1543,10 +7119,54 @@ def main():
                 else:
                     print("该项目为开源项目，只显示基本信息")
             print(f"总commit数: {result['total_count']}")
+            if result.get('refs'):
+                print_ref_contributions(result['refs'])
+            if result.get('branches'):
+                print_branch_breakdown(result['branches'])
+            if result.get('paths'):
+                print_path_breakdown(result['paths'])
+            if result.get('calendar'):
+                print_day_types(result['calendar'], result['day_types'])
+            if result.get('work_time_minutes'):
+                minutes = result['work_time_minutes']
+                print(f"分钟级上下班时间: {minutes['opening'] or '?'} ∼ {minutes['closing'] or '?'}"
+                      f"（σ={minutes['bandwidth']} 分钟高斯核平滑，{minutes['backend']}）")
+            if result.get('sample'):
+                sample = result['sample']
+                print(f"抽样: {sample['sampled']}/{sample['population']} 个 commit，"
+                      f"996指数 {sample['confidence']:.0%} 置信区间 {sample['index_996_ci']}，"
+                      f"加班占比 {sample['overtime_ratio_ci']}%")
             print("="*50)
         
+        # 时间窗口对比摘要
+        for window in result.get('windows', []):
+            print(f"[{window['name']}] {window['start_date']} ∼ {window['end_date']}: "
+                  f"{window['total_count']} commits，996指数 {window['index_996']}，加班占比 {window['overtime_ratio']}%")
+        
+        # JSON 结果
+        if args.json:
+            write_json_result(result, args.json)
+            print(f"📄 JSON 结果: {os.path.abspath(args.json)}")
+        
+        # OpenMetrics 指标
+        if args.metrics:
+            run_stats = {
+                'scan_seconds': scan_seconds,
+                'scanned_commits': result['total_count'] + result.get('duplicate_count', 0),
+                'failed_repos': result.get('failed_count', 0),
+                'cache': Code996Analyzer.clone_cache.run_stats if Code996Analyzer.clone_cache else None,
+            }
+            write_openmetrics(args.metrics, result, project_name, run_stats, args.metrics_max_series)
+            print(f"📈 OpenMetrics 指标: {os.path.abspath(args.metrics)}")
+        
         # ========== 共通部分：显示报告信息并打开浏览器 ==========
         abs_path = os.path.abspath(output_file)
+        if partial_writer:
+            print(f"\n✓ 中间结果已生成 ({partial_writer.record_count} 条 commit 记录)")
+            print(f"📁 保存位置: {abs_path}")
+            print(f"   合并: python code996_local.py --reduce {output_file} [更多文件...]")
+            return
+        
         print(f"\n✓ 报告已生成")
         print(f"📄 文件名: {os.path.basename(output_file)}")
         print(f"📁 保存位置: {abs_path}")
@@ -1555,6 +7175,37 @@ def main():
         if not args.no_browser:
             print(f"\n正在打开浏览器...")
             webbrowser.open(f'file://{abs_path}')
+        
+        # ========== 监听模式：refs 变化时增量更新并重写报告 ==========
+        if args.watch:
+            def publish(changed):
+                if multi_analyzer_instance:
+                    updated = multi_analyzer_instance.build_current_result(changed)
+                    if hierarchy:
+                        repo_index = {repo.path: repo for repo in updated['repo_results']}
+                        updated['hierarchy'], _ = rollup_hierarchy(hierarchy, repo_index, multi_analyzer_instance)
+                else:
+                    updated = analyzer_instance.build_full_result()
+                
+                if args.site:
+                    build_static_site(updated, args.site, multi_analyzer_instance, args.assets, args.report_workers,
+                                      args.data_payload)
+                else:
+                    if multi_analyzer_instance and args.per_repo_reports is not None:
+                        generate_per_repo_reports(updated, output_file, args.per_repo_reports or None,
+                                                  args.report_workers, args.assets, args.data_payload)
+                    generate_html(updated, output_file, project_name, args.assets, data_mode=args.data_payload)
+                if args.json:
+                    write_json_result(updated, args.json)
+                if args.metrics:
+                    write_openmetrics(args.metrics, updated, project_name, run_stats, args.metrics_max_series)
+                return updated
+            
+            if multi_analyzer_instance:
+                watched = [analyzer for _, analyzer in multi_analyzer_instance.repo_entries]
+            else:
+                watched = [analyzer_instance]
+            watch_repositories(watched, publish, args.watch_interval, multi_analyzer_instance)
     
     finally:
         # 清理临时文件
@@ -1562,6 +7213,8 @@ def main():
             analyzer_instance.cleanup()
         if multi_analyzer_instance:
             multi_analyzer_instance.cleanup()
+        if event_store:
+            event_store.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,120 @@
+"""
+测试公共工具：用 git fast-import 按指定的提交时间快速构造仓库
+
+所有测试只依赖本地 git，不访问网络。
+"""
+import base64
+import gzip
+import json
+import os
+import re
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import code996_local  # noqa: E402
+
+
+GIT_ENV = {
+    'GIT_CONFIG_NOSYSTEM': '1',
+    'GIT_AUTHOR_NAME': 'tester',
+    'GIT_AUTHOR_EMAIL': 'tester@example.com',
+    'GIT_COMMITTER_NAME': 'tester',
+    'GIT_COMMITTER_EMAIL': 'tester@example.com',
+}
+
+
+def git(cwd, *args, **kwargs):
+    """在 cwd 中执行 git 命令，返回 stdout"""
+    env = dict(os.environ, **GIT_ENV, **kwargs.pop('env', {}))
+    return subprocess.run(['git', '-C', str(cwd)] + list(args), check=True, capture_output=True,
+                          text=True, env=env, **kwargs).stdout
+
+
+def _signature(stamp):
+    moment = datetime.fromisoformat(stamp)
+    offset = moment.strftime('%z') or '+0000'
+    return f"tester <tester@example.com> {int(moment.timestamp())} {offset}"
+
+
+def add_commits(path, commits, branch='main', parent=None):
+    """
+    在 path 仓库的 branch 上追加 commit
+
+    Args:
+        commits: [时间] 或 [(时间, 修改的文件路径)]，时间为带时区的 ISO 8601（如 2024-03-04T10:15:00+08:00）
+        parent: 新分支的起点（引用或 SHA），默认接在 branch 当前的 tip 之后
+    """
+    lines = []
+    for seq, item in enumerate(commits):
+        stamp, filename = item if isinstance(item, tuple) else (item, None)
+        signature = _signature(stamp)
+        message = f"commit {seq} at {stamp}"
+        lines.append(f"commit refs/heads/{branch}")
+        lines.append(f"author {signature}")
+        lines.append(f"committer {signature}")
+        lines.append(f"data {len(message.encode())}")
+        lines.append(message)
+        if seq == 0:
+            start = parent or _tip(path, branch)
+            if start:
+                lines.append(f"from {start}")
+        if filename:
+            content = f"{stamp}\n"
+            lines.append(f"M 644 inline {filename}")
+            lines.append(f"data {len(content.encode())}")
+            lines.append(content.rstrip('\n'))
+        lines.append('')
+    subprocess.run(['git', '-C', str(path), 'fast-import', '--quiet'], input='\n'.join(lines) + '\n',
+                   check=True, capture_output=True, text=True, env=dict(os.environ, **GIT_ENV))
+    return git(path, 'rev-parse', f'refs/heads/{branch}').strip()
+
+
+def _tip(path, branch):
+    result = subprocess.run(['git', '-C', str(path), 'rev-parse', '--verify', '-q', f'refs/heads/{branch}'],
+                            capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def make_repo(path, commits, bare=False, branch='main'):
+    """创建仓库并按给定时间写入 commit（见 add_commits），返回 tip SHA"""
+    os.makedirs(path, exist_ok=True)
+    git(path, 'init', '-q', '--bare' if bare else '--no-bare', '-b', branch)
+    tip = add_commits(path, commits, branch)
+    if not bare:
+        git(path, 'checkout', '-q', '-f', branch)
+    return tip
+
+
+def stamps(day, hours, tz='+08:00'):
+    """同一天若干整点的 commit 时间"""
+    return [f"{day}T{hour:02d}:00:00{tz}" for hour in hours]
+
+
+def run_main(monkeypatch, *argv):
+    """以命令行参数运行 main()，返回退出码（正常结束为 0）"""
+    monkeypatch.setattr(sys, 'argv', ['code996_local.py'] + [str(arg) for arg in argv])
+    try:
+        code996_local.main()
+    except SystemExit as e:
+        return e.code or 0
+    return 0
+
+
+def report_data(html):
+    """取出报告页面中嵌入的报告数据（inline / gzip 两种模式）"""
+    match = re.search(r'<script type="([^"]+)" id="report-data"([^>]*)>(.*?)</script>', html, re.S)
+    content_type, attrs, payload = match.groups()
+    if 'data-encoding="gzip"' in attrs:
+        assert content_type == 'application/octet-stream'
+        payload = gzip.decompress(base64.b64decode(payload)).decode('utf-8')
+    return json.loads(payload)
+
+
+@pytest.fixture
+def c996():
+    return code996_local
@@ -0,0 +1,84 @@
+"""直接分析 git bundle 与 .git 目录的 tar 包（PackReader 流式解析，不解包、不调用 git）"""
+import subprocess
+import tarfile
+
+import pytest
+
+from conftest import add_commits, git, make_repo, stamps
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / 'legacy'
+    make_repo(path, [(stamp, 'a.txt') for stamp in stamps('2024-03-04', range(8, 20))])
+    add_commits(path, stamps('2024-03-09', [23]), branch='feature', parent='main~2')
+    git(path, 'gc', '-q')
+    # gc 之后的 commit 以松散对象保存
+    add_commits(path, [(stamp, 'b.txt') for stamp in stamps('2024-03-10', [1, 2])])
+    git(path, 'checkout', '-q', '-f', 'main')
+    return path
+
+
+def histogram_of(analyzer):
+    return list(analyzer.analyze()['histogram'])
+
+
+def expected_histogram(c996, repo):
+    return histogram_of(c996.Code996Analyzer(start_date='2024-01-01', end_date='2024-12-31', repo_path=str(repo)))
+
+
+def archive_histogram(c996, path):
+    assert c996.classify_repo(str(path))['type'] == 'archive'
+    return histogram_of(c996.ArchiveAnalyzer(str(path), start_date='2024-01-01', end_date='2024-12-31'))
+
+
+def test_bundle_matches_git_log(tmp_path, c996, repo):
+    bundle = tmp_path / 'legacy.bundle'
+    git(repo, 'bundle', 'create', str(bundle), '--all')
+    histogram = archive_histogram(c996, bundle)
+    assert sum(histogram) == 14  # 只统计 HEAD 可达的 commit，不含 feature 分支
+    assert histogram == expected_histogram(c996, repo)
+
+
+def test_incremental_bundle_counts_included_commits(tmp_path, c996, repo):
+    bundle = tmp_path / 'recent.bundle'
+    git(repo, 'bundle', 'create', str(bundle), 'main~3..main')
+    assert sum(archive_histogram(c996, bundle)) == 3
+
+
+@pytest.mark.parametrize('suffix, mode', [('.tar.gz', 'w:gz'), ('.tar', 'w'), ('.tar.xz', 'w:xz')])
+def test_worktree_tarball_with_packs_and_loose_objects(tmp_path, c996, repo, suffix, mode):
+    archive = tmp_path / f'legacy{suffix}'
+    with tarfile.open(archive, mode) as tar:
+        tar.add(repo / '.git', arcname='legacy/.git')
+    assert archive_histogram(c996, archive) == expected_histogram(c996, repo)
+
+
+def test_bare_tarball(tmp_path, c996, repo):
+    bare = tmp_path / 'legacy.git'
+    git(tmp_path, 'clone', '-q', '--bare', str(repo), str(bare))
+    archive = tmp_path / 'legacy-bare.tgz'
+    with tarfile.open(archive, 'w:gz') as tar:
+        tar.add(bare, arcname='.')
+    assert archive_histogram(c996, archive) == expected_histogram(c996, repo)
+
+
+def test_pack_reader_yields_every_commit(tmp_path, c996, repo):
+    revs = git(repo, 'rev-list', '--all').split()
+    pack = subprocess.run(['git', '-C', str(repo), 'pack-objects', '--stdout', '--revs'], input=git(repo, 'rev-parse', '--branches').encode(),
+                          capture_output=True, check=True).stdout
+    path = tmp_path / 'all.pack'
+    path.write_bytes(pack)
+    with open(path, 'rb') as f:
+        commits = dict(c996.PackReader(f).iter_commits())
+    assert sorted(commits) == sorted(revs)
+    parents, ident, *_ = c996.parse_commit_object(commits[revs[0]])
+    assert 'tester' in ident and len(parents) == 1
+
+
+def test_missing_objects_is_an_error(tmp_path, c996):
+    archive = tmp_path / 'empty.tar'
+    with tarfile.open(archive, 'w') as tar:
+        tar.add(__file__, arcname='README')
+    with pytest.raises(SystemExit):
+        archive_histogram(c996, archive)
@@ -0,0 +1,69 @@
+"""--by-path：一次 git log --name-only 统计每个目录前缀的直方图"""
+import pytest
+
+from conftest import add_commits, git, make_repo, run_main, stamps
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / 'mono'
+    files = ['services/api/main.go'] * 4 + ['services/web/app.js'] * 3 + ['README.md'] + ['文档/说明.md'] * 2
+    make_repo(path, list(zip(stamps('2024-03-04', range(9, 19)), files)))
+    add_commits(path, [(stamps('2024-03-05', [22])[0], 'services/web/late.js')], branch='feature', parent='main~1')
+    env = {'GIT_AUTHOR_DATE': '2024-03-05T23:00:00+08:00', 'GIT_COMMITTER_DATE': '2024-03-05T23:00:00+08:00'}
+    git(path, 'merge', '-q', '--no-ff', '-m', 'merge feature', 'feature', env=env)
+    # 同时修改两个服务的 commit 在两个前缀中各计一次
+    for name in ('services/api/shared.go', 'services/web/shared.js'):
+        (path / name).write_text('shared\n', encoding='utf-8')
+    git(path, 'add', '-A')
+    env = {'GIT_AUTHOR_DATE': '2024-03-06T20:30:00+08:00', 'GIT_COMMITTER_DATE': '2024-03-06T20:30:00+08:00'}
+    git(path, 'commit', '-q', '-m', 'both', env=env)
+    return path
+
+
+def by_path(c996, repo, depth, limit=50):
+    analyzer = c996.PathAnalyzer(start_date='2024-01-01', end_date='2024-12-31', repo_path=str(repo),
+                                 depth=depth, limit=limit)
+    return analyzer.analyze()['paths']
+
+
+def counts(paths):
+    return {item['path']: item['total_count'] for item in paths['prefixes']}
+
+
+def test_parse_by_path(c996):
+    assert c996.parse_by_path('2') == (2, c996.PATH_DEFAULT_LIMIT)
+    assert c996.parse_by_path('depth=3, max=10') == (3, 10)
+    for value in ['max=10', 'depth=0', 'depth=x', 'level=2']:
+        with pytest.raises(SystemExit):
+            c996.parse_by_path(value)
+
+
+def test_prefixes_by_depth(c996, repo):
+    one = by_path(c996, repo, 1)
+    assert counts(one) == {'services': 9, '文档': 2, '/': 1}
+    assert one['merge_count'] == 1 and one['other'] is None
+    two = by_path(c996, repo, 2)
+    assert counts(two) == {'services/api': 5, 'services/web': 5, '文档': 2, '/': 1}
+    web = next(item for item in two['prefixes'] if item['path'] == 'services/web')
+    assert web['histogram'][(2 - 1) * 24 + 22] == 1 and web['histogram'][(3 - 1) * 24 + 20] == 1
+
+
+def test_prefix_limit_folds_into_other(c996, repo):
+    paths = by_path(c996, repo, 2, limit=2)
+    assert len(paths['prefixes']) == 2
+    assert paths['other']['total_count'] == 3 and paths['other']['path'] == c996.PATH_OTHER
+
+
+def test_quoted_paths(c996):
+    analyzer = c996.PathAnalyzer(depth=2)
+    assert analyzer.prefix_of('"\\346\\226\\207\\346\\241\\243/a/b.md"') == '文档/a'
+    assert analyzer.prefix_of('"with \\"quote\\"/x"') == 'with "quote"'
+    assert analyzer.prefix_of('top.txt') == '/'
+
+
+def test_cli_report(tmp_path, monkeypatch, capsys, repo):
+    output = tmp_path / 'report.html'
+    assert run_main(monkeypatch, '--repo', repo, '--by-path', 'depth=2', '-o', output, '--no-browser') == 0
+    assert 'services/api' in capsys.readouterr().out
+    assert 'services/web' in output.read_text(encoding='utf-8')
@@ -0,0 +1,85 @@
+"""--calendar：按工作日历区分工作日、周末与节假日"""
+import json
+
+import pytest
+
+from conftest import make_repo, run_main, stamps
+
+
+WORKDAY, WEEKEND, HOLIDAY = 0, 1, 2
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / 'repo'
+    make_repo(path, stamps('2024-03-09', [10]) + stamps('2024-03-11', [10, 11, 12, 13])
+              + stamps('2024-04-04', [14, 15]) + stamps('2024-04-07', [10, 11, 12]))
+    return path
+
+
+def test_builtin_cn(c996):
+    calendar = c996.WorkCalendar(['cn'])
+    assert calendar.describe() == {'name': 'cn', 'start': '2022-01-01', 'end': '2026-12-31'}
+    assert [calendar.classify(day) for day in
+            ['2024-03-11', '2024-03-09', '2024-04-04', '2024-04-06', '2024-04-07', '2024-10-12']] == \
+        [WORKDAY, WEEKEND, HOLIDAY, HOLIDAY, WORKDAY, WORKDAY]
+    # 日历范围之外只按星期几区分
+    assert [calendar.classify(day) for day in ['2021-10-01', '2021-10-02', '2027-10-01']] == \
+        [WORKDAY, WEEKEND, WORKDAY]
+
+
+def test_custom_calendar_layers(tmp_path, c996):
+    team = tmp_path / 'team.json'
+    team.write_text(json.dumps({'holidays': ['2024-04-07', '2024-12-24:2024-12-26'], 'workdays': ['2024-04-06'],
+                                'weekend': [5, 6]}), encoding='utf-8')
+    calendar = c996.WorkCalendar(['cn', str(team)])
+    assert calendar.name == 'cn+team'
+    assert calendar.classify('2024-04-07') == HOLIDAY  # 后面的日历覆盖 cn 的调休上班
+    assert calendar.classify('2024-04-06') == WORKDAY
+    assert [calendar.classify(day) for day in ['2024-12-23', '2024-12-25', '2024-03-08', '2024-03-10']] == \
+        [WORKDAY, HOLIDAY, WEEKEND, WORKDAY]
+
+
+@pytest.mark.parametrize('spec', [
+    {'holidays': ['2024-02-30']},
+    {'holidays': ['2024-01-01'], 'weekend': [0]},
+    {'holidays': '2024-01-01'},
+    {},
+    [],
+])
+def test_invalid_calendar(tmp_path, c996, spec):
+    path = tmp_path / 'bad.json'
+    path.write_text(json.dumps(spec), encoding='utf-8')
+    with pytest.raises(SystemExit):
+        c996.WorkCalendar([str(path)])
+
+
+def test_missing_calendar(c996):
+    with pytest.raises(SystemExit):
+        c996.WorkCalendar(['no-such-calendar'])
+
+
+def test_day_types(c996, repo):
+    def analyze(calendar):
+        return c996.Code996Analyzer(start_date='2024-01-01', end_date='2024-12-31', repo_path=str(repo),
+                                    calendar=calendar).analyze()
+
+    plain = analyze(None)
+    result = analyze(c996.WorkCalendar(['cn']))
+    assert 'day_types' not in plain
+    assert result['day_types'] == [7, 1, 2]
+    assert result['calendar']['name'] == 'cn'
+    assert plain['total_count'] == result['total_count'] == 10
+
+
+def test_aggregate_and_report(tmp_path, monkeypatch, capsys, c996, repo):
+    other = tmp_path / 'other'
+    make_repo(other, stamps('2024-10-01', [20]))
+    listing = tmp_path / 'repos.txt'
+    listing.write_text(f"{repo}\n{other}\n", encoding='utf-8')
+    output = tmp_path / 'report.html'
+    assert run_main(monkeypatch, '--input-file', listing, '--calendar', 'cn', '--start', '2024-01-01',
+                    '--end', '2024-12-31', '-o', output, '--no-browser') == 0
+    html = output.read_text(encoding='utf-8')
+    assert '节假日 3</strong>' in html
+    assert '节假日' in capsys.readouterr().out
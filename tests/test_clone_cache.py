@@ -0,0 +1,122 @@
+"""online_project 克隆缓存：命中复用、LRU 淘汰（file:// 远程仓库，不访问网络）"""
+import json
+import os
+import subprocess
+import time
+
+import pytest
+
+from conftest import add_commits, make_repo, stamps
+
+
+@pytest.fixture
+def remotes(tmp_path):
+    urls = []
+    for name in ('alpha', 'beta', 'gamma'):
+        path = tmp_path / 'remotes' / 'team' / f'{name}.git'
+        make_repo(path, [(stamp, f'{name}.txt') for stamp in stamps('2024-03-04', range(9, 15))], bare=True)
+        urls.append(path.as_uri())
+    return urls
+
+
+def index_of(cache):
+    with open(os.path.join(cache.root, cache.INDEX_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_parse_size(c996):
+    assert c996.parse_size('500M') == 500 * 1024 ** 2
+    assert c996.parse_size('1.5GiB') == int(1.5 * 1024 ** 3)
+    assert c996.parse_size('2048') == 2048
+    with pytest.raises(ValueError):
+        c996.parse_size('lots')
+
+
+def test_entry_names_are_stable_and_distinct(c996):
+    cache = c996.CloneCache('unused')
+    first = cache.entry_name('https://github.com/a/proj.git')
+    assert first == cache.entry_name('https://github.com/a/proj.git/') and first.startswith('a-proj-')
+    assert first != cache.entry_name('https://gitlab.com/a/proj.git')
+
+
+def test_second_analysis_hits_cache_and_fetches(tmp_path, monkeypatch, c996, remotes):
+    cache = c996.CloneCache(str(tmp_path / 'cache'))
+    monkeypatch.setattr(c996.Code996Analyzer, 'clone_cache', cache)
+
+    def analyze():
+        analyzer = c996.Code996Analyzer(start_date='2024-01-01', remote_url=remotes[0])
+        try:
+            return analyzer.analyze()['total_count']
+        finally:
+            analyzer.cleanup()
+
+    assert analyze() == 6
+    add_commits(remotes[0][len('file://'):], stamps('2024-03-05', [22]))
+    assert analyze() == 7
+    assert cache.run_stats['hits'] == 1 and cache.run_stats['misses'] == 1
+    assert (index_of(cache)['hits'], index_of(cache)['misses']) == (1, 1)
+    assert cache._held == {}
+
+
+def test_lru_eviction_skips_entries_in_use(tmp_path, c996, remotes):
+    cache = c996.CloneCache(str(tmp_path / 'cache'))
+    paths = []
+    for url in remotes[:2]:
+        path, hit = cache.checkout(url)
+        assert not hit
+        paths.append(path)
+        time.sleep(0.01)
+    cache.release(paths[1])
+    # 第一个条目仍在使用中（持有共享锁），超出容量时只能淘汰第二个
+    cache.max_bytes = 1
+    latest, _ = cache.checkout(remotes[2])
+    assert sorted(entry['url'] for entry in index_of(cache)['entries'].values()) == [remotes[0], remotes[2]]
+    assert not os.path.exists(paths[1])
+    cache.release(paths[0])
+    cache.release(latest)
+
+    # 释放后按最后使用时间淘汰，容量只够一个条目时保留最近使用的
+    cache.max_bytes = c996.directory_size(latest)
+    cache.gc()
+    assert [entry['url'] for entry in index_of(cache)['entries'].values()] == [remotes[2]]
+    assert index_of(cache)['evictions'] == 2
+
+
+def test_max_age_eviction(tmp_path, c996, remotes):
+    cache = c996.CloneCache(str(tmp_path / 'cache'))
+    path, _ = cache.checkout(remotes[0])
+    cache.release(path)
+    cache.max_age_days = 0
+    cache.gc()
+    assert index_of(cache)['entries'] == {}
+    assert not os.path.exists(path)
+
+
+def test_adopts_clones_left_by_older_versions(tmp_path, capsys, c996, remotes):
+    root = tmp_path / 'cache'
+    root.mkdir()
+    # 旧版本的目录名：项目名，重名时加时间戳
+    for name in ('team-alpha', 'team-alpha_20240101_120000', 'team-beta'):
+        url = remotes[1] if name == 'team-beta' else remotes[0]
+        subprocess.run(['git', 'clone', '-q', '--bare', url, str(root / name)], check=True, capture_output=True)
+    os.utime(root / 'team-alpha_20240101_120000', (1, 1))
+    (root / 'notes').mkdir()
+
+    cache = c996.CloneCache(str(root))
+    path, hit = cache.checkout(remotes[0])
+    assert hit and path == str(root / cache.entry_name(remotes[0]))
+    assert '纳入缓存索引' in capsys.readouterr().out
+    assert sorted(os.listdir(root)) == sorted([
+        '.cache-index.json', '.cache.lock', 'notes', 'team-alpha_20240101_120000',
+        cache.entry_name(remotes[0]), cache.entry_name(remotes[0]) + '.lock', cache.entry_name(remotes[1]),
+        cache.entry_name(remotes[1]) + '.lock'])
+    entries = index_of(cache)['entries']
+    assert entries['team-alpha_20240101_120000']['url'] == remotes[0] and len(entries) == 3
+    assert all(entry['size'] > 0 for entry in entries.values())
+    cache.release(path)
+
+    # 旧克隆计入容量，按最后使用时间最先被淘汰
+    cache.max_bytes = sum(entry['size'] for entry in entries.values()) - 1
+    cache.gc()
+    assert 'team-alpha_20240101_120000' not in index_of(cache)['entries']
+    assert not (root / 'team-alpha_20240101_120000').exists() and (root / 'notes').exists()
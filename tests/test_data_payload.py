@@ -0,0 +1,73 @@
+"""--data-payload gzip：报告数据压缩为一个 gzip+base64 数据块，区块延迟渲染"""
+import re
+
+from conftest import make_repo, report_data, run_main, stamps
+from test_repo_table import aggregate
+
+
+def lazy_placeholders(html):
+    return re.findall(r"<div class='lazy-section' data-section='(\w+)'></div>", html)
+
+
+def test_gzip_payload_round_trip(c996):
+    result = aggregate(c996, 50)
+    inline = c996.render_report(result, 'fleet')
+    packed = c996.render_report(result, 'fleet', data_mode='gzip')
+    assert 'data-encoding="gzip"' in packed and 'data-encoding' not in inline
+
+    data = report_data(packed)
+    plain = report_data(inline)
+    assert data['charts'] == plain['charts'] and data['repos'] == plain['repos']
+    assert lazy_placeholders(packed) == ['repo_list'] and lazy_placeholders(inline) == []
+    # 延迟区块的 HTML 原样并入数据
+    assert data['sections']['repo_list'] in inline
+    assert c996.render_report(result, 'fleet', data_mode='gzip') == packed  # mtime=0，输出可复现
+
+
+def with_hierarchy(tmp_path, c996, result, groups):
+    """把汇总结果中的仓库按顺序分到 groups 个团队下，附加层级汇总"""
+    listing = tmp_path / 'teams.csv'
+    listing.write_text('repo,org,team\n' + ''.join(f"{repo.path},Org,Team {i % groups}\n"
+                                                    for i, repo in enumerate(result['repo_results'])))
+    root = c996.load_hierarchy(str(listing))
+    repo_index = {repo.path: repo for repo in result['repo_results']}
+    result['hierarchy'], _ = c996.rollup_hierarchy(root, repo_index, c996.MultiRepoAnalyzer([], project_name='fleet'))
+    return result
+
+
+def sizes(c996, result):
+    inline = c996.render_report(result, 'fleet')
+    packed = c996.render_report(result, 'fleet', data_mode='gzip')
+    return len(inline.encode('utf-8')), len(packed.encode('utf-8')), packed
+
+
+def test_large_aggregate_shrinks(tmp_path, c996):
+    inline, packed, html = sizes(c996, aggregate(c996, 5000))
+    assert len(report_data(html)['repos']['rows']) == 5000
+    assert packed * 2 < inline
+    # 层级树的 HTML 重复度高，压缩效果最明显
+    result = with_hierarchy(tmp_path, c996, aggregate(c996, 10000), 100)
+    inline, packed, html = sizes(c996, result)
+    assert lazy_placeholders(html) == ['hierarchy', 'repo_list']
+    assert packed * 5 < inline
+
+
+def test_single_repo_has_nothing_to_defer(c996):
+    result = aggregate(c996, 1)['repo_results'][0].result()
+    packed = c996.render_report(result, 'repo', data_mode='gzip')
+    assert lazy_placeholders(packed) == [] and report_data(packed)['sections'] == {}
+
+
+def test_cli(tmp_path, monkeypatch):
+    paths = []
+    for i in range(2):
+        paths.append(tmp_path / f'repo{i}')
+        make_repo(paths[-1], stamps('2024-03-04', range(9, 12 + i)))
+    listing = tmp_path / 'repos.txt'
+    listing.write_text('\n'.join(map(str, paths)) + '\n', encoding='utf-8')
+    output = tmp_path / 'report.html'
+    assert run_main(monkeypatch, '--input-file', listing, '--data-payload', 'gzip', '-o', output,
+                    '--no-browser') == 0
+    data = report_data(output.read_text(encoding='utf-8'))
+    assert [row[2] for row in data['repos']['rows']] == [3, 4]
+    assert run_main(monkeypatch, '--input-file', listing, '--data-payload', 'brotli', '--no-browser') == 2
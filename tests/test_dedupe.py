@@ -0,0 +1,60 @@
+"""--dedupe：跨仓库 commit 去重集合与多仓库汇总"""
+import hashlib
+import random
+
+from conftest import add_commits, git, make_repo, stamps
+
+
+def digests(count, seed):
+    rng = random.Random(seed)
+    return [hashlib.sha1(rng.randbytes(16)).digest() for _ in range(count)]
+
+
+def test_sorted_set_is_exact_across_merges(c996, monkeypatch):
+    monkeypatch.setattr(c996.SortedDigestSet, 'MIN_PENDING', 64)
+    digest_set = c996.SortedDigestSet()
+    values = digests(5000, seed=1)
+    assert all(digest_set.add(value) for value in values)
+    assert not any(digest_set.add(value) for value in values[::7])
+    assert len(digest_set) == 5000
+    assert all(value in digest_set for value in values)
+    assert not any(value in digest_set for value in digests(2000, seed=2))
+    assert digest_set.nbytes <= 5000 * c996.SortedDigestSet.DIGEST_SIZE
+
+
+def test_bloom_set_has_no_false_negatives_and_bounded_false_positives(c996):
+    digest_set = c996.BloomDigestSet(capacity=20000, false_positive_rate=0.01)
+    values = digests(20000, seed=3)
+    for value in values:
+        digest_set.add(value)
+    assert all(value in digest_set for value in values)
+    others = digests(20000, seed=4)
+    false_positives = sum(value in digest_set for value in others)
+    assert false_positives / len(others) < 0.02
+
+
+def test_bloom_set_clear(c996):
+    digest_set = c996.BloomDigestSet(capacity=100)
+    value = digests(1, seed=5)[0]
+    assert digest_set.add(value)
+    assert not digest_set.add(value)
+    digest_set.clear()
+    assert len(digest_set) == 0 and value not in digest_set
+
+
+def test_fork_history_counted_once(tmp_path, c996):
+    upstream = tmp_path / 'upstream'
+    make_repo(upstream, stamps('2024-03-04', range(9, 19)))
+    fork = tmp_path / 'fork'
+    git(tmp_path, 'clone', '-q', str(upstream), str(fork))
+    add_commits(fork, stamps('2024-03-05', [20, 21, 22]), branch='main', parent='origin/main')
+    git(fork, 'reset', '-q', '--hard', 'main')
+    repos = [{'path': str(upstream), 'type': 'local'}, {'path': str(fork), 'type': 'local'}]
+
+    plain = c996.MultiRepoAnalyzer(repos, start_date='2024-01-01', end_date='2024-12-31').analyze()
+    deduped = c996.MultiRepoAnalyzer(repos, start_date='2024-01-01', end_date='2024-12-31',
+                                     dedupe_set=c996.SortedDigestSet()).analyze()
+    assert plain['total_count'] == 23
+    assert deduped['total_count'] == 13
+    assert deduped['duplicate_count'] == 10
+    assert [repo.duplicate_count for repo in deduped['repo_results']] == [0, 10]
@@ -0,0 +1,61 @@
+"""--hierarchy：层级文件解析与逐级汇总"""
+import json
+
+import pytest
+
+from conftest import make_repo, run_main, stamps
+
+
+@pytest.fixture
+def org(tmp_path):
+    repos = {
+        'api': stamps('2024-03-04', range(9, 13)),
+        'shared': stamps('2024-03-05', [21, 22]),
+        'web': stamps('2024-03-09', [10, 11, 12]),
+    }
+    paths = {}
+    for name, commits in repos.items():
+        paths[name] = str(tmp_path / name)
+        make_repo(paths[name], commits)
+    hierarchy = {'Org': {'Backend': {'Team A': [paths['api'], paths['shared']], 'Team B': [paths['shared']]},
+                         'Web': [paths['web']]}}
+    path = tmp_path / 'org.json'
+    path.write_text(json.dumps(hierarchy))
+    return path, paths
+
+
+def rollup(c996, hierarchy_path):
+    root = c996.load_hierarchy(str(hierarchy_path))
+    analyzer = c996.MultiRepoAnalyzer(c996.hierarchy_repo_list(root), start_date='2024-01-01', end_date='2024-12-31')
+    result = analyzer.analyze()
+    repo_index = {repo.path: repo for repo in result['repo_results']}
+    summary, _ = c996.rollup_hierarchy(root, repo_index, analyzer)
+    return result, summary
+
+
+def test_rollup_counts_each_repo_once_per_subtree(c996, org):
+    result, summary = rollup(c996, org[0])
+    assert len(result['repo_results']) == 3
+    assert summary['name'] == 'Org'
+    assert summary['total_count'] == result['total_count'] == 9
+    assert list(summary['histogram']) == list(result['histogram'])
+    backend, web = summary['children']
+    assert (backend['path'], backend['repo_count'], backend['total_count']) == ('Org/Backend', 2, 6)
+    assert [(team['name'], team['total_count']) for team in backend['children']] == [('Team A', 6), ('Team B', 2)]
+    assert (web['total_count'], web['repos'][0]['name']) == (3, 'web')
+
+
+def test_csv_hierarchy(tmp_path, c996):
+    path = tmp_path / 'teams.csv'
+    path.write_text("repo,org,team\n/r/api,Org,Backend\n/r/web,Org,Web\n# comment\n/r/ops,Org,\n")
+    root = c996.load_hierarchy(str(path))
+    assert root['name'] == 'Org'
+    assert root['repos'] == ['/r/ops']
+    assert [(child['name'], child['repos']) for child in root['children']] == \
+        [('Backend', ['/r/api']), ('Web', ['/r/web'])]
+
+
+def test_hierarchy_rejects_dedupe(tmp_path, monkeypatch, capsys, org):
+    code = run_main(monkeypatch, '--hierarchy', org[0], '--dedupe', '--no-browser', '-o', tmp_path / 'out.html')
+    assert code == 1
+    assert '--hierarchy 不能与 --dedupe 同时使用' in capsys.readouterr().err
@@ -0,0 +1,76 @@
+"""--metrics：OpenMetrics 文本（textfile collector），序列数有上限"""
+import re
+
+import pytest
+
+from conftest import make_repo, run_main, stamps
+
+
+SAMPLE = re.compile(r'^([a-z_0-9]+)(?:\{((?:[a-z_]+="(?:[^"\\]|\\.)*",?)*)\})? (-?[0-9.e+]+)$')
+LABEL = re.compile(r'([a-z_]+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text):
+    """逐行校验 OpenMetrics 语法，返回 {(指标名, ((标签, 值), ...)): 数值}"""
+    lines = text.splitlines()
+    assert lines[-1] == '# EOF'
+    samples = {}
+    for line in lines[:-1]:
+        if line.startswith('#'):
+            assert re.match(r'^# (TYPE [a-z_0-9]+ gauge|UNIT [a-z_0-9]+ [a-z]+|HELP [a-z_0-9]+ .+)$', line), line
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name, labels, value = match.groups()
+        key = (name, tuple(LABEL.findall(labels or '')))
+        assert key not in samples, line
+        samples[key] = float(value)
+    return samples
+
+
+@pytest.fixture
+def repos(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f'repo{i}'
+        # repo0 commit 最多；repo4 全在晚上
+        hours = range(9, 19 - i) if i < 4 else [21, 22]
+        make_repo(path, stamps('2024-03-04', hours))
+        paths.append(path)
+    return paths
+
+
+def test_series_are_bounded(tmp_path, c996, repos):
+    result = c996.MultiRepoAnalyzer([{'path': str(p), 'type': 'local'} for p in repos],
+                                    start_date='2024-01-01', end_date='2024-12-31').analyze()
+    path = tmp_path / 'out' / 'code996.prom'
+    run_stats = {'scan_seconds': 2.0, 'scanned_commits': 36, 'failed_repos': 0,
+                 'cache': {'hits': 3, 'misses': 1, 'bytes': 4096}}
+    c996.write_openmetrics(str(path), result, 'fleet "A"', run_stats, max_series=2)
+    samples = parse(path.read_text(encoding='utf-8'))
+    assert [p.name for p in path.parent.iterdir()] == ['code996.prom']
+
+    commits = {dict(labels)['name']: value for (name, labels), value in samples.items()
+               if name == 'code996_commits'}
+    assert commits == {'fleet \\"A\\"': 36, 'repo0': 10, 'repo1': 9, '__other__': 17}
+    assert samples[('code996_folded_series', (('scope', 'repo'),))] == 3
+    merged = c996.Code996Analyzer().build_result(
+        [sum(counts) for counts in zip(*[repo.histogram for repo in result['repo_results'][2:]])])
+    assert samples[('code996_index', (('scope', 'repo'), ('name', '__other__')))] == merged['index_996']
+    assert samples[('code996_repos', (('scope', 'total'), ('name', 'fleet \\"A\\"')))] == 5
+    assert samples[('code996_scan_commits_per_second', ())] == 18
+    assert samples[('code996_clone_cache_hit_ratio', ())] == 0.75
+    assert samples[('code996_clone_bytes', ())] == 4096
+
+
+def test_cli_writes_metrics(tmp_path, monkeypatch, repos):
+    listing = tmp_path / 'repos.txt'
+    listing.write_text('\n'.join(str(p) for p in repos[:2]) + '\n', encoding='utf-8')
+    output = tmp_path / 'code996.prom'
+    assert run_main(monkeypatch, '--input-file', listing, '--no-browser', '-o', tmp_path / 'r.html',
+                    '--metrics', output, '--metrics-max-series', '10') == 0
+    samples = parse(output.read_text(encoding='utf-8'))
+    assert samples[('code996_folded_series', (('scope', 'repo'),))] == 0
+    assert samples[('code996_scanned_commits', ())] == 19
+    # 本地仓库不经过克隆缓存
+    assert samples.get(('code996_clone_cache_lookups', (('result', 'miss'),)), 0) == 0
@@ -0,0 +1,74 @@
+"""--minutes：分钟级直方图与平滑后的上下班时间"""
+import sys
+
+import pytest
+
+from conftest import make_repo, run_main, stamps
+
+
+def workday_stamps(start='09:30', end='18:30', step=10):
+    """2024-03-04 至 03-08 每天 start 到 end 之间每 step 分钟一个 commit"""
+    first = int(start[:2]) * 60 + int(start[3:])
+    last = int(end[:2]) * 60 + int(end[3:])
+    return [f"2024-03-{day:02d}T{minute // 60:02d}:{minute % 60:02d}:00+08:00"
+            for day in range(4, 9) for minute in range(first, last + 1, step)]
+
+
+def analyze(c996, repo, minutes=True):
+    analyzer = c996.Code996Analyzer(start_date='2024-01-01', end_date='2024-12-31', repo_path=str(repo),
+                                    minutes=minutes)
+    return analyzer, analyzer.analyze()
+
+
+def test_half_hour_schedule(tmp_path, c996):
+    repo = tmp_path / 'repo'
+    make_repo(repo, workday_stamps())
+    analyzer, result = analyze(c996, repo)
+    minutes = result['work_time_minutes']
+    assert 9 * 60 + 15 <= minutes['opening_minute'] <= 9 * 60 + 45
+    assert 18 * 60 + 15 <= minutes['closing_minute'] <= 18 * 60 + 45
+    assert minutes['opening'] == f"{minutes['opening_minute'] // 60:02d}:{minutes['opening_minute'] % 60:02d}"
+    assert len(minutes['profile']) == 1440 // c996.MINUTE_PROFILE_STEP
+    # 分钟级直方图大小固定，小时级指标不受影响
+    assert len(analyzer.minute_histogram) == c996.MINUTE_HISTOGRAM_SIZE
+    assert sum(analyzer.minute_histogram) == result['total_count']
+    _, hourly = analyze(c996, repo, minutes=False)
+    assert 'work_time_minutes' not in hourly
+    assert (hourly['index_996'], list(hourly['histogram'])) == (result['index_996'], list(result['histogram']))
+
+
+def test_no_working_hours(c996):
+    minutes = c996.detect_work_minutes([0] * c996.MINUTE_HISTOGRAM_SIZE)
+    assert (minutes['opening'], minutes['closing'], minutes['threshold']) == (None, None, 0)
+
+
+def test_smoothing_wraps_around_midnight(c996):
+    profile = [0] * 1440
+    profile[0] = 10
+    smoothed, _ = c996.smooth_minute_profile(profile)
+    assert smoothed[1439] == pytest.approx(smoothed[1]) and smoothed[1439] > 0
+    assert sum(smoothed) == pytest.approx(10)
+
+
+def test_numpy_matches_pure_python(monkeypatch, c996):
+    pytest.importorskip('numpy')
+    profile = [(minute * 7919) % 13 for minute in range(1440)]
+    vectorized, backend = c996.smooth_minute_profile(profile)
+    assert backend == 'numpy'
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+    pure, backend = c996.smooth_minute_profile(profile)
+    assert backend == 'python' and vectorized == pytest.approx(pure)
+
+
+def test_report_and_single_repo_only(tmp_path, monkeypatch):
+    repo = tmp_path / 'repo'
+    make_repo(repo, workday_stamps())
+    output = tmp_path / 'report.html'
+    assert run_main(monkeypatch, '--repo', repo, '--minutes', '-o', output, '--no-browser') == 0
+    assert '分钟级上下班时间' in output.read_text(encoding='utf-8')
+
+    other = tmp_path / 'other'
+    make_repo(other, stamps('2024-03-04', [10]))
+    listing = tmp_path / 'repos.txt'
+    listing.write_text(f"{repo}\n{other}\n", encoding='utf-8')
+    assert run_main(monkeypatch, '--input-file', listing, '--minutes', '--no-browser') == 1
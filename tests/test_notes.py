@@ -0,0 +1,89 @@
+"""--notes / --publish-notes：通过 refs/notes/code996 在克隆之间共享逐日直方图（本地 bare 仓库）"""
+import pytest
+
+from conftest import add_commits, git, make_repo, run_main, stamps
+
+
+NOTES_REF = 'refs/notes/code996'
+WINDOWS = ['Qingming=2024-04-01:2024-04-07', 'April=2024-04-01:2024-04-30']
+
+
+@pytest.fixture
+def origin(tmp_path):
+    path = tmp_path / 'origin.git'
+    make_repo(path, stamps('2024-03-04', range(9, 19)) + stamps('2024-04-04', [10, 11]), bare=True)
+    return path
+
+
+def clone(tmp_path, origin, name):
+    path = tmp_path / name
+    git(tmp_path, 'clone', '-q', str(origin), str(path))
+    return path
+
+
+def analyze(c996, repo, notes=None, calendar=None):
+    analyzer = c996.Code996Analyzer(start_date='2024-01-01', end_date='2024-12-31', repo_path=str(repo), notes=notes,
+                                    windows=c996.parse_windows(WINDOWS), calendar=calendar)
+    return analyzer.analyze()
+
+
+def window_summary(result):
+    return [(window['work_days'], window['index_996']) for window in result['windows']]
+
+
+def test_publish_then_reuse_in_another_clone(tmp_path, capsys, c996, origin):
+    publisher = clone(tmp_path, origin, 'publisher')
+    published = analyze(c996, publisher, notes='publish')
+    assert published['notes']['published'] and published['notes']['scanned'] == 12
+    base = git(publisher, 'rev-parse', 'HEAD').strip()
+    git(publisher, 'push', '-q', 'origin', NOTES_REF)
+
+    add_commits(origin, stamps('2024-04-07', [20, 21, 22]))
+    reader = clone(tmp_path, origin, 'reader')
+    git(reader, 'fetch', '-q', 'origin', f'{NOTES_REF}:{NOTES_REF}')
+    capsys.readouterr()
+    result = analyze(c996, reader, notes='read')
+    assert result['notes'] == {'base': base, 'scanned': 3, 'published': False}
+    assert '只读取之后新增的 3 个 commit' in capsys.readouterr().out
+
+    plain = analyze(c996, reader)
+    assert list(result['histogram']) == list(plain['histogram'])
+    assert [w['total_count'] for w in result['windows']] == [w['total_count'] for w in plain['windows']] == [5, 5]
+
+
+def test_calendar_day_types_from_notes(tmp_path, c996, origin):
+    repo = clone(tmp_path, origin, 'repo')
+    add_commits(repo, stamps('2024-04-07', [20, 21, 22]))  # 2024-04-07 为清明调休上班的周日
+    analyze(c996, repo, notes='publish')
+    calendar = c996.WorkCalendar(['cn'])
+    result = analyze(c996, repo, notes='read', calendar=calendar)
+    plain = analyze(c996, repo, calendar=calendar)
+    assert result['notes']['scanned'] == 0
+    assert result['day_types'] == plain['day_types'] == [13, 0, 2]
+    assert window_summary(result) == window_summary(plain)
+
+
+def test_without_published_notes_falls_back(tmp_path, capsys, monkeypatch, origin):
+    repo = clone(tmp_path, origin, 'repo')
+    assert run_main(monkeypatch, '--repo', repo, '--notes', '--no-browser', '-o', tmp_path / 'r.html') == 0
+    assert '按常规方式统计' in capsys.readouterr().out
+    assert git(repo, 'notes', f'--ref={NOTES_REF}', 'list') == ''
+
+
+def test_commit_before_1970_in_author_local_time(tmp_path, c996):
+    repo = tmp_path / 'old'
+    # 时间戳为正，但按作者所在时区是 1969-12-31
+    make_repo(repo, ['1969-12-31T18:00:00-08:00'] + stamps('2024-03-04', [10, 11]))
+    head = git(repo, 'rev-parse', 'HEAD').strip()
+    analyzer = c996.Code996Analyzer(start_date='1969-01-01', end_date='2024-12-31', repo_path=str(repo), notes='publish')
+    assert analyzer.analyze()['notes']['published']
+
+    note = git(repo, 'notes', f'--ref={NOTES_REF}', 'show', head)
+    header, days = c996.decode_day_histograms(note)
+    assert header['commit_count'] == 3
+    assert days[-1] == {(3 - 1) * 24 + 18: 1}  # 1969-12-31 周三 18 点
+
+    reader = c996.Code996Analyzer(start_date='1969-01-01', end_date='2024-12-31', repo_path=str(repo), notes='read')
+    result = reader.analyze()
+    assert result['notes']['scanned'] == 0 and result['total_count'] == 3
+    assert result['histogram'][(3 - 1) * 24 + 18] == 1
@@ -0,0 +1,80 @@
+"""--map-output / --reduce：中间结果文件的写出与流式合并"""
+import gzip
+import json
+
+import pytest
+
+from conftest import add_commits, git, make_repo, stamps
+
+
+def map_repos(c996, tmp_path, name, repos, period='month'):
+    writer = c996.PartialWriter(str(tmp_path / f'{name}.c996'))
+    result = c996.MultiRepoAnalyzer([{'path': str(path), 'type': 'local'} for path in repos],
+                                    start_date='2024-01-01', end_date='2024-12-31',
+                                    period=period, partial_writer=writer).analyze()
+    return writer.close(result), result
+
+
+@pytest.fixture
+def forked(tmp_path):
+    upstream = tmp_path / 'upstream'
+    make_repo(upstream, stamps('2024-03-04', range(9, 15)) + stamps('2024-04-01', [10, 11]))
+    fork = tmp_path / 'fork'
+    git(tmp_path, 'clone', '-q', str(upstream), str(fork))
+    add_commits(fork, stamps('2024-04-02', [21, 22]), branch='main', parent='origin/main')
+    git(fork, 'reset', '-q', '--hard', 'main')
+    return upstream, fork
+
+
+def test_reduce_without_dedupe_sums_headers(tmp_path, c996, forked):
+    first, first_result = map_repos(c996, tmp_path, 'a', [forked[0]])
+    second, second_result = map_repos(c996, tmp_path, 'b', [forked[1]])
+    result = c996.reduce_partials([first, second])
+    assert result['partial_count'] == 2
+    assert result['total_count'] == first_result['total_count'] + second_result['total_count'] == 18
+    assert list(result['histogram']) == [a + b for a, b in zip(first_result['histogram'], second_result['histogram'])]
+    assert sorted(result['periods']) == ['2024-03', '2024-04']
+    assert [repo.total_count for repo in result['repo_results']] == [8, 10]
+
+
+def test_reduce_with_dedupe_round_trips_records(tmp_path, c996, forked):
+    map_repos(c996, tmp_path, 'a', [forked[0]])
+    map_repos(c996, tmp_path, 'b', [forked[1]])
+    expected = c996.MultiRepoAnalyzer([{'path': str(path), 'type': 'local'} for path in forked],
+                                      start_date='2024-01-01', end_date='2024-12-31', period='month',
+                                      dedupe_set=c996.SortedDigestSet()).analyze()
+    result = c996.reduce_partials([str(tmp_path)], dedupe_set=c996.SortedDigestSet())
+    assert result['total_count'] == expected['total_count'] == 10
+    assert result['duplicate_count'] == 8
+    assert list(result['histogram']) == list(expected['histogram'])
+    assert {key: list(bucket) for key, bucket in result['periods'].items()} == \
+        {key: list(bucket) for key, bucket in expected['periods'].items()}
+
+
+def partial_header(c996, **fields):
+    header = {'format': c996.PARTIAL_FORMAT, 'version': c996.PARTIAL_VERSION, 'project_name': 'p',
+              'start_date': '1960-01-01', 'end_date': '2024-12-31', 'total_count': 1,
+              'histogram': [0] * c996.HISTOGRAM_SIZE, 'period': 'day', 'periods': {}, 'repos': []}
+    header.update(fields)
+    return json.dumps(header).encode() + b'\n'
+
+
+def test_pre_1970_commits_survive_round_trip(tmp_path, c996):
+    path = tmp_path / 'old.c996'
+    writer = c996.PartialWriter(str(path))
+    writer.add(b'\x01' * 20, '1969-07-20', 5)
+    writer.add(b'\x02' * 20, '2024-03-04', 6)
+    writer.close({'project_name': 'old', 'start_date': '1960-01-01', 'end_date': '2024-12-31',
+                  'total_count': 2, 'histogram': [0] * c996.HISTOGRAM_SIZE, 'period': 'day',
+                  'periods': {}, 'repo_results': []})
+    result = c996.reduce_partials([str(path)], dedupe_set=c996.SortedDigestSet())
+    assert result['total_count'] == 2
+    assert sorted(result['periods']) == ['1969-07-20', '2024-03-04']
+
+
+def test_rejects_newer_version(tmp_path, c996):
+    path = tmp_path / 'future.c996'
+    with gzip.open(path, 'wb') as f:
+        f.write(partial_header(c996, version=c996.PARTIAL_VERSION + 1))
+    with pytest.raises(ValueError, match='版本过新'):
+        c996.reduce_partials([str(path)])
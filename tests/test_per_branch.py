@@ -0,0 +1,54 @@
+"""--per-branch：一次遍历分支并集，按可达位集得到每个分支的直方图"""
+import pytest
+
+from conftest import add_commits, git, make_repo, run_main, stamps
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / 'repo'
+    make_repo(path, stamps('2024-03-04', range(9, 19)) + stamps('2024-03-05', range(9, 19)))
+    add_commits(path, stamps('2024-03-09', [10, 11, 12]), branch='release/1.0', parent='main~12')
+    add_commits(path, stamps('2024-03-12', [21, 22]), branch='release/1.1', parent='main~4')
+    add_commits(path, stamps('2024-03-13', [23]), branch='release/1.1')
+    return path
+
+
+def branch_analyzer(c996, repo, refs='branches'):
+    analyzer = c996.BranchAnalyzer(start_date='2024-01-01', end_date='2024-12-31', repo_path=str(repo), refs=refs)
+    return analyzer, analyzer.analyze()
+
+
+def test_matches_separate_runs_per_branch(c996, repo):
+    _, result = branch_analyzer(c996, repo)
+    assert result['total_count'] == 20 + 3 + 3
+    branches = {branch['name']: branch for branch in result['branches']}
+    assert [branch['name'] for branch in result['branches']] == ['main', 'release/1.1', 'release/1.0']
+    for name, exclusive in [('main', 4), ('release/1.0', 3), ('release/1.1', 3)]:
+        single = c996.Code996Analyzer(start_date='2024-01-01', end_date='2024-12-31', repo_path=str(repo),
+                                      refs=f'refs/heads/{name}').analyze()
+        branch = branches[name]
+        assert branch['histogram'] == list(single['histogram'])
+        assert (branch['total_count'], branch['index_996']) == (single['total_count'], single['index_996'])
+        assert branch['exclusive_count'] == exclusive
+
+
+def test_hundreds_of_branches(c996, repo):
+    shas = git(repo, 'rev-list', 'main').split()
+    updates = ''.join(f"create refs/heads/topic/{i:03d} {shas[i % len(shas)]}\n" for i in range(300))
+    git(repo, 'update-ref', '--stdin', input=updates)
+    analyzer, result = branch_analyzer(c996, repo)
+    assert len(analyzer.branches) == 303 and result['total_count'] == 26
+    for branch in result['branches']:
+        expected = int(git(repo, 'rev-list', '--count', f'refs/heads/{branch["name"]}').strip())
+        assert branch['total_count'] == expected
+    # 分支位集的种类远少于分支数
+    assert len({key // c996.HISTOGRAM_SIZE for key in analyzer.mask_counts}) <= len(shas) + 2
+
+
+def test_cli_report(tmp_path, monkeypatch, capsys, repo):
+    output = tmp_path / 'report.html'
+    assert run_main(monkeypatch, '--repo', repo, '--per-branch', '--refs', 'release/*',
+                    '-o', output, '--no-browser') == 0
+    assert 'release/1.1' in capsys.readouterr().out
+    assert 'release/1.0' in output.read_text(encoding='utf-8')
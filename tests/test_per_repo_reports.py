@@ -0,0 +1,37 @@
+"""--per-repo-reports：进程池并行渲染单仓库报告并在汇总页链接"""
+import os
+
+from conftest import make_repo, report_data, run_main, stamps
+
+
+def test_per_repo_reports_are_linked(tmp_path, monkeypatch, c996):
+    first, second = tmp_path / 'team-a' / 'app', tmp_path / 'team-b' / 'app'
+    make_repo(first, stamps('2024-03-04', [10, 11]))
+    make_repo(second, stamps('2024-03-05', [20]))
+    output = tmp_path / 'out' / 'fleet.html'
+    code = run_main(monkeypatch, '--repos', f'{first},{second}', '--start', '2024-01-01', '--end', '2024-12-31',
+                    '--per-repo-reports', '--report-workers', '2', '--no-browser', '-o', output)
+    assert code == 0
+
+    rows = report_data(output.read_text())['repos']['rows']
+    assert [(row[0], row[2], row[4]) for row in rows] == \
+        [('app', 2, 'fleet-repos/app.html'), ('app', 1, 'fleet-repos/app-2.html')]
+    for row in rows:
+        page = (output.parent / row[4]).read_text()
+        assert report_data(page)['charts']['hourChart']
+        assert 'repo-filter' not in page  # 单仓库报告没有仓库列表
+    assert sorted(os.listdir(output.parent / 'fleet-repos')) == ['app-2.html', 'app.html']
+
+
+def test_render_reports_parallel_matches_serial(tmp_path, c996):
+    calculator = c996.Code996Analyzer()
+    histogram = [0] * c996.HISTOGRAM_SIZE
+    histogram[34] = 3
+    tasks = []
+    for i in range(4):
+        result = calculator.build_result(histogram, '2024-01-01', '2024-12-31')
+        tasks.append((result, f'p{i}', str(tmp_path / 'pool' / f'p{i}.html'), 'cdn', None, 'inline'))
+    c996.render_reports_parallel(tasks, workers=2)
+    c996.render_reports_parallel([task[:2] + (task[2].replace('pool', 'serial'),) + task[3:] for task in tasks], workers=1)
+    for i in range(4):
+        assert (tmp_path / 'pool' / f'p{i}.html').read_text() == (tmp_path / 'serial' / f'p{i}.html').read_text()
@@ -0,0 +1,80 @@
+"""执行计划：廉价探测 + 按规模选择策略（--jobs / --explain）"""
+import pytest
+
+from conftest import git, make_repo, run_main, stamps
+
+
+def probe(commits, cost=None, repo_type='local', cache=None):
+    return {'repo': {'path': 'r', 'type': repo_type}, 'commits': commits, 'pack_bytes': None,
+            'commit_graph': commits is not None, 'cache': cache, 'cost': commits if cost is None else cost}
+
+
+@pytest.mark.parametrize('kwargs, options, strategy, shards', [
+    ({'commits': 500000}, {'jobs': 8}, 'sharded', 8),
+    ({'commits': 120000}, {'jobs': 8}, 'sharded', 4),
+    ({'commits': 500000}, {'jobs': 1}, 'stream', 1),
+    ({'commits': 500000}, {'jobs': 8, 'refs': 'all'}, 'stream', 1),
+    ({'commits': 500000}, {'jobs': 8, 'sample': True}, 'sample', 1),
+    ({'commits': 5000}, {'jobs': 8}, 'stream', 1),
+    ({'commits': None, 'cost': 10 ** 6}, {'jobs': 8}, 'stream', 1),
+    ({'commits': 0}, {'jobs': 8}, 'empty', 1),
+    ({'commits': None, 'cost': float('inf'), 'cache': 'cold'}, {'jobs': 8}, 'stream', 1),
+    ({'commits': None, 'cost': 0, 'repo_type': 'archive'}, {'jobs': 8}, 'archive', 1),
+])
+def test_plan_repo(c996, kwargs, options, strategy, shards):
+    plan = c996.plan_repo(probe(**kwargs), **options)
+    assert (plan['strategy'], plan['shards']) == (strategy, shards)
+    assert plan['reason']
+
+
+def test_probe_counts_commits_only_with_commit_graph(tmp_path, c996):
+    repo = tmp_path / 'repo'
+    make_repo(repo, stamps('2024-03-04', range(9, 15)))
+    spec = {'path': str(repo), 'type': 'local'}
+    before = c996.probe_repo(spec, '2024-01-01', '2024-12-31')
+    assert (before['commit_graph'], before['commits']) == (False, None)
+    assert before['pack_bytes'] > 0
+    git(repo, 'commit-graph', 'write', '--reachable')
+    after = c996.probe_repo(spec, '2024-01-01', '2024-12-31')
+    assert (after['commit_graph'], after['commits'], after['cost']) == (True, 6, 6)
+
+
+def test_sharded_run_matches_single_stream(tmp_path, monkeypatch, c996):
+    big, small = tmp_path / 'big', tmp_path / 'small'
+    make_repo(big, [f"2024-{m:02d}-{d:02d}T{h:02d}:00:00+08:00"
+                    for m in range(1, 13) for d in range(2, 29, 3) for h in (9, 13, 20)])
+    make_repo(small, stamps('2024-03-04', [10]))
+    git(big, 'commit-graph', 'write', '--reachable')
+    repos = [{'path': str(small), 'type': 'local'}, {'path': str(big), 'type': 'local'}]
+
+    plans = c996.plan_repos(repos, '2024-01-01', '2024-12-31', jobs=3)
+    assert [plan['repo']['path'] for plan in plans] == [str(big), str(small)]
+
+    monkeypatch.setattr(c996, 'PLAN_SHARD_MIN_COMMITS', 100)
+    monkeypatch.setattr(c996, 'PLAN_SHARD_MIN_SIZE', 50)
+    sharded_calls = []
+    original = c996.Code996Analyzer.run_git_log_sharded
+
+    def spy(self, *args):
+        sharded_calls.append(self.shards)
+        yield from original(self, *args)
+
+    monkeypatch.setattr(c996.Code996Analyzer, 'run_git_log_sharded', spy)
+    parallel = c996.MultiRepoAnalyzer(repos, start_date='2024-01-01', end_date='2024-12-31', jobs=3,
+                                      period='month').analyze()
+    assert sharded_calls == [3]
+    serial = c996.MultiRepoAnalyzer(repos, start_date='2024-01-01', end_date='2024-12-31', period='month').analyze()
+    assert parallel['total_count'] == serial['total_count'] == 325
+    assert list(parallel['histogram']) == list(serial['histogram'])
+    assert {k: list(v) for k, v in parallel['periods'].items()} == {k: list(v) for k, v in serial['periods'].items()}
+    # repo_results 仍按输入顺序排列
+    assert [repo.total_count for repo in parallel['repo_results']] == [1, 324]
+
+
+def test_explain_does_not_analyze(tmp_path, monkeypatch, capsys, c996):
+    repo = tmp_path / 'repo'
+    make_repo(repo, stamps('2024-03-04', [10]))
+    monkeypatch.setattr(c996.Code996Analyzer, 'analyze', lambda self: pytest.fail('--explain 不应执行分析'))
+    assert run_main(monkeypatch, '--repo', repo, '--explain', '-j', '4') == 0
+    out = capsys.readouterr().out
+    assert '执行计划（--jobs 4' in out and str(repo) in out
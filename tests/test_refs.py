@@ -0,0 +1,55 @@
+"""--refs：一次遍历所有选中引用的并集，共享的 commit 只统计一次"""
+import pytest
+
+from conftest import add_commits, git, make_repo, run_main, stamps
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / 'repo'
+    make_repo(path, stamps('2024-03-04', range(9, 19)))
+    add_commits(path, stamps('2024-03-09', [10, 11, 12]), branch='release/1.0', parent='main~5')
+    add_commits(path, stamps('2024-03-06', [21, 22]), branch='feature')
+    git(path, 'tag', '-a', '-m', 'v1', 'v1', 'main~2')
+    return path
+
+
+def analyze(c996, repo, refs):
+    analyzer = c996.Code996Analyzer(start_date='2024-01-01', end_date='2024-12-31', repo_path=str(repo), refs=refs)
+    return analyzer.analyze()
+
+
+def test_all_refs_in_one_walk(monkeypatch, c996, repo):
+    calls = []
+    original = c996.Code996Analyzer.run_git_log
+
+    def spy(self, *args):
+        calls.append(args)
+        yield from original(self, *args)
+
+    monkeypatch.setattr(c996.Code996Analyzer, 'run_git_log', spy)
+    result = analyze(c996, repo, 'all')
+    assert len(calls) == 1
+    assert result['total_count'] == 15  # main 10 + release 3 + feature 2
+    refs = result['refs']
+    assert (refs['selector'], refs['ref_count']) == ('all', 4)
+    contributions = {item['ref']: item['count'] for item in refs['contributions']}
+    assert sum(contributions.values()) == 15
+    assert contributions['release/1.0'] >= 3 and contributions['feature'] == 2
+    assert set(contributions) <= {'main', 'release/1.0', 'feature', 'v1'}
+
+
+def test_head_only_by_default(c996, repo):
+    result = analyze(c996, repo, None)
+    assert result['total_count'] == 10 and 'refs' not in result
+
+
+def test_pattern_selector(c996, repo):
+    result = analyze(c996, repo, 'release/*')
+    assert result['total_count'] == 8  # 分叉点之前的 5 个 + release 自己的 3 个
+    assert result['refs']['contributions'] == [{'ref': 'release/1.0', 'count': 8}]
+    assert analyze(c996, repo, 'branches')['refs']['ref_count'] == 3
+
+
+def test_unmatched_pattern_is_an_error(monkeypatch, c996, repo):
+    assert run_main(monkeypatch, '--repo', repo, '--refs', 'hotfix/*', '--no-browser') == 1
@@ -0,0 +1,80 @@
+"""RepoRecord：多仓库汇总中每个仓库只保存数字，dict 在序列化时才生成"""
+import json
+import tracemalloc
+
+import pytest
+
+from conftest import make_repo, run_main, stamps
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / 'repo'
+    make_repo(path, stamps('2024-03-04', range(9, 21)) + stamps('2024-03-09', [22, 23]) + stamps('2024-04-04', [10]))
+    return str(path)
+
+
+@pytest.fixture
+def result(c996, repo):
+    return c996.Code996Analyzer(start_date='2024-01-01', end_date='2024-12-31', repo_path=repo, period='month',
+                                windows=c996.parse_windows(['Q1=2024-01-01:2024-03-31']),
+                                calendar=c996.WorkCalendar(['cn'])).analyze()
+
+
+def normalized(value, c996):
+    return json.loads(json.dumps(value, default=c996.json_default))
+
+
+def test_round_trip(c996, result):
+    record = c996.RepoRecord('repo', '/src/repo', 'local', result, duplicate_count=2)
+    assert not hasattr(record, '__dict__')
+    assert normalized(record.result(), c996) == normalized(result, c996)
+    entry = normalized(record, c996)
+    assert (entry['name'], entry['type'], entry['duplicate_count']) == ('repo', 'local', 2)
+    assert 'report' not in entry and 'partial' not in entry
+    assert entry['result']['periods'] == {'2024-03': entry['result']['periods']['2024-03'],
+                                          '2024-04': entry['result']['periods']['2024-04']}
+
+    linked = record.with_report('repos/repo.html')
+    assert (linked.report, record.report) == ('repos/repo.html', None)
+    assert linked.histogram is record.histogram
+
+
+def test_histogram_width(c996):
+    assert c996.compact_histogram([0] * 167 + [255]).typecode == 'B'
+    assert c996.compact_histogram([0] * 167 + [256]).typecode == 'H'
+    assert c996.compact_histogram([0] * 167 + [1 << 16]).typecode == 'i'
+
+
+def test_update_replaces_metrics(c996, result):
+    record = c996.RepoRecord('repo', '/src/repo', 'local', result)
+    newer = dict(result, total_count=result['total_count'] + 1,
+                 histogram=[count + (index == 10) for index, count in enumerate(result['histogram'])])
+    record.update(newer)
+    assert record.total_count == sum(record.histogram) == result['total_count'] + 1
+
+
+def test_memory_per_repo(c996, repo):
+    plain = c996.Code996Analyzer(start_date='2024-01-01', end_date='2024-12-31', repo_path=repo).analyze()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    records = [c996.RepoRecord('repo', '/src/repo', 'local', plain) for _ in range(2000)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'lineno'))
+    # 记录本身加一个 168 字节的直方图数组，不含 dict 与列表
+    assert len(records) == 2000 and allocated / 2000 < 512
+
+
+def test_json_output_expands_records(tmp_path, monkeypatch, repo):
+    other = tmp_path / 'other'
+    make_repo(other, stamps('2024-03-05', [10, 22]))
+    listing = tmp_path / 'repos.txt'
+    listing.write_text(f"{repo}\n{other}\n", encoding='utf-8')
+    output = tmp_path / 'result.json'
+    assert run_main(monkeypatch, '--input-file', listing, '--start', '2024-01-01', '--end', '2024-12-31',
+                    '--json', output, '-o', tmp_path / 'r.html', '--no-browser') == 0
+    repos = json.loads(output.read_text(encoding='utf-8'))['repo_results']
+    assert [entry['result']['total_count'] for entry in repos] == [15, 2]
+    assert repos[1]['result']['hour_data'] == [{'time': '10', 'count': 1}, {'time': '22', 'count': 1}]
+    assert repos[1]['result']['description']
@@ -0,0 +1,42 @@
+"""汇总报告的仓库列表：行数据随报告数据嵌入，由页面虚拟列表渲染"""
+from conftest import report_data
+
+
+def aggregate(c996, count):
+    calculator = c996.Code996Analyzer()
+    histogram = [0] * c996.HISTOGRAM_SIZE
+    repos = []
+    for i in range(count):
+        repo_histogram = [0] * c996.HISTOGRAM_SIZE
+        repo_histogram[10 + i % 12] = i + 1
+        histogram = [a + b for a, b in zip(histogram, repo_histogram)]
+        result = calculator.build_result(repo_histogram, '2024-01-01', '2024-12-31')
+        repos.append(c996.RepoRecord(f'repo-{i}', f'/src/repo-{i}', ['local', 'remote', 'archive'][i % 3], result))
+    return c996.MultiRepoAnalyzer([], project_name='fleet').build_aggregate_result(histogram, repos, 0)
+
+
+def test_repo_table_rows(c996):
+    result = aggregate(c996, 3)
+    table = c996.repo_table_data(result['repo_results'], result['total_count'], links=[None, 'repos/b.html', None])
+    assert table['total'] == 6
+    assert [row[:3] for row in table['rows']] == [['repo-0', 'l', 1], ['repo-1', 'r', 2], ['repo-2', 'a', 3]]
+    assert [len(row) for row in table['rows']] == [4, 5, 4]
+    assert table['rows'][1][4] == 'repos/b.html'
+
+
+def test_page_markup_does_not_grow_with_repo_count(c996):
+    small = c996.render_report(aggregate(c996, 5), 'fleet')
+    large = c996.render_report(aggregate(c996, 2000), 'fleet')
+    assert len(report_data(large)['repos']['rows']) == 2000
+    strip = lambda html: html[:html.index('id="report-data"')]
+    # 只有汇总指标的数字不同，不随仓库数增长
+    assert abs(len(strip(large)) - len(strip(small))) < 1000
+    assert 'repo-1999' not in strip(large)
+
+
+def test_repo_names_cannot_close_the_data_script(c996):
+    result = aggregate(c996, 1)
+    result['repo_results'][0].name = '</script><b>x'
+    html = c996.render_report(result, 'fleet')
+    assert '</script><b>' not in html
+    assert report_data(html)['repos']['rows'][0][0] == '</script><b>x'
@@ -0,0 +1,51 @@
+"""预编译报告模板与 --assets cdn|inline|shared"""
+import base64
+import os
+import re
+
+import pytest
+
+
+def sample_result(c996):
+    histogram = [0] * c996.HISTOGRAM_SIZE
+    histogram[10] = histogram[40] = 2
+    return c996.Code996Analyzer().build_result(histogram, '2024-01-01', '2024-12-31')
+
+
+def font_sources(html):
+    return re.findall(r"src: url\('([^']*)'\)", html)
+
+
+def test_template_substitution(c996):
+    template = c996.ReportTemplate("<b>{{a}}</b>{{b}}{{a}}{ {c} }{{}}")
+    assert template.keys == ['a', 'b', 'a']
+    assert template.render({'a': 1, 'b': '{{a}}'}) == "<b>1</b>{{a}}1{ {c} }{{}}"
+    with pytest.raises(KeyError):
+        template.render({'a': 1})
+
+
+def test_report_template_placeholders_are_all_filled(c996):
+    html = c996.render_report(sample_result(c996), 'demo')
+    assert not re.search(r'\{\{\w+\}\}', html)
+    assert c996.REPORT_ASSETS['chart_xkcd'][1] in html
+    assert font_sources(html) == [c996.REPORT_ASSETS['font_vcr'][1], c996.REPORT_ASSETS['font_zpix'][1]]
+
+
+def test_inline_assets_embed_chart_library_and_fonts(tmp_path, c996):
+    output = c996.generate_html(sample_result(c996), str(tmp_path / 'r.html'), 'demo', 'inline')
+    html = open(output, encoding='utf-8').read()
+    assert 'cdn.jsdelivr' not in html and 'fastly.jsdelivr' not in html
+    assert c996.read_vendored_asset('chart_xkcd') in html
+    sources = font_sources(html)
+    assert [source.split(';')[0] for source in sources] == ['data:font/ttf', 'data:font/woff2']
+    for name, source in zip(['font_vcr', 'font_zpix'], sources):
+        with open(c996.vendored_asset_path(name), 'rb') as f:
+            assert base64.b64decode(source.split(',', 1)[1]) == f.read()
+
+
+def test_shared_assets_copy_fonts_next_to_script(tmp_path, c996):
+    output = c996.generate_html(sample_result(c996), str(tmp_path / 'site' / 'r.html'), 'demo', 'shared')
+    html = open(output, encoding='utf-8').read()
+    assert sorted(os.listdir(tmp_path / 'site' / 'assets')) == ['chart.xkcd.min.js', 'vcr-osd.ttf', 'zpix.woff2']
+    assert '<script src="assets/chart.xkcd.min.js" defer></script>' in html
+    assert font_sources(html) == ['assets/vcr-osd.ttf', 'assets/zpix.woff2']
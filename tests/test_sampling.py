@@ -0,0 +1,92 @@
+"""--sample：分层抽样估算与置信区间"""
+import random
+import threading
+
+import pytest
+
+from conftest import git, make_repo, run_main, stamps
+
+
+def synthetic_stamps(count, seed=7):
+    """工作日白天为主、约两成晚间/周末的 commit 时间（按时间排列）"""
+    rng = random.Random(seed)
+    moments = []
+    for _ in range(count):
+        month, day = rng.randrange(1, 13), rng.randrange(1, 29)
+        hour = rng.choice(range(19, 24)) if rng.random() < 0.2 else rng.choice(range(9, 19))
+        moments.append((month, day, hour, rng.randrange(60)))
+    return [f"2024-{m:02d}-{d:02d}T{h:02d}:{mi:02d}:00+08:00" for m, d, h, mi in sorted(moments)]
+
+
+def sampled(c996, repo, rate, **kwargs):
+    analyzer = c996.SampledAnalyzer(start_date='2023-06-01', end_date='2025-06-30', repo_path=str(repo),
+                                    rate=rate, **kwargs)
+    return analyzer, analyzer.analyze()
+
+
+def test_helpers(c996):
+    assert [c996.bit_reverse(i, 3) for i in range(8)] == [0, 4, 2, 6, 1, 5, 3, 7]
+    assert c996.scale_histogram([1, 2, 0, 3], 12) == [2, 4, 0, 6]
+    assert sum(c996.scale_histogram([1, 1, 1], 10)) == 10
+
+
+def test_small_population_falls_back_to_exact_count(tmp_path, capsys, c996):
+    repo = tmp_path / 'small'
+    make_repo(repo, synthetic_stamps(150))
+    analyzer, result = sampled(c996, repo, 0.3)
+    sample = result['sample']
+    assert (sample['sampled'], sample['population'], sample['exhaustive']) == (150, 150, True)
+    assert sample['index_996_ci'] == [result['index_996']] * 2
+    assert '退化为完整统计' in capsys.readouterr().err
+    assert '结果即完整统计' in c996.generate_sample_notice(sample)
+
+
+def test_sample_interval_covers_exact_index(tmp_path, capsys, c996):
+    repo = tmp_path / 'large'
+    make_repo(repo, synthetic_stamps(20000))
+    git(repo, 'commit-graph', 'write', '--reachable')
+
+    analyzer, result = sampled(c996, repo, 0.1, tolerance=3.0)
+    sample = result['sample']
+    assert sample['population'] == 20000 and not sample['exhaustive']
+    assert 1000 <= sample['sampled'] <= 2500
+    assert result['total_count'] == 20000
+    err = capsys.readouterr().err
+    assert '退化为完整统计' not in err and 'commit-graph' not in err
+
+    comparison = analyzer.compare_exact(result)
+    low, high = sample['index_996_ci']
+    assert low <= comparison['index_996'] <= high and comparison['index_996_covered']
+    assert comparison['histogram_distance'] < 0.1
+    print(f"\n--sample 0.1: {sample['sampled']}/20000 commits, speedup {comparison['speedup']}x, "
+          f"index {result['index_996']} vs exact {comparison['index_996']} (CI [{low}, {high}])")
+
+
+def test_missing_commit_graph_is_reported(tmp_path, capsys, c996):
+    repo = tmp_path / 'nograph'
+    make_repo(repo, synthetic_stamps(1200))
+    sampled(c996, repo, 0.1)
+    err = capsys.readouterr().err
+    assert 'commit-graph' in err and '实际抽样比例为 50%' in err
+
+
+def test_batches_larger_than_pipe_buffer(tmp_path, monkeypatch, c996):
+    repo = tmp_path / 'wide'
+    make_repo(repo, synthetic_stamps(12000))
+    git(repo, 'commit-graph', 'write', '--reachable')
+    # 每轮 3000 个 SHA（约 120 KB），远超管道缓冲区：先写完整批再读取会与 cat-file 互相阻塞
+    monkeypatch.setattr(c996, 'SAMPLE_BATCH_SIZE', 3000)
+    monkeypatch.setattr(c996, 'SAMPLE_MIN_SIZE', 12000)
+    results = []
+    worker = threading.Thread(target=lambda: results.append(sampled(c996, repo, 0.5)[1]), daemon=True)
+    worker.start()
+    worker.join(60)
+    assert not worker.is_alive(), 'cat-file --batch 死锁'
+    assert results[0]['sample']['sampled'] == 6000
+
+
+@pytest.mark.parametrize('argv', [['--sample', '0'], ['--sample', '1.5'], ['--sample-compare']])
+def test_cli_validation(tmp_path, monkeypatch, c996, argv):
+    repo = tmp_path / 'repo'
+    make_repo(repo, stamps('2024-03-04', [10]))
+    assert run_main(monkeypatch, '--repo', repo, '--no-browser', *argv) == 1
@@ -0,0 +1,45 @@
+"""--scan 目录扫描（discover_git_repos）"""
+import os
+
+from conftest import make_repo, run_main, stamps
+
+
+def discovered(c996, root, **kwargs):
+    return sorted(os.path.relpath(repo['path'], root) for repo in c996.discover_git_repos(str(root), **kwargs))
+
+
+def test_discovers_worktree_and_bare_repos(tmp_path, c996):
+    make_repo(tmp_path / 'team' / 'api', stamps('2024-03-04', [10]))
+    make_repo(tmp_path / 'mirrors' / 'web.git', stamps('2024-03-04', [11]), bare=True)
+    os.makedirs(tmp_path / 'empty' / 'deep')
+    assert discovered(c996, tmp_path) == ['mirrors/web.git', 'team/api']
+
+
+def test_prunes_dependency_dirs(tmp_path, c996):
+    make_repo(tmp_path / 'app', stamps('2024-03-04', [10]))
+    make_repo(tmp_path / 'node_modules' / 'left-pad', stamps('2024-03-04', [10]))
+    assert discovered(c996, tmp_path) == ['app']
+
+
+def test_repos_named_like_build_dirs_are_reported(tmp_path, c996):
+    make_repo(tmp_path / 'build', stamps('2024-03-04', [10]))
+    make_repo(tmp_path / 'target', stamps('2024-03-04', [11]), bare=True)
+    # 普通的构建产物目录（本身不是仓库）仍然跳过，不再深入
+    make_repo(tmp_path / 'dist' / 'nested', stamps('2024-03-04', [12]))
+    assert discovered(c996, tmp_path) == ['build', 'target']
+
+
+def test_submodules_only_when_requested(tmp_path, c996):
+    make_repo(tmp_path / 'outer', stamps('2024-03-04', [10]))
+    make_repo(tmp_path / 'outer' / 'libs' / 'inner', stamps('2024-03-04', [11]))
+    assert discovered(c996, tmp_path) == ['outer']
+    assert discovered(c996, tmp_path, include_submodules=True) == ['outer', 'outer/libs/inner']
+
+
+def test_scan_without_repos_reports_distinct_error(tmp_path, monkeypatch, capsys):
+    os.makedirs(tmp_path / 'nothing' / 'here')
+    code = run_main(monkeypatch, '--scan', tmp_path, '--no-browser', '-o', tmp_path / 'out.html')
+    assert code == 1
+    err = capsys.readouterr().err
+    assert '未发现任何 Git 仓库' in err
+    assert '所有仓库分析都失败了' not in err
@@ -0,0 +1,66 @@
+"""克隆缓存的共享对象库：同一家族的 fork 共用一份对象（file:// 远程仓库）"""
+import json
+import os
+
+import pytest
+
+from conftest import add_commits, git, make_repo, stamps
+
+
+@pytest.fixture
+def forks(tmp_path):
+    upstream = tmp_path / 'remotes' / 'org' / 'proj.git'
+    make_repo(upstream, [(stamp, 'a.txt') for stamp in stamps('2024-03-04', range(9, 19))], bare=True)
+    fork = tmp_path / 'remotes' / 'someone' / 'proj.git'
+    git(tmp_path, 'clone', '-q', '--bare', str(upstream), str(fork))
+    add_commits(fork, [(stamps('2024-03-05', [21])[0], 'b.txt')])
+    return upstream.as_uri(), fork.as_uri()
+
+
+def object_count(path):
+    counts = dict(line.split(': ') for line in git(path, 'count-objects', '-v').splitlines())
+    return int(counts['count']) + int(counts['in-pack'])
+
+
+def test_family_names(c996):
+    cache = c996.CloneCache('unused', families=[('platform', r'/platform/')])
+    assert cache.family_of('https://github.com/org/proj.git') == 'proj'
+    assert cache.family_of('git@github.com:someone/proj') == 'proj'
+    assert cache.family_of('https://example.com/platform/api.git') == 'platform'
+    assert c996.CloneCache('unused').family_of('https://github.com/org/proj.git') is None
+
+
+def test_forks_share_one_object_store(tmp_path, c996, forks):
+    cache = c996.CloneCache(str(tmp_path / 'cache'), families=[])
+    paths = [cache.checkout(url)[0] for url in forks]
+    store = cache.store_path('proj')
+    for path in paths:
+        with open(os.path.join(path, 'objects', 'info', 'alternates'), encoding='utf-8') as f:
+            assert os.path.realpath(f.read().strip()) == os.path.realpath(os.path.join(store, 'objects'))
+        # 共同历史只在对象库中保存一份
+        assert object_count(path) <= 3
+    assert object_count(store) >= 30
+    assert git(paths[1], 'rev-list', '--count', 'HEAD').strip() == '11'
+
+    for path in paths:
+        cache.release(path)
+    cache.max_bytes = 1
+    cache.gc()
+    assert not os.path.exists(store)
+    with open(os.path.join(cache.root, cache.INDEX_FILE), encoding='utf-8') as f:
+        index = json.load(f)
+    assert index['entries'] == {} and index['stores'] == {}
+
+
+def test_evicting_one_member_keeps_store(tmp_path, c996, forks):
+    cache = c996.CloneCache(str(tmp_path / 'cache'), families=[])
+    upstream_path, _ = cache.checkout(forks[0])
+    fork_path, _ = cache.checkout(forks[1])
+    cache.release(fork_path)
+    cache.max_bytes = 1
+    cache.gc()
+    store = cache.store_path('proj')
+    refs = git(store, 'for-each-ref', '--format=%(refname)').split()
+    assert refs and all(ref.startswith(f'refs/remotes/{cache.entry_name(forks[0])}/') for ref in refs)
+    assert git(upstream_path, 'rev-list', '--count', 'HEAD').strip() == '10'
+    cache.release(upstream_path)
@@ -0,0 +1,55 @@
+"""--site：增量维护静态报告站点"""
+import json
+import os
+
+from conftest import add_commits, make_repo, stamps
+
+
+def build(c996, repos, site_dir):
+    analyzer = c996.MultiRepoAnalyzer([{'path': str(path), 'type': 'local'} for path in repos],
+                                      start_date='2024-01-01', end_date='2024-12-31', project_name='fleet',
+                                      period='month')
+    result = analyzer.analyze()
+    return c996.build_static_site(result, str(site_dir), analyzer, workers=1)
+
+
+def test_site_rebuilds_only_changed_pages(tmp_path, c996):
+    api, web = tmp_path / 'api', tmp_path / 'web'
+    make_repo(api, stamps('2024-03-04', [10, 11]))
+    make_repo(web, stamps('2024-04-02', [20]))
+    site = tmp_path / 'site'
+
+    index, rendered, total = build(c996, [api, web], site)
+    assert (rendered, total) == (3, 3)
+    assert sorted(os.listdir(site / 'repos')) == ['api.html', 'web.html']
+    assert sorted(os.listdir(site / 'assets')) == ['chart.xkcd.min.js', 'vcr-osd.ttf', 'zpix.woff2']
+    index_html = open(index, encoding='utf-8').read()
+    assert "href='repos/api.html'" in index_html and '<svg' in index_html
+    web_mtime = os.stat(site / 'repos' / 'web.html').st_mtime_ns
+
+    assert build(c996, [api, web], site)[1:] == (0, 3)
+
+    add_commits(api, stamps('2024-05-06', [22]))
+    assert build(c996, [api, web], site)[1:] == (2, 3)  # api.html + all.html
+    assert os.stat(site / 'repos' / 'web.html').st_mtime_ns == web_mtime
+
+    assert build(c996, [api], site)[1:] == (1, 2)
+    assert os.listdir(site / 'repos') == ['api.html']
+    with open(site / c996.SITE_MANIFEST, encoding='utf-8') as f:
+        assert sorted(json.load(f)['pages']) == ['all.html', 'repos/api.html']
+
+
+def test_missing_page_is_rerendered(tmp_path, c996):
+    api = tmp_path / 'api'
+    make_repo(api, stamps('2024-03-04', [10]))
+    site = tmp_path / 'site'
+    build(c996, [api], site)
+    os.remove(site / 'repos' / 'api.html')
+    assert build(c996, [api], site)[1:] == (1, 2)
+    assert os.path.exists(site / 'repos' / 'api.html')
+
+
+def test_duplicate_names_get_stable_suffixes(c996):
+    first = c996.site_page_name('app', '/a/app', True)
+    assert first == c996.site_page_name('app', '/a/app', True) != c996.site_page_name('app', '/b/app', True)
+    assert c996.site_page_name('my app', '/x', False) == 'my-app.html'
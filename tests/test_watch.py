@@ -0,0 +1,70 @@
+"""--watch：refs 变化时只读取新增 commit"""
+import _thread
+import threading
+
+import pytest
+
+from conftest import add_commits, git, make_repo, stamps
+
+
+def test_refresh_head_reads_only_new_commits(tmp_path, c996):
+    path = tmp_path / 'repo'
+    make_repo(path, stamps('2024-03-04', [10, 11]))
+    analyzer = c996.Code996Analyzer(start_date='2024-01-01', repo_path=str(path))
+    assert analyzer.analyze()['total_count'] == 2
+    assert analyzer.refresh_head() == 0
+
+    add_commits(path, stamps('2024-03-05', [21, 22, 23]))
+    assert analyzer.refresh_head() == 3
+    assert analyzer.build_full_result()['total_count'] == 5
+
+    git(path, 'update-ref', 'refs/heads/main', 'main~4')
+    assert analyzer.refresh_head() is None
+    analyzer.recollect()
+    assert analyzer.build_full_result()['total_count'] == 1
+
+
+def test_multi_repo_refresh_keeps_dedupe(tmp_path, c996):
+    upstream = tmp_path / 'upstream'
+    make_repo(upstream, stamps('2024-03-04', [10, 11]))
+    fork = tmp_path / 'fork'
+    git(tmp_path, 'clone', '-q', str(upstream), str(fork))
+    repos = [{'path': str(upstream), 'type': 'local'}, {'path': str(fork), 'type': 'local'}]
+    aggregator = c996.MultiRepoAnalyzer(repos, start_date='2024-01-01', dedupe_set=c996.SortedDigestSet(), watch=True)
+    assert aggregator.analyze()['total_count'] == 2
+
+    add_commits(upstream, stamps('2024-03-06', [20]))
+    git(fork, 'pull', '-q', '--ff-only')
+    changed = [analyzer for analyzer in aggregator.analyzers if analyzer.refresh_head()]
+    assert len(changed) == 2
+    result = aggregator.build_current_result(changed)
+    assert (result['total_count'], result['duplicate_count']) == (3, 3)
+    assert [repo.total_count for repo in result['repo_results']] == [3, 3]
+
+
+@pytest.mark.parametrize('mode', ['inotify', 'poll'])
+def test_watch_loop_picks_up_new_commits(tmp_path, monkeypatch, capsys, c996, mode):
+    if mode == 'poll':
+        monkeypatch.setattr(c996.RefWatcher, '_init_inotify', lambda self: (_ for _ in ()).throw(OSError('disabled')))
+    path = tmp_path / 'repo'
+    make_repo(path, stamps('2024-03-04', [10]))
+    analyzer = c996.Code996Analyzer(start_date='2024-01-01', repo_path=str(path))
+    analyzer.analyze()
+
+    updates = []
+
+    def on_update(changed):
+        updates.append(analyzer.build_full_result()['total_count'])
+        raise KeyboardInterrupt
+
+    committer = threading.Timer(0.3, add_commits, (path, stamps('2024-03-05', [20, 21])))
+    failsafe = threading.Timer(15, _thread.interrupt_main)
+    committer.start()
+    failsafe.start()
+    try:
+        c996.watch_repositories([analyzer], on_update, interval=0.1)
+    finally:
+        failsafe.cancel()
+        committer.join()
+    assert updates == [3]
+    assert f'（{mode}）' in capsys.readouterr().out
@@ -0,0 +1,53 @@
+"""--window：一次遍历历史统计多个命名时间窗口"""
+import pytest
+
+from conftest import make_repo, stamps
+
+
+WINDOWS = ['Q1=2024-01-01:2024-03-31', 'Q2=2024-04-01:2024-06-30', 'March=2024-03-01:2024-03-31']
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / 'repo'
+    make_repo(path, stamps('2024-02-05', range(9, 18)) + stamps('2024-03-31', [23])
+              + stamps('2024-04-01', [0, 10]) + stamps('2024-05-11', [14, 15, 16]))
+    return str(path)
+
+
+def test_parse_windows(c996):
+    assert c996.parse_windows([' Q1 = 2024-01-01 : 2024-03-31 ']) == \
+        [{'name': 'Q1', 'start_date': '2024-01-01', 'end_date': '2024-03-31'}]
+    assert c996.windows_date_range(c996.parse_windows(WINDOWS)) == ('2024-01-01', '2024-07-01')
+    for value in ['Q1=2024-01-01', 'Q1=2024-02-30:2024-03-01', 'Q1=2024-03-01:2024-01-01']:
+        with pytest.raises(SystemExit):
+            c996.parse_windows([value])
+
+
+def analyze(c996, repo, start, end, windows=None):
+    return c996.Code996Analyzer(start_date=start, end_date=end, repo_path=repo, windows=windows).analyze()
+
+
+def hours(window):
+    return [(item['time'], item['count']) for item in window['hour_data'] if item['count']]
+
+
+def test_windows_bucket_by_author_day(c996, repo):
+    windows = c996.parse_windows(WINDOWS)
+    result = analyze(c996, repo, *c996.windows_date_range(windows), windows=windows)
+    assert [(w['name'], w['total_count']) for w in result['windows']] == [('Q1', 10), ('Q2', 5), ('March', 1)]
+    q1, q2, march = result['windows']
+    assert hours(march) == [('23', 1)]
+    assert hours(q2) == [('00', 1), ('10', 1), ('14', 1), ('15', 1), ('16', 1)]
+    assert sum(count for _, count in hours(q1)) == 10
+    assert result['total_count'] == 15
+
+
+def test_multi_repo_windows_are_merged(tmp_path, c996, repo):
+    other = tmp_path / 'other'
+    make_repo(other, stamps('2024-03-02', [20, 21]))
+    windows = c996.parse_windows(WINDOWS)
+    start, end = c996.windows_date_range(windows)
+    result = c996.MultiRepoAnalyzer([{'path': repo, 'type': 'local'}, {'path': str(other), 'type': 'local'}],
+                                    start_date=start, end_date=end, windows=windows).analyze()
+    assert [(w['name'], w['total_count']) for w in result['windows']] == [('Q1', 12), ('Q2', 5), ('March', 3)]